@@ -9,7 +9,18 @@ import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
-from jinja2 import Environment, FileSystemLoader
+
+from src.template_engine import get_template_env
+
+
+def format_number(value):
+    """格式化数字，添加千分位分隔符（模板过滤器）"""
+    if value is None:
+        return '0'
+    try:
+        return f"{int(value):,}"
+    except (ValueError, TypeError):
+        return str(value)
 
 
 class WeeklyReportGenerator:
@@ -28,24 +39,9 @@ class WeeklyReportGenerator:
         self.template_path = Path(template_path)
         self.template_dir = self.template_path.parent
 
-        # 使用Jinja2环境
-        self.env = Environment(
-            loader=FileSystemLoader(str(self.template_dir)),
-            trim_blocks=True,
-            lstrip_blocks=True
-        )
-
-        # 添加自定义过滤器
-        self.env.filters['format_number'] = self._format_number
-
-    def _format_number(self, value):
-        """格式化数字，添加千分位分隔符"""
-        if value is None:
-            return '0'
-        try:
-            return f"{int(value):,}"
-        except (ValueError, TypeError):
-            return str(value)
+        # 使用共享Jinja2环境（进程内复用，按配置启用字节码缓存）；过滤器在创建环境时注册
+        self.env = get_template_env(self.template_dir, filters={'format_number': format_number},
+                                    trim_blocks=True, lstrip_blocks=True)
 
     def generate_report(
         self,
@@ -189,29 +185,242 @@ def process_json_data(json_files: Dict[str, str]) -> Dict:
     """
     处理JSON数据文件，提取关键指标
 
+    JSON文件为 output/archive 下的快照（支持带 schema_version 的新格式和旧归档格式）
+
     Args:
         json_files: 各部分JSON文件路径的字典
 
     Returns:
-        Dict: 处理后的数据字典
+        Dict: 处理后的数据字典（键与 generate_report 的 *_data 参数对应）
     """
+    from src.snapshot import load_snapshot_file
+
+    extractors = {
+        'traffic': extract_traffic_metrics,
+        'activation': extract_activation_metrics,
+        'engagement': extract_engagement_metrics,
+        'retention': extract_retention_metrics,
+        'revenue': extract_revenue_metrics,
+    }
+
     result = {}
+    for section, extractor in extractors.items():
+        if section not in json_files:
+            continue
+        snapshot = load_snapshot_file(json_files[section])
+        result[section] = extractor(snapshot['data']) if snapshot else {}
+
+    return result
 
-    # 处理流量数据
-    if 'traffic' in json_files:
-        with open(json_files['traffic'], 'r', encoding='utf-8') as f:
-            traffic_json = json.load(f)
-            result['traffic'] = extract_traffic_metrics(traffic_json)
 
-    # 处理其他部分类似...
+def _weeks(data: List[Dict], date_col: str) -> List[str]:
+    """按时间顺序返回数据中的周"""
+    return sorted({str(row[date_col]) for row in data if row.get(date_col) is not None})
 
-    return result
+
+def _change_rate(current, previous) -> float:
+    """环比变化率（百分比）"""
+    if not previous:
+        return 0.0
+    return (current - previous) / previous * 100
+
+
+def _signed(value: float, digits: int = 1, suffix: str = '') -> str:
+    """带符号的数字字符串，如 +40.1%"""
+    return f"{value:+.{digits}f}{suffix}"
+
+
+def _trend(value: float) -> str:
+    """变化方向箭头"""
+    return '↑' if value > 0 else ('↓' if value < 0 else '→')
 
 
 def extract_traffic_metrics(data: List[Dict]) -> Dict:
-    """从流量数据中提取关键指标"""
-    # 实现流量数据提取逻辑
-    return {}
+    """从流量数据中提取关键指标（按渠道汇总最新周与上周）"""
+    weeks = _weeks(data, '日期')
+    if not weeks:
+        return {}
+
+    def _totals(week):
+        rows = [row for row in data if str(row.get('日期')) == week]
+        guests = sum(row.get('新访客数') or 0 for row in rows)
+        registers = sum(row.get('新访客注册数') or 0 for row in rows)
+        return rows, guests, registers
+
+    rows, guests, registers = _totals(weeks[-1])
+    prev_rows, prev_guests, prev_registers = _totals(weeks[-2]) if len(weeks) > 1 else ([], 0, 0)
+
+    conversion = registers / guests * 100 if guests else 0
+    prev_conversion = prev_registers / prev_guests * 100 if prev_guests else 0
+    guests_wow = _change_rate(guests, prev_guests)
+    registers_wow = _change_rate(registers, prev_registers)
+    conversion_wow = conversion - prev_conversion
+
+    # 新访客变化最大的两个渠道
+    prev_by_channel = {row.get('渠道'): row.get('新访客数') or 0 for row in prev_rows}
+    changes = sorted(
+        rows,
+        key=lambda row: abs((row.get('新访客数') or 0) - prev_by_channel.get(row.get('渠道'), 0)),
+        reverse=True
+    )
+    notes = []
+    for row in changes[:2]:
+        curr_value = row.get('新访客数') or 0
+        prev_value = prev_by_channel.get(row.get('渠道'), 0)
+        notes.append({
+            'channel': row.get('渠道', ''),
+            'description': (
+                f"新访客数环比{_signed(_change_rate(curr_value, prev_value), suffix='%')}"
+                f"（从{prev_value:,}到{curr_value:,}）"
+            )
+        })
+
+    return {
+        'total_guests': guests,
+        'total_registers': registers,
+        'conversion_rate': round(conversion, 1),
+        'guests_wow': _signed(guests_wow, suffix='%'),
+        'guests_trend': _trend(guests_wow),
+        'registers_wow': _signed(registers_wow, suffix='%'),
+        'registers_trend': _trend(registers_wow),
+        'conversion_wow': _signed(conversion_wow, 2, '%'),
+        'conversion_trend': _trend(conversion_wow),
+        'notes': notes
+    }
+
+
+def extract_activation_metrics(data: List[Dict]) -> Dict:
+    """从激活数据中提取漏斗各步转化率（最新周数据不完整，单独列出）"""
+    rows = sorted(data, key=lambda row: str(row.get('日期', '')))
+    if len(rows) < 3:
+        return {}
+
+    steps = [
+        '注册到进工具转化率',
+        '进工具到有效画户型转化率',
+        '有效画户型到有效拖模型转化率',
+        '有效拖模型到渲染转化率',
+    ]
+    current, last, last_last = rows[-1], rows[-2], rows[-3]
+
+    result = {
+        'current_week_label': str(current.get('日期')),
+        'last_week_label': str(last.get('日期')),
+        'last_last_week_label': str(last_last.get('日期')),
+        'incomplete_data': True,
+        'new_users': current.get('新注册用户数', 0),
+    }
+    for i, col in enumerate(steps + ['渲染总转化率'], start=1):
+        key = f"step{i}" if i <= len(steps) else 'total'
+        llw = round((last_last.get(col) or 0) * 100, 2)
+        lw = round((last.get(col) or 0) * 100, 2)
+        result[f"{key}_llw"] = llw
+        result[f"{key}_lw"] = lw
+        result[f"{key}_change"] = f"{_trend(lw - llw)} {_signed(lw - llw, 2, '%')}"
+        if key != 'total':
+            result[f"{key}_curr"] = round((current.get(col) or 0) * 100, 2)
+
+    return result
+
+
+def extract_engagement_metrics(data: List[Dict]) -> Dict:
+    """从活跃数据中提取新老用户WAU"""
+    weeks = _weeks(data, '周')
+    if not weeks:
+        return {}
+
+    def _wau(week, user_type=None):
+        return sum(
+            row.get('上周工具WAU') or 0 for row in data
+            if str(row.get('周')) == week and (user_type is None or row.get('用户类型（新老）') == user_type)
+        )
+
+    latest = weeks[-1]
+    previous = weeks[-2] if len(weeks) > 1 else None
+    total, new, old = _wau(latest), _wau(latest, '新注册'), _wau(latest, '老用户')
+    prev_total = _wau(previous) if previous else 0
+    prev_new = _wau(previous, '新注册') if previous else 0
+    prev_old = _wau(previous, '老用户') if previous else 0
+
+    return {
+        'total_wau': total,
+        'wow': _signed(_change_rate(total, prev_total)),
+        'driver': '新用户' if abs(new - prev_new) >= abs(old - prev_old) else '老用户',
+        'new_wau': new,
+        'new_wow': _signed(_change_rate(new, prev_new)),
+        'old_wau': old,
+        'old_wow': _signed(_change_rate(old, prev_old)),
+        'historical_avg': round(sum(_wau(week) for week in weeks) / len(weeks))
+    }
+
+
+def extract_retention_metrics(data: List[Dict]) -> Dict:
+    """从留存数据中提取新老用户次周留存率"""
+    result = {}
+    for user_type, prefix in (('新注册', 'new'), ('老用户', 'old')):
+        rows = sorted(
+            (row for row in data if row.get('上周用户类型') == user_type),
+            key=lambda row: str(row.get('上周', ''))
+        )
+        rates = [(row.get('工具次周留存') or 0) * 100 for row in rows]
+        if not rates:
+            continue
+
+        current = rates[-1]
+        average = sum(rates) / len(rates)
+        if current >= max(rates):
+            trend = f'达到近{len(rates)}周最高点'
+        elif current >= average:
+            trend = f'处于近{len(rates)}周较高水平'
+        else:
+            trend = f'低于近{len(rates)}周平均水平'
+
+        result[f"{prefix}_rate"] = round(current, 1)
+        result[f"{prefix}_last"] = round(rates[-2], 1) if len(rates) > 1 else 0
+        result[f"{prefix}_trend"] = trend
+        result[f"{prefix}_12w_avg"] = round(average, 2)
+
+    return result
+
+
+def extract_revenue_metrics(data: List[Dict]) -> Dict:
+    """从收入数据中提取总收入、新签与续约的环比变化"""
+    rows = sorted(data, key=lambda row: str(row.get('日期', '')))
+    if len(rows) < 2:
+        return {}
+
+    current, previous = rows[-1], rows[-2]
+
+    def _delta(col):
+        return (current.get(col) or 0) - (previous.get(col) or 0)
+
+    def _rate(col):
+        return round(_change_rate(current.get(col) or 0, previous.get(col) or 0), 1)
+
+    total_change = _delta('Total_Amt')
+    renewal_change = _delta('Renewal_Amt')
+    new_change = _delta('NewSubscribe_Amt')
+    users_change = _delta('Total_Paid_Users')
+
+    return {
+        'total': round(current.get('Total_Amt') or 0),
+        'change_abs': round(total_change),
+        'trend': '⬆️' if total_change > 0 else '⬇️',
+        'change_rate': _rate('Total_Amt'),
+        'renewal_change': f"{renewal_change:+,.0f}",
+        'renewal_rate': _rate('Renewal_Amt'),
+        'new_change': f"{new_change:+,.0f}",
+        'new_rate': _rate('NewSubscribe_Amt'),
+        'normal_change': f"{total_change:+,.0f}",
+        'type_analysis': f"续约收入（{renewal_change:+,.0f} 美元）、 新签（{new_change:+,.0f} 美元）",
+        'users_analysis': (
+            f"付费用户数{'增加' if users_change >= 0 else '减少'}{abs(users_change):,.0f}人"
+            f"（{_signed(_rate('Total_Paid_Users'), suffix='%')}）"
+        ),
+        'arpu_analysis': (
+            f"整体客单价从{previous.get('整体客单价', 0)}变为{current.get('整体客单价', 0)}"
+        )
+    }
 
 
 if __name__ == '__main__':
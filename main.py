@@ -22,14 +22,10 @@ try:
 except ImportError:
     print("⚠️  未安装 python-dotenv，运行: pip install python-dotenv")
 
-from src.logger import setup_logging, get_logger
 from src.date_utils import calculate_week_params
-from src.interactive_prompt import ask_target_week, ask_revenue_summary, confirm_execution
-from src.data_fetcher import DataFetcher
-# 使用新的 Analyzer 替代 DataAnalyzer（向后兼容）
-from src.core import ConfigManager, Analyzer, ReportGenerator as NewReportGenerator
-from src.report_generator import ReportGenerator
-from src.confluence_updater import ConfluenceUpdater
+
+# 各子系统（requests、jinja2、AI总结等）在对应阶段才导入，
+# 保证 --help 等轻量命令无需加载整套依赖
 
 
 def parse_arguments() -> Dict:
@@ -41,7 +37,12 @@ def parse_arguments() -> Dict:
         'has_revenue_md': False,
         'md_path': None,
         'auto_confirm': False,
-        'save_file': False
+        'save_file': False,
+        'import_profile': False,
+        'from_snapshot': None,
+        'force_publish': False,
+        'period': None,
+        'local_engine': None
     }
 
     i = 1
@@ -60,6 +61,11 @@ def parse_arguments() -> Dict:
   --no-md         不使用MD文档，仅SQL数据
   --auto-confirm  自动确认所有提示
   --save-file     将报告保存到本地文件，不更新Confluence
+  --import-profile 运行结束后输出各模块导入耗时（同 -X importtime）
+  --from-snapshot DIR 从归档快照目录加载数据，跳过Metabase查询
+  --force-publish 强制完整发布到Confluence（不做差量比较）
+  --local-engine DIR 在本地 SQLite 样例表上执行SQL（离线调试，不访问Metabase）
+  --period month|quarter 生成月报/季报（由缓存的日/周数据汇总，只查询缺失的日期；保存到本地文件）
 
 示例：
   # 自动运行（本周）：
@@ -73,6 +79,12 @@ def parse_arguments() -> Dict:
 
   # 保存到本地文件（不更新Confluence）：
     python3 main.py --auto --save-file
+
+  # 使用归档快照快速渲染（不访问数仓）：
+    python3 main.py --from-snapshot output/archive --save-file --auto-confirm
+
+  # 上个月的月报（--target 指定其他月份/季度）：
+    python3 main.py --period month --auto-confirm
 """)
             sys.exit(0)
         elif arg == '--auto' or arg == '-a':
@@ -106,6 +118,41 @@ def parse_arguments() -> Dict:
             args['auto_confirm'] = True
         elif arg == '--save-file':
             args['save_file'] = True
+        elif arg == '--force-publish':
+            args['force_publish'] = True
+        elif arg == '--import-profile':
+            args['import_profile'] = True
+        elif arg == '--from-snapshot' or arg.startswith('--from-snapshot='):
+            if '=' in arg:
+                args['from_snapshot'] = arg.split('=', 1)[1]
+            elif i + 1 < len(sys.argv) and not sys.argv[i+1].startswith('--'):
+                args['from_snapshot'] = sys.argv[i + 1]
+                i += 1
+            else:
+                print("--from-snapshot 需要指定快照目录")
+                sys.exit(1)
+        elif arg == '--local-engine' or arg.startswith('--local-engine='):
+            if '=' in arg:
+                args['local_engine'] = arg.split('=', 1)[1]
+            elif i + 1 < len(sys.argv) and not sys.argv[i+1].startswith('--'):
+                args['local_engine'] = sys.argv[i + 1]
+                i += 1
+            else:
+                print("--local-engine 需要指定样例表目录")
+                sys.exit(1)
+            # 本地调试不更新 Confluence
+            args['save_file'] = True
+        elif arg == '--period' or arg.startswith('--period='):
+            if '=' in arg:
+                args['period'] = arg.split('=', 1)[1]
+            elif i + 1 < len(sys.argv) and not sys.argv[i+1].startswith('--'):
+                args['period'] = sys.argv[i + 1]
+                i += 1
+            if args['period'] not in ('month', 'quarter'):
+                print("--period 需要指定 month 或 quarter")
+                sys.exit(1)
+            # 月报/季报不覆盖 Confluence 上的周报页面
+            args['save_file'] = True
         else:
             print(f"未知参数: {arg}，使用 --help 查看帮助")
             sys.exit(1)
@@ -115,8 +162,14 @@ def parse_arguments() -> Dict:
 
 
 def get_week_config_from_args(args: Dict) -> Dict:
-    """根据命令行参数获取周配置"""
-    if args['mode'] == 'manual' and args['target_date']:
+    """根据命令行参数获取周配置（--period 时为月/季度配置）"""
+    if args.get('period'):
+        from src.date_utils import calculate_period_params
+        params = calculate_period_params(args['period'], target_date=args['target_date'])
+        params['description'] = params['period_label']
+        params['target_date'] = args['target_date'] or params['report_date']
+        return params
+    elif args['mode'] == 'manual' and args['target_date']:
         # 手动模式：计算目标周的偏移
         # 这里简化处理，直接使用固定偏移
         params = calculate_week_params(target_date=args['target_date'])
@@ -147,33 +200,51 @@ def load_config(config_file: str = None) -> dict:
     """加载配置文件"""
     if config_file is None:
         config_file = Path(__file__).parent / 'config' / 'config.yaml'
+    import yaml
     with open(config_file, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
 
 def main():
     """主流程"""
+    # 先解析参数：--help 无需加载任何子系统
+    args = parse_arguments()
+    if args['import_profile']:
+        from src.utils.import_profile import enable_import_profile
+        enable_import_profile()
+
+    from src.logger import setup_logging, stop_logging
+    from src.core import ConfigManager
+    from src.run_metrics import reset_run_metrics
+
+    run_metrics = reset_run_metrics()
+    run_success = False
     try:
         # 1. 设置日志
+        logging_config = ConfigManager().get_logging_config()
         logger = setup_logging(
             name='weekly_report',
-            level=os.getenv('LOG_LEVEL', 'INFO'),
-            log_file=os.getenv('LOG_FILE_PATH', 'logs/weekly_report.log')
+            level=os.getenv('LOG_LEVEL', logging_config['level']),
+            log_file=os.getenv('LOG_FILE_PATH', logging_config['file']),
+            max_bytes=logging_config['max_bytes'],
+            backup_count=logging_config['backup_count'],
+            use_queue=logging_config['queue_enabled'],
+            max_payload_chars=logging_config['max_payload_chars']
         )
         logger.info("="*60)
         logger.info("Coohom周报自动化更新系统启动")
         logger.info("="*60)
 
-        # 2. 解析命令行参数
-        args = parse_arguments()
-
-        # 3. 获取周配置
+        # 2. 获取周配置
         week_config = get_week_config_from_args(args)
         logger.info(f"目标周: {week_config['description']}")
         logger.info(f"报告日期: {week_config.get('report_date', '')}")
-        logger.info(f"周范围: {week_config.get('week_monday', '')} ~ {week_config.get('week_saturday', '')}")
+        if args['period']:
+            logger.info(f"周期范围: {week_config['period_start']} ~ {week_config['period_end']}")
+        else:
+            logger.info(f"周范围: {week_config.get('week_monday', '')} ~ {week_config.get('week_saturday', '')}")
 
-        # 4. 收入MD文档（可选）
+        # 3. 收入MD文档（可选）
         md_content = None
         if args['has_revenue_md'] and args['md_path']:
             md_path = args['md_path']
@@ -184,15 +255,16 @@ def main():
             else:
                 logger.warning(f"⚠️  MD文件不存在: {md_path}")
         elif not args['has_revenue_md']:
-            logger.info("ℹ️  将仅使用SQL数据生成收入部分")
+            logger.info("ℹ️  收入部分使用SQL数据生成（含SKU/国家/账单分层拆分）")
 
-        # 5. 确认执行（自动模式下跳过）
+        # 4. 确认执行（自动模式下跳过）
         if not args['auto_confirm']:
             print("\n执行参数确认：")
             print(f" 目标周: {week_config['description']}")
             print(f"  报告日期: {week_config.get('report_date', '')}")
             print(f"  收入MD: {'使用' if args['has_revenue_md'] else '不使用'}")
-            print(f"  将在Confluence更新页面ID: 81397518314")
+            for target in ConfigManager().get_publish_targets():
+                print(f"  将在Confluence更新页面: {target['name']} (ID: {target['page_id']})")
             print("\n按Enter继续执行，或Ctrl+C取消...")
 
             # 等待用户确认（可选）
@@ -204,7 +276,7 @@ def main():
                 logger.info("\n用户中断执行")
                 sys.exit(1)
 
-        # 6. 加载配置（使用新的 ConfigManager）
+        # 5. 加载配置（使用新的 ConfigManager）
         logger.info("加载配置文件...")
         config_manager = ConfigManager()
         config = config_manager._config  # 兼容旧代码
@@ -218,14 +290,57 @@ def main():
         else:
             logger.info("ℹ️  METABASE_API_KEY 环境变量未设置，将使用配置文件或MCP方式")
 
-        # 7. 数据获取 - 获取本周数据
+        if args['local_engine']:
+            config['local_engine'] = {**config.get('local_engine', {}), 'enabled': True,
+                                      'sample_dir': args['local_engine']}
+            logger.info(f"ℹ️  使用本地SQL引擎，样例表目录: {args['local_engine']}")
+
+        # 6. 数据获取 - 获取本周数据
         logger.info("\n" + "="*60)
         logger.info("第一阶段：数据获取")
         logger.info("="*60)
-        fetcher = DataFetcher(config, logger=logger, use_mcp=False)
+        # 部分注册表（config.yaml 的 sections）：取数、分析、图表和渲染都按它遍历
+        section_specs = config_manager.get_sections()
+        sections = [spec['name'] for spec in section_specs]
+        from src.schema import apply_section_schemas, build_schema
+
+        if args['period']:
+            # 月报/季报：合并归档快照后在本地汇总，只为缓存缺失的日期查询数仓
+            from src.period_report import load_period_data
+            snapshot_dir = args['from_snapshot'] or base_path / config.get('snapshot', {}).get('output_dir', 'output/archive')
+            fetcher = None
+            if not args['from_snapshot']:
+                from src.data_fetcher import DataFetcher
+                fetcher = DataFetcher(config, logger=logger, use_mcp=False)
+            current_data = load_period_data(section_specs, week_config, str(snapshot_dir), fetcher=fetcher,
+                                            base_path=str(base_path), schema=build_schema(config), logger=logger)
+        elif args['from_snapshot']:
+            # 快照模式：直接加载归档数据，不访问数仓
+            from src.snapshot import load_snapshot_dir
+            logger.info(f"从快照加载数据: {args['from_snapshot']}")
+            current_data = load_snapshot_dir(
+                args['from_snapshot'],
+                sections=sections,
+                max_date=week_config.get('snapshot_date'),
+                logger=logger
+            )
+            # 快照按部分列类型转换一次（旧快照中的数值可能是字符串）
+            apply_section_schemas(current_data, build_schema(config), logger=logger)
+            for section, data in current_data.items():
+                run_metrics.record_cache(bool(data), section=section)
+        else:
+            from src.data_fetcher import DataFetcher
+            fetcher = DataFetcher(config, logger=logger, use_mcp=False)
+
+            logger.info("获取本周数据...")
+            # DataFetcher 会自动把每个部分的结果归档为快照，供 --from-snapshot 复用
+            current_data = fetcher.fetch_all_sections(week_config, week_offset=0, base_path=str(base_path))
+
+        # 日粒度取数的部分（流量、激活）在本地汇总为周粒度，供分析和周报使用
+        from src.rollup import rollup_sections
+        if not args['period']:
+            current_data = rollup_sections(current_data, section_specs, 'week')
 
-        logger.info("获取本周数据...")
-        current_data = fetcher.fetch_all_sections(week_config, week_offset=0, base_path=str(base_path))
         logger.info("获取数据获取情况")
         sections_with_data = [k for k, v in current_data.items() if v]
         sections_without_data = [k for k, v in current_data.items() if not v]
@@ -235,81 +350,128 @@ def main():
         else:
             logger.warning(f"⚠️  {len(sections_without_data)} 个部分无数据")
 
-        # 8. 数据获取 - 获取上周数据（用于环比）
-        logger.info("\n获取上周数据（用于环比计算）...")
-        previous_data = fetcher.fetch_all_sections(week_config, week_offset=-1, base_path=str(base_path))
+        # 趋势图在进程池中后台渲染，与上周数据获取和分析并行
+        chart_renderer = None
+        # 趋势图按周序列绘制，月报/季报不生成
+        if config.get('charts', {}).get('enabled', True) and not args['period']:
+            from src.charts import ChartRenderer
+            # 注册表中声明了 chart 的部分同样生成趋势图（charts.series 优先）
+            chart_config = dict(config.get('charts', {}))
+            chart_config['series'] = {
+                **{spec['name']: spec['chart'] for spec in section_specs if spec.get('chart')},
+                **chart_config.get('series', {})
+            }
+            chart_renderer = ChartRenderer(chart_config, logger=logger)
+            chart_renderer.submit(current_data, week_config.get('report_date', ''))
+
+        # 7. 数据获取 - 获取上周数据（用于环比）
+        if args['from_snapshot'] or args['period']:
+            # 快照已包含12周历史（月报/季报数据已包含上期），环比由分析器从同一份数据中提取
+            previous_data = current_data
+        else:
+            logger.info("\n获取上周数据（用于环比计算）...")
+            previous_data = rollup_sections(
+                fetcher.fetch_all_sections(week_config, week_offset=-1, base_path=str(base_path)),
+                section_specs, 'week'
+            )
 
-        # 9. 数据分析（使用新的 Analyzer）
+        # 8. 数据分析（使用新的 Analyzer）
         logger.info("\n" + "="*60)
         logger.info("第二阶段：数据分析")
         logger.info("="*60)
+        from src.core import Analyzer
         analyzer = Analyzer(config=config_manager, logger=logger)
 
         analysis_results = analyzer.analyze_all_sections(current_data, previous_data, week_config)
 
+        # 异常检测：所有分组×指标相对历史基线打分，得分最高的写入各部分关注事项（月报/季报只有两期数据，不检测）
+        anomaly_config = config.get('anomaly', {}) or {}
+        if anomaly_config.get('enabled', True) and not args['period']:
+            from src.anomaly import AnomalyDetector
+            detector = AnomalyDetector(anomaly_config, sections=section_specs, logger=logger)
+            detector.add_attention_items(analysis_results, detector.scan(current_data))
+
         # 显示分析结果摘要
         if 'traffic' in analysis_results:
             logger.info(f"流量: {analysis_results['traffic']['summary']}")
         if 'revenue' in analysis_results:
             logger.info(f"收入: {analysis_results['revenue']['summary']}")
 
-        # 10. 生成报告
+        # 9. 生成报告（各部分只渲染一次，按发布目标组装）
         logger.info("\n" + "="*60)
         logger.info("第三阶段：报告生成")
         logger.info("="*60)
-        generator = ReportGenerator(logger)
-
-        html_content = generator.generate_full_report(
-            params=week_config,
-            current_data=current_data,
-            previous_data=previous_data,
-            analysis=analysis_results,
-            revenue_md_content=md_content
-        )
+        from src.report_generator import ReportGenerator
+        from src.publisher import build_target_reports, publish_targets, save_report_artifacts
+        generator = ReportGenerator(logger, sections=section_specs)
+
+        targets = config_manager.get_publish_targets()
+        needed_sections = None
+        if all(target['sections'] for target in targets):
+            needed_sections = sorted({name for target in targets for name in target['sections']})
+
+        # 报告模型只构建一次，HTML、storage 和 Markdown 都由它输出
+        model = generator.build_report_model(week_config, current_data, analysis_results, md_content)
+        blocks = generator.render_model_blocks(model, sections=needed_sections)
+
+        # 趋势图和完整明细表作为附件上传，正文中嵌入图片和下载链接
+        attachments = {}
+        if chart_renderer:
+            from src.attachments import add_chart_images
+            charts = {name: info for name, info in chart_renderer.collect().items() if info['section'] in blocks}
+            blocks = add_chart_images(blocks, charts)
+            attachments.update(charts)
+        attachment_config = config.get('confluence', {}).get('attachments', {})
+        if attachment_config.get('enabled', True) and attachment_config.get('tables', True):
+            from src.attachments import collect_table_attachments, add_attachment_links
+            # 子部分（收入拆分）的明细附件挂在父部分下
+            section_parents = {spec['name']: spec['parent'] for spec in section_specs if spec.get('parent')}
+            tables = collect_table_attachments(
+                {k: v for k, v in current_data.items() if section_parents.get(k, k) in blocks},
+                week_config.get('report_date', ''),
+                section_parents
+            )
+            blocks = add_attachment_links(blocks, tables)
+            attachments.update(tables)
+        logger.info(f"附件: {len(attachments)} 个")
+
+        reports = build_target_reports(generator, week_config, blocks, targets)
+
+        from src.attachments import markdown_attachment_links
+        markdown = generator.render_model_markdown(model, appendix=markdown_attachment_links(attachments))
+        save_report_artifacts(markdown, attachments, config, week_config.get('report_date', ''), logger=logger)
+
+        logger.info(f"✅ 报告生成完成（{len(reports)} 个发布目标 + Markdown）")
 
-        logger.info("✅ 报告HTML生成完成")
+        # 10. 保存到文件或更新Confluence
+        logger.info("\n" + "="*60)
+        logger.info("第四阶段：保存报告到文件" if args['save_file'] else "第四阶段：更新Confluence")
+        logger.info("="*60)
+        results = publish_targets(
+            targets,
+            reports,
+            config,
+            version_message=f"Weekly report - {week_config.get('report_date', '')}",
+            force=args['force_publish'],
+            save_file=args['save_file'],
+            report_date=week_config.get('report_date', ''),
+            max_workers=config.get('confluence', {}).get('max_publish_workers', 4),
+            attachments=attachments,
+            logger=logger
+        )
 
-        # 11. 保存到文件或更新Confluence
-        if args['save_file']:
-            # 保存到本地文件
+        failed = [name for name, result in results.items() if not result['success']]
+        run_success = bool(results) and not failed
+        if run_success:
             logger.info("\n" + "="*60)
-            logger.info("第四阶段：保存报告到文件")
+            logger.info("✅ 报告已保存到本地文件！" if args['save_file'] else "✅ 周报更新完成！")
             logger.info("="*60)
-            updater = ConfluenceUpdater(config, logger)
-            saved_path = updater.save_html_to_file(
-                html_content,
-                week_config.get('report_date', '')
-            )
-            if saved_path:
-                logger.info("\n" + "="*60)
-                logger.info("✅ 报告已保存到本地文件！")
-                logger.info("="*60)
-                logger.info(f"文件路径: {saved_path}")
-                logger.info(f"报告日期: {week_config.get('report_date', '')}")
-            else:
-                logger.error("\n" + "="*60)
-                logger.error("❌ 保存报告失败")
+            for name, result in results.items():
+                logger.info(f"{name}: {result['location']}")
+            logger.info(f"报告日期: {week_config.get('report_date', '')}")
         else:
-            # 更新Confluence
-            logger.info("\n" + "="*60)
-            logger.info("第四阶段：更新Confluence")
-            logger.info("="*60)
-            updater = ConfluenceUpdater(config, logger)
-
-            success = updater.update_page(
-                new_content=html_content,
-                version_message=f"Weekly report - {week_config.get('report_date', '')}"
-            )
-
-            if success:
-                logger.info("\n" + "="*60)
-                logger.info("✅ 周报更新完成！")
-                logger.info("="*60)
-                logger.info(f"Confluence页面: https://cf.qunhequnhe.com/pages/viewpage.action?pageId=81397518314")
-                logger.info(f"报告日期: {week_config.get('report_date', '')}")
-            else:
-                logger.error("\n" + "="*60)
-                logger.error("❌ 周报更新失败")
+            logger.error("\n" + "="*60)
+            logger.error(f"❌ {'保存报告' if args['save_file'] else '周报更新'}失败: {', '.join(failed)}")
 
     except KeyboardInterrupt:
         logger.info("\n\n❌ 用户中断执行")
@@ -317,6 +479,18 @@ def main():
         logger.error(f"\n❌ 执行过程中出现异常: {e}", exc_info=True)
         import traceback
         traceback.print_exc()
+    finally:
+        # 导出本次运行指标（Prometheus textfile + JSON）
+        try:
+            run_metrics.export(ConfigManager().get_metrics_config(), success=run_success)
+        except Exception as e:
+            print(f"⚠️  导出运行指标失败: {e}")
+        # 队列模式下写完剩余日志再退出
+        stop_logging('weekly_report')
+        if args['import_profile']:
+            from src.utils.import_profile import disable_import_profile, report_import_profile
+            disable_import_profile()
+            report_import_profile()
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+-- 按日粒度返回，周/月视图由 src/rollup.py 在本地汇总（日粒度的新用户计数可直接相加）
 SELECT
     `create_date` AS `日期`,
     `ads_channel_classify` AS `渠道`,
@@ -10,7 +11,7 @@ SELECT
     ) AS `新访客注册转化率`
 FROM (
     SELECT
-        CASE '周'
+        CASE '日'
             WHEN '日' THEN `created_day`
             WHEN '周' THEN DATE_FORMAT(DATE_TRUNC('week', STR_TO_DATE(`created_day`, '%Y%m%d')), '%Y%m%d')
             WHEN '月' THEN SUBSTR(`created_day`, 1, 6)
@@ -33,7 +34,7 @@ FROM (
         AND `fst_visit_ua` <> 'meta-externalads/1.1 (+https://developers.facebook.com/docs/sharing/webmasters/crawler)'
         AND `fst_visit_ua` <> 'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.6478.114 Safari/537.36'
     GROUP BY
-        CASE '周'
+        CASE '日'
             WHEN '日' THEN `created_day`
             WHEN '周' THEN DATE_FORMAT(DATE_TRUNC('week', STR_TO_DATE(`created_day`, '%Y%m%d')), '%Y%m%d')
             WHEN '月' THEN SUBSTR(`created_day`, 1, 6)
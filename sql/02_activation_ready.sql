@@ -1,3 +1,4 @@
+-- 按日粒度返回，周/月视图由 src/rollup.py 在本地汇总（日粒度的新用户计数可直接相加）
 WITH user_daily_pv AS (
     -- Step 1: 按照日期和用户统计每日 PV
     SELECT
@@ -11,15 +12,31 @@ WITH user_daily_pv AS (
 ),
 user_rolling_pv AS (
     -- Step 2: 计算滚动窗口内7天的总 PV
-    SELECT
-        a.userid,
-        a.ds,
-        SUM(b.pv) AS total_pv
-    FROM user_daily_pv a
-    LEFT JOIN user_daily_pv b ON a.userid = b.userid
-        AND b.ds BETWEEN DATE_FORMAT(DATE_ADD(a.ds, INTERVAL -6 DAY), '%Y%m%d') AND a.ds
-    GROUP BY a.userid, a.ds
-    HAVING SUM(b.pv) > 6
+    -- 每个用户每天最多一行，[ds-6, ds] 窗口内最多还有前6行：用 LAG 取前6个有PV的日期，
+    -- 只累加落在窗口内的行。替代按 ds 范围的自连接（对每个用户是平方级），
+    -- 结果与自连接一致（sql/reference/02_rolling_pv_selfjoin.sql，差分测试见 tests/test_sql_diff.py）
+    SELECT userid, ds, total_pv
+    FROM (
+        SELECT
+            userid,
+            ds,
+            pv
+            + IF(LAG(ds, 1) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 1) OVER (PARTITION BY userid ORDER BY ds), 0)
+            + IF(LAG(ds, 2) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 2) OVER (PARTITION BY userid ORDER BY ds), 0)
+            + IF(LAG(ds, 3) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 3) OVER (PARTITION BY userid ORDER BY ds), 0)
+            + IF(LAG(ds, 4) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 4) OVER (PARTITION BY userid ORDER BY ds), 0)
+            + IF(LAG(ds, 5) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 5) OVER (PARTITION BY userid ORDER BY ds), 0)
+            + IF(LAG(ds, 6) OVER (PARTITION BY userid ORDER BY ds) >= DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d'),
+                 LAG(pv, 6) OVER (PARTITION BY userid ORDER BY ds), 0)
+            AS total_pv
+        FROM user_daily_pv
+    ) rolling
+    WHERE total_pv > 6
 ),
 e AS (
     SELECT
@@ -45,7 +62,7 @@ SELECT
     ROUND(COUNT(DISTINCT c.userid) / CAST(COUNT(DISTINCT a.userid) AS DOUBLE), 6) AS `渲染总转化率`
 FROM (
     SELECT
-        CASE '周'
+        CASE '日'
             WHEN '周' THEN created_week
             WHEN '日' THEN created_day
             WHEN '月' THEN CONCAT(SUBSTR(created_day, 1, 6), '01')
@@ -59,7 +76,7 @@ FROM (
         qhdi_ext.ads_channel_classify
     FROM (
         SELECT
-            CASE '周'
+            CASE '日'
                 WHEN '周' THEN created_week
                 WHEN '日' THEN created_day
                 WHEN '月' THEN CONCAT(SUBSTR(created_day, 1, 6), '01')
@@ -91,7 +108,7 @@ FROM (
 ) a
 LEFT JOIN (
     SELECT
-        CASE '周'
+        CASE '日'
             WHEN '周' THEN created_week
             WHEN '日' THEN created_day
             WHEN '月' THEN CONCAT(created_month, '01')
@@ -0,0 +1,99 @@
+-- 收入数据立方体：一次扫描发票表，用 GROUPING SETS 同时产出总计、SKU、国家、账单分层四个粒度
+-- 替代 05~08 四次扫描同一分区，由 src/revenue_cube.py 在本地拆分为 revenue / revenue_sku / revenue_country / revenue_tier
+-- 去重用户数不能跨行相加，所以每个粒度都由 GROUPING SETS 单独精确计算，而不是从最细粒度汇总
+-- 用户筛选与 05_revenue.sql 一致；订阅_* 列只统计订阅模式，对应 05 的付费用户数与客单价口径
+WITH usr AS (
+    SELECT
+        usr_1.userid
+    FROM (
+        SELECT
+            CASE '周'
+                WHEN '周' THEN created_week
+                WHEN '日' THEN created_day
+                WHEN '月' THEN CONCAT(SUBSTR(created_day, 1, 6), '01')
+            END AS created_time,
+            created_day,
+            created_week,
+            kujiale_user_id AS userid,
+            ds,
+            qhdi
+        FROM hive_prod.exabrain.dwb_usr_coohom_user_s_d
+        WHERE ds = DATE_FORMAT(CURRENT_DATE() - INTERVAL '1' DAY, '%Y%m%d')
+    ) usr_1
+    INNER JOIN (
+        SELECT kujiale_user_id AS userid, locale_site, locale
+        FROM hive_prod.kdw_dw.dwb_usr_coohom_user_s_d
+        WHERE ds = DATE_FORMAT(CURRENT_DATE() - INTERVAL '1' DAY, '%Y%m%d')
+    ) usr_2 ON usr_1.userid = usr_2.userid
+    LEFT JOIN (
+        SELECT qhdi, ads_channel_classify
+        FROM hive_prod.exabrain.dwb_usr_coohom_qhdi_extended_s_d
+        WHERE ds = DATE_FORMAT(CURRENT_DATE() - INTERVAL '1' DAY, '%Y%m%d')
+    ) qhdi ON usr_1.qhdi = qhdi.qhdi
+),
+revenue_data AS (
+    SELECT
+        pay_success_week AS week,
+        COALESCE(amt_usd, 0) AS amt_usd,
+        order_type_user,
+        sub_mode_type IN ('normal_subscription_mode', 'single_subscription_mode') AS is_subscription,
+        user_id,
+        COALESCE(sku_mode, 'Unknown') AS sku_mode,
+        COALESCE(sku_type, 'Unknown') AS sku_type,
+        COALESCE(sku_interval, 'Unknown') AS sku_interval,
+        COALESCE(country_en, 'Unknown') AS country_en,
+        COALESCE(country_chs, 'Unknown') AS country_chs,
+        -- 账单分层逻辑（与 08_revenue_by_tier.sql 相同，字段需按实际表结构调整）
+        CASE
+            WHEN order_type_user = 'NewSubscribe' THEN '新签'
+            WHEN order_type_user = 'Renewal' THEN
+                CASE
+                    WHEN is_upgrade = true THEN '升级'
+                    WHEN is_downgrade = true THEN '降级'
+                    WHEN consecutive_renewal_count >= 2 THEN '连续续约'
+                    ELSE '召回'
+                END
+            ELSE '其他'
+        END AS tier
+    FROM hive_prod.kdw_dw.dws_coohom_trd_daily_toc_invoice_s_d
+    WHERE ds = DATE_FORMAT(CURRENT_DATE() - INTERVAL '1' DAY, '%Y%m%d')
+        AND pay_success_day BETWEEN DATE_FORMAT(DATE_SUB(DATE_TRUNC('week', CURRENT_DATE()), INTERVAL '12' WEEK), '%Y%m%d')
+            AND DATE_FORMAT(DATE_TRUNC('week', CURRENT_DATE()) - INTERVAL '1' DAY, '%Y%m%d')
+        AND COALESCE(amt_usd, 0) > 0
+        AND kjl_user_id IN (SELECT * FROM usr)
+)
+SELECT
+    week AS 日期,
+    CASE
+        WHEN GROUPING(sku_mode) = 0 THEN 'sku'
+        WHEN GROUPING(country_chs) = 0 THEN 'country'
+        WHEN GROUPING(tier) = 0 THEN 'tier'
+        ELSE 'total'
+    END AS 粒度,
+    sku_mode AS SKU模式,
+    sku_type AS SKU类型,
+    sku_interval AS SKU周期,
+    country_en AS 国家_英文,
+    country_chs AS 国家_中文,
+    tier AS 账单分层,
+    ROUND(SUM(amt_usd), 1) AS 收入_美元,
+    ROUND(SUM(IF(order_type_user = 'NewSubscribe', amt_usd, 0)), 1) AS 新签收入_美元,
+    ROUND(SUM(IF(order_type_user = 'Renewal', amt_usd, 0)), 1) AS 续约收入_美元,
+    COUNT(DISTINCT user_id) AS 付费用户数,
+    COUNT(DISTINCT IF(order_type_user = 'NewSubscribe', user_id, NULL)) AS 新签用户数,
+    COUNT(DISTINCT IF(order_type_user = 'Renewal', user_id, NULL)) AS 续约用户数,
+    ROUND(SUM(IF(is_subscription, amt_usd, 0)), 1) AS 订阅收入_美元,
+    ROUND(SUM(IF(is_subscription AND order_type_user = 'NewSubscribe', amt_usd, 0)), 1) AS 订阅新签收入_美元,
+    ROUND(SUM(IF(is_subscription AND order_type_user = 'Renewal', amt_usd, 0)), 1) AS 订阅续约收入_美元,
+    COUNT(DISTINCT IF(is_subscription, user_id, NULL)) AS 订阅付费用户数,
+    COUNT(DISTINCT IF(is_subscription AND order_type_user = 'NewSubscribe', user_id, NULL)) AS 订阅新签用户数,
+    COUNT(DISTINCT IF(is_subscription AND order_type_user = 'Renewal', user_id, NULL)) AS 订阅续约用户数
+FROM revenue_data
+GROUP BY GROUPING SETS (
+    (week),
+    (week, sku_mode, sku_type, sku_interval),
+    (week, country_en, country_chs),
+    (week, tier)
+)
+ORDER BY 日期, 粒度, 收入_美元 DESC
+LIMIT 1000000
@@ -0,0 +1,17 @@
+-- 有效拖模型步骤的原始写法（自连接），作为 02_activation_ready.sql 中窗口函数写法的对照
+-- 只用于离线差分测试（src/sql_diff.py），不在周报中执行
+-- 输入表 user_daily_pv(userid, ds, pv)：每个用户每天一行
+WITH user_rolling_pv AS (
+    -- Step 2: 计算滚动窗口内7天的总 PV
+    SELECT
+        a.userid,
+        a.ds,
+        SUM(b.pv) AS total_pv
+    FROM user_daily_pv a
+    LEFT JOIN user_daily_pv b ON a.userid = b.userid
+        AND b.ds BETWEEN DATE_FORMAT(DATE_ADD(a.ds, INTERVAL -6 DAY), '%Y%m%d') AND a.ds
+    GROUP BY a.userid, a.ds
+    HAVING SUM(b.pv) > 6
+)
+SELECT userid, ds, total_pv
+FROM user_rolling_pv
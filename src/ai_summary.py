@@ -8,8 +8,10 @@ AI总结生成模块
 2. 规则模式：基于预定义规则生成客观总结（作为fallback）
 """
 
+import time
 from typing import Dict, List, Optional
 from src.logger import get_logger
+from src.run_metrics import get_run_metrics
 
 logger = get_logger('ai_summary')
 
@@ -70,11 +72,16 @@ class AISummaryGenerator:
         """
         # 优先使用LLM
         if self.llm_client:
+            metrics = get_run_metrics()
+            start = time.perf_counter()
             try:
                 summary = self.llm_client.generate_summary(section, analysis, current_data)
+                metrics.observe('llm_duration_seconds', time.perf_counter() - start, section=section)
                 self.logger.info(f"✅ LLM生成 {section} 总结成功")
                 return summary
             except Exception as e:
+                metrics.observe('llm_duration_seconds', time.perf_counter() - start, section=section)
+                metrics.inc('llm_failures_total', section=section)
                 self.logger.warning(f"⚠️ LLM调用失败，降级到规则生成: {e}")
                 if self.fallback_to_rule:
                     return self._generate_rule_based_summary(section, analysis, current_data)
@@ -324,7 +331,9 @@ class AISummaryGenerator:
         """
         summaries = {}
 
-        sections = ['traffic', 'activation', 'engagement', 'retention', 'revenue']
+        # 按部分注册表顺序生成（summary: false 的部分跳过）
+        from src.core.sections import load_sections
+        sections = [spec['name'] for spec in load_sections(self.config) if spec.get('summary', True)]
 
         for section in sections:
             if section in analysis_results:
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+异常检测模块
+
+SQL已返回12~25周的历史数据，本模块把每个部分整理为 (分组×指标, 周) 的矩阵，
+以目标周之前的若干周为滚动基线，对所有渠道/用户类型/SKU 分组的所有指标一次性打分：
+- zscore：(本周 - 基线均值) / 基线标准差
+- mad：(本周 - 基线中位数) / (1.4826 × 绝对中位差)，对个别极端周不敏感
+
+指标和分组维度取自汇总规则（src.rollup.DEFAULT_ROLLUPS 或注册表 rollup）。
+安装 numpy 时按矩阵批量计算；未安装时逐单元格计算，结果一致
+"""
+
+import math
+import statistics
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.logger import get_logger
+from src.rollup import DEFAULT_ROLLUPS
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+METHODS = ('zscore', 'mad')
+
+# MAD 换算为正态分布标准差的系数
+MAD_SCALE = 1.4826
+
+DEFAULT_ANOMALY_CONFIG = {
+    'method': 'zscore',
+    'window': 12,            # 基线周数
+    'min_periods': 4,        # 基线至少需要的有效周数
+    'threshold': 3.0,        # |得分| 达到该值视为异常
+    'min_scale_ratio': 0.05,  # 基线离散度下限（基线中心的比例），避免平稳序列的微小波动被放大
+    'max_attention_items': 3,
+}
+
+
+def build_matrix(
+    rows: List[Dict],
+    date_key: str,
+    dimensions: Sequence[str],
+    metrics: Sequence[str]
+) -> Tuple[List[str], List[Tuple], List[List[List[float]]]]:
+    """
+    把数据行整理为 分组 × 指标 × 日期 的矩阵（缺失为 NaN）
+
+    Args:
+        rows: 数据行
+        date_key: 日期列
+        dimensions: 分组维度列
+        metrics: 指标列
+
+    Returns:
+        tuple: (升序日期列表, 分组键列表, values[分组][指标][日期])
+    """
+    dates = sorted({str(row.get(date_key)) for row in rows if row.get(date_key)})
+    date_index = {day: index for index, day in enumerate(dates)}
+    segments: Dict[Tuple, int] = {}
+    values: List[List[List[float]]] = []
+
+    for row in rows:
+        day = row.get(date_key)
+        if not day:
+            continue
+        segment = tuple(row.get(dim) for dim in dimensions)
+        index = segments.get(segment)
+        if index is None:
+            index = segments[segment] = len(values)
+            values.append([[math.nan] * len(dates) for _ in metrics])
+        column = date_index[str(day)]
+        cells = values[index]
+        for metric_index, metric in enumerate(metrics):
+            value = row.get(metric)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            current = cells[metric_index][column]
+            # 同一分组同一日期有多行时累加
+            cells[metric_index][column] = value if math.isnan(current) else current + value
+
+    return dates, list(segments), values
+
+
+def _score_numpy(series, method: str, min_periods: int, min_scale_ratio: float):
+    """批量打分：series 为 (N, 基线周数+1)，最后一列为目标周"""
+    values = np.asarray(series, dtype=float)
+    history, target = values[:, :-1], values[:, -1]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        counts = np.sum(~np.isnan(history), axis=1)
+        if method == 'mad':
+            center = np.nanmedian(history, axis=1)
+            scale = MAD_SCALE * np.nanmedian(np.abs(history - center[:, None]), axis=1)
+        else:
+            center = np.nanmean(history, axis=1)
+            scale = np.nanstd(history, axis=1, ddof=1)
+        scale = np.maximum(np.nan_to_num(scale), np.maximum(np.abs(np.nan_to_num(center)) * min_scale_ratio, 1e-9))
+        score = (target - center) / scale
+    valid = (counts >= min_periods) & ~np.isnan(target)
+    return center.tolist(), scale.tolist(), np.where(valid, score, np.nan).tolist()
+
+
+def _score_python(series, method: str, min_periods: int, min_scale_ratio: float):
+    """逐单元格打分（未安装 numpy 时使用）"""
+    centers, scales, scores = [], [], []
+    for cells in series:
+        history = [value for value in cells[:-1] if not math.isnan(value)]
+        target = cells[-1]
+        if len(history) < min_periods or math.isnan(target):
+            centers.append(math.nan)
+            scales.append(math.nan)
+            scores.append(math.nan)
+            continue
+        # statistics.stdev 内部用分数精确计算，逐单元格调用太慢，这里直接用浮点公式
+        count = len(history)
+        if method == 'mad':
+            center = statistics.median(history)
+            scale = MAD_SCALE * statistics.median([abs(value - center) for value in history])
+        else:
+            center = sum(history) / count
+            scale = math.sqrt(sum((value - center) ** 2 for value in history) / (count - 1)) if count > 1 else 0.0
+        scale = max(scale, abs(center) * min_scale_ratio, 1e-9)
+        centers.append(center)
+        scales.append(scale)
+        scores.append((target - center) / scale)
+    return centers, scales, scores
+
+
+def score_series(
+    series: List[List[float]],
+    method: str = 'zscore',
+    min_periods: int = 4,
+    min_scale_ratio: float = 0.05
+) -> Tuple[List[float], List[float], List[float]]:
+    """
+    对多条序列的最后一个值相对于其之前的值打分
+
+    Args:
+        series: 每条序列为 [基线..., 目标值]（缺失为 NaN）
+        method: zscore / mad
+        min_periods: 基线至少需要的有效值个数
+        min_scale_ratio: 离散度下限（基线中心的比例）
+
+    Returns:
+        tuple: (基线中心, 离散度, 得分)，基线不足或目标缺失时得分为 NaN
+    """
+    if method not in METHODS:
+        raise ValueError(f"未知的异常检测方法: {method}")
+    if not series:
+        return [], [], []
+    if HAS_NUMPY:
+        return _score_numpy(series, method, min_periods, min_scale_ratio)
+    return _score_python(series, method, min_periods, min_scale_ratio)
+
+
+def severity(score: float, threshold: float) -> str:
+    """按 |得分| / 阈值 划分严重程度（与 DataValidator._get_severity 一致）"""
+    ratio = abs(score) / threshold
+    if ratio > 2.0:
+        return 'critical'
+    elif ratio > 1.5:
+        return 'high'
+    elif ratio > 1.0:
+        return 'medium'
+    return 'low'
+
+
+def _format_value(value: float) -> str:
+    """比率保留4位小数，计数和金额取整加千分位"""
+    if abs(value) < 10 and not float(value).is_integer():
+        return f"{value:.4f}"
+    return f"{value:,.0f}"
+
+
+class AnomalyDetector:
+    """多指标、多分组的历史基线异常检测器"""
+
+    def __init__(self, config: Dict = None, sections: List[Dict] = None, logger=None):
+        """
+        初始化异常检测器
+
+        Args:
+            config: 异常检测配置（config.yaml 的 anomaly）
+            sections: 部分注册表（提供日期列、week_lag 和自定义汇总规则，默认内置部分）
+            logger: 日志记录器
+        """
+        self.logger = logger or get_logger('anomaly')
+        self.config = {**DEFAULT_ANOMALY_CONFIG, **(config or {})}
+        if self.config['method'] not in METHODS:
+            raise ValueError(f"未知的异常检测方法: {self.config['method']}")
+        if sections is None:
+            from src.core.sections import load_sections
+            sections = load_sections(None)
+        self.sections = {spec['name']: spec for spec in sections}
+        # 最近一次 scan_section 打分的 分组×指标 个数（用于日志）
+        self._last_scan_cells = 0
+
+    def _section_rule(self, section: str) -> Optional[Dict]:
+        """部分的日期列、分组维度和指标"""
+        spec = self.sections.get(section, {})
+        rule = spec.get('rollup') or DEFAULT_ROLLUPS.get(section)
+        if not rule:
+            return None
+        metrics = list(rule.get('sums', [])) + list(rule.get('means', [])) + list(rule.get('ratios', {}))
+        if not metrics:
+            return None
+        return {
+            'date_key': spec.get('date_column') or rule.get('date_key', '日期'),
+            'dimensions': list(rule.get('dimensions', [])),
+            'metrics': metrics,
+            'week_lag': int(spec.get('week_lag', 0) or 0),
+        }
+
+    def scan_section(self, section: str, rows: List[Dict], target_date: str = None) -> List[Dict]:
+        """
+        扫描一个部分所有分组×指标在目标周的异常
+
+        Args:
+            section: 部分名称
+            rows: 周粒度数据行（含历史周）
+            target_date: 目标周（默认数据中最新的一周，次周类指标按 week_lag 往前推）
+
+        Returns:
+            list: 异常列表，按 |得分| 从大到小排序
+        """
+        self._last_scan_cells = 0
+        rule = self._section_rule(section)
+        if not rule or not rows:
+            return []
+
+        dates, segments, values = build_matrix(rows, rule['date_key'], rule['dimensions'], rule['metrics'])
+        if not dates:
+            return []
+        if target_date is None:
+            target_date = dates[-1]
+            if rule['week_lag']:
+                lagged = datetime.strptime(target_date[:8], '%Y%m%d') - timedelta(days=7 * rule['week_lag'])
+                target_date = lagged.strftime('%Y%m%d')
+        if target_date not in dates:
+            return []
+
+        # 目标周及其之前 window 周
+        end = dates.index(target_date) + 1
+        start = max(0, end - 1 - int(self.config['window']))
+        series = [metric_values[start:end] for cells in values for metric_values in cells]
+        self._last_scan_cells = len(series)
+        centers, scales, scores = score_series(
+            series, self.config['method'], int(self.config['min_periods']), float(self.config['min_scale_ratio'])
+        )
+
+        threshold = float(self.config['threshold'])
+        metric_count = len(rule['metrics'])
+        anomalies = []
+        for index, score in enumerate(scores):
+            if math.isnan(score) or abs(score) < threshold:
+                continue
+            segment = dict(zip(rule['dimensions'], segments[index // metric_count]))
+            metric = rule['metrics'][index % metric_count]
+            value = series[index][-1]
+            label = '/'.join(str(v) for v in segment.values() if v is not None)
+            direction = '偏高' if score > 0 else '偏低'
+            anomalies.append({
+                'section': section,
+                'field': metric,
+                'segment': segment,
+                'date': target_date,
+                'current_value': value,
+                'baseline': centers[index],
+                'score': round(score, 2),
+                'threshold': threshold,
+                'method': self.config['method'],
+                'severity': severity(score, threshold),
+                'message': (f"{label + ' ' if label else ''}{metric} {_format_value(value)}，"
+                            f"较近{end - 1 - start}周基线 {_format_value(centers[index])} {direction}"
+                            f"（{self.config['method']} {score:+.1f}）"),
+            })
+
+        anomalies.sort(key=lambda item: -abs(item['score']))
+        return anomalies
+
+    def scan(self, data: Dict[str, List[Dict]], target_date: str = None) -> Dict[str, List[Dict]]:
+        """
+        扫描所有部分
+
+        Args:
+            data: {部分名称: 周粒度数据行}
+            target_date: 目标周（默认各部分最新的一周）
+
+        Returns:
+            dict: {部分名称: 异常列表}（只包含有异常的部分）
+        """
+        from src.run_metrics import get_run_metrics
+
+        start = time.perf_counter()
+        results = {}
+        cells = 0
+        for section, rows in data.items():
+            anomalies = self.scan_section(section, rows or [], target_date)
+            cells += self._last_scan_cells
+            if anomalies:
+                results[section] = anomalies
+        elapsed = time.perf_counter() - start
+        get_run_metrics().observe('anomaly_scan_seconds', elapsed)
+
+        total = sum(len(items) for items in results.values())
+        self.logger.info(f"异常扫描: {cells} 个分组×指标，{total} 个异常，耗时 {elapsed * 1000:.1f} ms"
+                         f"（{'numpy' if HAS_NUMPY else '纯Python'}，{self.config['method']}）")
+        return results
+
+    def add_attention_items(self, analysis_results: Dict[str, Dict], anomalies: Dict[str, List[Dict]]) -> None:
+        """
+        把各部分得分最高的异常写入分析结果的关注事项
+
+        Args:
+            analysis_results: Analyzer.analyze_all_sections 的结果（原地修改）
+            anomalies: scan 的结果
+        """
+        limit = int(self.config.get('max_attention_items', 3))
+        for section, items in anomalies.items():
+            result = analysis_results.get(section)
+            if not isinstance(result, dict) or limit <= 0:
+                continue
+            result.setdefault('attention_items', [])
+            result['attention_items'].extend(item['message'] for item in items[:limit])
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试异常检测模块\n")
+
+    import random
+    rng = random.Random(0)
+    mondays = [(datetime(2025, 11, 3) + timedelta(weeks=week)).strftime('%Y%m%d') for week in range(13)]
+    demo_rows = []
+    for channel in ('paid ads', 'organic', 'referral'):
+        for day in mondays:
+            visitors = 1000 + rng.randint(-50, 50)
+            if channel == 'paid ads' and day == mondays[-1]:
+                visitors = 2000
+            demo_rows.append({'日期': day, '渠道': channel, '新访客数': visitors,
+                              '新访客注册数': visitors // 10, '新访客注册转化率': 0.1})
+
+    detector = AnomalyDetector()
+    for found in detector.scan({'traffic': demo_rows}).get('traffic', []):
+        print(f"[{found['severity']}] {found['message']}")
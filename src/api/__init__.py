@@ -10,10 +10,10 @@ from src.logger import get_logger
 logger = get_logger('api')
 
 
+@runtime_checkable
 class APIClient(Protocol):
     """API 客户端接口"""
 
-    @runtime_checkable
     def fetch_section_data(self, section: str, params: dict) -> list:
         """获取某部分数据"""
         raise NotImplementedError
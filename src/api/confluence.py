@@ -1,24 +1,328 @@
 #!/usr/bin/env python3
 """
-Confluence API 客户端（后续扩展用）
+Confluence API 客户端
 
-功能预留
+功能：
+1. 连接池 + keep-alive 的 requests.Session（同一站点的多个页面共用连接）
+2. 页面元数据缓存：ETag 条件请求（If-None-Match）+ 短时缓存，PUT 成功后直接更新缓存
+3. GET 请求对 429/5xx 自动重试
+4. 附件流式 multipart 上传（大表格、图片不再塞进页面正文）
 """
-from typing import Dict
+import io
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, Union
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from src.logger import get_logger
 from src.api import APIClient
 
 logger = get_logger('api.confluence')
 
+# 禁用SSL警告（内网Confluence使用自签名证书）
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class MultipartStream:
+    """
+    流式 multipart/form-data 请求体
+
+    长度预先计算（requests 据此发送 Content-Length 而不是 chunked 编码），
+    文件内容按块读取，上传大文件时不需要整体载入内存
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        filename: str,
+        fileobj,
+        size: int,
+        content_type: str = 'application/octet-stream',
+        chunk_size: int = 65536
+    ):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+
+        head = ''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        tail = f'\r\n--{self.boundary}--\r\n'
+
+        self._parts = [io.BytesIO(head.encode('utf-8')), fileobj, io.BytesIO(tail.encode('utf-8'))]
+        self._length = len(head.encode('utf-8')) + size + len(tail.encode('utf-8'))
+
+    @property
+    def content_type(self) -> str:
+        """请求的 Content-Type 头"""
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        """按块读取请求体（http.client 发送时调用）"""
+        if size is None or size < 0:
+            size = self.chunk_size
+        chunks = []
+        while self._parts and size > 0:
+            data = self._parts[0].read(size)
+            if not data:
+                self._parts.pop(0)
+                continue
+            chunks.append(data)
+            size -= len(data)
+        return b''.join(chunks)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _open_content(content: Union[bytes, str, Path, io.IOBase]) -> Tuple[object, int, bool]:
+    """
+    把附件内容统一为 (文件对象, 字节数, 是否需要关闭)
+
+    Args:
+        content: 字节串、文件路径或可 seek 的二进制文件对象
+    """
+    if isinstance(content, (bytes, bytearray)):
+        return io.BytesIO(content), len(content), True
+    if isinstance(content, (str, Path)):
+        return open(content, 'rb'), os.path.getsize(content), True
+    start = content.tell()
+    content.seek(0, os.SEEK_END)
+    size = content.tell() - start
+    content.seek(start)
+    return content, size, False
+
 
 class ConfluenceAPIClient(APIClient):
     """Confluence API 客户端"""
 
-    def __init__(self, base_url: str, username: str, password: str):
-        self.base_url = base_url
+    def __init__(
+        self,
+        base_url: str,
+        username: str = '',
+        password: str = '',
+        pool_size: int = 10,
+        max_retries: int = 3,
+        timeout: int = 30,
+        verify: bool = False,
+        cache_ttl: float = 300,
+        logger=None
+    ):
+        """
+        初始化客户端
+
+        Args:
+            base_url: Confluence 站点地址
+            username: 用户名（为空且提供了 password 时按个人访问令牌使用 Bearer 认证）
+            password: 密码或 API Token
+            pool_size: 连接池大小
+            max_retries: GET 请求的最大重试次数
+            timeout: 请求超时（秒）
+            verify: 是否校验SSL证书
+            cache_ttl: 页面元数据缓存有效期（秒），0 表示每次都走条件请求
+            logger: 日志记录器
+        """
+        self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
+        self.timeout = timeout
+        self.verify = verify
+        self.cache_ttl = cache_ttl
+        self.logger = logger or get_logger('api.confluence')
+
         self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET'])
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+
+        if username and password:
+            self.session.auth = (username, password)
+        elif password:
+            self.session.headers['Authorization'] = f"Bearer {password}"
+
+        # (page_id, expand) -> {'data': dict, 'etag': str, 'fetched_at': float}
+        self._cache: Dict[Tuple[str, str], Dict] = {}
+        self._cache_lock = threading.Lock()
+
+    def _url(self, path: str) -> str:
+        """构建 REST API URL"""
+        return f"{self.base_url}/wiki/rest/api/{path}"
+
+    def invalidate(self, page_id: str = None) -> None:
+        """
+        清除页面元数据缓存
+
+        Args:
+            page_id: 页面ID（为空时清除全部）
+        """
+        with self._cache_lock:
+            if page_id is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == str(page_id)]:
+                    del self._cache[key]
+
+    def get_page(self, page_id: str, expand: str = 'version', use_cache: bool = True) -> Dict:
+        """
+        获取页面信息
+
+        缓存未过期时直接返回缓存；过期但有 ETag 时发送条件请求，304 时沿用缓存
+
+        Args:
+            page_id: 页面ID
+            expand: 需要展开的字段
+            use_cache: 是否使用缓存
+
+        Returns:
+            dict: 页面信息，失败返回空字典
+        """
+        key = (str(page_id), expand)
+        with self._cache_lock:
+            cached = self._cache.get(key) if use_cache else None
+
+        if cached and time.time() - cached['fetched_at'] < self.cache_ttl:
+            self.logger.debug("页面 %s 元数据命中缓存 (expand=%s)", page_id, expand)
+            return cached['data']
+
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+
+        try:
+            response = self.session.get(
+                self._url(f"content/{page_id}"),
+                params={'expand': expand},
+                headers=headers,
+                timeout=self.timeout,
+                verify=self.verify
+            )
+        except requests.RequestException as e:
+            self.logger.error(f"❌ 获取页面网络异常: {e}")
+            return {}
+
+        if response.status_code == 304 and cached:
+            self.logger.debug("页面 %s 未变化 (304)", page_id)
+            with self._cache_lock:
+                cached['fetched_at'] = time.time()
+            return cached['data']
+
+        if response.status_code != 200:
+            self.logger.error(f"获取页面失败: HTTP {response.status_code}")
+            self.logger.error(f"响应内容: {response.text[:200]}")
+            return {}
+
+        data = response.json()
+        with self._cache_lock:
+            self._cache[key] = {
+                'data': data,
+                'etag': response.headers.get('ETag'),
+                'fetched_at': time.time()
+            }
+        return data
+
+    def put_page(
+        self,
+        page_id: str,
+        title: str,
+        content: str,
+        version: int,
+        version_message: str = None
+    ) -> Tuple[int, Dict]:
+        """
+        提交页面新版本
+
+        成功后用返回的页面信息更新缓存，后续发布无需再次获取元数据
+
+        Args:
+            page_id: 页面ID
+            title: 页面标题
+            content: 页面内容（storage 格式）
+            version: 新版本号（当前版本 + 1）
+            version_message: 版本信息
+
+        Returns:
+            tuple: (HTTP状态码, 响应JSON)；网络异常时状态码为 0
+        """
+        update_data = {
+            'id': str(page_id),
+            'type': 'page',
+            'title': title,
+            'body': {
+                'storage': {
+                    'value': content,
+                    'representation': 'storage'
+                }
+            },
+            'version': {
+                'number': version,
+                'message': version_message or ''
+            }
+        }
+
+        try:
+            response = self.session.put(
+                self._url(f"content/{page_id}"),
+                json=update_data,
+                timeout=max(self.timeout, 60),
+                verify=self.verify
+            )
+        except requests.RequestException as e:
+            self.logger.error(f"❌ 更新页面网络异常: {e}")
+            return 0, {}
+
+        if response.status_code not in (200, 201):
+            self.logger.error(f"更新失败: HTTP {response.status_code}")
+            self.logger.error(f"响应内容: {response.text[:200]}")
+            if response.status_code == 409:
+                # 版本冲突：缓存的版本号已过期
+                self.invalidate(page_id)
+            return response.status_code, {}
+
+        data = response.json() if response.content else {}
+        page_meta = {
+            'id': str(page_id),
+            'title': data.get('title', title),
+            'version': data.get('version') or {'number': version}
+        }
+        self.invalidate(page_id)
+        with self._cache_lock:
+            now = time.time()
+            self._cache[(str(page_id), 'version')] = {'data': page_meta, 'etag': None, 'fetched_at': now}
+            self._cache[(str(page_id), 'body.storage,version')] = {
+                'data': dict(page_meta, body={'storage': {'value': content, 'representation': 'storage'}}),
+                'etag': None,
+                'fetched_at': now
+            }
+        return response.status_code, data
 
     def update_page(
         self,
@@ -27,7 +331,7 @@ class ConfluenceAPIClient(APIClient):
         version_message: str = None
     ) -> bool:
         """
-        更新 Confluence 页面
+        更新 Confluence 页面（获取当前版本后提交新版本）
 
         Args:
             page_id: 页面 ID
@@ -37,6 +341,137 @@ class ConfluenceAPIClient(APIClient):
         Returns:
             bool: 是否成功
         """
-        # CF 功能暂时不开发
-        logger.info("⏭️ Confluence 更新功能暂未开发")
-        raise NotImplementedError("Confluence API 更新功能暂未开发")
+        page = self.get_page(page_id)
+        if not page:
+            return False
+
+        version = page.get('version', {}).get('number', 1) + 1
+        status, _ = self.put_page(page_id, page.get('title', ''), content, version, version_message)
+        return status in (200, 201)
+
+    def find_attachment(self, page_id: str, filename: str) -> Dict:
+        """
+        查找页面上的同名附件
+
+        Args:
+            page_id: 页面ID
+            filename: 附件文件名
+
+        Returns:
+            dict: 附件信息，不存在或失败返回空字典
+        """
+        try:
+            response = self.session.get(
+                self._url(f"content/{page_id}/child/attachment"),
+                params={'filename': filename},
+                timeout=self.timeout,
+                verify=self.verify
+            )
+        except requests.RequestException as e:
+            self.logger.error(f"❌ 查询附件网络异常: {e}")
+            return {}
+
+        if response.status_code != 200:
+            return {}
+        results = response.json().get('results', [])
+        return results[0] if results else {}
+
+    def upload_attachment(
+        self,
+        page_id: str,
+        filename: str,
+        content: Union[bytes, str, Path, io.IOBase],
+        content_type: str = 'application/octet-stream',
+        comment: str = '',
+        chunk_size: int = 65536
+    ) -> Dict:
+        """
+        以流式 multipart 上传附件（同名附件存在时上传为新版本）
+
+        Args:
+            page_id: 页面ID
+            filename: 附件文件名
+            content: 字节串、文件路径或二进制文件对象
+            content_type: 附件 MIME 类型
+            comment: 附件版本说明
+            chunk_size: 读取块大小
+
+        Returns:
+            dict: 附件信息，失败返回空字典
+        """
+        existing = self.find_attachment(page_id, filename)
+        if existing:
+            url = self._url(f"content/{page_id}/child/attachment/{existing['id']}/data")
+        else:
+            url = self._url(f"content/{page_id}/child/attachment")
+
+        fileobj, size, should_close = _open_content(content)
+        try:
+            fields = {'minorEdit': 'true'}
+            if comment:
+                fields['comment'] = comment
+            body = MultipartStream(fields, filename, fileobj, size, content_type, chunk_size)
+
+            response = self.session.post(
+                url,
+                data=body,
+                headers={
+                    'Content-Type': body.content_type,
+                    'X-Atlassian-Token': 'nocheck'
+                },
+                timeout=max(self.timeout, 120),
+                verify=self.verify
+            )
+        except requests.RequestException as e:
+            self.logger.error(f"❌ 上传附件网络异常 {filename}: {e}")
+            return {}
+        finally:
+            if should_close:
+                fileobj.close()
+
+        if response.status_code not in (200, 201):
+            self.logger.error(f"❌ 上传附件失败 {filename}: HTTP {response.status_code}")
+            self.logger.error(f"响应内容: {response.text[:200]}")
+            return {}
+
+        data = response.json() if response.content else {}
+        # 新建附件返回 {'results': [...]}，更新数据返回附件本身
+        if 'results' in data:
+            data = data['results'][0] if data['results'] else {}
+        self.logger.info(f"✅ 附件已上传: {filename}（{size} 字节）")
+        return data or {'title': filename}
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self.session.close()
+
+
+_clients: Dict[Tuple[str, str], ConfluenceAPIClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_confluence_client(
+    base_url: str,
+    username: str = '',
+    password: str = '',
+    **kwargs
+) -> ConfluenceAPIClient:
+    """
+    获取共享的客户端（同一站点、同一账号复用连接池和缓存）
+
+    Args:
+        base_url: Confluence 站点地址
+        username: 用户名
+        password: 密码或 API Token
+        **kwargs: 传给 ConfluenceAPIClient 的其他参数（仅首次创建时生效）
+
+    Returns:
+        ConfluenceAPIClient: 客户端实例
+    """
+    key = (base_url.rstrip('/'), username)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ConfluenceAPIClient(base_url, username, password, **kwargs)
+            _clients[key] = client
+        return client
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+报告附件模块
+
+完整的渠道明细表不再内联进页面正文（正文表格只保留前10行、6列），
+而是导出为CSV附件上传到页面，正文中通过 ri:attachment 引用；
+趋势图（src.charts）同样作为附件上传并以 ac:image 嵌入
+"""
+
+import csv
+import io
+from html import escape
+from typing import Dict, List
+
+from src.section_blocks import SECTION_END, SECTION_START
+
+
+def build_table_csv(rows: List[Dict]) -> bytes:
+    """
+    把查询结果导出为CSV（UTF-8 BOM，Excel可直接打开中文）
+
+    Args:
+        rows: 数据行列表
+
+    Returns:
+        bytes: CSV内容
+    """
+    columns = []
+    for row in rows:
+        for key in row.keys():
+            if key not in columns:
+                columns.append(key)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def attachment_link(filename: str, text: str = None) -> str:
+    """
+    生成指向页面附件的链接（storage 格式）
+
+    Args:
+        filename: 附件文件名
+        text: 链接文字，默认为文件名
+
+    Returns:
+        str: <ac:link> 片段
+    """
+    text = (text or filename).replace(']]>', ']]&gt;')
+    return (
+        f'<ac:link><ri:attachment ri:filename="{escape(filename)}" />'
+        f'<ac:plain-text-link-body><![CDATA[{text}]]></ac:plain-text-link-body></ac:link>'
+    )
+
+
+def attachment_image(filename: str, width: int = None) -> str:
+    """
+    生成引用页面附件图片的片段（storage 格式）
+
+    Args:
+        filename: 附件文件名
+        width: 显示宽度（像素）
+
+    Returns:
+        str: <ac:image> 片段
+    """
+    width_attr = f' ac:width="{int(width)}"' if width else ''
+    return f'<ac:image{width_attr}><ri:attachment ri:filename="{escape(filename)}" /></ac:image>'
+
+
+def collect_table_attachments(
+    current_data: Dict[str, List[Dict]],
+    report_date: str = '',
+    section_parents: Dict[str, str] = None
+) -> Dict[str, Dict]:
+    """
+    为每个有数据的部分生成完整明细CSV附件
+
+    Args:
+        current_data: {部分名称: 数据行列表}
+        report_date: 报告日期，写入文件名
+        section_parents: {子部分: 父部分}，子部分的明细链接放在父部分中
+
+    Returns:
+        dict: {文件名: {'section', 'content', 'content_type', 'rows'}}
+    """
+    suffix = f"_{report_date}" if report_date else ''
+    section_parents = section_parents or {}
+    attachments = {}
+    for section, rows in (current_data or {}).items():
+        if not rows:
+            continue
+        filename = f"{section}{suffix}.csv"
+        attachments[filename] = {
+            'section': section_parents.get(section, section),
+            'content': build_table_csv(rows),
+            'content_type': 'text/csv',
+            'rows': len(rows),
+        }
+    return attachments
+
+
+def add_attachment_links(blocks: Dict[str, str], attachments: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    在各部分末尾（结束标记之前）加入附件下载链接
+
+    Args:
+        blocks: {部分名称: 带标记的HTML}
+        attachments: collect_table_attachments 的结果
+
+    Returns:
+        dict: 新的 blocks（原字典不修改）
+    """
+    links = {}
+    for filename, info in attachments.items():
+        text = f"完整明细（{info.get('rows', 0)} 行）：{filename}"
+        links.setdefault(info['section'], []).append(f"<p>{attachment_link(filename, text)}</p>")
+
+    result = dict(blocks)
+    for section, items in links.items():
+        block = result.get(section)
+        end_marker = SECTION_END.format(name=section)
+        if not block or end_marker not in block:
+            continue
+        head, _, tail = block.rpartition(end_marker)
+        result[section] = f"{head.rstrip()}\n" + '\n'.join(items) + f"\n{end_marker}{tail}"
+    return result
+
+
+def add_chart_images(blocks: Dict[str, str], charts: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    在各部分嵌入趋势图：迷你走势图放在部分标题之后，趋势图放在部分末尾
+
+    Args:
+        blocks: {部分名称: 带标记的HTML}
+        charts: src.charts.ChartRenderer.collect 的结果
+
+    Returns:
+        dict: 新的 blocks（原字典不修改）
+    """
+    result = dict(blocks)
+    for filename, info in charts.items():
+        section = info['section']
+        block = result.get(section)
+        if not block:
+            continue
+        if info['kind'] == 'sparkline':
+            image = f"<p>{attachment_image(filename)}</p>"
+            anchor = '</h2>' if '</h2>' in block else SECTION_START.format(name=section)
+            head, sep, tail = block.partition(anchor)
+            result[section] = f"{head}{sep}\n{image}{tail}"
+        else:
+            end_marker = SECTION_END.format(name=section)
+            if end_marker not in block:
+                continue
+            head, _, tail = block.rpartition(end_marker)
+            result[section] = f"{head.rstrip()}\n<p>{attachment_image(filename)}</p>\n{end_marker}{tail}"
+    return result
+
+
+def markdown_attachment_links(attachments: Dict[str, Dict], base_dir: str = 'attachments') -> Dict[str, str]:
+    """
+    生成Markdown报告中各部分的趋势图和明细附件链接
+
+    Args:
+        attachments: {文件名: {'section', 'kind'(图表), 'rows'(明细表), ...}}
+        base_dir: 附件相对于Markdown文件的目录
+
+    Returns:
+        dict: {部分名称: Markdown片段}
+    """
+    lines = {}
+    for filename, info in attachments.items():
+        if info.get('kind') == 'trend':
+            line = f"![{info['section']}]({base_dir}/{filename})"
+        elif 'rows' in info:
+            line = f"[完整明细（{info['rows']} 行）]({base_dir}/{filename})"
+        else:
+            continue
+        lines.setdefault(info['section'], []).append(line)
+    return {section: '\n\n'.join(items) for section, items in lines.items()}
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试报告附件模块\n")
+
+    data = {'traffic': [{'渠道': '自然流量', 'UV': 1200}, {'渠道': '广告', 'UV': 800}]}
+    files = collect_table_attachments(data, '2025-01-06')
+    for name, info in files.items():
+        print(f"{name}: {len(info['content'])} 字节, {info['rows']} 行")
+    print(attachment_link('traffic_2025-01-06.csv'))
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+趋势图渲染模块
+
+根据SQL返回的12周历史数据为每个部分生成：
+- 迷你走势图（sparkline）：放在部分标题下方
+- 趋势图：每个分组一条折线，放在部分末尾
+
+默认输出纯Python生成的SVG（无额外依赖）；安装 matplotlib 时可配置为PNG。
+渲染在进程池中执行，数据获取完成后即提交，与分析阶段并行
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Dict, List, Tuple
+
+from src.logger import get_logger
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    HAS_MATPLOTLIB = True
+except ImportError:
+    HAS_MATPLOTLIB = False
+
+
+# 折线颜色（与Confluence模板主色一致）
+PALETTE = ['#0052cc', '#36b37e', '#ff5630', '#ffab00', '#6554c0', '#00b8d9', '#97a0af']
+
+# 各部分默认的趋势指标（列名与 sql/ 下各查询的返回列一致）：
+# date 日期列，value 数值列，group 分组列（可选）；values 为多个数值列时每列一条折线（不再分组）
+DEFAULT_CHART_SERIES = {
+    'traffic': {'date': '日期', 'value': '新访客数', 'title': '新访客数'},
+    'activation': {'date': '日期', 'value': '新注册用户数', 'title': '新注册用户数'},
+    'engagement': {'date': '周', 'values': ['新用户WAU', '老用户WAU'], 'title': '工具WAU'},
+    'retention': {'date': '上周', 'value': '工具次周留存', 'group': '上周用户类型', 'title': '工具次周留存',
+                  'aggregate': 'mean'},
+    'revenue': {'date': '日期', 'value': '总收入', 'title': '总收入'},
+}
+
+Series = Dict[str, List[Tuple[str, float]]]
+
+
+def build_series(
+    rows: List[Dict],
+    date_key: str,
+    value_key: str,
+    group_key: str = None,
+    weeks: int = 12,
+    aggregate: str = 'sum'
+) -> Series:
+    """
+    从查询结果提取按日期排序的序列
+
+    Args:
+        rows: 数据行列表
+        date_key: 日期列
+        value_key: 数值列
+        group_key: 分组列，为空时所有行合并为一条序列
+        weeks: 保留最近的周数
+        aggregate: 同一日期多行的合并方式（sum 或 mean）
+
+    Returns:
+        dict: {分组名称: [(日期, 数值), ...]}
+    """
+    buckets: Dict[str, Dict[str, List[float]]] = {}
+    for row in rows or []:
+        date = row.get(date_key)
+        value = row.get(value_key)
+        if date is None or not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        group = str(row.get(group_key, '')) if group_key else '全部'
+        buckets.setdefault(group, {}).setdefault(str(date), []).append(float(value))
+
+    series = {}
+    for group, by_date in buckets.items():
+        points = []
+        for date in sorted(by_date)[-weeks:]:
+            values = by_date[date]
+            points.append((date, sum(values) / len(values) if aggregate == 'mean' else sum(values)))
+        series[group] = points
+    return series
+
+
+def build_column_series(
+    rows: List[Dict],
+    date_key: str,
+    value_keys: List[str],
+    weeks: int = 12,
+    aggregate: str = 'sum'
+) -> Series:
+    """
+    多个数值列各提取一条序列（如新用户WAU、老用户WAU）
+
+    Args:
+        rows: 数据行列表
+        date_key: 日期列
+        value_keys: 数值列
+        weeks: 保留最近的周数
+        aggregate: 同一日期多行的合并方式（sum 或 mean）
+
+    Returns:
+        dict: {数值列: [(日期, 数值), ...]}，没有有效数值的列不出现
+    """
+    series = {}
+    for value_key in value_keys:
+        points = build_series(rows, date_key, value_key, None, weeks, aggregate).get('全部')
+        if points:
+            series[value_key] = points
+    return series
+
+
+def combine_series(series: Series) -> Series:
+    """把多条序列按日期求和为一条总体序列"""
+    totals: Dict[str, float] = {}
+    for points in series.values():
+        for date, value in points:
+            totals[date] = totals.get(date, 0.0) + value
+    return {'全部': sorted(totals.items())} if totals else {}
+
+
+def _is_rate(series: Series) -> bool:
+    """判断序列是否为比率（全部在0~1之间）"""
+    values = [v for points in series.values() for _, v in points]
+    return bool(values) and all(0 <= v <= 1 for v in values)
+
+
+def format_axis_value(value: float, percent: bool = False) -> str:
+    """格式化坐标轴数值"""
+    if percent:
+        return f"{value * 100:.1f}%"
+    if abs(value) >= 10000:
+        return f"{value / 10000:.1f}万"
+    if abs(value) >= 100 or value == int(value):
+        return f"{value:,.0f}"
+    return f"{value:.2f}"
+
+
+def _scale(values: List[float]) -> Tuple[float, float]:
+    """计算纵轴范围（上下各留5%空白）"""
+    vmin, vmax = min(values), max(values)
+    if vmin == vmax:
+        vmin, vmax = vmin - 1, vmax + 1
+    pad = (vmax - vmin) * 0.05
+    return vmin - pad, vmax + pad
+
+
+def render_sparkline_svg(values: List[float], width: int = 160, height: int = 32, color: str = PALETTE[0]) -> str:
+    """
+    生成迷你走势图
+
+    Args:
+        values: 数值序列（按时间顺序）
+        width: 宽度
+        height: 高度
+        color: 折线颜色
+
+    Returns:
+        str: SVG文本
+    """
+    if len(values) < 2:
+        return ''
+    vmin, vmax = _scale(values)
+    step = (width - 4) / (len(values) - 1)
+    points = [
+        (2 + i * step, 2 + (height - 4) * (1 - (v - vmin) / (vmax - vmin)))
+        for i, v in enumerate(values)
+    ]
+    path = ' '.join(f"{x:.1f},{y:.1f}" for x, y in points)
+    last_x, last_y = points[-1]
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{path}"/>'
+        f'<circle cx="{last_x:.1f}" cy="{last_y:.1f}" r="2.5" fill="{color}"/>'
+        '</svg>'
+    )
+
+
+def render_trend_svg(series: Series, title: str = '', width: int = 600, height: int = 220) -> str:
+    """
+    生成多序列趋势折线图
+
+    Args:
+        series: {分组名称: [(日期, 数值), ...]}
+        title: 图表标题
+        width: 宽度
+        height: 高度
+
+    Returns:
+        str: SVG文本
+    """
+    dates = sorted({date for points in series.values() for date, _ in points})
+    values = [v for points in series.values() for _, v in points]
+    if len(dates) < 2:
+        return ''
+
+    percent = _is_rate(series)
+    left, right, top, bottom = 56, 12, 36, 28
+    plot_w, plot_h = width - left - right, height - top - bottom
+    vmin, vmax = _scale(values)
+    x_of = {date: left + i * plot_w / (len(dates) - 1) for i, date in enumerate(dates)}
+
+    def y_of(value):
+        return top + plot_h * (1 - (value - vmin) / (vmax - vmin))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="#ffffff"/>',
+        f'<text x="{left}" y="16" font-size="13" font-weight="bold" fill="#172b4d">{escape(title)}</text>',
+    ]
+
+    # 横向网格线与纵轴刻度
+    for i in range(4):
+        value = vmin + (vmax - vmin) * i / 3
+        y = y_of(value)
+        parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" stroke="#ebecf0"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end" fill="#6b778c">'
+                     f'{escape(format_axis_value(value, percent))}</text>')
+
+    # 横轴：首尾日期
+    for date, anchor in ((dates[0], 'start'), (dates[-1], 'end')):
+        parts.append(f'<text x="{x_of[date]:.1f}" y="{height - 8}" text-anchor="{anchor}" fill="#6b778c">'
+                     f'{escape(date)}</text>')
+
+    # 折线与图例
+    legend_x = width - right
+    for index, (group, points) in enumerate(series.items()):
+        color = PALETTE[index % len(PALETTE)]
+        path = ' '.join(f"{x_of[d]:.1f},{y_of(v):.1f}" for d, v in points)
+        parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{path}"/>')
+        if len(series) > 1:
+            label = escape(group)
+            legend_x -= 14 + 12 * len(group)
+            parts.append(f'<rect x="{legend_x:.0f}" y="8" width="10" height="10" fill="{color}"/>')
+            parts.append(f'<text x="{legend_x + 13:.0f}" y="17" fill="#42526e">{label}</text>')
+
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def _render_png(job: Dict) -> bytes:
+    """用 matplotlib 渲染PNG"""
+    import io
+    import matplotlib.pyplot as plt
+
+    dpi = 100
+    fig, ax = plt.subplots(figsize=(job['width'] / dpi, job['height'] / dpi), dpi=dpi)
+    try:
+        for index, (group, points) in enumerate(job['series'].items()):
+            ax.plot([d for d, _ in points], [v for _, v in points], color=PALETTE[index % len(PALETTE)],
+                    linewidth=1.5, label=group)
+        if job['kind'] == 'sparkline':
+            ax.axis('off')
+        else:
+            ax.set_title(job['title'], fontsize=10, loc='left')
+            ax.tick_params(labelsize=7)
+            ax.set_xticks([ax.get_xticks()[0], ax.get_xticks()[-1]])
+            if len(job['series']) > 1:
+                ax.legend(fontsize=7)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def render_chart(job: Dict) -> bytes:
+    """
+    渲染单个图表（进程池任务，参数和返回值均可序列化）
+
+    Args:
+        job: {'kind': 'sparkline'|'trend', 'format', 'series', 'title', 'width', 'height'}
+
+    Returns:
+        bytes: 图片内容，数据不足时为空
+    """
+    if job.get('format') == 'png':
+        return _render_png(job)
+    if job['kind'] == 'sparkline':
+        points = next(iter(job['series'].values()), [])
+        svg = render_sparkline_svg([v for _, v in points], job['width'], job['height'])
+    else:
+        svg = render_trend_svg(job['series'], job['title'], job['width'], job['height'])
+    return svg.encode('utf-8')
+
+
+def build_chart_jobs(current_data: Dict[str, List[Dict]], chart_config: Dict = None, report_date: str = '') -> List[Dict]:
+    """
+    为每个部分生成图表任务
+
+    Args:
+        current_data: {部分名称: 数据行列表}
+        chart_config: 配置中的 charts 部分
+        report_date: 报告日期，写入文件名
+
+    Returns:
+        list: 图表任务列表
+    """
+    chart_config = chart_config or {}
+    fmt = chart_config.get('format', 'svg')
+    if fmt == 'png' and not HAS_MATPLOTLIB:
+        fmt = 'svg'
+    weeks = chart_config.get('weeks', 12)
+    specs = {**DEFAULT_CHART_SERIES, **chart_config.get('series', {})}
+    suffix = f"_{report_date}" if report_date else ''
+
+    jobs = []
+    for section, rows in (current_data or {}).items():
+        spec = specs.get(section)
+        if not spec or not rows:
+            continue
+        aggregate = spec.get('aggregate', 'sum')
+        if spec.get('values'):
+            series = build_column_series(rows, spec['date'], spec['values'], weeks, aggregate)
+        else:
+            series = build_series(rows, spec['date'], spec['value'], spec.get('group'), weeks, aggregate)
+        if not series or max(len(points) for points in series.values()) < 2:
+            continue
+        title = f"{spec.get('title') or spec.get('value') or '/'.join(spec['values'])}（近{weeks}周）"
+        # 迷你走势图只画合并后的总体序列
+        if spec.get('values'):
+            headline = combine_series(series)
+        else:
+            headline = build_series(rows, spec['date'], spec['value'], None, weeks, aggregate)
+        jobs.append({
+            'section': section, 'kind': 'sparkline', 'format': fmt, 'series': headline, 'title': title,
+            'width': chart_config.get('sparkline_width', 160), 'height': chart_config.get('sparkline_height', 32),
+            'filename': f"{section}_sparkline{suffix}.{fmt}",
+        })
+        jobs.append({
+            'section': section, 'kind': 'trend', 'format': fmt, 'series': series, 'title': title,
+            'width': chart_config.get('width', 600), 'height': chart_config.get('height', 220),
+            'filename': f"{section}_trend{suffix}.{fmt}",
+        })
+    return jobs
+
+
+class ChartRenderer:
+    """
+    后台图表渲染器
+
+    数据获取完成后调用 submit() 提交任务，渲染与分析阶段并行；
+    生成报告前调用 collect() 取回结果
+    """
+
+    def __init__(self, chart_config: Dict = None, logger=None):
+        """
+        初始化图表渲染器
+
+        Args:
+            chart_config: 配置中的 charts 部分
+            logger: 日志记录器
+        """
+        self.chart_config = chart_config or {}
+        self.logger = logger or get_logger('charts')
+        self._executor = None
+        self._futures = []
+
+    def submit(self, current_data: Dict[str, List[Dict]], report_date: str = '') -> int:
+        """
+        提交图表渲染任务
+
+        Args:
+            current_data: {部分名称: 数据行列表}
+            report_date: 报告日期
+
+        Returns:
+            int: 提交的任务数
+        """
+        jobs = build_chart_jobs(current_data, self.chart_config, report_date)
+        if not jobs:
+            return 0
+        try:
+            self._executor = ProcessPoolExecutor(max_workers=self.chart_config.get('max_workers', 2))
+            self._futures = [(job, self._executor.submit(render_chart, job)) for job in jobs]
+        except (OSError, RuntimeError) as e:
+            # 受限环境无法创建进程时在collect中串行渲染
+            self.logger.warning(f"⚠️ 无法启动图表渲染进程池，改为串行渲染: {e}")
+            self._executor = None
+            self._futures = [(job, None) for job in jobs]
+        return len(jobs)
+
+    def collect(self, timeout: float = 60) -> Dict[str, Dict]:
+        """
+        取回渲染结果
+
+        Args:
+            timeout: 每个任务的最长等待时间（秒）
+
+        Returns:
+            dict: {文件名: {'section', 'kind', 'content', 'content_type'}}，可直接作为附件上传
+        """
+        charts = {}
+        try:
+            for job, future in self._futures:
+                try:
+                    content = future.result(timeout=timeout) if future else render_chart(job)
+                except Exception as e:
+                    self.logger.warning(f"⚠️ 图表渲染失败 {job['filename']}: {e}")
+                    continue
+                if not content:
+                    continue
+                charts[job['filename']] = {
+                    'section': job['section'],
+                    'kind': job['kind'],
+                    'content': content,
+                    'content_type': 'image/png' if job['format'] == 'png' else 'image/svg+xml',
+                }
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._futures = []
+
+        self.logger.info(f"✅ 图表渲染完成: {len(charts)} 张")
+        return charts
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试趋势图渲染模块\n")
+
+    rows = [{'日期': f'2025{m:02d}01', '新访客数': 1000 + m * 37 % 200} for m in range(1, 13)]
+    renderer = ChartRenderer()
+    renderer.submit({'traffic': rows}, '2025-01-06')
+    for name, info in renderer.collect().items():
+        print(f"{name}: {len(info['content'])} 字节")
@@ -2,179 +2,359 @@
 """
 Confluence更新模块（API版本）
 
-通过requests直接调用Confluence REST API更新页面
+基于 src.api.confluence.ConfluenceAPIClient 调用Confluence REST API更新页面，
+同一站点的多个页面共用连接池和页面元数据缓存
 """
 
-import requests
-import urllib3
-from typing import Dict, Optional
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
 from pathlib import Path
 
 from src.logger import get_logger
-
-# 禁用SSL警告
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from src.run_metrics import get_run_metrics
+from src.section_blocks import hash_text, section_hashes, split_sections, replace_sections
 
 
 class ConfluenceUpdater:
     """Confluence更新器（API版本）"""
 
-    def __init__(self, config: Dict = None, logger=None):
+    def __init__(self, config: Dict = None, logger=None, page_id=None):
         """
         初始化Confluence更新器
 
         Args:
             config: 配置字典
             logger: 日志记录器
+            page_id: 目标页面ID（默认使用配置中的 confluence.page_id）
         """
         self.config = config or {}
         self.confluence_config = self.config.get('confluence', {})
-        self.page_id = self.confluence_config.get('page_id', 81397518314)
+        self.page_id = page_id or self.confluence_config.get('page_id', 81397518314)
         self.base_url = self.confluence_config.get('api_url', '')
         self.username = self.confluence_config.get('username', '')
         self.api_token = self.confluence_config.get('api_token', '')
         self.logger = logger or get_logger('confluence_updater')
 
-        # Session for API calls
-        self.session = None
-
-    def _get_session(self) -> requests.Session:
-        """获取或创建API会话"""
-        if self.session is None:
-            self.session = requests.Session()
-
-            # 如果有用户名和API token，配置认证
-            if self.username and self.api_token:
-                # Confluence使用Basic Auth或Bearer Token
-                from requests.auth import HTTPBasicAuth
-                self.session.auth = HTTPBasicAuth(self.username, self.api_token)
-                self.session.headers.update({
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json'
-                })
-                self.logger.info("✅ Confluence认证配置完成")
-
-        return self.session
-
-    def _build_confluence_api_url(self, path: str) -> str:
-        """构建Confluence API URL"""
-        # Confluence REST API通常使用 /wiki/rest/api/ 路径
-        return f"{self.base_url}/wiki/rest/api/{path}"
-
-    def get_current_page(self) -> Dict:
+        # 差量发布：本地记录上次发布的版本号和各部分哈希
+        self.differential = self.confluence_config.get('differential', True)
+        self.publish_state_dir = Path(self.confluence_config.get('publish_state_dir', 'output/.publish_state'))
+
+        # 共享的API客户端（延迟创建）
+        self.client = None
+
+    def _get_client(self):
+        """获取共享的Confluence API客户端（同一站点、同一账号复用连接池和缓存）"""
+        if self.client is None:
+            from src.api.confluence import get_confluence_client
+            self.client = get_confluence_client(
+                self.base_url,
+                self.username,
+                self.api_token,
+                pool_size=self.confluence_config.get('pool_size', 10),
+                cache_ttl=self.confluence_config.get('metadata_cache_ttl', 300),
+                logger=self.logger
+            )
+        return self.client
+
+    def get_current_page(self, expand: str = 'version', use_cache: bool = True) -> Dict:
         """
         获取当前Confluence页面信息
 
+        Args:
+            expand: 需要展开的字段（默认只取版本号；差量发布需要时再取 body.storage）
+            use_cache: 是否使用客户端的元数据缓存
+
         Returns:
             dict: 页面元数据，包含版本号等
         """
         self.logger.info(f"获取Confluence页面 (Page ID: {self.page_id})...")
 
         try:
-            session = self._get_session()
+            data = self._get_client().get_page(self.page_id, expand=expand, use_cache=use_cache)
+            if data:
+                self.logger.info(f"✅ 成功获取页面，当前版本: {data.get('version', {}).get('number', 'N/A')}")
+            return data
+        except Exception as e:
+            self.logger.error(f"❌ 获取页面异常: {e}")
+            return {}
 
-            # Confluence REST API: GET /wiki/rest/api/content/{id}?expand=version
-            url = self._build_confluence_api_url(f"content/{self.page_id}?expand=version")
+    def _publish_state_path(self) -> Path:
+        """本地发布状态文件路径"""
+        return self.publish_state_dir / f"{self.page_id}.json"
 
-            response = session.get(url, timeout=30, verify=False)
+    def _load_publish_state(self) -> Dict:
+        """
+        读取上次发布的状态
 
-            if response.status_code != 200:
-                self.logger.error(f"获取页面失败: HTTP {response.status_code}")
-                self.logger.error(f"响应内容: {response.text[:200]}")
-                return {}
+        Returns:
+            dict: {'version', 'body_sha256', 'sections', 'attachments', 'published_at'}，不存在时返回空字典
+        """
+        path = self._publish_state_path()
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"⚠️ 读取发布状态失败，将完整发布: {e}")
+            return {}
 
-            # 解析JSON结果
-            data = response.json()
+    def _save_publish_state(self, version: int, body: str) -> None:
+        """
+        保存本次发布的状态
 
-            self.logger.info(f"✅ 成功获取页面，当前版本: {data.get('version', {}).get('number', 'N/A')}")
+        Args:
+            version: 发布后的页面版本号
+            body: 实际发布的正文
+        """
+        state = {
+            'page_id': str(self.page_id),
+            'version': version,
+            'body_sha256': hash_text(body),
+            'sections': section_hashes(body),
+            'attachments': self._load_publish_state().get('attachments', {}),
+            'published_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._write_publish_state(state)
+
+    def _write_publish_state(self, state: Dict) -> None:
+        """写入发布状态文件"""
+        try:
+            self.publish_state_dir.mkdir(parents=True, exist_ok=True)
+            self._publish_state_path().write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+        except OSError as e:
+            self.logger.warning(f"⚠️ 保存发布状态失败: {e}")
 
-            return data
+    def _plan_update(self, new_content: str, current_page: Dict, state: Dict) -> Optional[Dict]:
+        """
+        计算差量发布方案
 
-        except requests.RequestException as e:
-            self.logger.error(f"❌ 获取页面网络异常: {e}")
-            return {}
-        except Exception as e:
-            self.logger.error(f"❌ 获取页面异常: {e}")
-            return {}
+        - 页面版本与本地记录一致：页面内容就是上次发布的内容，按本地哈希比较各部分，
+          无需下载页面正文
+        - 页面被其他人修改过（或没有本地记录）：下载正文，只替换发生变化的部分，
+          保留标记之外的人工编辑；正文中缺少标记时退回完整发布
+
+        Args:
+            new_content: 新生成的正文
+            current_page: get_current_page() 的结果
+            state: 本地发布状态
+
+        Returns:
+            dict: {'body': 要发布的正文, 'changed': 变化的部分列表}，无需更新时返回 None
+        """
+        new_hashes = section_hashes(new_content)
+        current_version = current_page.get('version', {}).get('number', 1)
+
+        if state and state.get('version') == current_version:
+            if state.get('body_sha256') == hash_text(new_content):
+                return None
+            changed = [name for name, digest in new_hashes.items() if state.get('sections', {}).get(name) != digest]
+            if new_hashes and not changed:
+                return None
+            return {'body': new_content, 'changed': changed or ['全部']}
+
+        if state:
+            self.logger.info(f"页面版本已变化（本地记录 {state.get('version')}，当前 {current_version}），按部分合并")
+
+        page = self.get_current_page(expand='body.storage,version')
+        remote_body = page.get('body', {}).get('storage', {}).get('value', '')
+        remote_hashes = section_hashes(remote_body)
+
+        if not new_hashes or not remote_hashes or set(new_hashes) - set(remote_hashes):
+            # 页面中没有（完整的）分段标记，只能整页替换
+            if remote_body and hash_text(remote_body) == hash_text(new_content):
+                return None
+            return {'body': new_content, 'changed': ['全部']}
+
+        changed = [name for name, digest in new_hashes.items() if remote_hashes.get(name) != digest]
+        if not changed:
+            return None
+
+        new_blocks = split_sections(new_content)
+        body, _ = replace_sections(remote_body, {name: new_blocks[name] for name in changed})
+        return {'body': body, 'changed': changed}
 
     def update_page(
         self,
         new_content: str,
-        version_message: str = None
+        version_message: str = None,
+        force: bool = False
     ) -> bool:
         """
         更新Confluence页面
 
+        启用差量发布时，内容没有变化则跳过更新（不产生新版本）；
+        只有部分内容变化时只替换这些部分。Confluence API 要求 PUT 完整正文，
+        因此节省的是无变化时的上传和版本、以及对页面人工编辑的覆盖
+
         Args:
             new_content: 新的页面内容（HTML格式）
             version_message: 版本更新消息
+            force: 是否强制完整发布
 
         Returns:
-            bool: 是否更新成功
+            bool: 是否更新成功（跳过无变化的更新也视为成功）
         """
         self.logger.info("更新Confluence页面...")
 
+        metrics = get_run_metrics()
+        start = time.perf_counter()
+        result = 'failure'
+
         try:
-            session = self._get_session()
-
-            # 先获取当前页面信息
-            current_page = self.get_current_page()
-
-            if not current_page:
-                self.logger.error("❌ 无法获取当前页面信息")
-                return False
-
-            # 获取当前版本号并递增
-            current_version = current_page.get('version', {}).get('number', 1)
-            new_version = current_version + 1
-
-            if version_message is None:
-                from datetime import datetime
-                version_message = f"Weekly report update - {datetime.now().strftime('%Y-%m-%d')}"
-
-            # 准备更新数据
-            # Confluence REST API使用PUT更新页面
-            update_data = {
-                'id': str(self.page_id),
-                'type': 'page',
-                'title': current_page.get('title', 'Coohom平台整体数据'),
-                'body': {
-                    'storage': {
-                        'value': new_content,
-                        'representation': 'storage'
-                    }
-                },
-                'version': {
-                    'number': new_version,
-                    'message': version_message
-                }
-            }
-
-            url = self._build_confluence_api_url(f"content/{self.page_id}")
-
-            response = session.put(url, json=update_data, timeout=60, verify=False)
-
-            if response.status_code not in [200, 201]:
-                self.logger.error(f"更新失败: HTTP {response.status_code}")
-                self.logger.error(f"响应内容: {response.text[:200]}")
-                return False
-
-            self.logger.info(f"✅ Confluence页面更新成功 (版本: {new_version})")
-            return True
-
-        except requests.RequestException as e:
-            self.logger.error(f"❌ 更新页面网络异常: {e}")
+            # 版本冲突（409）时客户端会清除缓存，重新获取页面后再试一次
+            for attempt in range(2):
+                # 先获取当前页面信息
+                current_page = self.get_current_page()
+
+                if not current_page:
+                    self.logger.error("❌ 无法获取当前页面信息")
+                    return False
+
+                # 获取当前版本号并递增
+                current_version = current_page.get('version', {}).get('number', 1)
+                new_version = current_version + 1
+
+                body = new_content
+                changed: List[str] = []
+                if self.differential and not force:
+                    plan = self._plan_update(new_content, current_page, self._load_publish_state())
+                    if plan is None:
+                        self.logger.info(f"✅ 页面内容无变化，跳过更新 (版本: {current_version})")
+                        self._save_publish_state(current_version, new_content)
+                        result = 'skipped'
+                        return True
+                    body = plan['body']
+                    changed = plan['changed']
+                    self.logger.info(f"变化的部分: {', '.join(changed)}")
+
+                message = version_message or f"Weekly report update - {datetime.now().strftime('%Y-%m-%d')}"
+                if changed and changed != ['全部']:
+                    message = f"{message} ({', '.join(changed)})"
+
+                # Confluence REST API使用PUT更新页面
+                status, _ = self._get_client().put_page(
+                    self.page_id,
+                    current_page.get('title', 'Coohom平台整体数据'),
+                    body,
+                    new_version,
+                    message
+                )
+
+                if status == 409 and attempt == 0:
+                    self.logger.warning("⚠️ 页面版本冲突，重新获取页面后重试")
+                    continue
+                if status not in (200, 201):
+                    return False
+
+                self.logger.info(f"✅ Confluence页面更新成功 (版本: {new_version})")
+                self._save_publish_state(new_version, body)
+                result = 'success'
+                return True
+
             return False
+
         except Exception as e:
             self.logger.error(f"❌ 更新页面异常: {e}")
             import traceback
             self.logger.debug(traceback.format_exc())
             return False
+        finally:
+            metrics.observe('confluence_publish_duration_seconds', time.perf_counter() - start, page_id=self.page_id)
+            metrics.inc('confluence_publish_total', page_id=self.page_id, result=result)
+
+    def upload_attachments(self, attachments: Dict[str, Dict]) -> Dict[str, bool]:
+        """
+        上传报告附件（流式 multipart），内容与上次上传相同的附件跳过
+
+        Args:
+            attachments: {文件名: {'content': bytes或文件路径, 'content_type': MIME类型}}
+
+        Returns:
+            dict: {文件名: 是否成功（跳过视为成功）}
+        """
+        if not attachments:
+            return {}
+
+        import hashlib
+
+        client = self._get_client()
+        chunk_size = self.confluence_config.get('attachments', {}).get('chunk_size', 65536)
+        metrics = get_run_metrics()
+        state = self._load_publish_state()
+        uploaded = dict(state.get('attachments', {}))
+        results = {}
+
+        for filename, info in attachments.items():
+            content = info['content']
+            digest = hashlib.sha256(
+                content if isinstance(content, bytes) else Path(content).read_bytes()
+            ).hexdigest()
+            if uploaded.get(filename) == digest:
+                self.logger.info(f"附件未变化，跳过上传: {filename}")
+                metrics.inc('confluence_attachment_total', page_id=self.page_id, result='skipped')
+                results[filename] = True
+                continue
+
+            data = client.upload_attachment(
+                self.page_id,
+                filename,
+                content,
+                content_type=info.get('content_type', 'application/octet-stream'),
+                chunk_size=chunk_size
+            )
+            results[filename] = bool(data)
+            metrics.inc('confluence_attachment_total', page_id=self.page_id,
+                        result='success' if data else 'failure')
+            if data:
+                uploaded[filename] = digest
+
+        if uploaded != state.get('attachments', {}):
+            state['page_id'] = str(self.page_id)
+            state['attachments'] = uploaded
+            self._write_publish_state(state)
+        return results
+
+    def save_attachments_to_dir(self, attachments: Dict[str, Dict], output_dir: str = 'output/attachments') -> List[str]:
+        """
+        将附件保存到本地目录（--save-file 模式）
+
+        Args:
+            attachments: {文件名: {'content': bytes或文件路径, ...}}
+            output_dir: 输出目录
+
+        Returns:
+            list: 保存的文件路径
+        """
+        paths = []
+        try:
+            directory = Path(output_dir)
+            directory.mkdir(parents=True, exist_ok=True)
+            for filename, info in attachments.items():
+                content = info['content']
+                if not isinstance(content, bytes):
+                    content = Path(content).read_bytes()
+                path = directory / filename
+                path.write_bytes(content)
+                paths.append(str(path))
+            if paths:
+                self.logger.info(f"✅ {len(paths)} 个附件已保存到: {directory}")
+        except OSError as e:
+            self.logger.error(f"❌ 保存附件失败: {e}")
+        return paths
+
+    def get_page_url(self) -> str:
+        """获取页面浏览地址"""
+        return f"{self.base_url}/pages/viewpage.action?pageId={self.page_id}"
 
     def save_html_to_file(
         self,
         html_content: str,
-        report_date: str = None
+        report_date: str = None,
+        name: str = None,
+        extension: str = 'html'
     ) -> str:
         """
         将HTML内容保存到文件
@@ -182,6 +362,8 @@ class ConfluenceUpdater:
         Args:
             html_content: HTML内容
             report_date: 报告日期（用于文件名）
+            name: 发布目标名称（非 main 时追加到文件名）
+            extension: 文件扩展名（storage 格式正文使用 storage.html）
 
         Returns:
             str: 保存的文件路径
@@ -192,9 +374,9 @@ class ConfluenceUpdater:
             output_dir.mkdir(exist_ok=True)
 
             # 生成文件名
-            from datetime import datetime
             date_str = report_date or datetime.now().strftime('%Y%m%d')
-            filename = f"confluence_report_{date_str}.html"
+            suffix = f"_{name}" if name and name != 'main' else ''
+            filename = f"confluence_report_{date_str}{suffix}.{extension}"
             file_path = output_dir / filename
 
             # 写入文件
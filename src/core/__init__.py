@@ -1,12 +1,35 @@
 #!/usr/bin/env python3
 """
 核心业务逻辑层
+
+子模块按需导入（PEP 562），只用 ConfigManager 时不会加载分析器、
+AI总结和报告生成相关依赖
 """
 
-from .config import ConfigManager
-from .analyzer import Analyzer  # 将在后续创建
-from .generator import ReportGenerator  # 将在后续创建
+import importlib
 
 from src.logger import get_logger
 
 logger = get_logger('core')
+
+# 导出名称 -> 所在子模块
+_LAZY_EXPORTS = {
+    'ConfigManager': '.config',
+    'Analyzer': '.analyzer',
+    'ReportGenerator': '.generator',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -10,6 +10,7 @@
 from typing import Dict, List, Optional
 from src.logger import get_logger
 from src.ai_summary import AISummaryGenerator
+from src.core.sections import get_section, load_sections, resolve_analyzer
 
 
 class Analyzer:
@@ -36,6 +37,9 @@ class Analyzer:
         if config:
             self.column_mappings = config.get_column_mappings()
 
+        # 部分注册表（决定分析哪些部分、日期列和分析函数）
+        self.sections = load_sections(config)
+
         # 初始化AI总结生成器（传入config以支持LLM）
         self.ai_summary_generator = AISummaryGenerator(config=config, logger=self.logger)
 
@@ -129,25 +133,32 @@ class Analyzer:
         if not data:
             return {'current_week_data': [], 'previous_week_data': []}
 
-        # 根据不同的section使用不同的日期列名
-        if section in ['traffic', 'revenue', 'activation']:
-            date_col = '日期'
-        elif section == 'engagement':
-            date_col = '周'
-        elif section == 'retention':
-            date_col = '上周'
-        else:
-            date_col = '日期'
+        # 日期列名和周偏移由部分注册表声明
+        spec = get_section(self.sections, section) or {}
+        date_col = spec.get('date_column', '日期')
+        week_lag = int(spec.get('week_lag', 0) or 0)
 
-        # 找出数据中的所有唯一日期并转换为整数
-        unique_dates = set()
-        for row in data:
-            date_val = row.get(date_col, '0')
-            try:
-                date_int = int(date_val) if isinstance(date_val, str) else int(date_val) if isinstance(date_val, int) else 0
-                unique_dates.add(date_int)
-            except (ValueError, TypeError):
-                pass
+        # 月报/季报：数据已按周期汇总（日期列为周期起始日），直接按本期/上期取数
+        if week_config and week_config.get('period') in ('month', 'quarter'):
+            current_start = week_config['period_start']
+            previous_start = week_config['previous_period_start']
+            self.logger.info(f"{section} 部分按{week_config.get('period_label', '')}提取: 本期 {current_start}, 上期 {previous_start}")
+            return {
+                'current_week_data': [row for row in data if str(row.get(date_col)) == current_start],
+                'previous_week_data': [row for row in data if str(row.get(date_col)) == previous_start],
+                'target_week_start': current_start,
+                'target_week_end': week_config['period_end'],
+                'last_week_start': previous_start,
+                'last_week_end': week_config['previous_period_end']
+            }
+
+        # 日期列在解码时已统一为 YYYYMMDD 字符串（src.schema），按字符串比较即可；
+        # 未经列类型转换的数据（如测试构造的整数日期）在这里补做一次
+        dates = [row.get(date_col) for row in data]
+        if any(type(value) is not str for value in dates):
+            from src.schema import normalize_date
+            dates = [normalize_date(value) for value in dates]
+        unique_dates = {value for value in dates if value and len(value) == 8 and value.isdigit()}
 
         if not unique_dates:
             return {'current_week_data': [], 'previous_week_data': []}
@@ -159,43 +170,34 @@ class Analyzer:
         # 根据最大日期计算该周的开始和结束日期（周日为一周结束日）
         # Python weekday: Monday=0, Sunday=6
         from datetime import datetime, timedelta
-        max_date_obj = datetime.strptime(str(max_date), '%Y%m%d')
+        max_date_obj = datetime.strptime(max_date, '%Y%m%d')
         days_from_monday = max_date_obj.weekday()  # 周一到当前日期的天数
         week_start = max_date_obj - timedelta(days=days_from_monday)
         week_end = max_date_obj  # 周日
 
-        week_start_int = int(week_start.strftime('%Y%m%d'))
-        week_end_int = int(week_end.strftime('%Y%m%d'))
-        last_week_start_int = int((week_start - timedelta(days=7)).strftime('%Y%m%d'))
-        last_week_end_int = int((week_end - timedelta(days=7)).strftime('%Y%m%d'))
-
-        # 留存部分特殊处理：往前推一周
+        # 次周类指标（如留存，week_lag=1）往前推：
         # 目标周（如20260216）的留存数据来源于20260209周
         # 所以current_data应取20260209周（上周），previous_data取20260216周（本周）
-        if section == 'retention':
-            self.logger.info(f"留存部分特殊处理：目标周{max_date}，往前推一周为20260209")
-            # 往前推一周，把current和previous都往前推一周
-            week_start_int = int((week_start - timedelta(days=7)).strftime('%Y%m%d'))
-            week_end_int = int((week_end - timedelta(days=7)).strftime('%Y%m%d'))
-            last_week_start_int = int((week_start - timedelta(days=14)).strftime('%Y%m%d'))
-            last_week_end_int = int((week_end - timedelta(days=14)).strftime('%Y%m%d'))
+        lag = timedelta(days=7 * week_lag)
+        if week_lag:
+            self.logger.info(f"{section} 部分目标周{max_date}，往前推{week_lag}周")
+        week_start_key = (week_start - lag).strftime('%Y%m%d')
+        week_end_key = (week_end - lag).strftime('%Y%m%d')
+        last_week_start_key = (week_start - lag - timedelta(days=7)).strftime('%Y%m%d')
+        last_week_end_key = (week_end - lag - timedelta(days=7)).strftime('%Y%m%d')
 
-        self.logger.info(f"识别目标周: {week_start_int} ~ {week_end_int}, 上周: {last_week_start_int} ~ {last_week_end_int}")
+        self.logger.info(f"识别目标周: {week_start_key} ~ {week_end_key}, 上周: {last_week_start_key} ~ {last_week_end_key}")
 
-        # 提取目标周数据和上周数据
+        # 提取目标周数据和上周数据（YYYYMMDD 字符串的字典序与日期顺序一致）
         current_week_data = []
         previous_week_data = []
 
-        for row in data:
-            date_val = row.get(date_col, '0')
-            try:
-                date_int = int(date_val) if isinstance(date_val, str) else int(date_val) if isinstance(date_val, int) else 0
-            except (ValueError, TypeError):
-                date_int = 0
-
-            if week_start_int <= date_int <= week_end_int:
+        for row, date_key in zip(data, dates):
+            if not date_key:
+                continue
+            if week_start_key <= date_key <= week_end_key:
                 current_week_data.append(row)
-            elif last_week_start_int <= date_int <= last_week_end_int:
+            elif last_week_start_key <= date_key <= last_week_end_key:
                 previous_week_data.append(row)
 
         self.logger.info(f"从 {len(data)} 行数据中提取: 目标周 {len(current_week_data)} 行, 上周 {len(previous_week_data)} 行")
@@ -230,45 +232,28 @@ class Analyzer:
 
         results = {}
 
-        # 流量分析 - 从SQL返回的数据中提取目标周和上周数据
-        if 'traffic' in current_data:
-            traffic_data = self._extract_target_week_data(current_data['traffic'], week_config, 'traffic')
-            results['traffic'] = self.analyze_traffic_data(
-                traffic_data['current_week_data'],
-                traffic_data['previous_week_data']
-            )
+        # 按注册表顺序分析：先从12周数据中提取目标周和上周，再调用部分的分析函数
+        for spec in self.sections:
+            name = spec['name']
+            if name not in current_data:
+                continue
+            analyze = resolve_analyzer(spec, self)
+            if analyze is None:
+                continue
 
-        # 激活分析
-        if 'activation' in current_data:
-            activation_data = self._extract_target_week_data(current_data['activation'], week_config, 'activation')
-            results['activation'] = self.analyze_activation_data(
-                activation_data['current_week_data'],
-                activation_data['previous_week_data']
-            )
-
-        # 活跃分析
-        if 'engagement' in current_data:
-            engagement_data = self._extract_target_week_data(current_data['engagement'], week_config, 'engagement')
-            results['engagement'] = self.analyze_engagement_data(
-                engagement_data['current_week_data'],
-                engagement_data['previous_week_data']
-            )
-
-        # 留存分析
-        if 'retention' in current_data:
-            retention_data = self._extract_target_week_data(current_data['retention'], week_config, 'retention')
-            results['retention'] = self.analyze_retention_data(
-                retention_data['current_week_data'],
-                retention_data['previous_week_data']
-            )
-
-        # 收入分析
-        if 'revenue' in current_data:
-            revenue_data = self._extract_target_week_data(current_data['revenue'], week_config, 'revenue')
-            results['revenue'] = self.analyze_revenue_data(
-                revenue_data['current_week_data'],
-                revenue_data['previous_week_data']
-            )
+            week_data = self._extract_target_week_data(current_data[name], week_config, name)
+            try:
+                result = analyze(week_data['current_week_data'], week_data['previous_week_data'])
+            except Exception as e:
+                self.logger.error(f"❌ 分析 {name} 部分失败: {e}")
+                continue
+
+            # 插件分析器不生成总结时，按注册表配置补充
+            if spec.get('summary', True) and isinstance(result, dict) and 'ai_summary' not in result:
+                result['ai_summary'] = self.ai_summary_generator.generate_summary(
+                    name, result, week_data['current_week_data']
+                )
+            results[name] = result
 
         self.logger.info("✅ 所有部分分析完成")
         return results
@@ -706,6 +691,95 @@ class Analyzer:
         self.logger.info(f"✅ 收入数据分析完成: {result['summary']}")
         return result
 
+    def analyze_revenue_breakdown(
+        self,
+        current_data: List[Dict],
+        previous_data: List[Dict],
+        dimensions: List[str],
+        label: str,
+        top_n: int = 3
+    ) -> Dict:
+        """
+        按维度拆分收入并找出主要变动项（top movers）
+
+        Args:
+            current_data: 本周拆分数据（06~08 收入拆分SQL的结果）
+            previous_data: 上周拆分数据
+            dimensions: 组成维度值的列（多列以 " / " 连接）
+            label: 维度名称（用于总结文字）
+            top_n: 增长和下降各保留的项数
+
+        Returns:
+            dict: 各维度项的收入、环比和占比，以及增长/下降最多的项
+        """
+        self.logger.info(f"分析收入拆分（{label}）...")
+
+        def group(rows: List[Dict]) -> Dict[str, Dict]:
+            groups = {}
+            for row in rows:
+                key = ' / '.join(str(row.get(col) or 'Unknown') for col in dimensions)
+                item = groups.setdefault(key, {'revenue': 0, 'users': 0})
+                item['revenue'] += row.get('收入_美元', 0) or 0
+                item['users'] += row.get('付费用户数', 0) or 0
+            return groups
+
+        current = group(current_data)
+        previous = group(previous_data)
+        total_current = sum(item['revenue'] for item in current.values())
+        total_previous = sum(item['revenue'] for item in previous.values())
+
+        items = []
+        for key in set(current) | set(previous):
+            revenue = current.get(key, {}).get('revenue', 0)
+            revenue_prev = previous.get(key, {}).get('revenue', 0)
+            wow = self.calculate_week_over_week(revenue, revenue_prev)
+            items.append({
+                'name': key,
+                'revenue': round(revenue, 1),
+                'previous': round(revenue_prev, 1),
+                'users': current.get(key, {}).get('users', 0),
+                'change_abs': round(revenue - revenue_prev, 1),
+                'change_rate': wow['change_rate'],
+                'trend': wow['trend'],
+                'share': round(revenue / total_current * 100, 1) if total_current else 0
+            })
+        items.sort(key=lambda item: item['revenue'], reverse=True)
+
+        movers = sorted(items, key=lambda item: item['change_abs'])
+        top_gainers = [item for item in reversed(movers) if item['change_abs'] > 0][:top_n]
+        top_decliners = [item for item in movers if item['change_abs'] < 0][:top_n]
+
+        highlights = []
+        if top_gainers:
+            highlights.append(f"增长最多: {top_gainers[0]['name']}（{top_gainers[0]['change_abs']:+,.1f}）")
+        if top_decliners:
+            highlights.append(f"下降最多: {top_decliners[0]['name']}（{top_decliners[0]['change_abs']:+,.1f}）")
+
+        result = {
+            'label': label,
+            'items': items,
+            'top_gainers': top_gainers,
+            'top_decliners': top_decliners,
+            'total_current': round(total_current, 1),
+            'total_previous': round(total_previous, 1),
+            'summary': f"{label}拆分 {len(items)} 项" + (f"，{'；'.join(highlights)}" if highlights else '')
+        }
+
+        self.logger.info(f"✅ 收入拆分（{label}）分析完成: {result['summary']}")
+        return result
+
+    def analyze_revenue_by_sku(self, current_data: List[Dict], previous_data: List[Dict]) -> Dict:
+        """按SKU（模式/类型/周期）拆分收入"""
+        return self.analyze_revenue_breakdown(current_data, previous_data, ['SKU模式', 'SKU类型', 'SKU周期'], 'SKU')
+
+    def analyze_revenue_by_country(self, current_data: List[Dict], previous_data: List[Dict]) -> Dict:
+        """按国家/地区拆分收入"""
+        return self.analyze_revenue_breakdown(current_data, previous_data, ['国家_中文'], '国家/地区')
+
+    def analyze_revenue_by_tier(self, current_data: List[Dict], previous_data: List[Dict]) -> Dict:
+        """按账单分层（新签/连续续约/升级/降级/召回）拆分收入"""
+        return self.analyze_revenue_breakdown(current_data, previous_data, ['账单分层'], '账单分层')
+
 
 if __name__ == "__main__":
     # 测试代码
@@ -7,7 +7,7 @@
 import os
 import yaml
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from src.logger import get_logger
 from src.models.types import WeekParams, ColumnMappings
 
@@ -117,6 +117,16 @@ class ConfigManager:
         """
         return self.get('sql_files', {})
 
+    def get_sections(self) -> List[Dict]:
+        """
+        获取报告部分注册表（按报告顺序）
+
+        Returns:
+            list: 部分定义列表，见 src/core/sections.py
+        """
+        from src.core.sections import load_sections
+        return load_sections(self._config)
+
     def get_week_config(self) -> Dict:
         """
         获取日期配置
@@ -137,7 +147,9 @@ class ConfigManager:
             'level': self.get('logging.level', 'INFO'),
             'file': self.get('logging.file', 'logs/weekly_report.log'),
             'max_bytes': self.get('logging.max_bytes', 10485760),  # 10MB
-            'backup_count': self.get('logging.backup_count', 5)
+            'backup_count': self.get('logging.backup_count', 5),
+            'queue_enabled': self.get('logging.queue_enabled', False),
+            'max_payload_chars': self.get('logging.max_payload_chars', 500)
         }
 
     def get_revenue_md_config(self) -> Dict:
@@ -165,6 +177,45 @@ class ConfigManager:
             'timezone': self.get('schedule.timezone', 'Asia/Shanghai')
         }
 
+    def get_metrics_config(self) -> Dict:
+        """
+        获取运行指标导出配置
+
+        Returns:
+            dict: 运行指标配置
+        """
+        return {
+            'enabled': self.get('metrics.enabled', True),
+            'prometheus_file': self.get('metrics.prometheus_file', 'output/metrics/weekly_report.prom'),
+            'json_file': self.get('metrics.json_file', 'output/metrics/weekly_report_metrics.json'),
+            'history_file': self.get('metrics.history_file', 'output/metrics/history.jsonl')
+        }
+
+    def get_publish_targets(self) -> List[Dict]:
+        """
+        获取Confluence发布目标列表
+
+        未配置 confluence.targets 时，使用 confluence.page_id 作为唯一目标（发布完整报告）
+
+        Returns:
+            list: [{'name', 'page_id', 'sections', 'template'}, ...]，sections 为 None 表示全部
+        """
+        targets = self.get('confluence.targets') or [{
+            'name': 'main',
+            'page_id': self.get('confluence.page_id', 81397518314)
+        }]
+
+        return [
+            {
+                'name': target.get('name') or str(target.get('page_id')),
+                'page_id': target.get('page_id'),
+                'sections': target.get('sections') or None,
+                'template': target.get('template', 'base.html')
+            }
+            for target in targets
+            if target.get('page_id')
+        ]
+
     def get_default_config(self) -> Dict:
         """
         获取默认配置
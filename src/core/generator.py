@@ -5,14 +5,58 @@
 支持 Markdown 格式报告生成，每部分包含 AI 简短客观总结
 """
 
-from typing import Dict, Optional, List
+import io
+from typing import Dict, Optional, List, TextIO
 from pathlib import Path
 from datetime import datetime
+from src.core.sections import get_section, load_sections, top_level_sections
 from src.logger import get_logger
-from src.models.types import WeekParams
+from src.models.types import SectionSpec, WeekParams
 
 logger = get_logger('core.generator')
 
+# 数据表默认显示的行数与列数
+MAX_TABLE_ROWS = 10
+MAX_TABLE_COLUMNS = 6
+
+_HTML_HEAD = """
+<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{report_date} 周报</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; line-height: 1.6; margin: 20px; }}
+        h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
+        h2 {{ color: #34495e; margin-top: 30px; }}
+        h3 {{ color: #7f8c8d; }}
+        table {{ border-collapse: collapse; width: 100%; margin: 10px 0; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px 12px; text-align: left; }}
+        th {{ background-color: #f2f2f2; font-weight: bold; }}
+        tr:nth-child(even) {{ background-color: #f9f9f9; }}
+        .positive {{ color: #27ae60; }}
+        .negative {{ color: #e74c3c; }}
+        .neutral {{ color: #7f8c8d; }}
+        .summary {{ background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 10px 0; }}
+        .ai-summary {{ background-color: #e8f5e9; border-left: 4px solid #4caf50; padding: 10px; margin: 10px 0; }}
+        .attention {{ background-color: #fff3e0; border-left: 4px solid #ff9800; padding: 10px; margin: 10px 0; }}
+    </style>
+</head>
+<body>
+    <h1>{report_date} 周报</h1>
+    <p><strong>数据周:</strong> {week_monday} ~ {week_saturday}</p>
+"""
+
+
+def _format_cell(value) -> str:
+    """格式化表格单元格（整数加千分位，浮点数保留两位小数）"""
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
 
 class ReportGenerator:
     """
@@ -21,22 +65,35 @@ class ReportGenerator:
     支持 Markdown 和 HTML 两种格式
     """
 
-    def __init__(self, templates_dir: Optional[str] = None, logger=None):
+    def __init__(
+        self,
+        templates_dir: Optional[str] = None,
+        logger=None,
+        column_orders: Optional[Dict[str, List[str]]] = None,
+        sections: Optional[List[SectionSpec]] = None
+    ):
         """
         初始化报告生成器
 
         Args:
             templates_dir: 模板目录路径
             logger: 日志记录器
+            column_orders: 各部分数据表的列顺序（未指定的部分按列名排序）
+            sections: 部分注册表（默认内置五个部分），决定报告顺序和标题
         """
         self.logger = logger or get_logger('core.generator')
         self.templates_dir = templates_dir or Path(__file__).parent / 'templates'
+        self.column_orders = column_orders or {}
+        self.sections = sections if sections is not None else load_sections()
+        self._column_cache: Dict[str, tuple] = {}
 
     def generate_markdown_report(
         self,
         params: WeekParams,
         data: Dict,
-        analysis: Optional[Dict] = None
+        analysis: Optional[Dict] = None,
+        charts: Optional[Dict] = None,
+        chart_dir: str = 'attachments'
     ) -> str:
         """
         生成 Markdown 格式报告
@@ -45,11 +102,13 @@ class ReportGenerator:
             params: 周参数
             data: 各部分原始数据
             analysis: 分析结果（可选）
+            charts: 趋势图 {文件名: {'section', 'kind', ...}}（src.charts.ChartRenderer.collect 的结果）
+            chart_dir: 图片相对于报告文件的目录
 
         Returns:
             str: Markdown 格式的完整报告
         """
-        sections_order = ['traffic', 'activation', 'engagement', 'retention', 'revenue']
+        sections_order = [spec['name'] for spec in top_level_sections(self.sections)]
 
         lines = []
         lines.extend([
@@ -70,6 +129,13 @@ class ReportGenerator:
                 lines.append(f"\n> **暂无数据**")
                 continue
 
+            # 趋势图
+            chart_files = [name for name, info in (charts or {}).items()
+                           if info['section'] == section and info['kind'] == 'trend']
+            if chart_files:
+                lines.append("\n### 📈 近12周趋势")
+                lines.extend(f"![{self._get_section_title(section)}]({chart_dir}/{name})" for name in chart_files)
+
             # 数据表格
             lines.append("\n### 数据明细")
             lines.append(self._format_data_table(section_data, section))
@@ -121,7 +187,8 @@ class ReportGenerator:
         params: WeekParams,
         data: Dict,
         analysis: Optional[Dict] = None,
-        revenue_md_content: Optional[str] = None
+        revenue_md_content: Optional[str] = None,
+        max_rows: Optional[int] = MAX_TABLE_ROWS
     ) -> str:
         """
         生成 HTML 格式报告（兼容现有功能）
@@ -131,116 +198,141 @@ class ReportGenerator:
             data: 各部分原始数据
             analysis: 分析结果（可选）
             revenue_md_content: 收入 MD 文档内容（可选）
+            max_rows: 数据表最多显示的行数，None 表示完整输出
 
         Returns:
             str: HTML 格式的完整报告
         """
-        sections_order = ['traffic', 'activation', 'engagement', 'retention', 'revenue']
+        buffer = io.StringIO()
+        self.write_html_report(buffer, params, data, analysis, revenue_md_content, max_rows)
+        self.logger.info("✅ HTML 报告生成完成")
+        return buffer.getvalue()
 
-        html_parts = []
-        html_parts.append(f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{params.get('report_date', '')} 周报</title>
-    <style>
-        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; line-height: 1.6; margin: 20px; }}
-        h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
-        h2 {{ color: #34495e; margin-top: 30px; }}
-        h3 {{ color: #7f8c8d; }}
-        table {{ border-collapse: collapse; width: 100%; margin: 10px 0; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px 12px; text-align: left; }}
-        th {{ background-color: #f2f2f2; font-weight: bold; }}
-        tr:nth-child(even) {{ background-color: #f9f9f9; }}
-        .positive {{ color: #27ae60; }}
-        .negative {{ color: #e74c3c; }}
-        .neutral {{ color: #7f8c8d; }}
-        .summary {{ background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 10px 0; }}
-        .ai-summary {{ background-color: #e8f5e9; border-left: 4px solid #4caf50; padding: 10px; margin: 10px 0; }}
-        .attention {{ background-color: #fff3e0; border-left: 4px solid #ff9800; padding: 10px; margin: 10px 0; }}
-    </style>
-</head>
-<body>
-    <h1>{params.get('report_date', '')} 周报</h1>
-    <p><strong>数据周:</strong> {params.get('week_monday', '')} ~ {params.get('week_saturday', '')}</p>
-""")
+    def save_html_report(
+        self,
+        path: str,
+        params: WeekParams,
+        data: Dict,
+        analysis: Optional[Dict] = None,
+        revenue_md_content: Optional[str] = None,
+        max_rows: Optional[int] = None
+    ) -> str:
+        """
+        把 HTML 报告直接流式写入文件（完整数据表也不需要在内存中拼出整个文档）
+
+        Args:
+            path: 输出文件路径
+            params: 周参数
+            data: 各部分原始数据
+            analysis: 分析结果（可选）
+            revenue_md_content: 收入 MD 文档内容（可选）
+            max_rows: 数据表最多显示的行数，默认完整输出
+
+        Returns:
+            str: 文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            self.write_html_report(f, params, data, analysis, revenue_md_content, max_rows)
+        self.logger.info(f"✅ HTML 报告已写入: {path}")
+        return str(path)
+
+    def write_html_report(
+        self,
+        out: TextIO,
+        params: WeekParams,
+        data: Dict,
+        analysis: Optional[Dict] = None,
+        revenue_md_content: Optional[str] = None,
+        max_rows: Optional[int] = MAX_TABLE_ROWS
+    ) -> None:
+        """
+        把 HTML 报告写入文本流（io.StringIO 或文件句柄）
+
+        Args:
+            out: 可写文本流
+            params: 周参数
+            data: 各部分原始数据
+            analysis: 分析结果（可选）
+            revenue_md_content: 收入 MD 文档内容（可选）
+            max_rows: 数据表最多显示的行数，None 表示完整输出
+        """
+        write = out.write
+        sections_order = [spec['name'] for spec in top_level_sections(self.sections)]
+
+        write(_HTML_HEAD.format(
+            report_date=params.get('report_date', ''),
+            week_monday=params.get('week_monday', ''),
+            week_saturday=params.get('week_saturday', '')
+        ))
 
         # 为每个部分生成内容
         for section in sections_order:
             section_data = data.get(section, [])
             section_analysis = analysis.get(section, {}) if analysis else {}
 
-            html_parts.append(f'\n    <h2>{self._get_section_title(section)}</h2>')
+            write(f'\n    <h2>{self._get_section_title(section)}</h2>\n')
 
             if not section_data:
-                html_parts.append('    <p><em>暂无数据</em></p>')
+                write('    <p><em>暂无数据</em></p>\n')
                 continue
 
             # 数据表格
-            html_parts.append(self._format_html_table(section_data, section))
+            self._write_html_table(out, section_data, self._column_order(section, section_data), max_rows)
 
             # 环比数据
             if section_analysis:
                 wow_data = self._extract_wow_data(section, section_analysis)
                 if wow_data:
-                    html_parts.append('\n    <h3>环比变化</h3>')
-                    html_parts.append('    <table>')
-                    html_parts.append('        <thead><tr><th>指标</th><th>上周</th><th>本周</th><th>变化</th><th>变化率</th></tr></thead>')
-                    html_parts.append('        <tbody>')
+                    write('\n    <h3>环比变化</h3>\n'
+                          '    <table>\n'
+                          '        <thead><tr><th>指标</th><th>上周</th><th>本周</th><th>变化</th><th>变化率</th></tr></thead>\n'
+                          '        <tbody>\n')
                     for metric, value in wow_data.items():
-                        change = value.get('change_abs', 0)
-                        rate = value.get('change_rate', 0)
                         trend = value.get('trend', '→')
                         trend_class = 'positive' if trend == '↑' else ('negative' if trend == '↓' else 'neutral')
-                        html_parts.append(
+                        write(
                             f'            <tr>'
                             f'<td>{metric}</td>'
                             f'<td>{value.get("previous", 0)}</td>'
                             f'<td>{value.get("current", 0)}</td>'
-                            f'<td class="{trend_class}">{trend} {change}</td>'
-                            f'<td class="{trend_class}">{rate}%</td>'
-                            f'</tr>'
+                            f'<td class="{trend_class}">{trend} {value.get("change_abs", 0)}</td>'
+                            f'<td class="{trend_class}">{value.get("change_rate", 0)}%</td>'
+                            f'</tr>\n'
                         )
-                    html_parts.append('        </tbody></table>')
+                    write('        </tbody></table>\n')
 
             # AI 总结
             if section_analysis.get('ai_summary'):
-                html_parts.append('\n    <div class="ai-summary">')
-                html_parts.append(f'        <strong>🤖 AI 总结:</strong> {section_analysis["ai_summary"]}')
-                html_parts.append('    </div>')
+                write('\n    <div class="ai-summary">\n'
+                      f'        <strong>🤖 AI 总结:</strong> {section_analysis["ai_summary"]}\n'
+                      '    </div>\n')
 
             # 收入 MD 内容
             if section == 'revenue' and revenue_md_content:
-                html_parts.append('\n    <div class="summary">')
-                html_parts.append(f'        <h3>收入详细分析</h3>')
-                html_parts.append(f'        <pre>{revenue_md_content}</pre>')
-                html_parts.append('    </div>')
+                write('\n    <div class="summary">\n'
+                      '        <h3>收入详细分析</h3>\n'
+                      f'        <pre>{revenue_md_content}</pre>\n'
+                      '    </div>\n')
 
             # 关键洞察
-            if section_analysis.get('attention_items'):
-                items = section_analysis['attention_items']
-                if items:
-                    html_parts.append('\n    <div class="attention">')
-                    html_parts.append('        <strong>⚠️ 关注事项:</strong>')
-                    html_parts.append('        <ul>')
-                    for item in items:
-                        html_parts.append(f'            <li>{item}</li>')
-                    html_parts.append('        </ul>')
-                    html_parts.append('    </div>')
-
-        html_parts.append(f"""
+            items = section_analysis.get('attention_items')
+            if items:
+                write('\n    <div class="attention">\n'
+                      '        <strong>⚠️ 关注事项:</strong>\n'
+                      '        <ul>\n')
+                for item in items:
+                    write(f'            <li>{item}</li>\n')
+                write('        </ul>\n'
+                      '    </div>\n')
+
+        write(f"""
     <hr>
     <p><strong>生成时间:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
 </body>
 </html>
 """)
 
-        html = '\n'.join(html_parts)
-        self.logger.info("✅ HTML 报告生成完成")
-        return html
-
     def generate_full_report(
         self,
         params: WeekParams,
@@ -248,7 +340,8 @@ class ReportGenerator:
         previous_data: Dict,
         analysis: Optional[Dict] = None,
         revenue_md_content: Optional[str] = None,
-        format: str = 'markdown'
+        format: str = 'markdown',
+        charts: Optional[Dict] = None
     ) -> str:
         """
         生成完整报告
@@ -260,6 +353,7 @@ class ReportGenerator:
             analysis: 分析结果（可选）
             revenue_md_content: 收入 MD 文档内容（可选）
             format: 报告格式 ('markdown' 或 'html')
+            charts: 趋势图（仅 Markdown 格式使用）
 
         Returns:
             str: 生成的报告内容
@@ -271,7 +365,7 @@ class ReportGenerator:
         }
 
         if format == 'markdown':
-            return self.generate_markdown_report(params, current_data, analysis)
+            return self.generate_markdown_report(params, current_data, analysis, charts=charts)
         else:
             return self.generate_html_report(params, current_data, analysis, revenue_md_content)
 
@@ -285,66 +379,76 @@ class ReportGenerator:
         Returns:
             str: 部分中文名称
         """
-        titles = {
-            'traffic': '1. 流量/投放',
-            'activation': '2. 激活/注册',
-            'engagement': '3. 活跃-新老用户',
-            'retention': '4. 留存',
-            'revenue': '5. 收入'
-        }
-        return titles.get(section, section)
+        spec = get_section(self.sections, section)
+        return spec.get('title', section) if spec else section
 
-    def _format_data_table(self, data: List[Dict], section: str) -> str:
+    def _column_order(self, section: str, data: List[Dict]) -> List[str]:
         """
-        格式化数据为 Markdown 表格
+        获取部分数据表的列顺序
+
+        优先使用初始化时传入的 column_orders；否则扫描一次数据得到排序后的列名，
+        按部分缓存，同一份数据的 Markdown 和 HTML 表格共用
 
         Args:
-            data: 数据列表
             section: 部分名称
+            data: 数据列表
 
         Returns:
-            str: Markdown 表格
+            list: 列名（最多 MAX_TABLE_COLUMNS 列）
         """
-        if not data:
-            return ""
+        if section in self.column_orders:
+            return self.column_orders[section][:MAX_TABLE_COLUMNS]
+
+        cached = self._column_cache.get(section)
+        if cached and cached[0] is data:
+            return cached[1]
 
-        # 获取所有列名
         all_keys = set()
         for row in data:
             all_keys.update(row.keys())
-        columns = sorted(all_keys)
-
         # 限制列数，避免表格过宽
-        max_columns = 6
-        if len(columns) > max_columns:
-            columns = columns[:max_columns]
+        columns = sorted(all_keys)[:MAX_TABLE_COLUMNS]
+        self._column_cache[section] = (data, columns)
+        return columns
 
-        lines = []
-        lines.append("| " + " | ".join(columns) + " |")
-        lines.append("| " + " | ".join(["---"] * len(columns)) + " |")
+    def _format_data_table(self, data: List[Dict], section: str, max_rows: Optional[int] = MAX_TABLE_ROWS) -> str:
+        """
+        格式化数据为 Markdown 表格
 
-        for row in data[:10]:  # 只显示前10条
-            values = []
-            for col in columns:
-                value = row.get(col, '')
-                # 格式化数值
-                if isinstance(value, (int, float)):
-                    value = f"{value:,}" if isinstance(value, int) else f"{value:.2f}"
-                values.append(str(value))
-            lines.append("| " + " | ".join(values) + " |")
+        Args:
+            data: 数据列表
+            section: 部分名称
+            max_rows: 最多显示的行数，None 表示完整输出
 
-        if len(data) > 10:
-            lines.append(f"| ... | 共 {len(data)} 条记录 |")
+        Returns:
+            str: Markdown 表格
+        """
+        if not data:
+            return ""
+
+        columns = self._column_order(section, data)
+        rows = data if max_rows is None else data[:max_rows]
+
+        buffer = io.StringIO()
+        write = buffer.write
+        write("| " + " | ".join(columns) + " |\n")
+        write("| " + " | ".join(["---"] * len(columns)) + " |")
+        for row in rows:
+            write("\n| " + " | ".join([_format_cell(row.get(col, '')) for col in columns]) + " |")
+
+        if len(rows) < len(data):
+            write(f"\n| ... | 共 {len(data)} 条记录 |")
 
-        return '\n'.join(lines)
+        return buffer.getvalue()
 
-    def _format_html_table(self, data: List[Dict], section: str) -> str:
+    def _format_html_table(self, data: List[Dict], section: str, max_rows: Optional[int] = MAX_TABLE_ROWS) -> str:
         """
         格式化数据为 HTML 表格
 
         Args:
             data: 数据列表
             section: 部分名称
+            max_rows: 最多显示的行数，None 表示完整输出
 
         Returns:
             str: HTML 表格
@@ -352,37 +456,38 @@ class ReportGenerator:
         if not data:
             return "<p>无数据</p>"
 
-        # 获取所有列名
-        all_keys = set()
-        for row in data:
-            all_keys.update(row.keys())
-        columns = sorted(all_keys)
+        buffer = io.StringIO()
+        self._write_html_table(buffer, data, self._column_order(section, data), max_rows)
+        return buffer.getvalue().rstrip('\n')
 
-        # 限制列数
-        max_columns = 6
-        if len(columns) > max_columns:
-            columns = columns[:max_columns]
+    @staticmethod
+    def _write_html_table(out: TextIO, data: List[Dict], columns: List[str], max_rows: Optional[int] = MAX_TABLE_ROWS) -> None:
+        """
+        把数据表逐行写入文本流
 
-        lines = ['    <table>', '        <thead><tr>']
+        Args:
+            out: 可写文本流
+            data: 数据列表
+            columns: 列顺序（预先计算）
+            max_rows: 最多写入的行数，None 表示完整输出
+        """
+        write = out.write
+        write('    <table>\n        <thead><tr>\n')
         for col in columns:
-            lines.append(f'            <th>{col}</th>')
-        lines.extend(['        </tr></thead>', '        <tbody>'])
+            write(f'            <th>{col}</th>\n')
+        write('        </tr></thead>\n        <tbody>\n')
 
-        for row in data[:10]:
-            lines.append('            <tr>')
+        rows = data if max_rows is None else data[:max_rows]
+        for row in rows:
+            write('            <tr>\n')
             for col in columns:
-                value = row.get(col, '')
-                if isinstance(value, (int, float)):
-                    value = f"{value:,}" if isinstance(value, int) else f"{value:.2f}"
-                lines.append(f'                <td>{value}</td>')
-            lines.append('            </tr>')
-
-        if len(data) > 10:
-            lines.append(f'            <tr><td colspan="{len(columns)}">... 共 {len(data)} 条记录</td></tr>')
+                write(f'                <td>{_format_cell(row.get(col, ""))}</td>\n')
+            write('            </tr>\n')
 
-        lines.extend(['        </tbody>', '    </table>'])
+        if len(rows) < len(data):
+            write(f'            <tr><td colspan="{len(columns)}">... 共 {len(data)} 条记录</td></tr>\n')
 
-        return '\n'.join(lines)
+        write('        </tbody>\n    </table>\n')
 
     def _extract_wow_data(self, section: str, analysis: Dict) -> Dict:
         """
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+报告部分注册表
+
+每个数据部分在 config.yaml 的 sections 中声明一次：SQL文件、分析器、
+是否生成AI总结、模板和日期列。取数、快照、分析、总结和渲染各阶段都遍历
+同一份注册表，新增部分只需添加配置（和对应SQL/模板），不必修改各阶段代码
+
+声明了 parent 的子部分（如收入的 SKU/国家/分层拆分）与其他部分一起并发取数和分析，
+渲染时并入父部分，不单独成节；声明了 source 的部分不单独查询，由 shared_queries 中的
+共享查询一次取数后在本地拆分
+"""
+
+import importlib
+from typing import Callable, Dict, List, Optional
+
+from src.logger import get_logger
+from src.models.types import SectionSpec
+
+logger = get_logger('core.sections')
+
+# 内置的五个部分（未配置 sections 时使用，顺序即报告顺序）
+DEFAULT_SECTIONS: Dict[str, SectionSpec] = {
+    'traffic': {
+        'title': '1. 流量/投放',
+        'sql': '01_traffic_weekly.sql',
+        'analyzer': 'analyze_traffic_data',
+        'date_column': '日期',
+        'grain': 'day',
+    },
+    'activation': {
+        'title': '2. 激活/注册',
+        'sql': '02_activation_ready.sql',
+        'analyzer': 'analyze_activation_data',
+        'date_column': '日期',
+        'grain': 'day',
+        'history_weeks': 8,
+    },
+    'engagement': {
+        'title': '3. 活跃-新老用户',
+        'sql': '03_engagement_new_old_users.sql',
+        'analyzer': 'analyze_engagement_data',
+        'date_column': '周',
+    },
+    'retention': {
+        'title': '4. 留存',
+        'sql': '04_retention.sql',
+        'analyzer': 'analyze_retention_data',
+        'date_column': '上周',
+        'week_lag': 1,
+    },
+    'revenue': {
+        'title': '5. 收入',
+        'sql': '05_revenue.sql',
+        'analyzer': 'analyze_revenue_data',
+        'date_column': '日期',
+    },
+}
+
+
+def _normalize(name: str, raw: Dict) -> SectionSpec:
+    """补全单个部分的默认字段（兼容旧 sql_files 的 file 键）"""
+    base = DEFAULT_SECTIONS.get(name, {})
+    spec: SectionSpec = {
+        'name': name,
+        'title': name,
+        'sql': None,
+        'analyzer': None,
+        'summary': True,
+        'template': name,
+        'date_column': '日期',
+        'week_lag': 0,
+        'grain': 'week',
+        'history_weeks': 12,
+        'enabled': True,
+        **base,
+        **{k: v for k, v in (raw or {}).items() if v is not None},
+    }
+    spec['name'] = name
+    if raw and raw.get('file') and not raw.get('sql'):
+        spec['sql'] = raw['file']
+    return spec
+
+
+def load_sections(config=None, include_disabled: bool = False) -> List[SectionSpec]:
+    """
+    读取部分注册表
+
+    优先读取 sections；旧配置只有 sql_files 时按其声明补全；都没有时使用内置五个部分
+
+    Args:
+        config: 配置字典或 ConfigManager
+        include_disabled: 是否包含 enabled: false 的部分
+
+    Returns:
+        list: 按报告顺序排列的部分定义
+    """
+    config = config or {}
+    declared = config.get('sections') or config.get('sql_files') or DEFAULT_SECTIONS
+
+    specs = []
+    for name, raw in declared.items():
+        if not isinstance(raw, dict):
+            # 简写形式：traffic: "01_traffic_weekly.sql"
+            raw = {'sql': raw}
+        spec = _normalize(name, raw)
+        if spec['enabled'] or include_disabled:
+            specs.append(spec)
+    return specs
+
+
+def get_section(sections: List[SectionSpec], name: str) -> Optional[SectionSpec]:
+    """
+    按名称查找部分定义
+
+    Args:
+        sections: load_sections 的结果
+        name: 部分名称
+
+    Returns:
+        dict: 部分定义，不存在时返回 None
+    """
+    for spec in sections:
+        if spec['name'] == name:
+            return spec
+    return None
+
+
+def top_level_sections(sections: List[SectionSpec]) -> List[SectionSpec]:
+    """
+    报告中独立成节的部分（不含挂在其他部分下的子部分）
+
+    Args:
+        sections: load_sections 的结果
+
+    Returns:
+        list: 没有 parent 的部分
+    """
+    return [spec for spec in sections if not spec.get('parent')]
+
+
+def child_sections(sections: List[SectionSpec], parent: str) -> List[SectionSpec]:
+    """
+    挂在指定部分下的子部分（如收入下的 SKU、国家、分层拆分）
+
+    Args:
+        sections: load_sections 的结果
+        parent: 父部分名称
+
+    Returns:
+        list: 按注册表顺序排列的子部分
+    """
+    return [spec for spec in sections if spec.get('parent') == parent]
+
+
+def load_callable(target: str) -> Optional[Callable]:
+    """
+    加载 "模块:函数" 形式的插件
+
+    Args:
+        target: 如 src.revenue_cube:split_revenue_cube
+
+    Returns:
+        callable: 函数，无法加载时返回 None
+    """
+    module_name, _, func_name = target.partition(':')
+    try:
+        return getattr(importlib.import_module(module_name), func_name)
+    except (ImportError, AttributeError, ValueError) as e:
+        logger.error(f"❌ 无法加载插件 {target}: {e}")
+        return None
+
+
+def resolve_analyzer(spec: SectionSpec, analyzer=None) -> Optional[Callable]:
+    """
+    解析部分的分析函数
+
+    analyzer 为 Analyzer 的方法名（如 analyze_traffic_data），
+    或 "模块:函数" 形式的插件；两者签名一致：fn(current_week_rows, previous_week_rows) -> dict
+
+    Args:
+        spec: 部分定义
+        analyzer: Analyzer 实例（解析方法名时使用）
+
+    Returns:
+        callable: 分析函数，未配置或无法解析时返回 None
+    """
+    target = spec.get('analyzer')
+    if not target:
+        return None
+
+    if ':' in target:
+        return load_callable(target)
+
+    func = getattr(analyzer, target, None) if analyzer is not None else None
+    if func is None:
+        logger.error(f"❌ {spec['name']} 的分析器不存在: {target}")
+    return func
+
+
+if __name__ == "__main__":
+    # 测试代码：打印当前配置的注册表
+    from src.core.config import ConfigManager
+
+    print("测试报告部分注册表\n")
+    for item in load_sections(ConfigManager()):
+        print(f"{item['name']:<12} {item['title']:<16} sql={item['sql']} analyzer={item['analyzer']}")
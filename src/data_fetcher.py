@@ -9,9 +9,11 @@ import requests
 from typing import Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
-from src.logger import get_logger
+from src.logger import get_logger, truncate_payload
+from src.metabase_export import DEFAULT_API_ROW_CAP, is_truncated, iter_csv_rows, iter_text_lines, lift_limit
 from src.sql_preprocessor import preprocess_sql_file
-from src.mcp_client import MetabaseMCPClient
+from src.run_metrics import get_run_metrics
+from src.schema import apply_schema, build_schema
 
 
 class DataFetcher:
@@ -41,12 +43,17 @@ class DataFetcher:
                        self.metabase_config.get('metabase_api_key') or \
                        self.metabase_config.get('api_token', '')
         self.timeout = self.metabase_config.get('query_timeout', 300)
+        # 结果被截断时改用流式CSV导出
+        self.api_row_cap = int(self.metabase_config.get('api_row_cap', DEFAULT_API_ROW_CAP))
+        self.stream_export = self.metabase_config.get('stream_export', True)
+        self.export_chunk_size = int(self.metabase_config.get('export_chunk_size', 65536))
         self.use_mcp = use_mcp
         self.logger = logger or get_logger('data_fetcher')
 
         # MCP 客户端（当 use_mcp=True 时使用）
         self.mcp_client = None
         if self.use_mcp:
+            from src.mcp_client import MetabaseMCPClient
             self.mcp_client = MetabaseMCPClient(
                 database_id=self.database_id,
                 max_retries=3,
@@ -55,15 +62,25 @@ class DataFetcher:
             )
             self.logger.info("✅ 使用 MCP 方式获取数据")
 
-        # SQL文件映射（从配置文件动态读取）
-        sql_config = self.config.get('sql_files', {})
-        self.sql_files = {
-            'traffic': sql_config.get('traffic', {}).get('file', '01_traffic_weekly.sql'),
-            'activation': sql_config.get('activation', {}).get('file', '02_activation_ready.sql'),
-            'engagement': sql_config.get('engagement', {}).get('file', '03_engagement_new_old_users.sql'),
-            'retention': sql_config.get('retention', {}).get('file', '04_retention.sql'),
-            'revenue': sql_config.get('revenue', {}).get('file', '05_revenue.sql'),
-        }
+        # 本地SQL引擎（local_engine.enabled）：在 SQLite 样例表上执行，不访问 Metabase
+        self.local_engine = None
+        local_config = self.config.get('local_engine', {}) or {}
+        if local_config.get('enabled'):
+            from src.local_engine import LocalEngine
+            self.local_engine = LocalEngine.from_config(
+                local_config, base_path=str(Path(__file__).parent.parent), logger=self.logger
+            )
+            self.logger.info("✅ 使用本地SQL引擎获取数据")
+
+        # 部分注册表（config.yaml 的 sections），SQL文件映射由注册表生成
+        from src.core.sections import load_sections
+        self.sections = load_sections(self.config)
+        self.sql_files = {spec['name']: spec['sql'] for spec in self.sections if spec.get('sql')}
+        # 共享查询（如收入立方体）：一次查询，本地拆分为声明了 source 的多个部分
+        self.shared_queries = self.config.get('shared_queries', {}) or {}
+        self.max_concurrent_queries = max(1, int(self.metabase_config.get('max_concurrent_queries', 4)))
+        # 各部分列类型（由 column_mappings 推断），查询结果解码时转换一次
+        self.schema = build_schema(self.config)
 
         # SQL专属文件夹路径
         self.sql_output_dir = Path(__file__).parent.parent / 'sql_queries'
@@ -79,6 +96,9 @@ class DataFetcher:
             processed_sql: 处理后的SQL
             params: 日期参数
         """
+        # 本地引擎调试时不保存
+        if self.local_engine is not None:
+            return
         try:
             report_date = params.get('report_date', datetime.now().strftime('%Y-%m-%d'))
             gen_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -117,18 +137,61 @@ class DataFetcher:
         except Exception as e:
             self.logger.warning(f"⚠️ 保存SQL文件失败: {e}")
 
-    def _execute_api_query(self, sql_query: str) -> List[Dict]:
+    def _save_snapshot(
+        self,
+        section: str,
+        sql_file: str,
+        sql: str,
+        data: List[Dict],
+        params: Dict,
+        base_path: str = None
+    ):
+        """
+        将查询结果保存为二进制快照
+
+        Args:
+            section: 部分名称
+            sql_file: SQL文件路径
+            sql: 实际执行的SQL
+            data: 查询结果
+            params: 日期参数
+            base_path: 项目根目录
+        """
+        snapshot_config = self.config.get('snapshot', {})
+        # 本地样例数据不写入快照归档（归档是月报/季报和 --from-snapshot 的数据来源）
+        if not snapshot_config.get('enabled', True) or not data or self.local_engine is not None:
+            return
+
+        from src.snapshot import save_binary_snapshot
+
+        output_dir = Path(snapshot_config.get('output_dir', 'output/archive'))
+        if base_path and not output_dir.is_absolute():
+            output_dir = Path(base_path) / output_dir
+
+        save_binary_snapshot(
+            section, data, params,
+            sql=sql,
+            output_dir=str(output_dir),
+            fmt=snapshot_config.get('format', 'auto'),
+            sql_file=sql_file,
+            logger=self.logger
+        )
+
+    def _execute_api_query(self, sql_query: str, section: str = 'adhoc') -> List[Dict]:
         """
         使用 API 方式执行查询
 
         Args:
             sql_query: SQL查询字符串
+            section: 部分名称（用于运行指标标签）
 
         Returns:
             List[Dict]: 查询结果列表
         """
         import time
 
+        metrics = get_run_metrics()
+
         try:
             self.logger.info("正在执行Metabase API查询...")
 
@@ -151,10 +214,11 @@ class DataFetcher:
                 }
             }
 
-            self.logger.debug(f"API URL: {api_url}")
-            self.logger.debug(f"Database ID: {self.database_id}")
-            self.logger.debug(f"API Token (前10位): {self.api_token[:10] if self.api_token else 'NOT SET'}...")
-            self.logger.debug(f"Headers: x-api-key={self.api_token[:10] if self.api_token else 'NOT SET'}...")
+            # 调试日志使用 % 延迟格式化，未开启DEBUG时不产生字符串拼接开销
+            token_prefix = self.api_token[:10] if self.api_token else 'NOT SET'
+            self.logger.debug("API URL: %s", api_url)
+            self.logger.debug("Database ID: %s", self.database_id)
+            self.logger.debug("API Token (前10位): %s...", token_prefix)
 
             # 发送POST请求（支持重试机制处理202异步查询）
             response = None
@@ -165,6 +229,9 @@ class DataFetcher:
                     data=json.dumps(request_data).encode('utf-8'),
                     timeout=30
                 )
+                metrics.inc('response_bytes_total', len(response.content or b''), section=section)
+                if attempt > 0:
+                    metrics.inc('query_retries_total', section=section)
 
                 # 检查响应状态
                 if response.status_code == 200:
@@ -176,37 +243,41 @@ class DataFetcher:
                         response_data = response.json()
                         # 如果202响应包含完整数据（status=completed），直接使用
                         if response_data.get('status') == 'completed' and 'data' in response_data:
-                            self.logger.info(f"202响应已包含完整数据，status={response_data.get('status')}")
+                            self.logger.info("202响应已包含完整数据，status=%s", response_data.get('status'))
                             break
                         # 否则需要等待并重试
                         if attempt < 4:  # 最多重试4次
                             current_delay = 3 * (2 ** attempt)
-                            self.logger.warning(f"⚠️ 查询执行中 (202, status={response_data.get('status')})，等待 {current_delay} 秒后重试... ({attempt + 1}/{5})")
+                            self.logger.warning(
+                                "⚠️ 查询执行中 (202, status=%s)，等待 %s 秒后重试... (%d/%d)",
+                                response_data.get('status'), current_delay, attempt + 1, 5
+                            )
                             time.sleep(current_delay)
                             continue
-                        self.logger.debug(f"最终202响应内容: {response.text[:200]}")
+                        self.logger.debug("最终202响应内容: %s", truncate_payload(response.text, 200))
                         break
                     except json.JSONDecodeError:
                         # 响应不是有效JSON，继续重试
                         if attempt < 4:
                             current_delay = 3 * (2 ** attempt)
-                            self.logger.warning(f"⚠️ 202响应无法解析，等待 {current_delay} 秒后重试... ({attempt + 1}/{5})")
+                            self.logger.warning("⚠️ 202响应无法解析，等待 %s 秒后重试... (%d/%d)", current_delay, attempt + 1, 5)
                             time.sleep(current_delay)
                             continue
                         break
                 else:
                     # 其他状态码表示错误
-                    self.logger.error(f"❌ API请求失败，状态码: {response.status_code}")
-                    self.logger.error(f"响应内容: {response.text[:500]}")
+                    self.logger.error("❌ API请求失败，状态码: %s", response.status_code)
+                    self.logger.error("响应内容: %s", truncate_payload(response.text))
                     return []
 
             # 解析JSON响应（此时response变量已包含最后一次的响应）
             response_data = response.json() if response else None
-            self.logger.info(f"成功获取响应，status: {response_data.get('status', 'unknown')}")
-            self.logger.info(f"响应keys: {list(response_data.keys())}")
-            self.logger.info(f"完整响应: {str(response_data)[:500]}")
+            self.logger.info("成功获取响应，status: %s", response_data.get('status', 'unknown'))
+            # 响应体可能有数万行，只在DEBUG级别输出截断后的内容
+            self.logger.debug("响应keys: %s", list(response_data.keys()))
+            self.logger.debug("完整响应: %s", truncate_payload(response_data))
             if 'data' in response_data:
-                self.logger.info(f"data类型: {type(response_data['data'])}")
+                self.logger.debug("data类型: %s", type(response_data['data']))
 
             # 处理返回数据
             if 'data' in response_data:
@@ -223,10 +294,20 @@ class DataFetcher:
                                 dict_rows.append(dict(zip(col_names, row)))
                             else:
                                 dict_rows.append(row)
-                        self.logger.info(f"✅ 查询成功，返回 {len(dict_rows)} 行数据")
+                        if self.stream_export and is_truncated(
+                            sql_query, len(dict_rows), data_obj.get('rows_truncated'), self.api_row_cap
+                        ):
+                            self.logger.warning(
+                                "⚠️ 返回 %d 行已达上限，结果可能被截断，改用流式导出", len(dict_rows)
+                            )
+                            exported = self._execute_export_query(sql_query, cols, section=section)
+                            if exported is not None:
+                                return exported
+                            self.logger.warning("⚠️ 流式导出失败，使用截断的结果（%d 行）", len(dict_rows))
+                        self.logger.info("✅ 查询成功，返回 %d 行数据", len(dict_rows))
                         return dict_rows
                 elif isinstance(data_obj, list):
-                    self.logger.info(f"✅ 查询成功，返回 {len(data_obj)} 行数据")
+                    self.logger.info("✅ 查询成功，返回 %d 行数据", len(data_obj))
                     return data_obj
                 else:
                     self.logger.warning(f"⚠️ 返回数据格式不符合预期")
@@ -247,6 +328,75 @@ class DataFetcher:
             self.logger.debug(traceback.format_exc())
             return []
 
+    def _execute_export_query(self, sql_query: str, cols: List[Dict] = None,
+                              section: str = 'adhoc') -> Optional[List[Dict]]:
+        """
+        通过 /api/dataset/csv 导出接口执行查询（不受 /api/dataset 行数上限限制）
+
+        响应按块读取、逐行解析，不会把整个CSV响应体读入内存；
+        SQL末尾作为兜底的 LIMIT 会被去掉
+
+        Args:
+            sql_query: SQL查询字符串
+            cols: /api/dataset 响应的列信息（用于还原数值类型）
+            section: 部分名称（用于运行指标标签）
+
+        Returns:
+            List[Dict]: 查询结果列表，导出失败时为 None
+        """
+        metrics = get_run_metrics()
+        export_url = self.base_url + 'api/dataset/csv'
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36)',
+            'x-api-key': self.api_token,
+        }
+        query = {
+            'database': self.database_id,
+            'type': 'native',
+            'native': {
+                'query': lift_limit(sql_query, self.api_row_cap)
+            }
+        }
+
+        def _counted(chunks):
+            for chunk in chunks:
+                metrics.inc('response_bytes_total', len(chunk), section=section)
+                yield chunk
+
+        try:
+            response = requests.post(
+                export_url,
+                headers=headers,
+                data={'query': json.dumps(query, ensure_ascii=False), 'format_rows': 'false'},
+                timeout=self.timeout,
+                stream=True
+            )
+            try:
+                # 导出失败时 Metabase 返回 JSON 错误体而不是CSV
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code not in (200, 202) or 'json' in content_type:
+                    self.logger.error("❌ 流式导出失败，状态码: %s", response.status_code)
+                    self.logger.error("响应内容: %s", truncate_payload(response.text))
+                    return None
+
+                chunks = _counted(response.iter_content(chunk_size=self.export_chunk_size))
+                rows = list(iter_csv_rows(iter_text_lines(chunks), cols))
+            finally:
+                response.close()
+
+            metrics.inc('stream_exports_total', section=section)
+            self.logger.info("✅ 流式导出成功，返回 %d 行数据", len(rows))
+            return rows
+
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"❌ 流式导出请求异常: {e}")
+            return None
+        except Exception as e:
+            self.logger.error(f"❌ 流式导出解析异常: {e}")
+            import traceback
+            self.logger.debug(traceback.format_exc())
+            return None
+
     def _execute_mcp_query(self, sql_query: str) -> List[Dict]:
         """
         使用 MCP 客户端执行查询
@@ -312,16 +462,18 @@ class DataFetcher:
         else:
             return []
 
-    def execute_metabase_query(self, sql_query: str, max_retries: int = 5) -> List[Dict]:
+    def execute_metabase_query(self, sql_query: str, max_retries: int = 5, section: str = 'adhoc') -> List[Dict]:
         """
         通过Metabase API执行SQL查询（已废弃，保留用于向后兼容）
 
-        根据是否使用MCP选择执行方式
+        根据配置选择本地引擎、MCP 或 API 执行
         """
+        if self.local_engine is not None:
+            return self.local_engine.execute(sql_query)
         if self.use_mcp and self.mcp_client:
             return self._execute_mcp_query(sql_query)
         else:
-            return self._execute_api_query(sql_query)
+            return self._execute_api_query(sql_query, section=section)
 
     def fetch_section_data(
         self,
@@ -345,18 +497,25 @@ class DataFetcher:
             return []
 
         sql_file = self.sql_files[section]
-        self.logger.info(f"处理 {section} 部分，SQL文件: {sql_file}")
+        self.logger.info("处理 %s 部分，SQL文件: %s", section, sql_file)
 
         try:
             # 预处理SQL（替换参数）
             processed_sql = preprocess_sql_file(sql_file, params, base_path)
 
-            # 执行查询
-            data = self.execute_metabase_query(processed_sql)
+            # 执行查询（记录耗时、行数）
+            metrics = get_run_metrics()
+            with metrics.timer('query_duration_seconds', section=section):
+                data = self.execute_metabase_query(processed_sql, section=section)
+            apply_schema(data, self.schema.get(section, {}), logger=self.logger)
+            metrics.inc('section_rows_total', len(data or []), section=section)
 
             # 保存SQL内容到md文件（专属文件夹）
             self._save_sql_to_md(section, sql_file, processed_sql, params)
 
+            # 保存查询结果快照（供复盘和 --from-snapshot 复用）
+            self._save_snapshot(section, sql_file, processed_sql, data, params, base_path)
+
             return data
 
         except Exception as e:
@@ -365,38 +524,117 @@ class DataFetcher:
             self.logger.debug(traceback.format_exc())
             return []
 
+    def _fetch_as_dict(self, section: str, params: Dict, base_path: str = None) -> Dict[str, List[Dict]]:
+        """单个部分取数（与 fetch_shared_query 返回格式一致，便于统一并发调度）"""
+        return {section: self.fetch_section_data(section, params, base_path)}
+
+    def fetch_shared_query(
+        self,
+        source: str,
+        sections: List[str],
+        params: Dict,
+        base_path: str = None
+    ) -> Dict[str, List[Dict]]:
+        """
+        执行一次共享查询并在本地拆分为多个部分
+
+        拆分后的每个部分单独保存快照，--from-snapshot 与单独查询时一致
+
+        Args:
+            source: 共享查询名称（config.yaml 的 shared_queries）
+            sections: 由该查询提供数据的部分
+            params: 日期参数字典
+            base_path: 项目根目录
+
+        Returns:
+            dict: {部分名称: 查询结果}，失败时各部分为空列表
+        """
+        from src.core.sections import load_callable
+
+        query_config = self.shared_queries.get(source, {})
+        sql_file = query_config.get('sql')
+        self.logger.info("处理共享查询 %s（%s），SQL文件: %s", source, '、'.join(sections), sql_file)
+
+        try:
+            splitter = load_callable(query_config.get('splitter', ''))
+            if not sql_file or splitter is None:
+                raise ValueError(f"共享查询 {source} 缺少 sql 或 splitter 配置")
+
+            processed_sql = preprocess_sql_file(sql_file, params, base_path)
+
+            metrics = get_run_metrics()
+            with metrics.timer('query_duration_seconds', section=source):
+                rows = self.execute_metabase_query(processed_sql, section=source)
+            self._save_sql_to_md(source, sql_file, processed_sql, params)
+
+            split = splitter(rows or [])
+            results = {}
+            for section in sections:
+                data = apply_schema(split.get(section, []), self.schema.get(section, {}), logger=self.logger)
+                metrics.inc('section_rows_total', len(data), section=section)
+                self._save_snapshot(section, sql_file, processed_sql, data, params, base_path)
+                results[section] = data
+
+            self.logger.info(f"✅ 共享查询 {source}: {len(rows or [])} 行，拆分为 {len(sections)} 个部分")
+            return results
+
+        except Exception as e:
+            self.logger.error(f"❌ 共享查询 {source} 失败: {e}")
+            import traceback
+            self.logger.debug(traceback.format_exc())
+            return {section: [] for section in sections}
+
     def fetch_all_sections(
         self,
         params: Dict,
         week_offset: int = 0,
-        base_path: str = None
+        base_path: str = None,
+        sections: List[str] = None
     ) -> Dict[str, List[Dict]]:
         """
-        获取所有部分的数据
+        获取注册表中所有部分的数据（按 metabase.max_concurrent_queries 并发）
 
         Args:
             params: 日期参数字典
             week_offset: 周偏移量（0=本周, -1=上周）
             base_path: 项目根目录
+            sections: 只获取这些部分（默认注册表中的全部部分）
 
         Returns:
             dict: 各部分的查询数据
         """
         self.logger.info(f"开始获取所有部分数据（周偏移: {week_offset}）...")
 
-        results = {}
-
-        # 获取各个部分的数据
-        sections = [
-            'traffic',
-            'activation',
-            'engagement',
-            'retention',
-            'revenue'
-        ]
-
-        for section in sections:
-            results[section] = self.fetch_section_data(section, params, base_path)
+        # 声明了 source 的部分合并为一次共享查询，其余部分各自查询
+        shared: Dict[str, List[str]] = {}
+        tasks = []
+        for spec in self.sections:
+            if sections is not None and spec['name'] not in sections:
+                continue
+            source = spec.get('source')
+            if source and source in self.shared_queries:
+                if source not in shared:
+                    shared[source] = []
+                    tasks.append((self.fetch_shared_query, (source, shared[source], params, base_path)))
+                shared[source].append(spec['name'])
+            elif spec['name'] in self.sql_files:
+                tasks.append((self._fetch_as_dict, (spec['name'], params, base_path)))
+
+        # 并发执行（MCP 客户端不保证线程安全，保持串行）
+        max_workers = 1 if self.use_mcp else min(self.max_concurrent_queries, len(tasks) or 1)
+        fetched = {}
+        if max_workers == 1:
+            for func, args in tasks:
+                fetched.update(func(*args))
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch') as executor:
+                futures = [executor.submit(func, *args) for func, args in tasks]
+                for future in futures:
+                    fetched.update(future.result())
+
+        # 结果按注册表顺序返回
+        results = {spec['name']: fetched[spec['name']] for spec in self.sections if spec['name'] in fetched}
 
         self.logger.info("✅ 数据获取完成")
         return results
@@ -9,13 +9,37 @@ from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 from pathlib import Path
 from src.logger import get_logger
+from src.result_set import ResultSet, column_aliases
 
 
 class DataValidator:
     """数据验证器 - 用于数据验证和异常检测"""
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, column_mappings: Dict = None, max_examples: int = 3):
+        """
+        初始化数据验证器
+
+        Args:
+            logger: 日志记录器
+            column_mappings: 列名映射（config.yaml 的 column_mappings），
+                用于以英文字段名校验SQL返回的中文列
+            max_examples: 完整性问题每列保留的示例行数
+        """
         self.logger = logger or get_logger('data_validator')
+        self.max_examples = max_examples
+
+        # 允许为负值的字段（变化量）
+        self.signed_fields = frozenset(['change_rate', 'change_abs', 'growth_rate'])
+
+        # 各部分的列别名表（只在表头生成一次，校验时不改写数据行）
+        self.column_aliases = {}
+        for section, section_config in (column_mappings or {}).items():
+            if not isinstance(section_config, dict):
+                continue
+            columns = section_config.get('columns', {})
+            self.column_aliases[section] = column_aliases(
+                columns if isinstance(columns, dict) else {}, section_config.get('aliases', {})
+            )
 
         # 定义各部分的关键字段
         self.required_fields = {
@@ -49,6 +73,87 @@ class DataValidator:
             }
         }
 
+    def _with_aliases(self, section_name: str, data: List[Dict]) -> List[Dict]:
+        """为数据套上该部分的列别名（无别名时原样返回）"""
+        aliases = self.column_aliases.get(section_name)
+        if not aliases or not data:
+            return data
+        return ResultSet(data, aliases)
+
+    def profile_columns(self, section_name: str, data: List[Dict]) -> Dict[str, Any]:
+        """
+        单次遍历数据行，按列汇总缺失值和负值
+
+        结果大小只与列数有关：每列一个计数和最多 max_examples 个示例行
+
+        Args:
+            section_name: 部分名称
+            data: 数据列表
+
+        Returns:
+            Dict: {
+                'row_count': int,
+                'missing': {字段: {'count': int, 'examples': [行号]}},
+                'negative': {列名: {'count': int, 'examples': [(行号, 值)]}}
+            }
+        """
+        rows = data.rows if isinstance(data, ResultSet) else (data or [])
+        aliases = self.column_aliases.get(section_name, {})
+        if isinstance(data, ResultSet):
+            aliases = {**aliases, **data.aliases}
+
+        # 必需字段在表头解析一次别名（原始行中已有该键时优先使用原键）
+        required = [(field, aliases.get(field)) for field in self.required_fields.get(section_name, [])]
+        max_examples = self.max_examples
+        missing = {}
+        negative = {}
+
+        for index, row in enumerate(rows, start=1):
+            for field, alias in required:
+                value = row.get(field)
+                if value is None and alias:
+                    value = row.get(alias)
+                if value is None:
+                    stats = missing.setdefault(field, {'count': 0, 'examples': []})
+                    stats['count'] += 1
+                    if len(stats['examples']) < max_examples:
+                        stats['examples'].append(index)
+
+            for key, value in row.items():
+                if isinstance(value, (int, float)) and value < 0 and key not in self.signed_fields:
+                    stats = negative.setdefault(key, {'count': 0, 'examples': []})
+                    stats['count'] += 1
+                    if len(stats['examples']) < max_examples:
+                        stats['examples'].append((index, value))
+
+        return {'row_count': len(rows), 'missing': missing, 'negative': negative}
+
+    @staticmethod
+    def summarize_profile(section_name: str, profile: Dict[str, Any]) -> Tuple[bool, List[str]]:
+        """
+        把按列汇总的结果转为问题列表（每列一条）
+
+        Args:
+            section_name: 部分名称
+            profile: profile_columns 的结果
+
+        Returns:
+            Tuple[bool, List[str]]: (是否有效, 问题列表)
+        """
+        if not profile['row_count']:
+            return False, [f"{section_name} 数据为空"]
+
+        total = profile['row_count']
+        issues = []
+        for field, stats in profile['missing'].items():
+            examples = ', '.join(str(index) for index in stats['examples'])
+            issues.append(f"{section_name} 数据缺少字段: {field}（{stats['count']}/{total} 行，如第 {examples} 行）")
+        for column, stats in profile['negative'].items():
+            examples = ', '.join(f"第 {index} 行={value}" for index, value in stats['examples'])
+            issues.append(f"{section_name} 数据中发现负值: {column}（{stats['count']}/{total} 行，如 {examples}）")
+
+        return len(issues) == 0, issues
+
     def validate_data_completeness(
         self,
         section_name: str,
@@ -58,6 +163,8 @@ class DataValidator:
         """
         验证数据完整性
 
+        单次遍历，问题按列汇总（每列一条，附少量示例行），而不是每行一条
+
         Args:
             section_name: 部分名称 (traffic, activation, engagement, retention, revenue)
             data: 数据列表
@@ -68,34 +175,12 @@ class DataValidator:
         """
         self.logger.debug(f"验证 {section_name} 数据完整性...")
 
-        issues = []
-
-        # 检查数据是否为空
-        if not data:
-            issues.append(f"{section_name} 数据为空")
-            if raise_on_error:
-                raise ValueError(f"{section_name} 数据为空")
-            return False, issues
-
-        # 检查关键字段是否存在
-        required = self.required_fields.get(section_name, [])
-        if required:
-            for row in data:
-                missing_fields = [f for f in required if f not in row or row[f] is None]
-                if missing_fields:
-                    issues.append(f"{section_name} 数据缺少字段: {', '.join(missing_fields)}")
-
-        # 检查数值字段是否合理
-        for row in data:
-            for key, value in row.items():
-                if isinstance(value, (int, float)):
-                    # 检查负值
-                    if value < 0 and key not in ['change_rate', 'change_abs', 'growth_rate']:
-                        issues.append(f"{section_name} 数据中发现负值: {key}={value}")
+        is_valid, issues = self.summarize_profile(section_name, self.profile_columns(section_name, data))
 
-        is_valid = len(issues) == 0
+        if not data and raise_on_error:
+            raise ValueError(f"{section_name} 数据为空")
 
-        if not is_valid:
+        if data and not is_valid:
             self.logger.warning(f"{section_name} 数据完整性检查失败: {issues}")
 
         return is_valid, issues
@@ -128,13 +213,17 @@ class DataValidator:
 
         # 获取阈值配置
         thresholds = self.anomaly_thresholds.get(section_name, {})
+        current_data = self._with_aliases(section_name, current_data)
+        previous_data = self._with_aliases(section_name, previous_data)
 
-        # 如果未指定字段，使用第一个数值字段
+        # 如果未指定字段，使用第一个数值字段（其次是通过别名可访问的阈值字段）
         if key_field is None:
             for key in current_data[0].keys():
                 if key in thresholds:
                     key_field = key
                     break
+            else:
+                key_field = next((key for key in thresholds if key in current_data[0]), None)
 
         if key_field is None:
             return anomalies
@@ -173,10 +262,12 @@ class DataValidator:
 
     @staticmethod
     def _extract_numeric_value(row: Dict, key: str) -> Optional[float]:
-        """从行中提取数值"""
+        """从行中提取数值（解码时已按列类型转换的值直接返回）"""
         value = row.get(key)
         if value is None:
             return None
+        if type(value) in (int, float):
+            return value
         try:
             return float(value)
         except (ValueError, TypeError):
@@ -236,9 +327,20 @@ class DataValidator:
 class DataQualityAnalyzer:
     """数据质量分析器"""
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, column_mappings: Dict = None, anomaly_detector=None):
+        """
+        初始化数据质量分析器
+
+        Args:
+            logger: 日志记录器
+            column_mappings: 列名映射（config.yaml 的 column_mappings）
+            anomaly_detector: 历史基线异常检测器（默认使用内置配置的 AnomalyDetector）
+        """
+        from src.anomaly import AnomalyDetector
+
         self.logger = logger or get_logger('data_quality')
-        self.validator = DataValidator(logger)
+        self.validator = DataValidator(logger, column_mappings=column_mappings)
+        self.anomaly_detector = anomaly_detector or AnomalyDetector(logger=self.logger)
 
     def generate_quality_report(
         self,
@@ -329,10 +431,15 @@ class DataQualityAnalyzer:
             'notes': []
         }
 
-        # 数据完整性检查
-        is_valid, issues = self.validator.validate_data_completeness(section_name, data)
-        section_report['completeness']['valid'] = is_valid
-        section_report['completeness']['issues'] = issues
+        # 数据完整性检查（单次遍历，按列汇总）
+        profile = self.validator.profile_columns(section_name, data)
+        is_valid, issues = self.validator.summarize_profile(section_name, profile)
+        section_report['completeness'] = {
+            'valid': is_valid,
+            'issues': issues,
+            'missing': profile['missing'],
+            'negative': profile['negative']
+        }
 
         if not is_valid:
             section_report['status'] = 'error'
@@ -346,8 +453,10 @@ class DataQualityAnalyzer:
             )
             section_report['anomalies'] = anomalies
 
-            if anomalies:
-                section_report['status'] = 'warning'
+        # 多周数据：所有分组×指标相对历史基线检测
+        section_report['anomalies'].extend(self.anomaly_detector.scan_section(section_name, data or []))
+        if section_report['anomalies'] and section_report['status'] == 'success':
+            section_report['status'] = 'warning'
 
         # 添加注意项
         if section_name == 'revenue' and not data:
@@ -116,6 +116,65 @@ def calculate_week_params(target_date: str = None, week_offset: int = 0) -> Dict
     }
 
 
+def calculate_period_params(period: str, target_date: str = None) -> Dict:
+    """
+    计算月报/季报的日期参数
+
+    Args:
+        period: month / quarter
+        target_date: 目标日期 'YYYYMMDD'；指定时取其所在的月/季度，
+                     不指定时取今天之前最近一个完整的月/季度
+
+    Returns:
+        dict: 包含以下参数的字典：
+            - period: 周期类型
+            - period_start / period_end: 本期起止日期（YYYYMMDD）
+            - previous_period_start / previous_period_end: 上期起止日期（用于环比）
+            - period_label: 周期名称（如 2026年9月、2026年Q3）
+            - report_date: 报告标题和文件名中的周期（如 2026-09、2026-Q3，不与周报文件重名）
+            - snapshot_date: 快照日期（本期最后一天）
+    """
+    if period not in ('month', 'quarter'):
+        raise ValueError(f"未知的报告周期: {period}")
+    months = 1 if period == 'month' else 3
+
+    def _start_of(day):
+        month = (day.month - 1) // months * months + 1
+        return day.replace(month=month, day=1)
+
+    def _shift(start, count):
+        index = start.year * 12 + start.month - 1 + count * months
+        return start.replace(year=index // 12, month=index % 12 + 1)
+
+    if target_date is None:
+        start = _shift(_start_of(datetime.now().date()), -1)
+    else:
+        start = _start_of(datetime.strptime(target_date, '%Y%m%d').date())
+
+    end = _shift(start, 1) - timedelta(days=1)
+    previous_start = _shift(start, -1)
+    previous_end = start - timedelta(days=1)
+
+    if period == 'month':
+        label = f"{start.year}年{start.month}月"
+        report_date = start.strftime('%Y-%m')
+    else:
+        quarter = (start.month - 1) // 3 + 1
+        label = f"{start.year}年Q{quarter}"
+        report_date = f"{start.year}-Q{quarter}"
+
+    return {
+        'period': period,
+        'period_start': start.strftime('%Y%m%d'),
+        'period_end': end.strftime('%Y%m%d'),
+        'previous_period_start': previous_start.strftime('%Y%m%d'),
+        'previous_period_end': previous_end.strftime('%Y%m%d'),
+        'period_label': label,
+        'report_date': report_date,
+        'snapshot_date': end.strftime('%Y%m%d'),
+    }
+
+
 def format_date_display(params: Dict) -> str:
     """
     格式化日期参数为可读字符串（用于日志输出）
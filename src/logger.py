@@ -3,13 +3,18 @@
 日志配置模块
 
 提供统一的日志配置，支持彩色控制台输出和文件日志
+支持队列模式：业务线程只把日志记录放入内存队列，格式化和磁盘写入由后台线程完成
 """
 
+import atexit
+import copy
 import logging
 import os
+import queue
+import reprlib
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from typing import Dict, Optional
 
 try:
     from colorlog import ColoredFormatter
@@ -18,13 +23,170 @@ except ImportError:
     HAS_COLORLOG = False
 
 
+# 日志负载（如API响应）默认最大字符数
+DEFAULT_MAX_PAYLOAD_CHARS = 500
+_max_payload_chars = DEFAULT_MAX_PAYLOAD_CHARS
+
+# 主日志记录器名称：get_logger 创建的模块记录器都是它的子记录器，共用它的handler（含队列）
+ROOT_LOGGER_NAME = 'weekly_report'
+
+# 队列模式下各记录器对应的后台监听器
+_queue_listeners: Dict[str, QueueListener] = {}
+
+# 入队时可以直接传给后台线程的不可变参数类型
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class LogPayload:
+    """
+    延迟格式化、限制长度的日志负载
+
+    只有在日志真正输出时（队列模式下在后台线程中）才会把对象转成字符串，
+    并且最多保留 max_chars 个字符，避免响应体等大对象撑大日志
+
+    Examples:
+        >>> logger.debug("完整响应: %s", truncate_payload(response_data))
+    """
+
+    __slots__ = ('obj', 'max_chars')
+
+    _repr = reprlib.Repr()
+    _repr.maxstring = 2000
+    _repr.maxother = 2000
+    _repr.maxdict = 50
+    _repr.maxlist = 50
+    _repr.maxlevel = 4
+
+    def __init__(self, obj, max_chars: Optional[int] = None):
+        self.obj = obj
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        limit = self.max_chars or _max_payload_chars
+        if isinstance(self.obj, (str, bytes)):
+            text = self.obj if isinstance(self.obj, str) else self.obj.decode('utf-8', errors='replace')
+            total = len(text)
+        else:
+            # 容器先用 reprlib 截断，避免对大对象做完整 str()
+            text = self._repr.repr(self.obj)
+            total = None
+        if len(text) <= limit:
+            return text
+        suffix = f"...(已截断，共{total}字符)" if total is not None else "...(已截断)"
+        return text[:limit] + suffix
+
+    __repr__ = __str__
+
+
+def truncate_payload(obj, max_chars: Optional[int] = None) -> LogPayload:
+    """
+    包装日志负载，输出时按长度上限截断
+
+    Args:
+        obj: 任意对象（字符串、字节、字典、列表等）
+        max_chars: 最大字符数（默认使用 setup_logging 配置的上限）
+
+    Returns:
+        LogPayload: 延迟格式化的负载对象
+    """
+    return LogPayload(obj, max_chars)
+
+
+def _snapshot_arg(arg):
+    """
+    入队前固定日志参数的当前状态
+
+    不可变值原样返回；列表、字典、集合（包括 LogPayload 包装的）做浅拷贝，
+    调用方之后修改原对象不会影响后台线程格式化出的内容
+
+    Returns:
+        固定后的参数；无法安全延迟格式化的对象返回 None
+    """
+    if isinstance(arg, _IMMUTABLE_ARG_TYPES):
+        return arg
+    if isinstance(arg, (list, dict, set)):
+        return copy.copy(arg)
+    if isinstance(arg, LogPayload):
+        if isinstance(arg.obj, (list, dict, set)):
+            return LogPayload(copy.copy(arg.obj), arg.max_chars)
+        return arg
+    if isinstance(arg, tuple) and all(isinstance(item, _IMMUTABLE_ARG_TYPES) for item in arg):
+        return arg
+    return None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    不在调用线程格式化消息的 QueueHandler
+
+    标准 QueueHandler.prepare() 会在业务线程里执行 % 格式化；
+    这里只复制记录并固定参数的当前状态，把格式化留给 QueueListener 的后台线程。
+    参数中有其他可变对象时退回到在调用线程格式化
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        args = record.args
+        if not args:
+            return record
+
+        items = args.items() if isinstance(args, dict) else enumerate(args)
+        snapshot = {}
+        for key, arg in items:
+            fixed = _snapshot_arg(arg)
+            if fixed is None:
+                # 无法安全延迟：在调用线程格式化
+                record.msg = record.getMessage()
+                record.args = None
+                return record
+            snapshot[key] = fixed
+
+        record.args = snapshot if isinstance(args, dict) else tuple(snapshot.values())
+        return record
+
+
+def stop_logging(name: str = 'weekly_report') -> None:
+    """
+    停止队列模式的后台监听器，并把队列中剩余的日志写完
+
+    Args:
+        name: 日志记录器名称
+    """
+    listener = _queue_listeners.pop(name, None)
+    if listener is not None:
+        listener.stop()
+
+
+def _stop_all_listeners() -> None:
+    """进程退出时写完所有队列中的日志"""
+    for name in list(_queue_listeners):
+        stop_logging(name)
+
+
+atexit.register(_stop_all_listeners)
+
+
+def _attached_handlers(logger: logging.Logger):
+    """获取记录实际经过的handler（子记录器沿 propagate 向上找到的handler）"""
+    current = logger
+    while current is not None:
+        if current.handlers:
+            return list(current.handlers)
+        if not current.propagate:
+            break
+        current = current.parent
+    return []
+
+
 def setup_logging(
     name: str = 'weekly_report',
     level: str = 'INFO',
     log_file: Optional[str] = None,
     max_bytes: int = 10485760,  # 10MB
     backup_count: int = 5,
-    console_colors: bool = True
+    console_colors: bool = True,
+    use_queue: bool = False,
+    max_payload_chars: int = DEFAULT_MAX_PAYLOAD_CHARS
 ) -> logging.Logger:
     """
     配置日志系统
@@ -36,15 +198,21 @@ def setup_logging(
         max_bytes: 单个日志文件最大字节数
         backup_count: 保留的日志文件备份数量
         console_colors: 是否在控制台使用彩色输出
+        use_queue: 是否启用队列模式（后台线程负责格式化和写盘）
+        max_payload_chars: truncate_payload 的默认长度上限
 
     Returns:
         logging.Logger: 配置好的日志记录器
     """
+    global _max_payload_chars
+    _max_payload_chars = max_payload_chars
+
     # 创建日志记录器
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
-    # 避免重复添加handler
+    # 避免重复添加handler（同时停掉旧的后台监听器）
+    stop_logging(name)
     if logger.handlers:
         logger.handlers.clear()
 
@@ -75,7 +243,7 @@ def setup_logging(
         console_formatter = logging.Formatter(log_format, datefmt=date_format)
 
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # 文件处理器（如果指定）
     if log_file:
@@ -97,7 +265,18 @@ def setup_logging(
             datefmt=date_format
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if use_queue:
+        # 业务线程只入队，后台线程负责格式化与写盘
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(_DeferredQueueHandler(log_queue))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queue_listeners[name] = listener
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
 
     return logger
 
@@ -112,42 +291,59 @@ def get_logger(name: str = 'weekly_report') -> logging.Logger:
     Returns:
         logging.Logger: 日志记录器实例
     """
+    # 模块记录器挂在主记录器下，日志经主记录器的handler输出（队列模式下同样只入队）
+    if name != ROOT_LOGGER_NAME and not name.startswith(f"{ROOT_LOGGER_NAME}."):
+        name = f"{ROOT_LOGGER_NAME}.{name}"
     logger = logging.getLogger(name)
 
-    # 如果记录器还没有handler，使用默认配置
-    if not logger.handlers:
-        return setup_logging(name)
+    # 如果主记录器还没有handler，使用默认配置
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    if not root_logger.handlers:
+        setup_logging(ROOT_LOGGER_NAME)
 
     return logger
 
 
+class _ContextFilter(logging.Filter):
+    """在调用线程里给日志记录加上下文前缀（每条记录只加一次）"""
+
+    def __init__(self, context: str):
+        super().__init__()
+        self.context = context
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        applied = getattr(record, 'log_contexts', ())
+        if self not in applied:
+            record.msg = f"[{self.context}] {record.msg}"
+            record.log_contexts = applied + (self,)
+        return True
+
+
 class LoggerContext:
     """
     日志上下文管理器
 
-    用于在特定操作中添加上下文信息到日志中
+    用于在特定操作中添加上下文信息到日志中。
+    前缀写在日志记录上（不修改formatter），队列模式下后台线程格式化时不受影响
     """
 
     def __init__(self, logger: logging.Logger, context: str):
         self.logger = logger
         self.context = context
-        self.original_handlers = None
+        self._filter = _ContextFilter(context)
+        self._handlers = []
 
     def __enter__(self):
-        # 添加上下文前缀到日志格式
-        for handler in self.logger.handlers:
-            if isinstance(handler.formatter, logging.Formatter):
-                old_format = handler.formatter._fmt
-                handler.formatter._fmt = f"[{self.context}] {old_format}"
+        # 挂在记录入口的handler上（队列模式下为 QueueHandler，在业务线程执行）
+        self._handlers = _attached_handlers(self.logger)
+        for handler in self._handlers:
+            handler.addFilter(self._filter)
         return self.logger
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        # 恢复原日志格式
-        for handler in self.logger.handlers:
-            if isinstance(handler.formatter, logging.Formatter):
-                formatter = handler.formatter
-                if formatter._fmt.startswith(f"[{self.context}] "):
-                    formatter._fmt = formatter._fmt[len(f"[{self.context}] "):]
+        for handler in self._handlers:
+            handler.removeFilter(self._filter)
+        self._handlers = []
 
 
 def log_execution_summary(logger: logging.Logger, stats: dict):
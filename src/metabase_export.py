@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Metabase 流式导出模块
+
+/api/dataset 一次最多返回 2000 行，各部分SQL末尾还有 LIMIT 10000，
+渠道×周、SKU×国家这类明细一旦变大就会被静默截断。
+结果行数达到上限时，改用 /api/dataset/csv 导出接口重新执行（去掉末尾 LIMIT），
+按块读取响应、逐行解析CSV，不把整个响应体读入内存
+"""
+
+import codecs
+import csv
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# SQL 末尾的 LIMIT n（允许其后跟分号和空白）
+TRAILING_LIMIT_PATTERN = re.compile(r'\bLIMIT\s+(\d+)\s*;?\s*$', re.IGNORECASE)
+
+# /api/dataset 单次返回行数上限（Metabase 默认 2000）
+DEFAULT_API_ROW_CAP = 2000
+
+# Metabase base_type -> 导出CSV单元格的转换函数
+INTEGER_TYPES = ('type/Integer', 'type/BigInteger')
+FLOAT_TYPES = ('type/Float', 'type/Decimal', 'type/Number')
+
+
+def query_row_limit(sql: str) -> Optional[int]:
+    """
+    取SQL末尾的 LIMIT 行数
+
+    Args:
+        sql: SQL查询字符串
+
+    Returns:
+        int: LIMIT 行数，没有末尾 LIMIT 时为 None
+    """
+    match = TRAILING_LIMIT_PATTERN.search(sql.rstrip())
+    return int(match.group(1)) if match else None
+
+
+def is_ceiling_limit(sql: str, api_row_cap: int = DEFAULT_API_ROW_CAP) -> bool:
+    """
+    判断SQL末尾的 LIMIT 是否为兜底上限（而非取前N行的业务口径）
+
+    不小于接口上限的 LIMIT（如 10000）只是防止结果过大的兜底；
+    小于接口上限的 LIMIT（如历史SQL的 LIMIT 25）是取最近N周的口径，不能去掉
+
+    Args:
+        sql: SQL查询字符串
+        api_row_cap: /api/dataset 单次返回行数上限
+
+    Returns:
+        bool: 是兜底上限时为 True
+    """
+    limit = query_row_limit(sql)
+    return limit is not None and limit >= api_row_cap
+
+
+def lift_limit(sql: str, api_row_cap: int = DEFAULT_API_ROW_CAP) -> str:
+    """
+    去掉SQL末尾作为兜底上限的 LIMIT（业务口径的 LIMIT 保留）
+
+    Args:
+        sql: SQL查询字符串
+        api_row_cap: /api/dataset 单次返回行数上限
+
+    Returns:
+        str: 用于流式导出的SQL
+    """
+    if not is_ceiling_limit(sql, api_row_cap):
+        return sql
+    return TRAILING_LIMIT_PATTERN.sub('', sql.rstrip()).rstrip()
+
+
+def is_truncated(sql: str, row_count: int, rows_truncated=None, api_row_cap: int = DEFAULT_API_ROW_CAP) -> bool:
+    """
+    判断查询结果是否可能被截断
+
+    Args:
+        sql: 执行的SQL
+        row_count: 返回的行数
+        rows_truncated: 响应 data.rows_truncated 字段（Metabase 截断时给出）
+        api_row_cap: /api/dataset 单次返回行数上限
+
+    Returns:
+        bool: 响应标记了截断、或行数达到接口上限时为 True（兜底 LIMIT 都不小于接口上限）
+    """
+    if rows_truncated:
+        return True
+    limit = query_row_limit(sql)
+    if limit is not None and limit < api_row_cap:
+        # 取前N行的 LIMIT：行数等于 N 是口径本身，不是截断
+        return False
+    return row_count >= api_row_cap
+
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = 'utf-8-sig') -> Iterator[str]:
+    """
+    把字节块流解码为文本行（保留换行符，跨块的多字节字符和半行正确拼接）
+
+    Args:
+        chunks: 响应字节块（如 response.iter_content()）
+        encoding: 编码，默认去掉 UTF-8 BOM
+
+    Yields:
+        str: 一行文本
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _cell_converter(base_type: Optional[str]):
+    """按列类型返回单元格转换函数（空字符串视为 NULL）"""
+    if base_type in INTEGER_TYPES:
+        cast = int
+    elif base_type in FLOAT_TYPES:
+        cast = float
+    elif base_type == 'type/Boolean':
+        def cast(value):
+            return value.lower() == 'true'
+    else:
+        return lambda value: value
+
+    def convert(value):
+        if value == '':
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            return value
+    return convert
+
+
+def iter_csv_rows(lines: Iterable[str], cols: List[Dict] = None) -> Iterator[Dict]:
+    """
+    逐行解析导出CSV为字典行
+
+    CSV 中所有值都是字符串，按 /api/dataset 响应里的列类型（cols 的 base_type）还原为数值，
+    与非导出查询返回的类型一致；没有列信息时保留字符串
+
+    Args:
+        lines: 文本行（含表头）
+        cols: /api/dataset 响应的列信息
+
+    Yields:
+        dict: 数据行
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    types = {col.get('name'): col.get('base_type') for col in (cols or [])}
+    converters = [_cell_converter(types.get(name)) for name in header]
+    for values in reader:
+        if not values:
+            continue
+        yield {name: convert(value) for name, convert, value in zip(header, converters, values)}
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试Metabase流式导出模块\n")
+
+    sql = "SELECT 渠道, 周 FROM t ORDER BY 周 LIMIT 10000"
+    print(f"LIMIT: {query_row_limit(sql)}  截断: {is_truncated(sql, 2000)}")
+    print(f"去掉LIMIT: {lift_limit(sql)}")
+    print(f"LIMIT 25 截断: {is_truncated('SELECT 1 LIMIT 25', 25)}")
+
+    body = '\ufeff渠道,新访客数\npaid ads,120\n"organic, seo",\n'.encode('utf-8')
+    chunks = [body[i:i + 5] for i in range(0, len(body), 5)]
+    for row in iter_csv_rows(iter_text_lines(chunks), [{'name': '新访客数', 'base_type': 'type/BigInteger'}]):
+        print(row)
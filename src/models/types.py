@@ -22,3 +22,22 @@ class ColumnMappings(TypedDict):
     revenue: dict
     engagement: dict
     retention: dict
+
+
+class SectionSpec(TypedDict, total=False):
+    """报告部分定义（config.yaml 的 sections 注册表）"""
+    name: str
+    title: str
+    sql: str
+    analyzer: str
+    summary: bool
+    template: str
+    date_column: str
+    week_lag: int
+    grain: str
+    history_weeks: int
+    rollup: dict
+    chart: dict
+    parent: str
+    source: str
+    enabled: bool
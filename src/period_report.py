@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+月报/季报数据模块
+
+月报、季报不单独编写SQL：每次周报取数时，流量、激活的日粒度结果和活跃、留存、
+收入的周粒度结果都已归档为快照。本模块合并这些快照作为本地缓存，
+再用 src.rollup 汇总到月/季度（计数和收入求和，比率由分子/分母重新计算，WAU 取周均值）
+
+只有缓存缺少本期或上期的某些日期时才访问数仓，且只查询有缺口的部分；
+SQL 以 CURRENT_DATE 为基准返回最近 history_weeks 个完整周（默认12，激活为8），
+因此只能补齐各部分自身窗口内的缺口，更早的缺口只记录警告
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from src.logger import get_logger
+from src.rollup import DEFAULT_ROLLUPS, rollup_section
+from src.run_metrics import get_run_metrics
+
+# SQL 默认返回的历史周数（DATE_TRUNC('week', CURRENT_DATE()) 往前12周），部分可用 history_weeks 覆盖
+LIVE_WINDOW_WEEKS = 12
+
+
+def _dates(start: str, end: str) -> List[str]:
+    """start ~ end（含）之间的每一天"""
+    day = datetime.strptime(start, '%Y%m%d')
+    last = datetime.strptime(end, '%Y%m%d')
+    result = []
+    while day <= last:
+        result.append(day.strftime('%Y%m%d'))
+        day += timedelta(days=1)
+    return result
+
+
+def required_dates(spec: Dict, start: str, end: str) -> List[str]:
+    """
+    汇总 start ~ end 需要的数据日期
+
+    日粒度部分需要每一天；周粒度部分需要周四落在区间内的每个周一
+    （与 src.rollup 中周归属月份/季度的规则一致）
+
+    Args:
+        spec: 部分定义
+        start: 起始日期 YYYYMMDD
+        end: 结束日期 YYYYMMDD
+
+    Returns:
+        list: 需要的日期（YYYYMMDD）
+    """
+    days = _dates(start, end)
+    if spec.get('grain') == 'day':
+        return days
+    mondays = []
+    for day in days:
+        date = datetime.strptime(day, '%Y%m%d')
+        if date.weekday() == 3:
+            mondays.append((date - timedelta(days=3)).strftime('%Y%m%d'))
+    return mondays
+
+
+def missing_dates(rows: List[Dict], spec: Dict, start: str, end: str) -> List[str]:
+    """
+    本地缓存中缺少的数据日期
+
+    Args:
+        rows: 缓存的数据行
+        spec: 部分定义
+        start: 起始日期 YYYYMMDD
+        end: 结束日期 YYYYMMDD
+
+    Returns:
+        list: 缺少的日期（YYYYMMDD）
+    """
+    date_col = spec.get('date_column', '日期')
+    cached = {str(row.get(date_col)) for row in rows or []}
+    return [day for day in required_dates(spec, start, end) if day not in cached]
+
+
+def live_window(today: str = None, weeks: int = LIVE_WINDOW_WEEKS) -> Tuple[str, str]:
+    """
+    数仓查询能返回的日期范围（最近 weeks 个完整周）
+
+    Args:
+        today: 当前日期 YYYYMMDD（默认今天）
+        weeks: SQL 返回的历史周数（部分定义的 history_weeks）
+
+    Returns:
+        tuple: (起始日期, 结束日期)
+    """
+    date = datetime.strptime(today, '%Y%m%d') if today else datetime.now()
+    monday = date - timedelta(days=date.weekday())
+    start = monday - timedelta(weeks=weeks)
+    end = monday - timedelta(days=1)
+    return start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+
+
+def merge_rows(cached: List[Dict], fresh: List[Dict], date_column: str = '日期') -> List[Dict]:
+    """
+    用新查询的结果覆盖缓存中相同日期的行
+
+    Args:
+        cached: 缓存的数据行
+        fresh: 新查询的数据行
+        date_column: 日期列
+
+    Returns:
+        list: 按日期升序合并后的数据行
+    """
+    by_date: Dict[str, List[Dict]] = {}
+    for row in cached or []:
+        by_date.setdefault(str(row.get(date_column)), []).append(row)
+    fresh_dates: Dict[str, List[Dict]] = {}
+    for row in fresh or []:
+        fresh_dates.setdefault(str(row.get(date_column)), []).append(row)
+    by_date.update(fresh_dates)
+    return [row for date in sorted(by_date) for row in by_date[date]]
+
+
+def rollup_period(spec: Dict, rows: List[Dict], period: str) -> List[Dict]:
+    """
+    把一个部分的日/周粒度数据汇总到月或季度
+
+    Args:
+        spec: 部分定义（rollup 为自定义汇总规则，默认 DEFAULT_ROLLUPS）
+        rows: 日/周粒度数据行
+        period: month / quarter
+
+    Returns:
+        list: 以周期起始日为日期的数据行；部分未声明汇总规则时返回空列表
+    """
+    rule = spec.get('rollup') or DEFAULT_ROLLUPS.get(spec['name'])
+    if not rule:
+        return []
+    rule = {'date_key': spec.get('date_column', '日期'), **rule}
+    row_grain = 'day' if spec.get('grain') == 'day' else 'week'
+    return rollup_section(spec['name'], rows, period, rule, row_grain=row_grain)
+
+
+def load_period_data(
+    sections: List[Dict],
+    period_config: Dict,
+    snapshot_dir: str,
+    fetcher=None,
+    base_path: str = None,
+    today: str = None,
+    schema: Dict = None,
+    logger=None
+) -> Dict[str, List[Dict]]:
+    """
+    从本地快照构建月报/季报数据，只为缓存中缺失的日期查询数仓
+
+    Args:
+        sections: 部分注册表
+        period_config: calculate_period_params 的结果
+        snapshot_dir: 快照归档目录
+        fetcher: DataFetcher（为 None 时只使用缓存）
+        base_path: 项目根目录
+        today: 当前日期 YYYYMMDD（默认今天，用于判断数仓可查询的窗口）
+        schema: 各部分列类型（src.schema.build_schema），旧快照中的字符串值在汇总前转换
+        logger: 日志记录器
+
+    Returns:
+        dict: {部分名称: 按周期汇总的数据行}（包含本期和上期）
+    """
+    from src.date_utils import calculate_week_params
+    from src.schema import apply_schema
+    from src.snapshot import load_section_history
+
+    logger = logger or get_logger('period_report')
+    period = period_config['period']
+    start = period_config['previous_period_start']
+    end = period_config['period_end']
+
+    # 1. 合并本地快照，统计每个部分缺少的日期
+    history = {}
+    missing = {}
+    for spec in sections:
+        name = spec['name']
+        history[name] = load_section_history(snapshot_dir, name, spec.get('date_column', '日期'), logger=logger)
+        apply_schema(history[name], (schema or {}).get(name, {}), logger=logger)
+        missing[name] = missing_dates(history[name], spec, start, end)
+
+    # 2. 只查询缺口落在该部分自身数仓窗口内的部分（查询结果由 DataFetcher 自动归档，下次直接命中缓存）
+    windows = {spec['name']: live_window(today, spec.get('history_weeks') or LIVE_WINDOW_WEEKS)
+               for spec in sections}
+    to_fetch = [name for name, days in missing.items()
+                if any(windows[name][0] <= day <= windows[name][1] for day in days)]
+    cached_count = len(sections) - len(to_fetch)
+    logger.info(f"{period_config['period_label']}: {cached_count} 个部分完全来自缓存，{len(to_fetch)} 个部分需要查询")
+
+    # 缓存命中率：每个部分计一次，快照历史覆盖全部所需日期为命中，有缺口为未命中（无论能否补查）
+    metrics = get_run_metrics()
+    for spec in sections:
+        metrics.record_cache(not missing[spec['name']], section=spec['name'])
+
+    if to_fetch and fetcher is not None:
+        logger.info(f"查询缓存缺失的部分: {', '.join(to_fetch)}")
+        fresh = fetcher.fetch_all_sections(calculate_week_params(target_date=today), base_path=base_path,
+                                           sections=to_fetch)
+        for spec in sections:
+            name = spec['name']
+            if fresh.get(name):
+                history[name] = merge_rows(history[name], fresh[name], spec.get('date_column', '日期'))
+                missing[name] = missing_dates(history[name], spec, start, end)
+
+    for spec in sections:
+        days = missing[spec['name']]
+        if days:
+            weeks = spec.get('history_weeks') or LIVE_WINDOW_WEEKS
+            logger.warning(f"⚠️ {spec['name']} 缺少 {len(days)} 个日期的数据（{days[0]} ~ {days[-1]}），"
+                           f"超出数仓{weeks}周窗口的部分无法补齐，按已有数据汇总")
+
+    # 3. 汇总到月/季度
+    results = {}
+    for spec in sections:
+        results[spec['name']] = rollup_period(spec, history[spec['name']], period)
+        if history[spec['name']] and not results[spec['name']]:
+            logger.warning(f"⚠️ {spec['name']} 未声明汇总规则（rollup），月报/季报中跳过")
+    return results
+
+
+if __name__ == "__main__":
+    # 测试代码：用本地归档构建上个月的月报数据（不访问数仓）
+    from src.core.sections import load_sections
+    from src.date_utils import calculate_period_params
+
+    print("测试月报/季报数据模块\n")
+
+    params = calculate_period_params('month', '20260101')
+    print(f"周期: {params['period_label']} ({params['period_start']} ~ {params['period_end']})")
+    data = load_period_data(load_sections(), params, 'output/archive')
+    for section_name, section_rows in data.items():
+        print(f"{section_name}: {section_rows[-2:]}")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+多页面发布模块
+
+一次获取与分析的结果扇出到多个Confluence页面：各部分只渲染一次，
+每个目标按自己的部分子集和基础模板组装后并发发布（页面正文为storage格式），
+Markdown报告和附件同时保存到本地
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+
+from src.logger import get_logger
+
+
+def build_target_reports(generator, params: Dict, blocks: Dict[str, str], targets: List[Dict]) -> Dict[str, str]:
+    """
+    为每个发布目标组装HTML
+
+    Args:
+        generator: src.report_generator.ReportGenerator 实例
+        params: 日期参数
+        blocks: generator.render_section_blocks 的结果
+        targets: 发布目标列表（ConfigManager.get_publish_targets）
+
+    Returns:
+        dict: {目标名称: HTML}
+    """
+    return {
+        target['name']: generator.assemble_report_html(
+            params,
+            blocks,
+            sections=target.get('sections'),
+            base_template=target.get('template', 'base.html')
+        )
+        for target in targets
+    }
+
+
+def _target_attachments(target: Dict, attachments: Dict[str, Dict]) -> Dict[str, Dict]:
+    """筛选发布目标包含的部分对应的附件"""
+    sections = target.get('sections')
+    return {
+        filename: info
+        for filename, info in (attachments or {}).items()
+        if not sections or info.get('section') in sections
+    }
+
+
+def publish_targets(
+    targets: List[Dict],
+    reports: Dict[str, str],
+    config: Dict,
+    version_message: str = None,
+    force: bool = False,
+    save_file: bool = False,
+    report_date: str = None,
+    max_workers: int = 4,
+    attachments: Dict[str, Dict] = None,
+    logger=None
+) -> Dict[str, Dict]:
+    """
+    并发发布到多个页面（或保存到本地文件）
+
+    Args:
+        targets: 发布目标列表
+        reports: {目标名称: HTML}
+        config: 配置字典
+        version_message: 版本更新消息
+        force: 是否强制完整发布
+        save_file: 是否只保存到本地文件
+        report_date: 报告日期（保存文件时用于文件名）
+        max_workers: 最大并发数
+        attachments: 附件 {文件名: {'section', 'content', 'content_type'}}，
+            每个目标只上传自己包含的部分对应的附件
+        logger: 日志记录器
+
+    Returns:
+        dict: {目标名称: {'success': bool, 'page_id': ..., 'location': 页面地址或文件路径}}
+    """
+    from src.confluence_updater import ConfluenceUpdater
+    from src.report_generator import html_to_storage
+
+    logger = logger or get_logger('publisher')
+
+    def _publish(target):
+        updater = ConfluenceUpdater(config, logger, page_id=target['page_id'])
+        html = reports[target['name']]
+        files = _target_attachments(target, attachments)
+        storage = html_to_storage(html)
+        if save_file:
+            path = updater.save_html_to_file(html, report_date, name=target['name'])
+            updater.save_html_to_file(storage, report_date, name=target['name'], extension='storage.html')
+            return {'success': bool(path), 'page_id': target['page_id'], 'location': path}
+        # 先上传附件，页面正文中的 ri:attachment 引用发布后即可解析
+        uploaded = updater.upload_attachments(files)
+        if not all(uploaded.values()):
+            logger.warning(f"⚠️ 目标 {target['name']} 有附件上传失败，页面中的对应链接将不可用")
+        success = updater.update_page(new_content=storage, version_message=version_message, force=force)
+        return {'success': success, 'page_id': target['page_id'], 'location': updater.get_page_url()}
+
+    results = {}
+    if len(targets) == 1:
+        # 单个目标无需线程池
+        results[targets[0]['name']] = _publish(targets[0])
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as executor:
+        futures = {executor.submit(_publish, target): target for target in targets}
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                results[target['name']] = future.result()
+            except Exception as e:
+                logger.error(f"❌ 发布目标 {target['name']} 失败: {e}")
+                results[target['name']] = {'success': False, 'page_id': target['page_id'], 'location': ''}
+
+    return results
+
+
+def save_report_artifacts(
+    markdown: str,
+    attachments: Dict[str, Dict],
+    config: Dict,
+    report_date: str = None,
+    output_dir: str = 'output',
+    logger=None
+) -> Dict[str, object]:
+    """
+    保存Markdown报告和附件（Markdown中的图片和明细链接指向 attachments/ 目录）
+
+    Args:
+        markdown: Markdown报告
+        attachments: 附件 {文件名: {'content', ...}}
+        config: 配置字典
+        report_date: 报告日期（用于文件名）
+        output_dir: 输出目录
+        logger: 日志记录器
+
+    Returns:
+        dict: {'markdown': 文件路径, 'attachments': [文件路径]}
+    """
+    from datetime import datetime
+    from src.confluence_updater import ConfluenceUpdater
+
+    logger = logger or get_logger('publisher')
+    result = {'markdown': '', 'attachments': []}
+
+    try:
+        directory = Path(output_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"weekly_report_{report_date or datetime.now().strftime('%Y%m%d')}.md"
+        path.write_text(markdown, encoding='utf-8')
+        result['markdown'] = str(path)
+        logger.info(f"✅ Markdown已保存到: {path.name}")
+    except OSError as e:
+        logger.error(f"❌ 保存Markdown失败: {e}")
+
+    if attachments:
+        updater = ConfluenceUpdater(config, logger)
+        result['attachments'] = updater.save_attachments_to_dir(attachments, str(Path(output_dir) / 'attachments'))
+    return result
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试多页面发布模块\n")
+
+    from src.core.config import ConfigManager
+
+    for target in ConfigManager().get_publish_targets():
+        print(f"{target['name']}: page_id={target['page_id']}, sections={target['sections'] or '全部'}, "
+              f"template={target['template']}")
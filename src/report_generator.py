@@ -2,20 +2,48 @@
 """
 报告生成模块（Jinja2模板版）
 
-生成Confluence兼容的HTML报告和Markdown报告
+分析结果先构建为报告模型（各部分的模板上下文），
+再由同一份模型输出HTML、Markdown和Confluence storage格式
 """
 
+import re
 from typing import Dict, List, Optional
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
+from src.core.sections import child_sections, load_sections, top_level_sections
 from src.logger import get_logger
+from src.section_blocks import wrap_section
+from src.template_engine import get_template_env
+
+
+# 注册表之后固定追加的汇总部分（来自分析结果，无对应SQL）
+SUMMARY_SECTIONS = ('insights', 'suggestions')
+
+_BODY_PATTERN = re.compile(r'<body[^>]*>(?P<body>.*)</body>', re.DOTALL | re.IGNORECASE)
+
+
+def html_to_storage(html: str) -> str:
+    """
+    把完整HTML文档转换为Confluence storage格式正文
+
+    storage 格式只接受正文片段：去掉 DOCTYPE、head 和 style，只保留 body 内容
+
+    Args:
+        html: 完整HTML（或已是正文片段）
+
+    Returns:
+        str: 页面正文
+    """
+    match = _BODY_PATTERN.search(html or '')
+    return match.group('body').strip() if match else (html or '')
 
 
 class ReportGenerator:
     """报告生成器（使用Jinja2模板）"""
 
-    def __init__(self, logger=None, template_dir: Optional[str] = None):
+    def __init__(self, logger=None, template_dir: Optional[str] = None, sections: Optional[List[Dict]] = None):
         self.logger = logger or get_logger('report_generator')
+        # 部分注册表（默认内置五个部分），决定报告包含哪些部分及其顺序
+        self.sections = sections if sections is not None else load_sections()
 
         # 设置模板目录
         if template_dir is None:
@@ -23,13 +51,13 @@ class ReportGenerator:
             template_dir = base_dir / 'templates' / 'confluence'
 
         template_dir = Path(template_dir)
+        self.template_dir = template_dir
         self.logger.info(f"模板目录: {template_dir}")
 
-        # 加载Jinja2环境
-        self.jinja_env = Environment(
-            loader=FileSystemLoader(str(template_dir)),
-            autoescape=False
-        )
+        # 共享Jinja2环境（进程内复用，按配置启用字节码缓存）
+        self.jinja_env = get_template_env(template_dir)
+        # Markdown 模板去掉块标签产生的空行，避免表格被拆断
+        self.markdown_env = get_template_env(template_dir, trim_blocks=True, lstrip_blocks=True)
 
         # 缓存模板
         self._templates = {}
@@ -37,7 +65,8 @@ class ReportGenerator:
     def _get_template(self, template_name: str):
         """获取模板（带缓存）"""
         if template_name not in self._templates:
-            self._templates[template_name] = self.jinja_env.get_template(template_name)
+            env = self.markdown_env if template_name.endswith('.md') else self.jinja_env
+            self._templates[template_name] = env.get_template(template_name)
             self.logger.debug(f"加载模板: {template_name}")
         return self._templates[template_name]
 
@@ -65,6 +94,267 @@ class ReportGenerator:
             return '0'
         return f"{int(value):,}" if format_int else f"{value:,.2f}"
 
+    # ==================== 报告模型（各部分模板上下文） ====================
+
+    def _traffic_context(self, analysis: Dict) -> Dict:
+        """流量部分上下文"""
+        visitors_wow = analysis.get('visitors_wow', {}).get('change_rate', 0)
+        registrations_wow = analysis.get('registrations_wow', {}).get('change_rate', 0)
+        conversion_wow = analysis.get('conversion_rate_wow', {}).get('change_rate', 0)
+
+        return {
+            'ai_summary': analysis.get('ai_summary', ''),
+            'total_visitors': self._format_number(analysis.get('new_visitors_current', 0)),
+            'total_registrations': self._format_number(analysis.get('registrations_current', 0)),
+            'conversion_rate': f"{analysis.get('conversion_rate_current', 0):.2f}",
+            'visitors_trend_class': self._get_trend_class(visitors_wow),
+            'visitors_change_str': self._format_change(visitors_wow, '%'),
+            'registrations_trend_class': self._get_trend_class(registrations_wow),
+            'registrations_change_str': self._format_change(registrations_wow, '%'),
+            'conversion_trend_class': self._get_trend_class(conversion_wow),
+            'conversion_change_str': self._format_change(conversion_wow, '%'),
+            'attention_items': analysis.get('attention_items', [])
+        }
+
+    def _activation_context(self, analysis: Dict) -> Dict:
+        """激活部分上下文"""
+        step_names = ['注册→进工具', '进工具→画户型', '画户型→拖模型', '拖模型→渲染']
+        funnel_steps = [
+            {
+                'name': name,
+                'previous_rate': analysis.get(f'step{i}_previous_rate', 0),
+                'current_rate': analysis.get(f'step{i}_current_rate', 0),
+                'trend_class': self._get_trend_class(analysis.get(f'step{i}_change_rate', 0)),
+                'change_str': self._format_change(analysis.get(f'step{i}_change_rate', 0), '%')
+            }
+            for i, name in enumerate(step_names, start=1)
+        ]
+
+        return {
+            'ai_summary': analysis.get('ai_summary', ''),
+            'previous_week_label': analysis.get('previous_week_label', '上上周'),
+            'current_week_label': analysis.get('current_week_label', '上周'),
+            'funnel_steps': funnel_steps,
+            # 使用 step4 作为总体转化率，替代不存在的 overall_* 字段
+            'overall_previous_rate': analysis.get('step4_previous_rate', 0),
+            'overall_current_rate': analysis.get('step4_current_rate', 0),
+            'overall_trend_class': self._get_trend_class(analysis.get('step4_change_rate', 0)),
+            'overall_change_str': self._format_change(analysis.get('step4_change_rate', 0), '%'),
+            'is_current_week_incomplete': analysis.get('is_current_week_incomplete', False),
+            'current_week_metrics': analysis.get('current_week_metrics', []),
+            'core_insights': analysis.get('core_insights', []),
+            'historical_trends': analysis.get('historical_trends', [])
+        }
+
+    def _engagement_context(self, analysis: Dict) -> Dict:
+        """活跃部分上下文"""
+        wau_wow = analysis.get('wau_wow', {}).get('change_rate', 0)
+
+        return {
+            'ai_summary': analysis.get('ai_summary', ''),
+            'wau': self._format_number(analysis.get('wau_current', 0)),
+            'wau_trend_class': self._get_trend_class(wau_wow),
+            'wau_change_str': self._format_change(wau_wow, '%') if 'wau_wow' in analysis else '→',
+            'wau_contribution': analysis.get('wau_contribution', '新老用户共同贡献'),
+            'new_user_wau': analysis.get('new_user_wau', 0),
+            'new_user_wau_trend_class': self._get_trend_class(analysis.get('new_user_wau_wow', 0)),
+            'new_user_wau_change_str': self._format_change(analysis.get('new_user_wau_wow', 0), '%'),
+            'old_user_wau': analysis.get('old_user_wau', 0),
+            'old_user_wau_trend_class': self._get_trend_class(analysis.get('old_user_wau_wow', 0)),
+            'old_user_wau_change_str': self._format_change(analysis.get('old_user_wau_wow', 0), '%'),
+            'historical_weeks': analysis.get('historical_weeks', 25),
+            'historical_avg_wau': analysis.get('historical_avg_wau', 0),
+            'historical_trends': analysis.get('historical_trends', []),
+            'attention_items': analysis.get('attention_items', [])
+        }
+
+    def _retention_context(self, analysis: Dict) -> Dict:
+        """留存部分上下文"""
+        return {
+            'ai_summary': analysis.get('ai_summary', ''),
+            'new_user_retention_rate': analysis.get('new_user_retention_rate', 0),
+            'new_user_retention_previous': analysis.get('new_user_retention_previous', 0),
+            'new_user_retention_current': analysis.get('new_user_retention_current', 0),
+            'new_user_retention_min': analysis.get('new_user_retention_min', 0),
+            'new_user_retention_max': analysis.get('new_user_retention_max', 0),
+            'new_user_retention_level': analysis.get('new_user_retention_level', '中等'),
+            'new_user_retention_level_class': 'positive-trend' if analysis.get('new_user_retention_level') == '高' else 'negative-trend',
+            'old_user_retention_rate': analysis.get('old_user_retention_rate', 0),
+            'old_user_retention_previous': analysis.get('old_user_retention_previous', 0),
+            'old_user_retention_current': analysis.get('old_user_retention_current', 0),
+            'old_user_retention_min': analysis.get('old_user_retention_min', 0),
+            'old_user_retention_max': analysis.get('old_user_retention_max', 0),
+            'old_user_trend_class': self._get_trend_class(analysis.get('old_user_retention_change', 0)),
+            'old_user_trend_note': analysis.get('old_user_trend_note', '需要关注'),
+            'historical_new_user_avg': analysis.get('historical_new_user_avg', 0),
+            'historical_old_user_avg': analysis.get('historical_old_user_avg', 0),
+            'historical_trends': analysis.get('historical_trends', []),
+            'insights': analysis.get('insights', [])
+        }
+
+    def _revenue_context(self, analysis: Dict, md_content: Optional[str] = None) -> Dict:
+        """收入部分上下文"""
+        revenue_change = analysis.get('wow', {}).get('change_abs', 0)
+        revenue_growth = analysis.get('wow', {}).get('change_rate', 0)
+
+        return {
+            'total_revenue': self._format_number(analysis.get('total_current', 0)),
+            'previous_revenue': self._format_number(analysis.get('total_previous', 0)),
+            'revenue_change_abs': revenue_change,
+            'revenue_change_str': self._format_change(revenue_change, ''),
+            'revenue_trend_class': self._get_trend_class(revenue_change),
+            'revenue_growth_rate': revenue_growth,
+            'revenue_growth_trend_class': self._get_trend_class(revenue_growth),
+            'renewal_revenue': self._format_number(analysis.get('renewal_revenue', 0)),
+            'renewal_growth_rate': analysis.get('renewal_growth_rate', 0),
+            'new_signing_revenue': self._format_number(analysis.get('new_signing_revenue', 0)),
+            'new_signing_growth_rate': analysis.get('new_signing_growth_rate', 0),
+            'md_content': md_content,
+            'ai_summary': analysis.get('ai_summary', '数据暂未加载'),
+            'revenue_type': analysis.get('revenue_type', '-'),
+            'user_count': analysis.get('user_count', '-'),
+            'average_order_value': analysis.get('average_order_value', '-'),
+            'historical_weeks': analysis.get('historical_weeks', 12),
+            'historical_avg_revenue': analysis.get('historical_avg_revenue', 0),
+            'historical_trends': analysis.get('historical_trends', []),
+            'attention_items': analysis.get('attention_items', [])
+        }
+
+    @staticmethod
+    def _insights_context(analysis: Dict) -> Dict:
+        """洞察部分上下文"""
+        return {
+            'positive_insights': analysis.get('positive_insights', []),
+            'negative_insights': analysis.get('negative_insights', []),
+            'key_findings': analysis.get('key_findings', [])
+        }
+
+    @staticmethod
+    def _suggestions_context(analysis: Dict) -> Dict:
+        """建议部分上下文"""
+        return {
+            'short_term_suggestions': analysis.get('short_term_suggestions', []),
+            'medium_term_suggestions': analysis.get('medium_term_suggestions', []),
+            'long_term_suggestions': analysis.get('long_term_suggestions', [])
+        }
+
+    def _breakdown_context(self, spec: Dict, analysis: Dict, max_items: int = 5) -> Dict:
+        """子部分（收入拆分）上下文：收入最高的几项和主要变动项"""
+        def row(item: Dict) -> Dict:
+            return {
+                'name': item['name'],
+                'revenue': self._format_number(item['revenue']),
+                'share': item['share'],
+                'change_str': self._format_change(item['change_abs']),
+                'change_rate': item['change_rate'],
+                'trend_class': self._get_trend_class(item['change_abs'])
+            }
+
+        return {
+            'title': spec.get('title', spec['name']),
+            'summary': analysis.get('summary', ''),
+            'rows': [row(item) for item in analysis.get('items', [])[:max_items]],
+            'top_gainers': [row(item) for item in analysis.get('top_gainers', [])],
+            'top_decliners': [row(item) for item in analysis.get('top_decliners', [])]
+        }
+
+    def _generic_context(self, spec: Dict, analysis: Dict) -> Dict:
+        """未提供专用上下文的部分：列出分析结果中的标量指标"""
+        metrics = [
+            (key, self._format_number(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value)
+            for key, value in analysis.items()
+            if key not in ('ai_summary', 'summary', 'attention_items') and isinstance(value, (str, int, float))
+        ]
+        return {
+            'title': spec.get('title', spec['name']),
+            'ai_summary': analysis.get('ai_summary', ''),
+            'metrics': metrics,
+            'attention_items': analysis.get('attention_items', [])
+        }
+
+    def _section_template(self, spec: Dict) -> str:
+        """部分使用的模板名（sections/ 下没有对应模板时使用 generic）"""
+        template = spec.get('template') or spec['name']
+        if (self.template_dir / 'sections' / f'{template}.html').exists():
+            return template
+        return 'generic'
+
+    def build_report_model(
+        self,
+        params: Dict,
+        current_data: Dict,
+        analysis: Dict,
+        revenue_md_content: Optional[str] = None,
+        sections: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        从分析结果构建报告模型（只遍历一次分析结果，供各输出格式共用）
+
+        Args:
+            params: 日期参数
+            current_data: 本周所有数据
+            analysis: 所有分析结果
+            revenue_md_content: 收入MD文档内容
+            sections: 需要的部分（默认全部）
+
+        Returns:
+            dict: {'meta': 报告头尾信息, 'sections': {部分名称: {'has_data', 'context', 'template'}}}，按报告顺序排列
+        """
+        from datetime import datetime
+
+        # 内置部分的专用上下文；注册表中的其他部分（不论名称）都使用通用上下文
+        builders = {
+            'traffic': self._traffic_context,
+            'activation': self._activation_context,
+            'engagement': self._engagement_context,
+            'retention': self._retention_context,
+            'revenue': lambda section_analysis: self._revenue_context(section_analysis, revenue_md_content),
+        }
+
+        model_sections = {}
+        # 数据部分按注册表顺序，以是否获取到数据为准；子部分并入父部分的 breakdowns
+        for spec in top_level_sections(self.sections):
+            name = spec['name']
+            if sections is not None and name not in sections:
+                continue
+            section_analysis = analysis.get(name, {})
+            if name in builders:
+                context = builders[name](section_analysis)
+            else:
+                context = self._generic_context(spec, section_analysis)
+            context['breakdowns'] = [
+                self._breakdown_context(child, analysis[child['name']])
+                for child in child_sections(self.sections, name)
+                if analysis.get(child['name'], {}).get('items')
+            ]
+            model_sections[name] = {
+                'has_data': name in current_data,
+                'context': context,
+                'template': self._section_template(spec)
+            }
+
+        # 洞察与建议以是否有分析结果为准
+        for name in SUMMARY_SECTIONS:
+            if sections is not None and name not in sections:
+                continue
+            context = getattr(self, f'_{name}_context')(analysis.get(name, {}))
+            model_sections[name] = {'has_data': name in analysis, 'context': context, 'template': name}
+
+        return {
+            'meta': {
+                'report_date': params.get('report_date', datetime.now().strftime('%Y-%m-%d')),
+                'data_week': params.get('data_week', ''),
+                'data_end_date': params.get('data_end_date', ''),
+                'database_id': params.get('database_id', 2),
+                'execution_time': datetime.now().strftime('%Y-%m-%d %H:%M')
+            },
+            'sections': model_sections
+        }
+
+    def _render_section(self, template: str, context: Dict, fmt: str = 'html') -> str:
+        """用 sections/{template}.{fmt} 模板渲染一个部分"""
+        return self._get_template(f'sections/{template}.{fmt}').render(**context)
+
     # ==================== 各部分渲染方法 ====================
 
     def render_traffic_section(
@@ -75,35 +365,7 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染流量部分"""
-        self.logger.info("渲染流量部分...")
-
-        template = self._get_template('sections/traffic.html')
-
-        # 提取数据
-        total_visitors = analysis.get('new_visitors_current', 0)
-        total_registrations = analysis.get('registrations_current', 0)
-        conversion_rate = analysis.get('conversion_rate_current', 0)
-
-        # 环比数据
-        visitors_wow = analysis.get('visitors_wow', {}).get('change_rate', 0)
-        registrations_wow = analysis.get('registrations_wow', {}).get('change_rate', 0)
-        conversion_wow = analysis.get('conversion_rate_wow', {}).get('change_rate', 0)
-
-        # 渲染模板
-        html = template.render(
-            ai_summary=analysis.get('ai_summary', ''),
-            total_visitors=self._format_number(total_visitors),
-            total_registrations=self._format_number(total_registrations),
-            conversion_rate=f"{conversion_rate:.2f}",
-            visitors_trend_class=self._get_trend_class(visitors_wow),
-            visitors_change_str=self._format_change(visitors_wow, '%'),
-            registrations_trend_class=self._get_trend_class(registrations_wow),
-            registrations_change_str=self._format_change(registrations_wow, '%'),
-            conversion_trend_class=self._get_trend_class(conversion_wow),
-            conversion_change_str=f"{self._format_change(conversion_wow, '%')}",
-            attention_items=analysis.get('attention_items', [])
-        )
-
+        html = self._render_section('traffic', self._traffic_context(analysis))
         self.logger.info("✅ 流量部分渲染完成")
         return html
 
@@ -115,58 +377,7 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染激活部分"""
-        self.logger.info("渲染激活部分...")
-
-        template = self._get_template('sections/activation.html')
-
-        # 漏斗步骤
-        funnel_steps = [
-            {
-                'name': '注册→进工具',
-                'previous_rate': analysis.get('step1_previous_rate', 0),
-                'current_rate': analysis.get('step1_current_rate', 0),
-                'trend_class': self._get_trend_class(analysis.get('step1_change_rate', 0)),
-                'change_str': self._format_change(analysis.get('step1_change_rate', 0), '%')
-            },
-            {
-                'name': '进工具→画户型',
-                'previous_rate': analysis.get('step2_previous_rate', 0),
-                'current_rate': analysis.get('step2_current_rate', 0),
-                'trend_class': self._get_trend_class(analysis.get('step2_change_rate', 0)),
-                'change_str': self._format_change(analysis.get('step2_change_rate', 0), '%')
-            },
-            {
-                'name': '画户型→拖模型',
-                'previous_rate': analysis.get('step3_previous_rate', 0),
-                'current_rate': analysis.get('step3_current_rate', 0),
-                'trend_class': self._get_trend_class(analysis.get('step3_change_rate', 0)),
-                'change_str': self._format_change(analysis.get('step3_change_rate', 0), '%')
-            },
-            {
-                'name': '拖模型→渲染',
-                'previous_rate': analysis.get('step4_previous_rate', 0),
-                'current_rate': analysis.get('step4_current_rate', 0),
-                'trend_class': self._get_trend_class(analysis.get('step4_change_rate', 0)),
-                'change_str': self._format_change(analysis.get('step4_change_rate', 0), '%')
-            }
-        ]
-
-        # 渲染模板（使用analysis中的周标签）
-        html = template.render(
-            ai_summary=analysis.get('ai_summary', ''),
-            previous_week_label=analysis.get('previous_week_label', '上上周'),
-            current_week_label=analysis.get('current_week_label', '上周'),
-            funnel_steps=funnel_steps,
-            # 使用 step4 作为总体转化率，替代不存在的 overall_* 字段
-            overall_previous_rate=analysis.get('step4_previous_rate', 0),
-            overall_current_rate=analysis.get('step4_current_rate', 0),
-            overall_trend_class=self._get_trend_class(analysis.get('step4_change_rate', 0)),
-            overall_change_str=self._format_change(analysis.get('step4_change_rate', 0), '%'),
-            is_current_week_incomplete=False,
-            current_week_metrics=[],
-            core_insights=[]
-        )
-
+        html = self._render_section('activation', self._activation_context(analysis))
         self.logger.info("✅ 激活部分渲染完成")
         return html
 
@@ -178,32 +389,7 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染活跃部分"""
-        self.logger.info("渲染活跃部分...")
-
-        template = self._get_template('sections/engagement.html')
-
-        wau = analysis.get('wau_current', 0)
-        wau_wow = analysis.get('wau_wow', {}).get('change_rate', 0)
-
-        # 渲染模板
-        html = template.render(
-            ai_summary=analysis.get('ai_summary', ''),
-            wau=self._format_number(wau),
-            wau_trend_class=self._get_trend_class(wau_wow),
-            wau_change_str=self._format_change(wau_wow, '%') if 'wau_wow' in analysis else '→',
-            wau_contribution=analysis.get('wau_contribution', '新老用户共同贡献'),
-            new_user_wau=analysis.get('new_user_wau', 0),
-            new_user_wau_trend_class=self._get_trend_class(analysis.get('new_user_wau_wow', 0)),
-            new_user_wau_change_str=self._format_change(analysis.get('new_user_wau_wow', 0), '%'),
-            old_user_wau=analysis.get('old_user_wau', 0),
-            old_user_wau_trend_class=self._get_trend_class(analysis.get('old_user_wau_wow', 0)),
-            old_user_wau_change_str=self._format_change(analysis.get('old_user_wau_wow', 0), '%'),
-            historical_weeks=analysis.get('historical_weeks', 25),
-            historical_avg_wau=analysis.get('historical_avg_wau', 0),
-            historical_trends=analysis.get('historical_trends', []),
-            attention_items=analysis.get('attention_items', [])
-        )
-
+        html = self._render_section('engagement', self._engagement_context(analysis))
         self.logger.info("✅ 活跃部分渲染完成")
         return html
 
@@ -215,33 +401,7 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染留存部分"""
-        self.logger.info("渲染留存部分...")
-
-        template = self._get_template('sections/retention.html')
-
-        # 渲染模板
-        html = template.render(
-            ai_summary=analysis.get('ai_summary', ''),
-            new_user_retention_rate=analysis.get('new_user_retention_rate', 0),
-            new_user_retention_previous=analysis.get('new_user_retention_previous', 0),
-            new_user_retention_current=analysis.get('new_user_retention_current', 0),
-            new_user_retention_min=analysis.get('new_user_retention_min', 0),
-            new_user_retention_max=analysis.get('new_user_retention_max', 0),
-            new_user_retention_level=analysis.get('new_user_retention_level', '中等'),
-            new_user_retention_level_class='positive-trend' if analysis.get('new_user_retention_level') == '高' else 'negative-trend',
-            old_user_retention_rate=analysis.get('old_user_retention_rate', 0),
-            old_user_retention_previous=analysis.get('old_user_retention_previous', 0),
-            old_user_retention_current=analysis.get('old_user_retention_current', 0),
-            old_user_retention_min=analysis.get('old_user_retention_min', 0),
-            old_user_retention_max=analysis.get('old_user_retention_max', 0),
-            old_user_trend_class=self._get_trend_class(analysis.get('old_user_retention_change', 0)),
-            old_user_trend_note=analysis.get('old_user_trend_note', '需要关注'),
-            historical_new_user_avg=analysis.get('historical_new_user_avg', 0),
-            historical_old_user_avg=analysis.get('historical_old_user_avg', 0),
-            historical_trends=analysis.get('historical_trends', []),
-            insights=analysis.get('insights', [])
-        )
-
+        html = self._render_section('retention', self._retention_context(analysis))
         self.logger.info("✅ 留存部分渲染完成")
         return html
 
@@ -253,39 +413,7 @@ class ReportGenerator:
         md_content: Optional[str] = None
     ) -> str:
         """生成收入部分的HTML（兼容旧版）"""
-        self.logger.info("生成收入部分HTML...")
-
-        template = self._get_template('sections/revenue.html')
-
-        total_revenue = analysis.get('total_current', 0)
-        last_revenue = analysis.get('total_previous', 0)
-        revenue_change = analysis.get('wow', {}).get('change_abs', 0)
-        revenue_growth = analysis.get('wow', {}).get('change_rate', 0)
-
-        # 渲染模板
-        html = template.render(
-            total_revenue=self._format_number(total_revenue),
-            previous_revenue=self._format_number(last_revenue),
-            revenue_change_abs=revenue_change,
-            revenue_change_str=self._format_change(revenue_change, ''),
-            revenue_trend_class=self._get_trend_class(revenue_change),
-            revenue_growth_rate=revenue_growth,
-            revenue_growth_trend_class=self._get_trend_class(revenue_growth),
-            renewal_revenue=self._format_number(analysis.get('renewal_revenue', 0)),
-            renewal_growth_rate=analysis.get('renewal_growth_rate', 0),
-            new_signing_revenue=self._format_number(analysis.get('new_signing_revenue', 0)),
-            new_signing_growth_rate=analysis.get('new_signing_growth_rate', 0),
-            md_content=md_content,
-            ai_summary=analysis.get('ai_summary', '数据暂未加载'),
-            revenue_type=analysis.get('revenue_type', '-'),
-            user_count=analysis.get('user_count', '-'),
-            average_order_value=analysis.get('average_order_value', '-'),
-            historical_weeks=analysis.get('historical_weeks', 12),
-            historical_avg_revenue=analysis.get('historical_avg_revenue', 0),
-            historical_trends=analysis.get('historical_trends', []),
-            attention_items=analysis.get('attention_items', [])
-        )
-
+        html = self._render_section('revenue', self._revenue_context(analysis, md_content))
         self.logger.info("✅ 收入部分HTML生成完成")
         return html
 
@@ -295,16 +423,7 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染洞察部分"""
-        self.logger.info("渲染洞察部分...")
-
-        template = self._get_template('sections/insights.html')
-
-        html = template.render(
-            positive_insights=analysis.get('positive_insights', []),
-            negative_insights=analysis.get('negative_insights', []),
-            key_findings=analysis.get('key_findings', [])
-        )
-
+        html = self._render_section('insights', self._insights_context(analysis))
         self.logger.info("✅ 洞察部分渲染完成")
         return html
 
@@ -314,30 +433,65 @@ class ReportGenerator:
         analysis: Dict
     ) -> str:
         """渲染建议部分"""
-        self.logger.info("渲染建议部分...")
+        html = self._render_section('suggestions', self._suggestions_context(analysis))
+        self.logger.info("✅ 建议部分渲染完成")
+        return html
 
-        template = self._get_template('sections/suggestions.html')
+    # ==================== 输出格式 ====================
 
-        html = template.render(
-            short_term_suggestions=analysis.get('short_term_suggestions', []),
-            medium_term_suggestions=analysis.get('medium_term_suggestions', []),
-            long_term_suggestions=analysis.get('long_term_suggestions', [])
-        )
+    def render_model_blocks(self, model: Dict, sections: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        把报告模型渲染为各部分HTML（每个部分带起止标记，供Confluence差量发布使用）
 
-        self.logger.info("✅ 建议部分渲染完成")
-        return html
+        Args:
+            model: build_report_model 的结果
+            sections: 需要渲染的部分（默认全部）
 
+        Returns:
+            dict: {部分名称: HTML}，只包含有数据的部分
+        """
+        return {
+            name: wrap_section(name, self._render_section(section.get('template', name), section['context']))
+            for name, section in model['sections'].items()
+            if section['has_data'] and (sections is None or name in sections)
+        }
 
-    def generate_full_report_html(
+    def render_model_markdown(self, model: Dict, appendix: Optional[Dict[str, str]] = None) -> str:
+        """
+        把报告模型渲染为完整Markdown报告（与旧版一致，无数据的部分也保留标题）
+
+        Args:
+            model: build_report_model 的结果
+            appendix: {部分名称: 追加到该部分末尾的Markdown}（如趋势图、明细附件链接）
+
+        Returns:
+            str: Markdown报告
+        """
+        chunks = []
+        for name, section in model['sections'].items():
+            md = self._render_section(section.get('template', name), section['context'], fmt='md').strip('\n')
+            if appendix and appendix.get(name):
+                md = f"{md}\n\n{appendix[name]}"
+            # 建议与洞察同属「核心洞察与建议」一节
+            if name == 'suggestions' and 'insights' in model['sections']:
+                chunks[-1] = f"{chunks[-1]}\n\n{md}"
+            else:
+                chunks.append(md)
+        return self._get_template('report.md').render(sections=chunks, **model['meta'])
+
+    def render_section_blocks(
         self,
         params: Dict,
         current_data: Dict,
         previous_data: Dict,
         analysis: Dict,
-        revenue_md_content: Optional[str] = None
-    ) -> str:
+        revenue_md_content: Optional[str] = None,
+        sections: Optional[List[str]] = None
+    ) -> Dict[str, str]:
         """
-        生成完整HTML报告
+        渲染各部分HTML（每个部分带起止标记，供Confluence差量发布使用）
+
+        多个发布目标共用同一份渲染结果，每个部分只渲染一次
 
         Args:
             params: 日期参数
@@ -345,81 +499,110 @@ class ReportGenerator:
             previous_data: 上周所有数据
             analysis: 所有分析结果
             revenue_md_content: 收入MD文档内容
+            sections: 需要渲染的部分（默认全部）
 
         Returns:
-            str: 完整的HTML报告
+            dict: {部分名称: HTML}，按报告顺序排列
         """
-        self.logger.info("生成完整HTML报告...")
+        model = self.build_report_model(params, current_data, analysis, revenue_md_content, sections)
+        return self.render_model_blocks(model)
+
+    def assemble_report_html(
+        self,
+        params: Dict,
+        blocks: Dict[str, str],
+        sections: Optional[List[str]] = None,
+        base_template: str = 'base.html'
+    ) -> str:
+        """
+        用基础模板组装完整HTML报告
 
-        # 渲染各部分
-        sections = []
-
-        # 流量部分
-        if 'traffic' in current_data:
-            sections.append(self.render_traffic_section(
-                params,
-                current_data['traffic'],
-                previous_data.get('traffic', []),
-                analysis.get('traffic', {})
-            ))
-
-        # 激活部分
-        if 'activation' in current_data:
-            sections.append(self.render_activation_section(
-                params,
-                current_data['activation'],
-                previous_data.get('activation', []),
-                analysis.get('activation', {})
-            ))
-
-        # 活跃部分
-        if 'engagement' in current_data:
-            sections.append(self.render_engagement_section(
-                params,
-                current_data['engagement'],
-                previous_data.get('engagement', []),
-                analysis.get('engagement', {})
-            ))
-
-        # 留存部分
-        if 'retention' in current_data:
-            sections.append(self.render_retention_section(
-                params,
-                current_data['retention'],
-                previous_data.get('retention', []),
-                analysis.get('retention', {})
-            ))
-
-        # 收入部分
-        if 'revenue' in current_data:
-            sections.append(self.generate_revenue_section_html(
-                current_data['revenue'],
-                previous_data.get('revenue', []),
-                analysis.get('revenue', {}),
-                revenue_md_content
-            ))
-
-        # 洞察与建议
-        if 'insights' in analysis:
-            sections.append(self.render_insights_section(params, analysis['insights']))
-        if 'suggestions' in analysis:
-            sections.append(self.render_suggestions_section(params, analysis['suggestions']))
-
-        # 渲染基础模板
-        base_template = self._get_template('base.html')
+        Args:
+            params: 日期参数
+            blocks: render_section_blocks 的结果
+            sections: 需要包含的部分（默认全部）
+            base_template: 基础模板文件名
 
+        Returns:
+            str: 完整的HTML报告
+        """
         from datetime import datetime
         execution_time = datetime.now().strftime('%Y-%m-%d %H:%M')
 
-        full_html = base_template.render(
+        return self._get_template(base_template).render(
             report_date=params.get('report_date', datetime.now().strftime('%Y-%m-%d')),
             data_week=params.get('data_week', ''),
             data_end_date=params.get('data_end_date', ''),
-            sections=sections,
+            sections=[html for name, html in blocks.items() if sections is None or name in sections],
             database_id=params.get('database_id', 2),
             execution_time=execution_time
         )
 
+    def render_all_formats(
+        self,
+        params: Dict,
+        current_data: Dict,
+        analysis: Dict,
+        revenue_md_content: Optional[str] = None,
+        base_template: str = 'base.html'
+    ) -> Dict[str, object]:
+        """
+        一次构建报告模型，同时输出HTML、Markdown和Confluence storage格式
+
+        Args:
+            params: 日期参数
+            current_data: 本周所有数据
+            analysis: 所有分析结果
+            revenue_md_content: 收入MD文档内容
+            base_template: 基础模板文件名
+
+        Returns:
+            dict: {'model', 'blocks', 'html', 'markdown', 'storage'}
+        """
+        model = self.build_report_model(params, current_data, analysis, revenue_md_content)
+        blocks = self.render_model_blocks(model)
+        html = self.assemble_report_html(params, blocks, base_template=base_template)
+
+        return {
+            'model': model,
+            'blocks': blocks,
+            'html': html,
+            'markdown': self.render_model_markdown(model),
+            'storage': html_to_storage(html)
+        }
+
+    def generate_full_report_html(
+        self,
+        params: Dict,
+        current_data: Dict,
+        previous_data: Dict,
+        analysis: Dict,
+        revenue_md_content: Optional[str] = None,
+        sections: Optional[List[str]] = None,
+        base_template: str = 'base.html'
+    ) -> str:
+        """
+        生成完整HTML报告
+
+        Args:
+            params: 日期参数
+            current_data: 本周所有数据
+            previous_data: 上周所有数据
+            analysis: 所有分析结果
+            revenue_md_content: 收入MD文档内容
+            sections: 需要包含的部分（默认全部）
+            base_template: 基础模板文件名
+
+        Returns:
+            str: 完整的HTML报告
+        """
+        self.logger.info("生成完整HTML报告...")
+
+        blocks = self.render_section_blocks(
+            params, current_data, previous_data, analysis, revenue_md_content, sections
+        )
+        full_html = self.assemble_report_html(params, blocks, base_template=base_template)
+
         self.logger.info("✅ 完整HTML报告生成完成")
         return full_html
 
@@ -446,130 +629,12 @@ class ReportGenerator:
         """
         self.logger.info("生成完整Markdown报告...")
 
-        # 渲染模板
-        template = self._get_template('report.md')
-
-        from datetime import datetime
-        execution_time = datetime.now().strftime('%Y-%m-%d %H:%M')
-
-        # 准备渲染参数
-        render_params = {
-            'report_date': params.get('report_date', datetime.now().strftime('%Y-%m-%d')),
-            'data_week': params.get('data_week', ''),
-            'data_end_date': params.get('data_end_date', ''),
-            'database_id': params.get('database_id', 2),
-            'execution_time': execution_time,
-            # 流量
-            'total_visitors': analysis.get('traffic', {}).get('new_visitors_current', 0),
-            'total_registrations': analysis.get('traffic', {}).get('registrations_current', 0),
-            'conversion_rate': analysis.get('traffic', {}).get('conversion_rate_current', 0),
-            'visitors_wow': analysis.get('traffic', {}).get('visitors_wow', {}).get('change_rate', 0),
-            'registrations_wow': analysis.get('traffic', {}).get('registrations_wow', {}).get('change_rate', 0),
-            'conversion_wow': analysis.get('traffic', {}).get('conversion_rate_wow', {}).get('change_rate', 0),
-            'attention_items_traffic': analysis.get('traffic', {}).get('attention_items', []),
-            # 激活
-            'previous_week_label': analysis.get('activation', {}).get('previous_week_label', ''),
-            'current_week_label': analysis.get('activation', {}).get('current_week_label', ''),
-            'funnel_steps': self._prepare_funnel_steps_for_md(analysis.get('activation', {})),
-            'overall_previous_rate': analysis.get('activation', {}).get('overall_previous_rate', 0),
-            'overall_current_rate': analysis.get('activation', {}).get('overall_current_rate', 0),
-            'overall_change_rate': analysis.get('activation', {}).get('overall_change_rate', 0),
-            'is_current_week_incomplete': analysis.get('activation', {}).get('is_current_week_incomplete', False),
-            'current_week_metrics': analysis.get('activation', {}).get('current_week_metrics', []),
-            'core_insights': analysis.get('activation', {}).get('core_insights', []),
-            # 活跃
-            'wau': analysis.get('engagement', {}).get('wau_current', 0),
-            'wau_wow': analysis.get('engagement', {}).get('wau_wow', {}).get('change_rate', 0),
-            'wau_contribution': analysis.get('engagement', {}).get('wau_contribution', '新老用户共同贡献'),
-            'new_user_wau': analysis.get('engagement', {}).get('new_user_wau', 0),
-            'new_user_wau_wow': analysis.get('engagement', {}).get('new_user_wau_wow', 0),
-            'old_user_wau': analysis.get('engagement', {}).get('old_user_wau', 0),
-            'old_user_wau_wow': analysis.get('engagement', {}).get('old_user_wau_wow', 0),
-            'historical_weeks_engagement': analysis.get('engagement', {}).get('historical_weeks', 25),
-            'historical_avg_wau': analysis.get('engagement', {}).get('historical_avg_wau', 0),
-            'historical_trends_engagement': analysis.get('engagement', {}).get('historical_trends', []),
-            'attention_items_engagement': analysis.get('engagement', {}).get('attention_items', []),
-            # 留存
-            'new_user_retention_rate': analysis.get('retention', {}).get('new_user_retention_rate', 0),
-            'new_user_retention_previous': analysis.get('retention', {}).get('new_user_retention_previous', 0),
-            'new_user_retention_current': analysis.get('retention', {}).get('new_user_retention_current', 0),
-            'new_user_retention_min': analysis.get('retention', {}).get('new_user_retention_min', 0),
-            'new_user_retention_max': analysis.get('retention', {}).get('new_user_retention_max', 0),
-            'new_user_retention_level': analysis.get('retention', {}).get('new_user_retention_level', '中等'),
-            'old_user_retention_rate': analysis.get('retention', {}).get('old_user_retention_rate', 0),
-            'old_user_retention_previous': analysis.get('retention', {}).get('old_user_retention_previous', 0),
-            'old_user_retention_current': analysis.get('retention', {}).get('old_user_retention_current', 0),
-            'old_user_retention_min': analysis.get('retention', {}).get('old_user_retention_min', 0),
-            'old_user_retention_max': analysis.get('retention', {}).get('old_user_retention_max', 0),
-            'old_user_retention_change': analysis.get('retention', {}).get('old_user_retention_change', 0),
-            'old_user_trend_note': analysis.get('retention', {}).get('old_user_trend_note', '需要关注'),
-            'historical_new_user_avg': analysis.get('retention', {}).get('historical_new_user_avg', 0),
-            'historical_old_user_avg': analysis.get('retention', {}).get('historical_old_user_avg', 0),
-            'historical_trends_retention': analysis.get('retention', {}).get('historical_trends', []),
-            'insights_retention': analysis.get('retention', {}).get('insights', []),
-            # 收入
-            'total_revenue': analysis.get('revenue', {}).get('total_current', 0),
-            'previous_revenue': analysis.get('revenue', {}).get('total_previous', 0),
-            'revenue_change_abs': analysis.get('revenue', {}).get('wow', {}).get('change_abs', 0),
-            'revenue_change_rate': analysis.get('revenue', {}).get('wow', {}).get('change_rate', 0),
-            'renewal_revenue': analysis.get('revenue', {}).get('renewal_revenue', 0),
-            'renewal_growth_rate': analysis.get('revenue', {}).get('renewal_growth_rate', 0),
-            'new_signing_revenue': analysis.get('revenue', {}).get('new_signing_revenue', 0),
-            'new_signing_growth_rate': analysis.get('revenue', {}).get('new_signing_growth_rate', 0),
-            'md_content': revenue_md_content,
-            'ai_summary': analysis.get('revenue', {}).get('ai_summary', '数据暂未加载'),
-            'revenue_type': analysis.get('revenue', {}).get('revenue_type', '-'),
-            'user_count_revenue': analysis.get('revenue', {}).get('user_count', '-'),
-            'average_order_value': analysis.get('revenue', {}).get('average_order_value', '-'),
-            'historical_weeks_revenue': analysis.get('revenue', {}).get('historical_weeks', 12),
-            'historical_avg_revenue': analysis.get('revenue', {}).get('historical_avg_revenue', 0),
-            'historical_trends_revenue': analysis.get('revenue', {}).get('historical_trends', []),
-            'attention_items_revenue': analysis.get('revenue', {}).get('attention_items', []),
-            # 洞察与建议
-            'positive_insights': analysis.get('insights', {}).get('positive_insights', []),
-            'negative_insights': analysis.get('insights', {}).get('negative_insights', []),
-            'key_findings': analysis.get('insights', {}).get('key_findings', []),
-            'short_term_suggestions': analysis.get('suggestions', {}).get('short_term_suggestions', []),
-            'medium_term_suggestions': analysis.get('suggestions', {}).get('medium_term_suggestions', []),
-            'long_term_suggestions': analysis.get('suggestions', {}).get('long_term_suggestions', []),
-        }
-
-        full_md = template.render(**render_params)
+        model = self.build_report_model(params, current_data, analysis, revenue_md_content)
+        full_md = self.render_model_markdown(model)
 
         self.logger.info("✅ 完整Markdown报告生成完成")
         return full_md
 
-    @staticmethod
-    def _prepare_funnel_steps_for_md(activation_analysis: Dict) -> List[Dict]:
-        """准备激活漏斗步骤数据用于Markdown渲染"""
-        steps = [
-            {
-                'name': '注册→进工具',
-                'previous_rate': activation_analysis.get('step1_previous_rate', 0),
-                'current_rate': activation_analysis.get('step1_current_rate', 0),
-                'change_str': ReportGenerator._format_change(activation_analysis.get('step1_change_rate', 0), '%')
-            },
-            {
-                'name': '进工具→画户型',
-                'previous_rate': activation_analysis.get('step2_previous_rate', 0),
-                'current_rate': activation_analysis.get('step2_current_rate', 0),
-                'change_str': ReportGenerator._format_change(activation_analysis.get('step2_change_rate', 0), '%')
-            },
-            {
-                'name': '画户型→拖模型',
-                'previous_rate': activation_analysis.get('step3_previous_rate', 0),
-                'current_rate': activation_analysis.get('step3_current_rate', 0),
-                'change_str': ReportGenerator._format_change(activation_analysis.get('step3_change_rate', 0), '%')
-            },
-            {
-                'name': '拖模型→渲染',
-                'previous_rate': activation_analysis.get('step4_previous_rate', 0),
-                'current_rate': activation_analysis.get('step4_current_rate', 0),
-                'change_str': ReportGenerator._format_change(activation_analysis.get('step4_change_rate', 0), '%')
-            }
-        ]
-        return steps
-
     # ==================== 兼容旧版方法 ====================
 
     def generate_full_report(
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+查询结果集模块
+
+列名映射只作用于表头：ResultSet 持有原始数据行和一份 {别名: 列名} 表，
+重命名只合并别名表（与列数成正比），不复制任何数据行；
+按下标取出的 RowView 同时支持中文列名和英文别名访问，读写都落在原始行上
+"""
+
+from collections.abc import MutableMapping, Sequence
+from typing import Dict, Iterator, List, Optional
+
+
+def column_aliases(
+    column_mapping: Dict[str, str] = None,
+    extra_aliases: Dict[str, str] = None,
+    base: Dict[str, str] = None
+) -> Dict[str, str]:
+    """
+    由列名映射生成别名表
+
+    映射的源列名本身是已有别名时，先解析为原始列名，别名表始终只有一层（支持链式重命名）
+
+    Args:
+        column_mapping: {中文列名: 英文键名}（config.yaml column_mappings.<部分>.columns）
+        extra_aliases: 额外的 {别名: 中文列名}（column_mappings.<部分>.aliases）
+        base: 已有的别名表（在其基础上合并，不修改原字典）
+
+    Returns:
+        dict: {别名: 原始列名}
+    """
+    aliases = dict(base or {})
+
+    def add(alias, column):
+        column = aliases.get(column, column)
+        if alias and alias != column:
+            aliases[alias] = column
+
+    for column, key in (column_mapping or {}).items():
+        add(key, column)
+    for alias, column in (extra_aliases or {}).items():
+        add(alias, column)
+    return aliases
+
+
+class RowView(MutableMapping):
+    """
+    数据行视图：按别名表把英文键解析为原始列名，不复制行数据
+
+    遍历、len() 和 items() 只返回原始列名，避免同一个值按两个键重复出现
+    """
+
+    __slots__ = ('_row', '_aliases')
+
+    def __init__(self, row: Dict, aliases: Dict[str, str]):
+        self._row = row
+        self._aliases = aliases
+
+    @property
+    def row(self) -> Dict:
+        """原始数据行"""
+        return self._row
+
+    def _resolve(self, key):
+        """别名解析为原始列名（原始行中已有该键时优先使用原键）"""
+        if key in self._row:
+            return key
+        return self._aliases.get(key, key)
+
+    def __getitem__(self, key):
+        return self._row[self._resolve(key)]
+
+    def __setitem__(self, key, value):
+        self._row[self._resolve(key)] = value
+
+    def __delitem__(self, key):
+        del self._row[self._resolve(key)]
+
+    def __contains__(self, key) -> bool:
+        return self._resolve(key) in self._row
+
+    def __iter__(self) -> Iterator:
+        return iter(self._row)
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RowView):
+            other = other.row
+        return self._row == other
+
+    def __repr__(self) -> str:
+        return f"RowView({self._row!r})"
+
+
+class ResultSet(Sequence):
+    """
+    查询结果集：原始数据行 + 表头别名
+
+    Args:
+        rows: 数据行（不复制）
+        aliases: {别名: 原始列名}
+    """
+
+    def __init__(self, rows: List[Dict], aliases: Optional[Dict[str, str]] = None):
+        if isinstance(rows, ResultSet):
+            aliases = column_aliases(extra_aliases=aliases, base=rows.aliases)
+            rows = rows.rows
+        self._rows = rows if rows is not None else []
+        self._aliases = dict(aliases or {})
+
+    @classmethod
+    def from_mapping(cls, rows: List[Dict], column_mapping: Dict[str, str] = None,
+                     extra_aliases: Dict[str, str] = None) -> 'ResultSet':
+        """
+        按列名映射包装查询结果
+
+        Args:
+            rows: 数据行
+            column_mapping: {中文列名: 英文键名}
+            extra_aliases: 额外的 {别名: 中文列名}
+
+        Returns:
+            ResultSet: 共享同一批数据行的结果集
+        """
+        return cls(rows, column_aliases(column_mapping, extra_aliases))
+
+    def rename(self, column_mapping: Dict[str, str]) -> 'ResultSet':
+        """
+        表头重命名（只合并别名表，数据行共享）
+
+        Args:
+            column_mapping: {原始列名或已有别名: 新键名}
+
+        Returns:
+            ResultSet: 新的结果集视图
+        """
+        return ResultSet(self._rows, column_aliases(column_mapping, base=self._aliases))
+
+    @property
+    def rows(self) -> List[Dict]:
+        """原始数据行"""
+        return self._rows
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        """别名表 {别名: 原始列名}"""
+        return dict(self._aliases)
+
+    @property
+    def columns(self) -> List[str]:
+        """原始列名（取第一行的键）"""
+        return list(self._rows[0].keys()) if self._rows else []
+
+    def resolve(self, name: str) -> str:
+        """别名解析为原始列名"""
+        return self._aliases.get(name, name)
+
+    def column(self, name: str, default=None) -> List:
+        """
+        取一整列的值
+
+        Args:
+            name: 原始列名或别名
+            default: 缺失时的默认值
+
+        Returns:
+            list: 各行该列的值
+        """
+        column = self.resolve(name)
+        return [row.get(column, default) for row in self._rows]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultSet(self._rows[index], self._aliases)
+        return RowView(self._rows[index], self._aliases)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[RowView]:
+        aliases = self._aliases
+        for row in self._rows:
+            yield RowView(row, aliases)
+
+    def __bool__(self) -> bool:
+        return bool(self._rows)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ResultSet):
+            other = other.rows
+        return self._rows == other
+
+    def __repr__(self) -> str:
+        return f"ResultSet({len(self._rows)} rows, aliases={self._aliases!r})"
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试查询结果集模块\n")
+
+    raw = [{'日期': '20260209', '新访客数': 1200}, {'日期': '20260216', '新访客数': 1500}]
+    result = ResultSet.from_mapping(raw, {'日期': 'date', '新访客数': 'new_visitors'})
+    print(result)
+    print(f"英文访问: {result[0]['new_visitors']}，中文访问: {result[0]['新访客数']}")
+    print(f"整列: {result.column('new_visitors')}")
+    result[1]['new_visitors'] = 1600
+    print(f"写回原始行: {raw[1]}")
@@ -9,6 +9,7 @@ import time
 import functools
 from typing import Callable, Optional, Type, Tuple, Any
 from src.logger import get_logger
+from src.run_metrics import get_run_metrics
 
 
 class RetryHandler:
@@ -72,6 +73,7 @@ class RetryHandler:
                         f"等待 {delay:.1f} 秒..."
                     )
                     time.sleep(delay)
+                    get_run_metrics().inc('retries_total', operation=func.__name__)
 
                 result = func(*args, **kwargs)
                 if attempt > 1:
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+收入数据立方体
+
+sql/11_revenue_cube.sql 一次扫描发票表，按 GROUPING SETS 返回总计、SKU、国家、
+账单分层四个粒度的行（粒度列区分）。本模块在本地把立方体拆分为
+revenue / revenue_sku / revenue_country / revenue_tier 四个部分，
+行结构与 05~08 单独查询的结果一致，分析器、模板和快照无需改动
+"""
+
+from typing import Dict, List
+
+# 立方体粒度 -> 部分名称
+CUBE_SECTIONS = {
+    'total': 'revenue',
+    'sku': 'revenue_sku',
+    'country': 'revenue_country',
+    'tier': 'revenue_tier',
+}
+
+# 各粒度保留的维度列（与 06~08 的输出列一致）
+CUBE_DIMENSIONS = {
+    'sku': ['SKU模式', 'SKU类型', 'SKU周期'],
+    'country': ['国家_英文', '国家_中文'],
+    'tier': ['账单分层'],
+}
+
+
+def _per_user(amount, users):
+    """客单价（无用户时为 None，与 SQL 中 IF(count = 0, NULL, ...) 一致）"""
+    return round(amount / users, 1) if users else None
+
+
+def _total_row(row: Dict) -> Dict:
+    """总计粒度 -> 05_revenue.sql 的行结构（用户数与客单价只统计订阅模式）"""
+    return {
+        '日期': row.get('日期'),
+        '总收入': row.get('收入_美元', 0) or 0,
+        '新签收入': row.get('新签收入_美元', 0) or 0,
+        '续约收入': row.get('续约收入_美元', 0) or 0,
+        '付费用户数': row.get('订阅付费用户数', 0) or 0,
+        '新签用户数': row.get('订阅新签用户数', 0) or 0,
+        '续约用户数': row.get('订阅续约用户数', 0) or 0,
+        '整体客单价': _per_user(row.get('订阅收入_美元', 0) or 0, row.get('订阅付费用户数', 0)),
+        '新签客单价': _per_user(row.get('订阅新签收入_美元', 0) or 0, row.get('订阅新签用户数', 0)),
+        '续约客单价': _per_user(row.get('订阅续约收入_美元', 0) or 0, row.get('订阅续约用户数', 0)) or 0,
+    }
+
+
+def _breakdown_row(row: Dict, level: str) -> Dict:
+    """拆分粒度 -> 06~08 的行结构"""
+    result = {'日期': row.get('日期')}
+    for column in CUBE_DIMENSIONS[level]:
+        result[column] = row.get(column) or 'Unknown'
+
+    revenue = row.get('收入_美元', 0) or 0
+    users = row.get('付费用户数', 0) or 0
+    result.update({
+        '收入_美元': revenue,
+        '付费用户数': users,
+        '客单价_美元': _per_user(revenue, users),
+    })
+    if level == 'tier':
+        result['用户数'] = users
+    else:
+        result.update({
+            '新签收入_美元': row.get('新签收入_美元', 0) or 0,
+            '新签用户数': row.get('新签用户数', 0) or 0,
+            '续约收入_美元': row.get('续约收入_美元', 0) or 0,
+            '续约用户数': row.get('续约用户数', 0) or 0,
+        })
+    return result
+
+
+def split_revenue_cube(rows: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    把立方体结果拆分为各收入部分
+
+    总计按日期升序（同 05），拆分按日期降序、收入降序（同 06~08）
+
+    Args:
+        rows: 11_revenue_cube.sql 的查询结果
+
+    Returns:
+        dict: {部分名称: 数据行列表}，四个部分都会返回（无数据时为空列表）
+    """
+    result = {section: [] for section in CUBE_SECTIONS.values()}
+    for row in rows or []:
+        level = row.get('粒度', 'total')
+        if level not in CUBE_SECTIONS:
+            continue
+        section = CUBE_SECTIONS[level]
+        result[section].append(_total_row(row) if level == 'total' else _breakdown_row(row, level))
+
+    result['revenue'].sort(key=lambda r: str(r['日期']))
+    for level, section in CUBE_SECTIONS.items():
+        if level != 'total':
+            result[section].sort(key=lambda r: (str(r['日期']), r['收入_美元']), reverse=True)
+    return result
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试收入数据立方体\n")
+
+    cube = [
+        {'日期': '20260209', '粒度': 'total', '收入_美元': 1000, '新签收入_美元': 300, '续约收入_美元': 700,
+         '订阅收入_美元': 900, '订阅付费用户数': 30},
+        {'日期': '20260209', '粒度': 'country', '国家_中文': '美国', '国家_英文': 'United States',
+         '收入_美元': 600, '付费用户数': 15},
+        {'日期': '20260209', '粒度': 'tier', '账单分层': '新签', '收入_美元': 300, '付费用户数': 12},
+    ]
+    for name, section_rows in split_revenue_cube(cube).items():
+        print(f"{name}: {section_rows}")
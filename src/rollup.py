@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+粒度汇总模块
+
+流量、激活SQL按日粒度返回一次，周、月视图在本地汇总得到，
+不再为日报/周报/月报分别改写 SQL 中的 CASE '周' 开关重新查询。
+
+周以周一为起点（与 calculate_week_params 和 SQL 中 DATE_TRUNC('week') 一致），
+月以当月1日为键（与激活SQL中 CONCAT(SUBSTR(created_day, 1, 6), '01') 一致）。
+只有可加的计数列参与求和，比率列由汇总后的分子/分母重新计算；
+去重用户数等不可加的列不能从日粒度汇总，未声明的列在汇总结果中丢弃
+
+月报/季报（src.period_report）同样用本模块把缓存的日、周粒度数据汇总到月、季度：
+周粒度的行按该周周四归属月份/季度（ISO 周的归属规则），WAU 这类不可加的
+周指标取周均值（means）
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+from src.logger import get_logger
+
+logger = get_logger('rollup')
+
+GRAINS = ('day', 'week', 'month', 'quarter')
+
+# 各部分的汇总规则：维度列、可加列、均值列、比率列 {比率列: (分子列, 分母列)}
+# date_key 为部分的日期列；周粒度部分的规则只在月报/季报中使用
+DEFAULT_ROLLUPS: Dict[str, Dict] = {
+    'traffic': {
+        'dimensions': ['渠道'],
+        'sums': ['新访客数', '新访客注册数'],
+        'ratios': {'新访客注册转化率': ('新访客注册数', '新访客数')},
+    },
+    'activation': {
+        'dimensions': [],
+        'sums': ['新注册用户数', '进工具用户数', '有效画户型用户数', '有效拖模型用户数', '渲染用户数'],
+        'ratios': {
+            '注册到进工具转化率': ('进工具用户数', '新注册用户数'),
+            '进工具到有效画户型转化率': ('有效画户型用户数', '进工具用户数'),
+            '有效画户型到有效拖模型转化率': ('有效拖模型用户数', '有效画户型用户数'),
+            '有效拖模型到渲染转化率': ('渲染用户数', '有效拖模型用户数'),
+            '进工具总转化率': ('进工具用户数', '新注册用户数'),
+            '有效画户型总转化率': ('有效画户型用户数', '新注册用户数'),
+            '有效拖模型总转化率': ('有效拖模型用户数', '新注册用户数'),
+            '渲染总转化率': ('渲染用户数', '新注册用户数'),
+        },
+    },
+    'engagement': {
+        'date_key': '周',
+        'means': ['新用户WAU', '老用户WAU'],
+    },
+    'retention': {
+        'date_key': '上周',
+        'dimensions': ['上周用户类型'],
+        'sums': ['上周工具WAU', '本周工具WAU'],
+        'ratios': {'工具次周留存': ('本周工具WAU', '上周工具WAU')},
+    },
+    'revenue': {
+        # 付费用户数、客单价为去重口径，不能跨周累加
+        'sums': ['总收入', '新签收入', '续约收入'],
+    },
+    'revenue_sku': {
+        'dimensions': ['SKU模式', 'SKU类型', 'SKU周期'],
+        'sums': ['收入_美元', '新签收入_美元', '续约收入_美元'],
+    },
+    'revenue_country': {
+        'dimensions': ['国家_英文', '国家_中文'],
+        'sums': ['收入_美元', '新签收入_美元', '续约收入_美元'],
+    },
+    'revenue_tier': {
+        'dimensions': ['账单分层'],
+        'sums': ['收入_美元'],
+    },
+}
+
+
+def bucket_key(day, grain: str, row_grain: str = 'day') -> str:
+    """
+    计算日期所属的汇总桶
+
+    Args:
+        day: 日期（YYYYMMDD 字符串或整数）
+        grain: day / week / month / quarter
+        row_grain: 日期本身的粒度；为 week 时按该周周四归属月份/季度
+
+    Returns:
+        str: 桶的起始日期（YYYYMMDD）
+    """
+    date = datetime.strptime(str(day)[:8], '%Y%m%d')
+    if row_grain == 'week' and grain in ('month', 'quarter'):
+        date = date - timedelta(days=date.weekday()) + timedelta(days=3)
+    if grain == 'day':
+        return date.strftime('%Y%m%d')
+    if grain == 'week':
+        return (date - timedelta(days=date.weekday())).strftime('%Y%m%d')
+    if grain == 'month':
+        return date.strftime('%Y%m01')
+    if grain == 'quarter':
+        return f"{date.year}{(date.month - 1) // 3 * 3 + 1:02d}01"
+    raise ValueError(f"未知的粒度: {grain}")
+
+
+def rollup(
+    rows: List[Dict],
+    grain: str,
+    sums: Sequence[str],
+    dimensions: Sequence[str] = (),
+    ratios: Dict[str, Tuple[str, str]] = None,
+    date_key: str = '日期',
+    means: Sequence[str] = (),
+    row_grain: str = 'day'
+) -> List[Dict]:
+    """
+    把日粒度（或周粒度）数据汇总到指定粒度
+
+    Args:
+        rows: 数据行
+        grain: 目标粒度（day / week / month / quarter）
+        sums: 求和的可加列
+        dimensions: 分组维度列（如渠道）
+        ratios: 汇总后重新计算的比率列 {比率列: (分子列, 分母列)}
+        date_key: 日期列
+        means: 取均值的列（按桶内的日期个数平均，如周均WAU）
+        row_grain: 数据行本身的粒度（day / week）
+
+    Returns:
+        list: 汇总后的数据行，按桶和维度排序；分母为0时比率为 None（与SQL一致）
+    """
+    ratios = ratios or {}
+    groups: Dict[tuple, Dict] = {}
+    periods: Dict[tuple, set] = {}
+
+    for row in rows or []:
+        day = row.get(date_key)
+        if not day:
+            continue
+        try:
+            key = (bucket_key(day, grain, row_grain),) + tuple(row.get(dim) for dim in dimensions)
+        except ValueError:
+            logger.warning(f"⚠️ 跳过无法解析的日期: {day}")
+            continue
+        group = groups.get(key)
+        if group is None:
+            group = {date_key: key[0], **{dim: row.get(dim) for dim in dimensions},
+                     **{col: 0 for col in list(sums) + list(means)}}
+            groups[key] = group
+            periods[key] = set()
+        periods[key].add(str(day))
+        for col in list(sums) + list(means):
+            group[col] += row.get(col) or 0
+
+    result = []
+    for key in sorted(groups, key=lambda k: tuple('' if v is None else str(v) for v in k)):
+        group = groups[key]
+        for col in means:
+            group[col] = round(group[col] / len(periods[key]), 1)
+        for col, (numerator, denominator) in ratios.items():
+            group[col] = round(group[numerator] / group[denominator], 6) if group.get(denominator) else None
+        result.append(group)
+    return result
+
+
+def rollup_section(
+    section: str,
+    rows: List[Dict],
+    grain: str,
+    spec: Dict = None,
+    row_grain: str = 'day'
+) -> List[Dict]:
+    """
+    按部分的汇总规则汇总数据
+
+    Args:
+        section: 部分名称
+        rows: 数据行
+        grain: 目标粒度
+        spec: 汇总规则（默认 DEFAULT_ROLLUPS[section]）
+        row_grain: 数据行本身的粒度（day / week）
+
+    Returns:
+        list: 汇总后的数据行；没有汇总规则时原样返回
+    """
+    spec = spec or DEFAULT_ROLLUPS.get(section)
+    if not spec:
+        return rows
+    return rollup(rows, grain, spec.get('sums', []), spec.get('dimensions', []), spec.get('ratios', {}),
+                  spec.get('date_key', '日期'), spec.get('means', []), row_grain)
+
+
+def rollup_sections(data: Dict[str, List[Dict]], sections: List[Dict], grain: str = 'week') -> Dict[str, List[Dict]]:
+    """
+    把注册表中声明 grain: day 的部分汇总到目标粒度，其他部分原样保留
+
+    Args:
+        data: {部分名称: 数据行}
+        sections: 部分注册表
+        grain: 目标粒度
+
+    Returns:
+        dict: 新的 {部分名称: 数据行}（原字典不修改）
+    """
+    result = dict(data)
+    for spec in sections:
+        name = spec['name']
+        if spec.get('grain') == 'day' and result.get(name):
+            result[name] = rollup_section(name, result[name], grain, spec.get('rollup'))
+    return result
+
+
+def build_views(
+    section: str,
+    rows: List[Dict],
+    grains: Sequence[str] = ('day', 'week', 'month'),
+    spec: Dict = None
+) -> Dict[str, List[Dict]]:
+    """
+    从一次日粒度取数生成多个粒度的视图
+
+    Args:
+        section: 部分名称
+        rows: 日粒度数据行
+        grains: 需要的粒度
+        spec: 汇总规则
+
+    Returns:
+        dict: {粒度: 数据行}
+    """
+    return {grain: rollup_section(section, rows, grain, spec) for grain in grains}
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试粒度汇总模块\n")
+
+    daily = [
+        {'日期': '20260202', '渠道': 'paid ads', '新访客数': 100, '新访客注册数': 20},
+        {'日期': '20260205', '渠道': 'paid ads', '新访客数': 50, '新访客注册数': 10},
+        {'日期': '20260209', '渠道': 'paid ads', '新访客数': 80, '新访客注册数': 8},
+    ]
+    for grain, view in build_views('traffic', daily).items():
+        print(f"{grain}: {view}")
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+运行指标模块
+
+记录每次运行的计数器、仪表和直方图（查询耗时、行数、接收字节数、重试次数、
+缓存命中率、LLM耗时、Confluence发布耗时等），并在运行结束时导出为
+Prometheus textfile-collector 文件和 JSON 文件，便于按周绘制趋势
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.logger import get_logger
+
+
+# 默认直方图桶（秒），覆盖从毫秒级渲染到数分钟的仓库查询
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# 指标说明（用于 Prometheus 的 # HELP 行）
+METRIC_HELP = {
+    'query_duration_seconds': '各部分SQL查询耗时（秒）',
+    'section_rows_total': '各部分查询返回的行数',
+    'response_bytes_total': 'Metabase响应接收的字节数',
+    'query_retries_total': '查询重试次数（含202轮询）',
+    'retries_total': 'RetryHandler触发的重试次数',
+    'cache_hits_total': '缓存命中次数',
+    'cache_misses_total': '缓存未命中次数',
+    'cache_hit_ratio': '缓存命中率',
+    'llm_duration_seconds': 'LLM总结生成耗时（秒）',
+    'llm_failures_total': 'LLM调用失败次数',
+    'confluence_publish_duration_seconds': 'Confluence发布耗时（秒）',
+    'confluence_publish_total': 'Confluence发布次数（按结果）',
+    'run_duration_seconds': '整次运行耗时（秒）',
+    'run_success': '最近一次运行是否成功（1成功/0失败）',
+    'last_run_timestamp_seconds': '最近一次运行结束时间（Unix时间戳）',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    """将标签字典转换为可哈希的有序元组"""
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _format_labels(label_key: LabelKey, extra: Optional[Dict] = None) -> str:
+    """格式化 Prometheus 标签字符串"""
+    items = list(label_key)
+    if extra:
+        items.extend((str(k), str(v)) for k, v in extra.items())
+    if not items:
+        return ''
+    escaped = []
+    for key, value in items:
+        value = value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    """格式化 Prometheus 数值"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class RunMetrics:
+    """
+    单次运行的指标收集器
+
+    线程安全，支持计数器（counter）、仪表（gauge）和直方图（histogram）
+    """
+
+    def __init__(
+        self,
+        namespace: str = 'weekly_report',
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        logger=None
+    ):
+        """
+        初始化指标收集器
+
+        Args:
+            namespace: 指标名前缀
+            buckets: 直方图桶上界（秒）
+            logger: 日志记录器
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self.logger = logger or get_logger('run_metrics')
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Dict]] = {}
+
+    # ==================== 记录方法 ====================
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """计数器累加"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """设置仪表值"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录直方图观测值"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                series[key] = hist
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    hist['buckets'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        计时上下文管理器，退出时将耗时记录到直方图
+
+        Examples:
+            >>> with get_run_metrics().timer('query_duration_seconds', section='traffic'):
+            ...     fetch()
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_cache(self, hit: bool, **labels) -> None:
+        """记录一次缓存命中或未命中"""
+        self.inc('cache_hits_total' if hit else 'cache_misses_total', **labels)
+
+    # ==================== 导出方法 ====================
+
+    def _finalize(self, success: Optional[bool] = None) -> None:
+        """计算派生指标（缓存命中率、运行耗时等）"""
+        with self._lock:
+            hits = sum(self._counters.get('cache_hits_total', {}).values())
+            misses = sum(self._counters.get('cache_misses_total', {}).values())
+        if hits + misses > 0:
+            self.set_gauge('cache_hit_ratio', hits / (hits + misses))
+
+        self.set_gauge('run_duration_seconds', time.time() - self.started_at)
+        self.set_gauge('last_run_timestamp_seconds', time.time())
+        if success is not None:
+            self.set_gauge('run_success', 1 if success else 0)
+
+    def to_dict(self) -> Dict:
+        """
+        导出为可JSON序列化的字典
+
+        Returns:
+            dict: {'counters': ..., 'gauges': ..., 'histograms': ...}
+        """
+        def _series(store):
+            return {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in store.items()
+            }
+
+        with self._lock:
+            histograms = {
+                name: [
+                    {
+                        'labels': dict(key),
+                        'count': hist['count'],
+                        'sum': round(hist['sum'], 6),
+                        'buckets': dict(zip([str(b) for b in self.buckets], hist['buckets']))
+                    }
+                    for key, hist in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+            return {
+                'namespace': self.namespace,
+                'started_at': datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'counters': _series(self._counters),
+                'gauges': _series(self._gauges),
+                'histograms': histograms
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        导出为 Prometheus 文本格式（textfile collector 可直接读取）
+
+        Returns:
+            str: Prometheus exposition 格式文本
+        """
+        lines = []
+        ns = self.namespace
+
+        with self._lock:
+            for metric_type, store in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted(store):
+                    full_name = f"{ns}_{name}"
+                    lines.append(f"# HELP {full_name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                    for key, value in sorted(store[name].items()):
+                        lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+            for name in sorted(self._histograms):
+                full_name = f"{ns}_{name}"
+                lines.append(f"# HELP {full_name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, hist in sorted(self._histograms[name].items()):
+                    for upper, count in zip(self.buckets, hist['buckets']):
+                        labels = _format_labels(key, {'le': _format_value(upper)})
+                        lines.append(f"{full_name}_bucket{labels} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(key, {'le': '+Inf'})} {hist['count']}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(round(hist['sum'], 6))}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {hist['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _atomic_write(path: Path, content: str) -> None:
+        """先写临时文件再重命名，避免 node_exporter 读到半个文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def export(self, metrics_config: Dict = None, success: Optional[bool] = None) -> Dict[str, str]:
+        """
+        导出指标到 Prometheus 文件和 JSON 文件
+
+        Args:
+            metrics_config: 配置中的 metrics 部分
+            success: 本次运行是否成功
+
+        Returns:
+            dict: 写入的文件路径 {'prometheus': ..., 'json': ..., 'history': ...}
+        """
+        metrics_config = metrics_config or {}
+        if not metrics_config.get('enabled', True):
+            return {}
+
+        self._finalize(success)
+        written = {}
+
+        try:
+            prom_file = metrics_config.get('prometheus_file', 'output/metrics/weekly_report.prom')
+            if prom_file:
+                self._atomic_write(Path(prom_file), self.to_prometheus())
+                written['prometheus'] = str(prom_file)
+
+            json_file = metrics_config.get('json_file', 'output/metrics/weekly_report_metrics.json')
+            snapshot = self.to_dict()
+            if json_file:
+                self._atomic_write(Path(json_file), json.dumps(snapshot, ensure_ascii=False, indent=2))
+                written['json'] = str(json_file)
+
+            # 追加一行到历史文件，便于本地按周绘制趋势
+            history_file = metrics_config.get('history_file', 'output/metrics/history.jsonl')
+            if history_file:
+                history_path = Path(history_file)
+                history_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(history_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+                written['history'] = str(history_file)
+
+            self.logger.info(f"✅ 运行指标已导出: {', '.join(written.values())}")
+        except Exception as e:
+            self.logger.warning(f"⚠️ 导出运行指标失败: {e}")
+
+        return written
+
+
+_run_metrics: Optional[RunMetrics] = None
+_run_metrics_lock = threading.Lock()
+
+
+def get_run_metrics() -> RunMetrics:
+    """
+    获取当前进程的运行指标收集器（单例）
+
+    Returns:
+        RunMetrics: 指标收集器
+    """
+    global _run_metrics
+    if _run_metrics is None:
+        with _run_metrics_lock:
+            if _run_metrics is None:
+                _run_metrics = RunMetrics()
+    return _run_metrics
+
+
+def reset_run_metrics() -> RunMetrics:
+    """重置运行指标（新的一次运行开始时调用）"""
+    global _run_metrics
+    with _run_metrics_lock:
+        _run_metrics = RunMetrics()
+    return _run_metrics
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试运行指标模块\n")
+
+    metrics = reset_run_metrics()
+
+    with metrics.timer('query_duration_seconds', section='traffic'):
+        time.sleep(0.01)
+    metrics.inc('section_rows_total', 143, section='traffic')
+    metrics.record_cache(False, section='traffic')
+    metrics.record_cache(True, section='revenue')
+
+    metrics._finalize(success=True)
+    print(metrics.to_prometheus())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+列类型模块
+
+根据 config.yaml 的 column_mappings 为每个部分生成列类型（schema），
+在查询结果解码时统一转换一次：日期统一为 YYYYMMDD 字符串，比率和金额为 float，人数为 int。
+之后的分析、校验、汇总和渲染直接使用已转换的值，不再逐行解析
+"""
+
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from src.logger import get_logger
+
+# 支持的列类型
+COLUMN_TYPES = ('date', 'int', 'float', 'rate', 'money', 'str')
+
+# 日期列（中文列名 / 英文键名）
+DATE_COLUMNS = ('日期', '周', '上周')
+DATE_KEYS = ('date', 'week', 'last_week')
+
+
+def infer_column_type(column: str, key: str = '') -> str:
+    """
+    根据列名推断列类型
+
+    Args:
+        column: 中文列名（SQL 返回的列名）
+        key: 英文键名（column_mappings 中的映射值）
+
+    Returns:
+        str: 列类型（date/int/rate/money/str）
+    """
+    key = (key or '').lower()
+    if column in DATE_COLUMNS or key in DATE_KEYS:
+        return 'date'
+    if '率' in column or '留存' in column or key.endswith('_rate'):
+        return 'rate'
+    if ('收入' in column or '客单价' in column or column.endswith('_Amt')
+            or 'amount' in key or 'revenue' in key or 'arpu' in key):
+        return 'money'
+    if column.endswith('数') or column.endswith('WAU') or key.endswith(('_users', '_visitors', '_registrations',
+                                                                        '_wau', '_count')):
+        return 'int'
+    return 'str'
+
+
+def build_schema(config: Dict = None) -> Dict[str, Dict[str, str]]:
+    """
+    从 column_mappings 生成各部分的列类型
+
+    列类型默认按列名推断，可在 column_mappings.<部分>.types 中按列名覆盖
+
+    Args:
+        config: 配置字典
+
+    Returns:
+        dict: {部分名称: {列名: 列类型}}
+    """
+    schema = {}
+    for section, section_config in ((config or {}).get('column_mappings', {}) or {}).items():
+        if not isinstance(section_config, dict):
+            continue
+        columns = section_config.get('columns', {}) or {}
+        if isinstance(columns, list):
+            columns = {column: '' for column in columns}
+        types = {column: infer_column_type(column, key) for column, key in columns.items()}
+        for column, column_type in (section_config.get('types', {}) or {}).items():
+            if column_type not in COLUMN_TYPES:
+                raise ValueError(f"{section}.{column} 的列类型未知: {column_type}")
+            types[column] = column_type
+        schema[section] = {column: column_type for column, column_type in types.items() if column_type != 'str'}
+    return schema
+
+
+def normalize_date(value) -> Optional[str]:
+    """
+    把日期值统一为 YYYYMMDD 字符串
+
+    Args:
+        value: 20260209、'20260209'、'2026-02-09'、'2026-02-09T00:00:00' 或 date/datetime
+
+    Returns:
+        str: YYYYMMDD，空值为 None；无法识别的值原样转为字符串
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y%m%d')
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    if len(text) >= 10 and text[4] == '-' and text[7] == '-':
+        return text[:4] + text[5:7] + text[8:10]
+    return text
+
+
+def _to_int(value):
+    """人数列：整数值的 float/字符串转为 int"""
+    if isinstance(value, str):
+        value = float(value.replace(',', ''))
+    if isinstance(value, float) and not value.is_integer():
+        return value
+    return int(value)
+
+
+def _to_float(value):
+    """比率/金额列：去掉千分位和百分号后转为 float（'12.5%' -> 0.125）"""
+    if isinstance(value, str):
+        text = value.replace(',', '').strip()
+        if text.endswith('%'):
+            return float(text[:-1]) / 100
+        return float(text)
+    return float(value)
+
+
+CONVERTERS: Dict[str, Callable] = {
+    'date': normalize_date,
+    'int': _to_int,
+    'float': _to_float,
+    'rate': _to_float,
+    'money': _to_float,
+}
+
+# 已是目标类型时跳过转换
+TYPED_CHECKS: Dict[str, Callable] = {
+    'date': lambda value: type(value) is str and len(value) == 8 and value.isdigit(),
+    'int': lambda value: type(value) is int,
+    'float': lambda value: type(value) is float,
+    'rate': lambda value: type(value) is float,
+    'money': lambda value: type(value) is float,
+}
+
+
+def apply_schema(rows: List[Dict], column_types: Dict[str, str], logger=None) -> List[Dict]:
+    """
+    按列类型原地转换查询结果（每个值只转换一次）
+
+    无法转换的值置为 None 并记录警告
+
+    Args:
+        rows: 查询结果
+        column_types: {列名: 列类型}
+        logger: 日志记录器
+
+    Returns:
+        list: 转换后的同一批数据行
+    """
+    if not rows or not column_types:
+        return rows
+
+    present = [(column, CONVERTERS[column_type], TYPED_CHECKS[column_type])
+               for column, column_type in column_types.items()
+               if column_type in CONVERTERS and column in rows[0]]
+    failures = {}
+    for row in rows:
+        for column, convert, is_typed in present:
+            value = row.get(column)
+            if value is None or is_typed(value):
+                continue
+            try:
+                row[column] = convert(value)
+            except (ValueError, TypeError):
+                row[column] = None
+                failures[column] = failures.get(column, 0) + 1
+
+    if failures:
+        logger = logger or get_logger('schema')
+        for column, count in failures.items():
+            logger.warning(f"⚠️ 列 {column} 有 {count} 个值无法转换为 {column_types[column]}，已置为空")
+    return rows
+
+
+def apply_section_schemas(
+    data: Dict[str, List[Dict]],
+    schema: Dict[str, Dict[str, str]],
+    logger=None
+) -> Dict[str, List[Dict]]:
+    """
+    按部分应用列类型
+
+    Args:
+        data: {部分名称: 数据行}
+        schema: build_schema 的结果
+        logger: 日志记录器
+
+    Returns:
+        dict: 转换后的同一份数据
+    """
+    for section, rows in data.items():
+        apply_schema(rows, schema.get(section, {}), logger=logger)
+    return data
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试列类型模块\n")
+
+    demo_schema = build_schema({'column_mappings': {'traffic': {'columns': {
+        '日期': 'date', '渠道': 'channel', '新访客数': 'new_visitors', '新访客注册转化率': 'new_visitor_conversion_rate'
+    }}}})
+    print(f"traffic schema: {demo_schema['traffic']}")
+
+    demo_rows = [{'日期': 20260209, '渠道': 'paid ads', '新访客数': '1,200', '新访客注册转化率': '12.5%'}]
+    print(apply_schema(demo_rows, demo_schema['traffic']))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+报告分段标记模块
+
+在生成的HTML中用注释标记包裹每个部分：
+    <!-- section:traffic:start -->...<!-- section:traffic:end -->
+
+Confluence差量发布时据此计算各部分哈希，并只替换页面中发生变化的部分
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+
+SECTION_START = '<!-- section:{name}:start -->'
+SECTION_END = '<!-- section:{name}:end -->'
+
+_SECTION_PATTERN = re.compile(
+    r'<!-- section:(?P<name>[\w-]+):start -->(?P<content>.*?)<!-- section:(?P=name):end -->',
+    re.DOTALL
+)
+
+
+def wrap_section(name: str, html: str) -> str:
+    """
+    用起止标记包裹一个部分
+
+    Args:
+        name: 部分名称
+        html: 部分HTML
+
+    Returns:
+        str: 带标记的HTML
+    """
+    return f"{SECTION_START.format(name=name)}\n{html}\n{SECTION_END.format(name=name)}"
+
+
+def split_sections(body: str) -> Dict[str, str]:
+    """
+    提取正文中所有带标记的部分
+
+    Args:
+        body: 页面正文
+
+    Returns:
+        dict: {部分名称: 部分内容（不含标记）}
+    """
+    return {m.group('name'): m.group('content') for m in _SECTION_PATTERN.finditer(body or '')}
+
+
+def hash_text(text: str) -> str:
+    """计算文本的 SHA-256（忽略首尾空白）"""
+    return hashlib.sha256((text or '').strip().encode('utf-8')).hexdigest()
+
+
+def section_hashes(body: str) -> Dict[str, str]:
+    """
+    计算正文中各部分的哈希
+
+    Args:
+        body: 页面正文
+
+    Returns:
+        dict: {部分名称: SHA-256}
+    """
+    return {name: hash_text(content) for name, content in split_sections(body).items()}
+
+
+def replace_sections(body: str, blocks: Dict[str, str]) -> Tuple[str, List[str]]:
+    """
+    把正文中指定部分替换为新内容，其余内容（包括人工编辑）保持不变
+
+    Args:
+        body: 原页面正文
+        blocks: {部分名称: 新的部分内容（不含标记）}
+
+    Returns:
+        tuple: (替换后的正文, 实际替换的部分列表)
+    """
+    replaced = []
+
+    def _replace(match):
+        name = match.group('name')
+        if name not in blocks:
+            return match.group(0)
+        replaced.append(name)
+        return f"{SECTION_START.format(name=name)}{blocks[name]}{SECTION_END.format(name=name)}"
+
+    return _SECTION_PATTERN.sub(_replace, body or ''), replaced
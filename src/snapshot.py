@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+数据快照模块
+
+把各部分的查询结果保存为带 schema 版本号的快照，并支持从快照目录
+重新加载，用于 --from-snapshot 模式（只做分析、渲染和发布，不访问数仓）
+
+早期的 JSON 快照格式（schema_version=1，仍可加载）：
+    {
+        "schema_version": 1,
+        "section": "traffic",
+        "description": "...",
+        "query": {"file": ..., "row_count": ..., "latest_week": ..., "fetched_at": ...},
+        "params": {...},
+        "data": [...]
+    }
+
+没有 schema_version 字段的历史归档文件视为版本 0，加载时自动升级
+
+DataFetcher 每次查询后由 save_binary_snapshot 写入紧凑的二进制快照：
+    output/archive/YYYY-MM/data/{section}_weekly_{YYYYMMDD}.arrow    (安装了 pyarrow，zstd 压缩，可 mmap)
+    output/archive/YYYY-MM/data/{section}_weekly_{YYYYMMDD}.json.gz  (未安装 pyarrow 或无法转为 Arrow 时的列式 gzip JSON)
+    output/archive/YYYY-MM/manifest.json                             (SQL哈希、行数、列、参数、时间戳)
+两种二进制格式都记录 schema_version（Arrow 写在 schema 元数据中）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.logger import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# 当前快照格式版本
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# 快照文件名：{section}_weekly_{YYYYMMDD}.{json|arrow|json.gz}
+SNAPSHOT_FILE_PATTERN = re.compile(
+    r'^(?P<section>[a-z_]+)_weekly_(?P<date>\d{8})\.(?P<ext>json|arrow|json\.gz)$'
+)
+
+# 二进制格式 -> 文件扩展名
+BINARY_FORMATS = {
+    'arrow': 'arrow',
+    'json.gz': 'json.gz',
+}
+
+# 同一部分同一日期存在多种格式时的加载优先级（越小越优先）
+_FORMAT_PRIORITY = {'arrow': 0, 'json.gz': 1, 'json': 2}
+
+MANIFEST_FILE = 'manifest.json'
+
+# 清单文件读写锁（并发获取多个部分时共用同一个清单）
+_manifest_lock = threading.Lock()
+
+# 各部分的日期列（用于推断快照中的最新周）
+_DATE_COLUMNS = ('日期', '周', '上周')
+
+
+def _latest_date(data: List[Dict]) -> Optional[str]:
+    """推断数据中的最新日期"""
+    dates = []
+    for row in data:
+        for col in _DATE_COLUMNS:
+            value = row.get(col) if isinstance(row, dict) else None
+            if value is not None:
+                dates.append(str(value))
+                break
+    return max(dates) if dates else None
+
+
+def _upgrade_snapshot(doc: Dict, path: Path) -> Dict:
+    """
+    把旧版本快照升级到当前版本
+
+    Args:
+        doc: 快照文件内容
+        path: 快照文件路径（用于补全 section）
+
+    Returns:
+        dict: 当前版本格式的快照
+    """
+    version = doc.get('schema_version', 0)
+
+    if version == 0:
+        # 历史归档：{"section", "description", "query", "data"}，没有版本号和参数
+        match = SNAPSHOT_FILE_PATTERN.match(path.name)
+        doc = {
+            'schema_version': SNAPSHOT_SCHEMA_VERSION,
+            'section': doc.get('section') or (match.group('section') if match else path.stem),
+            'description': doc.get('description', ''),
+            'query': dict(doc.get('query') or {}),
+            'params': {},
+            'data': doc.get('data') or []
+        }
+
+    return doc
+
+
+def load_snapshot_file(path: str, logger=None) -> Optional[Dict]:
+    """
+    加载单个快照文件
+
+    Args:
+        path: 快照文件路径
+        logger: 日志记录器
+
+    Returns:
+        dict: 当前版本格式的快照，加载失败返回 None
+    """
+    logger = logger or get_logger('snapshot')
+    path = Path(path)
+
+    if path.suffix == '.arrow' or path.name.endswith('.json.gz'):
+        return load_binary_snapshot(path, logger)
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            doc = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"❌ 读取快照失败 {path}: {e}")
+        return None
+
+    if not isinstance(doc, dict) or not isinstance(doc.get('data', []), list):
+        logger.error(f"❌ 快照格式无效: {path}")
+        return None
+
+    version = doc.get('schema_version', 0)
+    if version > SNAPSHOT_SCHEMA_VERSION:
+        logger.error(f"❌ 快照版本 {version} 高于当前支持的版本 {SNAPSHOT_SCHEMA_VERSION}: {path}")
+        return None
+
+    return _upgrade_snapshot(doc, path)
+
+
+def find_snapshot_files(snapshot_dir: str, max_date: str = None) -> Dict[str, Path]:
+    """
+    在目录中查找每个部分的快照文件
+
+    会递归查找 {section}_weekly_{YYYYMMDD}.{json|arrow|json.gz}，每个部分取不晚于
+    max_date 的最新一份；同一日期有多种格式时优先使用二进制快照
+
+    Args:
+        snapshot_dir: 快照目录（可以是 output/archive、某个月份目录或 json 目录）
+        max_date: 最晚日期 YYYYMMDD（可选）
+
+    Returns:
+        dict: {section: 快照文件路径}
+    """
+    candidates: Dict[str, List] = {}
+    for path in Path(snapshot_dir).rglob('*_weekly_*'):
+        match = SNAPSHOT_FILE_PATTERN.match(path.name)
+        if not match:
+            continue
+        if match.group('ext') == 'arrow' and not HAS_PYARROW:
+            continue
+        priority = -_FORMAT_PRIORITY[match.group('ext')]
+        candidates.setdefault(match.group('section'), []).append((match.group('date'), priority, path))
+
+    selected = {}
+    for section, files in candidates.items():
+        files.sort()
+        eligible = [item for item in files if max_date is None or item[0] <= max_date]
+        # 没有不晚于目标日期的快照时退回到最新一份
+        selected[section] = (eligible or files)[-1][2]
+
+    return selected
+
+
+def load_snapshot_dir(
+    snapshot_dir: str,
+    sections: List[str] = None,
+    max_date: str = None,
+    logger=None
+) -> Dict[str, List[Dict]]:
+    """
+    从快照目录加载各部分数据
+
+    Args:
+        snapshot_dir: 快照目录
+        sections: 需要的部分列表（默认加载目录中所有部分）
+        max_date: 最晚日期 YYYYMMDD（可选）
+        logger: 日志记录器
+
+    Returns:
+        dict: {section: 数据行列表}，缺失的部分为空列表
+    """
+    logger = logger or get_logger('snapshot')
+
+    if not Path(snapshot_dir).is_dir():
+        logger.error(f"❌ 快照目录不存在: {snapshot_dir}")
+        return {section: [] for section in sections or []}
+
+    files = find_snapshot_files(snapshot_dir, max_date)
+    results = {}
+
+    for section in sections or sorted(files):
+        path = files.get(section)
+        if path is None:
+            logger.warning(f"⚠️ 未找到 {section} 的快照")
+            results[section] = []
+            continue
+
+        snapshot = load_snapshot_file(path, logger)
+        results[section] = snapshot['data'] if snapshot else []
+        if snapshot:
+            logger.info(f"✅ 已加载 {section} 快照: {path.name}（{len(results[section])} 行）")
+
+    return results
+
+
+def load_section_history(
+    snapshot_dir: str,
+    section: str,
+    date_column: str = '日期',
+    max_date: str = None,
+    logger=None
+) -> List[Dict]:
+    """
+    合并一个部分的所有快照，得到本地缓存的完整历史
+
+    每份快照只覆盖查询时的12周窗口，按快照日期从旧到新合并；同一数据日期
+    出现在多份快照中时以较新的快照为准（晚到的数据修正会覆盖旧值）
+
+    Args:
+        snapshot_dir: 快照目录
+        section: 部分名称
+        date_column: 数据行的日期列
+        max_date: 只合并不晚于该日期的快照 YYYYMMDD（可选）
+        logger: 日志记录器
+
+    Returns:
+        list: 按数据日期升序排列的数据行
+    """
+    logger = logger or get_logger('snapshot')
+
+    # 每个快照日期只取一种格式（优先二进制），与 find_snapshot_files 一致
+    files: Dict[str, tuple] = {}
+    for path in Path(snapshot_dir).rglob(f'{section}_weekly_*'):
+        match = SNAPSHOT_FILE_PATTERN.match(path.name)
+        if not match or match.group('section') != section:
+            continue
+        if match.group('ext') == 'arrow' and not HAS_PYARROW:
+            continue
+        if max_date and match.group('date') > max_date:
+            continue
+        priority = -_FORMAT_PRIORITY[match.group('ext')]
+        date = match.group('date')
+        if date not in files or priority > files[date][0]:
+            files[date] = (priority, path)
+
+    history: Dict[str, List[Dict]] = {}
+    for date in sorted(files):
+        snapshot = load_snapshot_file(files[date][1], logger)
+        if not snapshot:
+            continue
+        by_date: Dict[str, List[Dict]] = {}
+        for row in snapshot['data']:
+            by_date.setdefault(str(row.get(date_column)), []).append(row)
+        history.update(by_date)
+
+    logger.info(f"✅ 已合并 {section} 的 {len(files)} 份快照（{len(history)} 个日期）")
+    return [row for date in sorted(history) for row in history[date]]
+
+
+# ==================== 二进制快照 ====================
+
+def resolve_snapshot_format(fmt: str = 'auto') -> str:
+    """
+    确定二进制快照格式
+
+    Args:
+        fmt: 配置的格式（auto / arrow / json.gz）
+
+    Returns:
+        str: 实际使用的格式（没有 pyarrow 时 arrow 退回 json.gz）
+    """
+    if fmt == 'arrow' and HAS_PYARROW:
+        return 'arrow'
+    if fmt == 'auto':
+        return 'arrow' if HAS_PYARROW else 'json.gz'
+    return 'json.gz'
+
+
+def _columns(rows: List[Dict]) -> List[str]:
+    """按首次出现顺序收集列名"""
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def _atomic_write_bytes(path: Path, content: bytes) -> None:
+    """先写临时文件再重命名，避免读到半个文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def _write_arrow(path: Path, rows: List[Dict]) -> None:
+    """写入 zstd 压缩的 Arrow IPC 文件（schema 元数据记录 schema_version）"""
+    table = pa.Table.from_pylist(rows)
+    table = table.replace_schema_metadata({'schema_version': str(SNAPSHOT_SCHEMA_VERSION)})
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    _atomic_write_bytes(path, sink.getvalue().to_pybytes())
+
+
+def _read_arrow(path: Path) -> Tuple[List[Dict], int]:
+    """以内存映射方式读取 Arrow IPC 文件，返回 (数据行, schema_version)"""
+    with pa.memory_map(str(path), 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    metadata = table.schema.metadata or {}
+    # 早期写入的 Arrow 快照没有版本号，与当前版本格式相同
+    version = int(metadata.get(b'schema_version', SNAPSHOT_SCHEMA_VERSION))
+    return table.to_pylist(), version
+
+
+def _write_json_gz(path: Path, rows: List[Dict]) -> None:
+    """写入列式 gzip JSON（列名只存一次）"""
+    columns = _columns(rows)
+    doc = {
+        'schema_version': SNAPSHOT_SCHEMA_VERSION,
+        'columns': columns,
+        'values': {col: [row.get(col) for row in rows] for col in columns},
+        'row_count': len(rows)
+    }
+    payload = json.dumps(doc, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    _atomic_write_bytes(path, gzip.compress(payload, compresslevel=6))
+
+
+def _read_json_gz(path: Path) -> Tuple[List[Dict], int]:
+    """读取列式 gzip JSON，返回 (数据行, schema_version)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        doc = json.load(f)
+    columns = doc.get('columns', [])
+    values = doc.get('values', {})
+    rows = [
+        {col: values[col][i] for col in columns}
+        for i in range(doc.get('row_count', 0))
+    ]
+    return rows, doc.get('schema_version', SNAPSHOT_SCHEMA_VERSION)
+
+
+def _update_manifest(month_dir: Path, key: str, entry: Dict) -> None:
+    """更新月份目录下的清单文件"""
+    manifest_path = month_dir / MANIFEST_FILE
+    with _manifest_lock:
+        manifest = load_manifest(month_dir)
+        manifest.setdefault('snapshots', {})[key] = entry
+        manifest['schema_version'] = SNAPSHOT_SCHEMA_VERSION
+        manifest['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        _atomic_write_bytes(
+            manifest_path,
+            json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        )
+
+
+def load_manifest(month_dir: str) -> Dict:
+    """
+    读取月份目录下的快照清单
+
+    Args:
+        month_dir: 月份目录（如 output/archive/2026-02）
+
+    Returns:
+        dict: 清单内容，不存在时返回空字典
+    """
+    manifest_path = Path(month_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_binary_snapshot(
+    section: str,
+    data: List[Dict],
+    params: Dict,
+    sql: str = '',
+    output_dir: str = 'output/archive',
+    fmt: str = 'auto',
+    sql_file: str = None,
+    logger=None
+) -> Optional[str]:
+    """
+    保存二进制快照并记录到清单
+
+    Args:
+        section: 部分名称
+        data: 查询结果
+        params: 日期参数（calculate_week_params 的返回值）
+        sql: 实际执行的SQL（用于计算哈希）
+        output_dir: 归档根目录
+        fmt: 格式（auto / arrow / json.gz）
+        sql_file: 对应的SQL文件
+        logger: 日志记录器
+
+    Returns:
+        str: 快照文件路径，失败返回 None
+    """
+    logger = logger or get_logger('snapshot')
+
+    fmt = resolve_snapshot_format(fmt)
+    snapshot_date = params.get('snapshot_date') or datetime.now().strftime('%Y%m%d')
+    month_dir = Path(output_dir) / f"{snapshot_date[:4]}-{snapshot_date[4:6]}"
+    file_name = f"{section}_weekly_{snapshot_date}.{BINARY_FORMATS[fmt]}"
+    path = month_dir / 'data' / file_name
+
+    try:
+        if fmt == 'arrow':
+            try:
+                _write_arrow(path, data)
+            except (pa.ArrowException, OverflowError) as e:
+                # 混合类型等无法转为 Arrow 的列：改存 json.gz，避免本周归档丢失
+                logger.warning(f"⚠️ {section} 无法转为 Arrow（{e}），改存 json.gz")
+                path.unlink(missing_ok=True)  # 同一日期的旧 Arrow 快照会优先加载，需要删除
+                fmt = 'json.gz'
+                file_name = f"{section}_weekly_{snapshot_date}.{BINARY_FORMATS[fmt]}"
+                path = month_dir / 'data' / file_name
+
+        if fmt != 'arrow':
+            _write_json_gz(path, data)
+
+        _update_manifest(month_dir, f"{section}_{snapshot_date}", {
+            'section': section,
+            'snapshot_date': snapshot_date,
+            'file': f"data/{file_name}",
+            'format': fmt,
+            'rows': len(data),
+            'columns': _columns(data),
+            'bytes': path.stat().st_size,
+            'sql_file': sql_file,
+            'sql_sha256': hashlib.sha256(sql.encode('utf-8')).hexdigest() if sql else None,
+            'latest_week': _latest_date(data),
+            'params': {k: v for k, v in params.items() if isinstance(v, (str, int, float, bool))},
+            'fetched_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+        logger.info(f"✅ {section} 快照已保存: {path}（{len(data)} 行，{path.stat().st_size} 字节）")
+        return str(path)
+    except Exception as e:
+        logger.warning(f"⚠️ 保存 {section} 二进制快照失败: {e}")
+        return None
+
+
+def load_binary_snapshot(path: str, logger=None) -> Optional[Dict]:
+    """
+    加载二进制快照（格式由扩展名决定），并从清单补全查询信息
+
+    Args:
+        path: 快照文件路径
+        logger: 日志记录器
+
+    Returns:
+        dict: 与 JSON 快照相同结构的字典，加载失败返回 None
+    """
+    logger = logger or get_logger('snapshot')
+    path = Path(path)
+
+    try:
+        if path.suffix == '.arrow':
+            if not HAS_PYARROW:
+                logger.error(f"❌ 读取 {path.name} 需要安装 pyarrow")
+                return None
+            rows, version = _read_arrow(path)
+        else:
+            rows, version = _read_json_gz(path)
+    except Exception as e:
+        logger.error(f"❌ 读取快照失败 {path}: {e}")
+        return None
+
+    if version > SNAPSHOT_SCHEMA_VERSION:
+        logger.error(f"❌ 快照版本 {version} 高于当前支持的版本 {SNAPSHOT_SCHEMA_VERSION}: {path}")
+        return None
+
+    match = SNAPSHOT_FILE_PATTERN.match(path.name)
+    section = match.group('section') if match else path.name.split('_weekly_')[0]
+    date = match.group('date') if match else ''
+    entry = load_manifest(path.parent.parent).get('snapshots', {}).get(f"{section}_{date}", {})
+
+    return {
+        'schema_version': SNAPSHOT_SCHEMA_VERSION,
+        'section': section,
+        'description': '',
+        'query': {
+            'file': entry.get('sql_file'),
+            'row_count': len(rows),
+            'latest_week': entry.get('latest_week'),
+            'fetched_at': entry.get('fetched_at'),
+            'sql_sha256': entry.get('sql_sha256')
+        },
+        'params': {'snapshot_date': date, **entry.get('params', {})},
+        'data': rows
+    }
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试数据快照模块\n")
+
+    archive_dir = Path(__file__).parent.parent / 'output' / 'archive'
+    for section, path in sorted(find_snapshot_files(str(archive_dir)).items()):
+        snapshot = load_snapshot_file(path)
+        print(f"{section}: {path.name}, schema_version={snapshot['schema_version']}, rows={len(snapshot['data'])}")
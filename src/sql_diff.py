@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+SQL 差分测试模块
+
+改写慢查询时，新旧两个版本在本地 SQLite 中用同一份合成数据各执行一次，
+逐行比较结果，保证改写前后口径完全一致后再替换线上SQL
+
+只改写差分所需的少量方言差异（DATE_FORMAT(DATE_ADD(...)) 日期运算、IF），
+不是通用的 StarRocks -> SQLite 翻译器
+"""
+
+import random
+import re
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from src.logger import get_logger
+
+# 数仓方言 -> SQLite 的改写规则（按顺序应用）
+SQLITE_REWRITES = [
+    # DATE_FORMAT(DATE_ADD(ds, INTERVAL -6 DAY), '%Y%m%d')：ds 为 YYYYMMDD 字符串
+    (re.compile(r"DATE_FORMAT\(DATE_ADD\(([\w.]+), INTERVAL (-?\d+) DAY\), '%Y%m%d'\)"),
+     r"strftime('%Y%m%d', date(substr(\1, 1, 4) || '-' || substr(\1, 5, 2) || '-' || substr(\1, 7, 2), '\2 day'))"),
+    (re.compile(r"\bIF\("), "IIF("),
+]
+
+
+def to_sqlite(sql: str) -> str:
+    """
+    把数仓SQL片段改写为 SQLite 可执行的SQL
+
+    Args:
+        sql: 数仓SQL
+
+    Returns:
+        str: SQLite SQL
+    """
+    for pattern, replacement in SQLITE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def extract_cte(sql: str, name: str) -> str:
+    """
+    从SQL中取出指定 CTE 的定义体（括号内的查询）
+
+    Args:
+        sql: 完整SQL
+        name: CTE 名称
+
+    Returns:
+        str: CTE 的查询体
+
+    Raises:
+        ValueError: 找不到该 CTE 时
+    """
+    match = re.search(rf"\b{re.escape(name)}\s+AS\s*\(", sql)
+    if not match:
+        raise ValueError(f"SQL中没有 CTE: {name}")
+
+    depth = 1
+    start = match.end()
+    for index in range(start, len(sql)):
+        if sql[index] == '(':
+            depth += 1
+        elif sql[index] == ')':
+            depth -= 1
+            if depth == 0:
+                return sql[start:index]
+    raise ValueError(f"CTE {name} 的括号不匹配")
+
+
+def run_sqlite(sql: str, tables: Dict[str, List[Dict]]) -> List[Dict]:
+    """
+    在内存 SQLite 中建表并执行查询
+
+    Args:
+        sql: SQLite SQL
+        tables: {表名: 数据行}（列取第一行的键）
+
+    Returns:
+        list: 查询结果行
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    try:
+        for table, rows in tables.items():
+            columns = list(rows[0].keys()) if rows else []
+            conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+            placeholders = ', '.join('?' for _ in columns)
+            conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                             [tuple(row.get(col) for col in columns) for row in rows])
+        return [dict(row) for row in conn.execute(sql).fetchall()]
+    finally:
+        conn.close()
+
+
+def compare_results(reference: List[Dict], candidate: List[Dict]) -> Dict:
+    """
+    比较两组查询结果（与行顺序无关）
+
+    Args:
+        reference: 原查询结果
+        candidate: 改写后的查询结果
+
+    Returns:
+        dict: {'equal', 'reference_rows', 'candidate_rows', 'only_reference', 'only_candidate'}
+    """
+    ref_counter = Counter(tuple(sorted(row.items())) for row in reference)
+    cand_counter = Counter(tuple(sorted(row.items())) for row in candidate)
+    only_reference = [dict(row) for row in (ref_counter - cand_counter).elements()]
+    only_candidate = [dict(row) for row in (cand_counter - ref_counter).elements()]
+    return {
+        'equal': not only_reference and not only_candidate,
+        'reference_rows': len(reference),
+        'candidate_rows': len(candidate),
+        'only_reference': only_reference,
+        'only_candidate': only_candidate,
+    }
+
+
+def synthetic_daily_pv(
+    users: int = 50,
+    start: str = '20260105',
+    days: int = 56,
+    activity: float = 0.35,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    生成 user_daily_pv(userid, ds, pv) 合成数据
+
+    活跃日随机分布（包含连续活跃、间隔6天、7天和更长的空档），用于覆盖滚动窗口的边界
+
+    Args:
+        users: 用户数
+        start: 起始日期 YYYYMMDD
+        days: 天数
+        activity: 每个用户每天活跃的概率
+        seed: 随机种子
+
+    Returns:
+        list: 每个用户每天最多一行
+    """
+    rng = random.Random(seed)
+    first_day = datetime.strptime(start, '%Y%m%d')
+    rows = []
+    for userid in range(1, users + 1):
+        for offset in range(days):
+            if rng.random() < activity:
+                day = (first_day + timedelta(days=offset)).strftime('%Y%m%d')
+                rows.append({'userid': userid, 'ds': day, 'pv': rng.randint(1, 4)})
+    return rows
+
+
+def check_activation_rolling_pv(base_path: str = None, seeds=(0, 1, 2), logger=None) -> Dict:
+    """
+    差分测试激活SQL的滚动PV步骤：自连接写法 vs 窗口函数写法
+
+    Args:
+        base_path: 项目根目录
+        seeds: 合成数据的随机种子
+        logger: 日志记录器
+
+    Returns:
+        dict: {'equal': 是否全部一致, 'runs': [各种子的 compare_results 结果]}
+    """
+    logger = logger or get_logger('sql_diff')
+    sql_dir = Path(base_path or Path(__file__).parent.parent) / 'sql'
+    reference_sql = to_sqlite((sql_dir / 'reference' / '02_rolling_pv_selfjoin.sql').read_text(encoding='utf-8'))
+    candidate_body = extract_cte((sql_dir / '02_activation_ready.sql').read_text(encoding='utf-8'), 'user_rolling_pv')
+    candidate_sql = to_sqlite(
+        f"WITH user_rolling_pv AS ({candidate_body})\nSELECT userid, ds, total_pv\nFROM user_rolling_pv"
+    )
+
+    runs = []
+    for seed in seeds:
+        tables = {'user_daily_pv': synthetic_daily_pv(seed=seed)}
+        result = compare_results(run_sqlite(reference_sql, tables), run_sqlite(candidate_sql, tables))
+        result['seed'] = seed
+        runs.append(result)
+        if result['equal']:
+            logger.info(f"✅ 种子 {seed}: 两种写法结果一致（{result['reference_rows']} 行）")
+        else:
+            logger.error(f"❌ 种子 {seed}: 结果不一致，仅自连接 {len(result['only_reference'])} 行，"
+                         f"仅窗口函数 {len(result['only_candidate'])} 行")
+
+    return {'equal': all(run['equal'] for run in runs), 'runs': runs}
+
+
+if __name__ == "__main__":
+    # 测试代码
+    print("测试SQL差分模块\n")
+
+    outcome = check_activation_rolling_pv(seeds=range(5))
+    print(f"激活SQL滚动PV改写结果一致: {outcome['equal']}")
@@ -29,33 +29,50 @@ def get_column_mapping_for_section(
     return section_config.get('columns', {})
 
 
+def get_column_aliases_for_section(
+    config: Dict,
+    section: str
+) -> Dict[str, str]:
+    """
+    从配置中获取指定部分的列别名（英文键名和 aliases 中声明的别名）
+
+    Args:
+        config: 配置字典
+        section: 部分名称
+
+    Returns:
+        dict: 别名表 {别名: 中文列名}
+    """
+    from src.result_set import column_aliases
+
+    section_config = config.get('column_mappings', {}).get(section, {})
+    return column_aliases(section_config.get('columns', {}), section_config.get('aliases', {}))
+
+
 def apply_column_mapping(
     data: List[Dict],
     column_mapping: Dict[str, str]
-) -> List[Dict]:
+):
     """
     应用列名映射到查询结果
 
+    只在表头合并别名，不复制数据行：返回的 ResultSet 按下标取出的行
+    同时支持中文列名和英文键名访问
+
     Args:
-        data: 查询结果列表
+        data: 查询结果列表（或已包装的 ResultSet）
         column_mapping: 列名映射字典 {中文列名: 英文键名}
 
     Returns:
-        list: 映射后的数据
+        ResultSet: 共享原始数据行的结果集（无映射时原样返回）
     """
     if not column_mapping:
         return data
 
-    mapped_data = []
-    for row in data:
-        mapped_row = {}
-        for key, value in row.items():
-            # 如果有映射规则，使用映射后的键名；否则保持原键名
-            new_key = column_mapping.get(key, key)
-            mapped_row[new_key] = value
-        mapped_data.append(mapped_row)
-
-    return mapped_data
+    from src.result_set import ResultSet
+    if isinstance(data, ResultSet):
+        return data.rename(column_mapping)
+    return ResultSet.from_mapping(data, column_mapping)
 
 
 def load_config(config_path: str = None) -> Dict:
@@ -100,14 +117,21 @@ def replace_sql_params(sql_content: str, params: Dict) -> str:
         '{pay_end_date}': params.get('pay_end_date', ''),
     }
 
-    for placeholder, value in replacements.items():
+    # 收入拆分SQL（06~08）使用 {{ds}} 形式的占位符，取本周和上周两周数据用于环比
+    double_brace = {
+        '{{ds}}': params.get('snapshot_date', ''),
+        '{{date_start}}': params.get('last_week_monday', params.get('partition_start', '')),
+        '{{date_end}}': params.get('week_sunday', ''),
+    }
+
+    for placeholder, value in {**double_brace, **replacements}.items():
         result = result.replace(placeholder, value)
 
     # 修复中文列名的反引号问题 - 直接去除中文列名的反引号
     # Metabase API通过JSON传递SQL时，反引号可能导致解析问题
-    # 查找所有 `中文字符串` 格式并去除反引号
+    # 查找所有 `中文字符串` 格式（含 收入_美元 这类中英混合列名）并去除反引号
     import re
-    result = re.sub(r'`([\u4e00-\u9fff]+)`', r'\1', result)
+    result = re.sub(r'`(\w*[\u4e00-\u9fff]\w*)`', r'\1', result)
 
     return result
 
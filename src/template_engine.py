@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+共享模板引擎
+
+每个进程、每个模板目录只创建一个 Jinja2 Environment，
+并按 config/templates.yaml 的 rendering.cache_enabled 启用
+FileSystemBytecodeCache：模板编译结果写入磁盘（默认用户缓存目录，不写入仓库），
+新进程启动时直接加载字节码，不再重新编译 templates/confluence/ 下的所有模板
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import yaml
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from src.logger import get_logger
+
+PROJECT_ROOT = Path(__file__).parent.parent
+TEMPLATES_CONFIG_FILE = PROJECT_ROOT / 'config' / 'templates.yaml'
+
+
+def _default_cache_dir() -> Path:
+    """默认字节码缓存目录：$XDG_CACHE_HOME 或 ~/.cache，取不到用户目录时使用系统临时目录"""
+    try:
+        base = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    except RuntimeError:
+        base = Path(tempfile.gettempdir())
+    return base / 'weekly_report' / 'jinja'
+
+
+DEFAULT_BYTECODE_CACHE_DIR = _default_cache_dir()
+
+_envs: Dict[tuple, Environment] = {}
+_envs_lock = threading.Lock()
+_rendering_config: Optional[Dict] = None
+
+logger = get_logger('template_engine')
+
+
+def load_rendering_config(config_file: str = None) -> Dict:
+    """
+    读取 templates.yaml 中的 rendering 配置（进程内只读取一次）
+
+    Args:
+        config_file: 配置文件路径，默认 config/templates.yaml
+
+    Returns:
+        dict: rendering 配置，文件不存在或解析失败时返回空字典
+    """
+    global _rendering_config
+    if _rendering_config is not None and config_file is None:
+        return _rendering_config
+
+    path = Path(config_file) if config_file else TEMPLATES_CONFIG_FILE
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rendering = (yaml.safe_load(f) or {}).get('rendering', {}) or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"⚠️ 读取模板配置失败，使用默认渲染配置: {e}")
+        rendering = {}
+
+    if config_file is None:
+        _rendering_config = rendering
+    return rendering
+
+
+def get_template_env(
+    template_dir,
+    rendering: Dict = None,
+    filters: Dict[str, Callable] = None,
+    **options
+) -> Environment:
+    """
+    获取模板目录对应的共享 Environment
+
+    Args:
+        template_dir: 模板目录
+        rendering: 渲染配置，默认读取 templates.yaml
+        filters: 创建环境时注册的过滤器（须为无状态的模块级函数），参与缓存键
+        **options: 额外的 Environment 参数（如 trim_blocks），参与缓存键
+
+    Returns:
+        Environment: 同一目录、同一参数在进程内复用的环境（调用方不应再修改其 filters）
+    """
+    rendering = load_rendering_config() if rendering is None else rendering
+    template_dir = Path(template_dir).resolve()
+    cache_enabled = rendering.get('cache_enabled', True)
+    filters = filters or {}
+    key = (str(template_dir), cache_enabled, tuple(sorted(options.items())),
+           tuple(sorted(filters.items(), key=lambda item: item[0])))
+
+    with _envs_lock:
+        env = _envs.get(key)
+        if env is not None:
+            return env
+
+        env_options = {'autoescape': rendering.get('autoescape', False), **options}
+        if cache_enabled:
+            cache_dir = Path(rendering.get('bytecode_cache_dir') or DEFAULT_BYTECODE_CACHE_DIR)
+            if not cache_dir.is_absolute():
+                cache_dir = PROJECT_ROOT / cache_dir
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                # 字节码与 trim_blocks 等编译参数相关，不同参数的环境使用不同的缓存文件
+                tag = hashlib.sha1(repr(sorted(env_options.items())).encode('utf-8')).hexdigest()[:8]
+                env_options['bytecode_cache'] = FileSystemBytecodeCache(str(cache_dir), f'__jinja2_{tag}_%s.cache')
+            except OSError as e:
+                logger.warning(f"⚠️ 无法创建模板字节码缓存目录，禁用缓存: {e}")
+
+        env = Environment(loader=FileSystemLoader(str(template_dir)), **env_options)
+        env.filters.update(filters)
+        _envs[key] = env
+        return env
+
+
+def warm_template_cache(env: Environment) -> int:
+    """
+    预编译环境中的全部模板（写入字节码缓存）
+
+    Args:
+        env: 模板环境
+
+    Returns:
+        int: 编译的模板数
+    """
+    count = 0
+    for name in env.list_templates(filter_func=lambda n: n.endswith(('.html', '.md'))):
+        try:
+            env.get_template(name)
+            count += 1
+        except Exception as e:
+            logger.warning(f"⚠️ 预编译模板失败 {name}: {e}")
+    return count
+
+
+def clear_template_envs() -> None:
+    """清空进程内的共享环境（用于测试或模板配置变更后）"""
+    global _rendering_config
+    with _envs_lock:
+        _envs.clear()
+    _rendering_config = None
+
+
+if __name__ == "__main__":
+    # 测试代码：预编译 Confluence 模板
+    import time
+
+    print("测试共享模板引擎\n")
+
+    start = time.perf_counter()
+    env = get_template_env(PROJECT_ROOT / 'templates' / 'confluence')
+    count = warm_template_cache(env)
+    print(f"预编译 {count} 个模板，耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"字节码缓存: {load_rendering_config().get('cache_enabled', True)}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+导入耗时分析工具
+
+通过包装导入系统的 importlib._bootstrap._find_and_load 记录每个模块首次导入的自身耗时和累计耗时，
+import 语句、importlib.import_module（如 src.core 的按需导出）和父包导入都经过这里，
+输出格式与 `python -X importtime` 一致，用于排查CLI启动慢的问题
+"""
+
+import importlib._bootstrap as _bootstrap
+import sys
+import time
+from typing import List, Optional, TextIO, Tuple
+
+# (模块名, 自身耗时us, 累计耗时us, 嵌套深度)
+_records: List[Tuple[str, int, int, int]] = []
+_stack: List[List[int]] = []
+_original_find_and_load = None
+
+
+def _profiled_find_and_load(name, import_):
+    """记录首次导入耗时的 _find_and_load 包装（name 已是绝对模块名）"""
+    # 已加载的模块直接走原始实现，不计入统计
+    if name in sys.modules:
+        return _original_find_and_load(name, import_)
+
+    depth = len(_stack)
+    _stack.append([0])  # 子模块累计耗时
+    start = time.perf_counter()
+    try:
+        return _original_find_and_load(name, import_)
+    finally:
+        cumulative = int((time.perf_counter() - start) * 1e6)
+        children = _stack.pop()[0]
+        if _stack:
+            _stack[-1][0] += cumulative
+        _records.append((name, cumulative - children, cumulative, depth))
+
+
+def enable_import_profile() -> None:
+    """开始记录后续导入的耗时"""
+    global _original_find_and_load
+    if _original_find_and_load is not None:
+        return
+    _original_find_and_load = _bootstrap._find_and_load
+    _bootstrap._find_and_load = _profiled_find_and_load
+
+
+def disable_import_profile() -> None:
+    """停止记录并恢复原始 _find_and_load"""
+    global _original_find_and_load
+    if _original_find_and_load is None:
+        return
+    _bootstrap._find_and_load = _original_find_and_load
+    _original_find_and_load = None
+
+
+def get_import_records() -> List[Tuple[str, int, int, int]]:
+    """
+    获取已记录的导入耗时
+
+    Returns:
+        list: [(模块名, 自身耗时us, 累计耗时us, 嵌套深度), ...]，按导入完成顺序
+    """
+    return list(_records)
+
+
+def report_import_profile(stream: Optional[TextIO] = None, top: int = 15) -> None:
+    """
+    输出导入耗时报告
+
+    Args:
+        stream: 输出流（默认 stderr）
+        top: 额外列出累计耗时最高的模块数
+    """
+    stream = stream or sys.stderr
+    records = get_import_records()
+
+    stream.write("import time: self [us] | cumulative | imported package\n")
+    for name, self_us, cumulative_us, depth in records:
+        stream.write(f"import time: {self_us:>9} | {cumulative_us:>10} | {'  ' * depth}{name}\n")
+
+    top_level_total = sum(r[2] for r in records if r[3] == 0)
+    stream.write(f"\n导入总耗时: {top_level_total / 1000:.1f} ms，共 {len(records)} 个模块\n")
+    stream.write(f"累计耗时最高的 {top} 个模块:\n")
+    for name, _, cumulative_us, _ in sorted(records, key=lambda r: r[2], reverse=True)[:top]:
+        stream.write(f"  {cumulative_us / 1000:>8.1f} ms  {name}\n")
+
+
+if __name__ == "__main__":
+    # 测试代码
+    enable_import_profile()
+    import json  # noqa: F401
+    import email.mime.text  # noqa: F401
+    disable_import_profile()
+    report_import_profile(sys.stdout)
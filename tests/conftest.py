@@ -85,3 +85,16 @@ def logger():
     """日志fixture"""
     from src.logger import get_logger
     return get_logger('test')
+
+
+@pytest.fixture(autouse=True, scope='session')
+def template_bytecode_cache(tmp_path_factory):
+    """模板字节码缓存写入临时目录，测试不在用户缓存目录或仓库中留下文件"""
+    from src import template_engine
+
+    patcher = pytest.MonkeyPatch()
+    patcher.setattr(template_engine, 'DEFAULT_BYTECODE_CACHE_DIR', tmp_path_factory.mktemp('jinja_cache'))
+    template_engine.clear_template_envs()
+    yield
+    template_engine.clear_template_envs()
+    patcher.undo()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+异常检测测试
+
+测试矩阵构建、zscore/MAD 打分、所有分组×指标的扫描、次周类部分的目标周，以及写入关注事项和质量报告
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from src import anomaly
+from src.anomaly import AnomalyDetector, build_matrix, score_series
+from src.data_quality import DataQualityAnalyzer
+
+MONDAYS = [(datetime(2025, 11, 3) + timedelta(weeks=week)).strftime('%Y%m%d') for week in range(14)]
+
+
+def _traffic_rows(spike_channel=None, spike_value=None):
+    """三个渠道14周的周粒度流量数据，可在最后一周制造一个突变"""
+    rng = random.Random(1)
+    rows = []
+    for channel in ('paid ads', 'organic', 'referral'):
+        for day in MONDAYS:
+            visitors = 1000 + rng.randint(-40, 40)
+            if channel == spike_channel and day == MONDAYS[-1]:
+                visitors = spike_value
+            registrations = visitors // 10
+            rows.append({'日期': day, '渠道': channel, '新访客数': visitors, '新访客注册数': registrations,
+                         '新访客注册转化率': round(registrations / visitors, 6)})
+    return rows
+
+
+class TestScoring:
+    """打分测试类"""
+
+    def test_build_matrix(self):
+        """测试分组×指标×日期矩阵，缺失为 NaN"""
+        rows = [{'日期': '20260209', '渠道': 'a', 'x': 1}, {'日期': '20260202', '渠道': 'b', 'x': 2},
+                {'日期': '20260209', '渠道': 'b', 'x': None}]
+
+        dates, segments, values = build_matrix(rows, '日期', ['渠道'], ['x'])
+
+        assert dates == ['20260202', '20260209']
+        assert segments == [('a',), ('b',)]
+        assert math.isnan(values[0][0][0]) and values[0][0][1] == 1
+        assert values[1][0][0] == 2 and math.isnan(values[1][0][1])
+
+    def test_zscore_and_mad(self):
+        """测试 zscore 与 MAD：MAD 不受基线中单个极端周影响"""
+        series = [[10, 12, 11, 9, 10, 11, 50, 10, 30]]
+
+        _, _, zscore = score_series(series, 'zscore', min_periods=4)
+        center, scale, mad = score_series(series, 'mad', min_periods=4)
+
+        assert center[0] == 10.5
+        assert scale[0] == pytest.approx(1.4826 * 0.5)
+        assert mad[0] == pytest.approx((30 - 10.5) / (1.4826 * 0.5))
+        assert zscore[0] < 3 < mad[0]
+
+    def test_insufficient_baseline(self):
+        """测试基线不足或目标缺失时不打分"""
+        _, _, scores = score_series([[1, 2, 3], [1, 2, 3, 4, 5, math.nan]], min_periods=4)
+
+        assert all(math.isnan(score) for score in scores)
+        with pytest.raises(ValueError):
+            score_series([[1, 2]], 'iqr')
+
+    def test_python_matches_numpy(self):
+        """测试纯Python实现与 numpy 实现结果一致（未安装 numpy 时跳过）"""
+        if not anomaly.HAS_NUMPY:
+            pytest.skip('numpy 未安装')
+        rng = random.Random(0)
+        series = [[rng.gauss(100, 10) for _ in range(13)] for _ in range(50)]
+        for method in ('zscore', 'mad'):
+            expected = anomaly._score_python(series, method, 4, 0.05)
+            actual = anomaly._score_numpy(series, method, 4, 0.05)
+            assert actual[2] == pytest.approx(expected[2])
+
+
+class TestDetector:
+    """异常检测器测试类"""
+
+    def test_scan_all_segments(self, logger):
+        """测试只标出突变渠道的相关指标，平稳渠道不误报"""
+        detector = AnomalyDetector(logger=logger)
+
+        found = detector.scan({'traffic': _traffic_rows('organic', 300)})['traffic']
+
+        assert {item['segment']['渠道'] for item in found} == {'organic'}
+        assert {item['field'] for item in found} == {'新访客数', '新访客注册数'}
+        assert found[0]['score'] < -3
+        assert found[0]['date'] == MONDAYS[-1]
+        assert '偏低' in found[0]['message']
+        assert detector.scan({'traffic': _traffic_rows()}) == {}
+
+    def test_retention_week_lag(self, logger):
+        """测试次周留存按 week_lag 以倒数第二周为目标周"""
+        rows = [{'上周': day, '上周用户类型': '新注册', '上周工具WAU': 1000, '本周工具WAU': 300 + i % 3}
+                for i, day in enumerate(MONDAYS)]
+        rows[-2]['本周工具WAU'] = 100
+        rows[-1]['本周工具WAU'] = 0  # 最新一周的次周留存尚未产生
+
+        found = AnomalyDetector(logger=logger).scan_section('retention', rows)
+
+        assert {item['date'] for item in found} == {MONDAYS[-2]}
+        assert {item['field'] for item in found} == {'本周工具WAU'}
+
+    def test_attention_items_and_quality_report(self, logger):
+        """测试写入关注事项（每部分限量）并计入数据质量报告"""
+        data = {'traffic': _traffic_rows('paid ads', 3000)}
+        detector = AnomalyDetector({'max_attention_items': 1}, logger=logger)
+        analysis = {'traffic': {'attention_items': []}}
+
+        detector.add_attention_items(analysis, detector.scan(data))
+        mappings = {'traffic': {'columns': {'新访客数': 'new_visitors'},
+                                'aliases': {'registrations': '新访客注册数', 'conversion_rate': '新访客注册转化率'}}}
+        report = DataQualityAnalyzer(logger, column_mappings=mappings).generate_quality_report(data)
+
+        assert len(analysis['traffic']['attention_items']) == 1
+        assert analysis['traffic']['attention_items'][0].startswith('paid ads ')
+        assert report['sections']['traffic']['status'] == 'warning'
+        assert report['summary']['total_anomalies'] >= 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+报告附件测试
+
+测试CSV导出、附件链接插入、流式 multipart 请求体和附件上传
+"""
+
+import io
+import json
+import pytest
+from src.api.confluence import ConfluenceAPIClient, MultipartStream
+from src.attachments import build_table_csv, collect_table_attachments, add_attachment_links
+from src.confluence_updater import ConfluenceUpdater
+from src.section_blocks import wrap_section, split_sections
+
+
+class FakeResponse:
+    """模拟HTTP响应"""
+
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.text = json.dumps(self._payload)
+        self.content = self.text.encode('utf-8')
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeAttachmentSession:
+    """模拟附件接口（记录上传的URL和请求体）"""
+
+    def __init__(self):
+        self.attachments = {}
+        self.posts = []
+
+    def get(self, url, params=None, **kwargs):
+        filename = (params or {}).get('filename')
+        if filename in self.attachments:
+            return FakeResponse(200, {'results': [{'id': self.attachments[filename], 'title': filename}]})
+        return FakeResponse(200, {'results': []})
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        body = b''.join(data)
+        self.posts.append({'url': url, 'body': body, 'headers': headers, 'length': len(data)})
+        filename = body.split(b'filename="')[1].split(b'"')[0].decode('utf-8')
+        if url.endswith('/data'):
+            return FakeResponse(200, {'id': self.attachments[filename], 'title': filename})
+        self.attachments[filename] = f'att{len(self.attachments) + 1}'
+        return FakeResponse(200, {'results': [{'id': self.attachments[filename], 'title': filename}]})
+
+
+class TestAttachmentContent:
+    """附件内容测试类"""
+
+    def test_build_table_csv(self):
+        """测试CSV导出保留全部行和列"""
+        rows = [{'渠道': '自然流量', 'UV': 1200}, {'渠道': '广告', 'UV': 800, '备注': 'x'}]
+        text = build_table_csv(rows).decode('utf-8-sig')
+
+        assert text.splitlines() == ['渠道,UV,备注', '自然流量,1200,', '广告,800,x']
+
+    def test_add_attachment_links(self):
+        """测试链接插入到对应部分的结束标记之前"""
+        blocks = {'traffic': wrap_section('traffic', '<p>流量</p>'), 'revenue': wrap_section('revenue', '<p>收入</p>')}
+        files = collect_table_attachments({'traffic': [{'UV': 1}], 'revenue': []}, '2025-01-06')
+        result = add_attachment_links(blocks, files)
+
+        assert list(files) == ['traffic_2025-01-06.csv']
+        assert 'ri:filename="traffic_2025-01-06.csv"' in split_sections(result['traffic'])['traffic']
+        assert result['revenue'] == blocks['revenue']
+        assert 'ri:attachment' not in blocks['traffic']
+
+
+class TestMultipartStream:
+    """流式请求体测试类"""
+
+    def test_length_matches_content(self):
+        """测试预先计算的长度与实际内容一致，且按块读取"""
+        payload = b'a' * 1000
+        stream = MultipartStream({'comment': '周报'}, 'big.csv', io.BytesIO(payload), len(payload),
+                                 'text/csv', chunk_size=64)
+        chunks = list(stream)
+
+        body = b''.join(chunks)
+        assert len(body) == len(stream)
+        assert max(len(c) for c in chunks) <= 64
+        assert payload in body
+        assert body.endswith(f'--{stream.boundary}--\r\n'.encode('utf-8'))
+
+
+class TestUploadAttachment:
+    """附件上传测试类"""
+
+    @pytest.fixture
+    def updater(self, tmp_path, logger):
+        """使用模拟附件接口的更新器"""
+        config = {'confluence': {'page_id': 123, 'publish_state_dir': str(tmp_path)}}
+        updater = ConfluenceUpdater(config, logger)
+        updater.client = ConfluenceAPIClient('https://cf.example.com', logger=logger)
+        updater.client.session = FakeAttachmentSession()
+        return updater
+
+    def test_create_then_update(self, updater):
+        """测试首次创建附件，内容变化后上传为新版本"""
+        session = updater.client.session
+
+        assert updater.upload_attachments({'t.csv': {'content': b'v1', 'content_type': 'text/csv'}}) == {'t.csv': True}
+        assert session.posts[0]['url'].endswith('/content/123/child/attachment')
+        assert session.posts[0]['headers']['X-Atlassian-Token'] == 'nocheck'
+        assert session.posts[0]['headers']['Content-Type'].startswith('multipart/form-data; boundary=')
+
+        updater.upload_attachments({'t.csv': {'content': b'v2', 'content_type': 'text/csv'}})
+        assert session.posts[1]['url'].endswith('/content/123/child/attachment/att1/data')
+
+    def test_skip_unchanged(self, updater):
+        """测试内容未变化的附件不重复上传"""
+        files = {'t.csv': {'content': b'same', 'content_type': 'text/csv'}}
+        updater.upload_attachments(files)
+        updater.upload_attachments(files)
+
+        assert len(updater.client.session.posts) == 1
+
+    def test_upload_from_path(self, updater, tmp_path):
+        """测试从文件路径流式上传"""
+        path = tmp_path / 'chart.svg'
+        path.write_bytes(b'<svg/>' * 100)
+
+        data = updater.client.upload_attachment(123, 'chart.svg', path, 'image/svg+xml', chunk_size=128)
+
+        assert data['title'] == 'chart.svg'
+        assert b'<svg/>' * 100 in updater.client.session.posts[0]['body']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
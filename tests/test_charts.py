@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+趋势图渲染测试
+
+测试序列提取、SVG生成、进程池渲染和报告嵌入
+"""
+
+import pytest
+from src.attachments import add_chart_images
+from src.charts import build_series, build_chart_jobs, render_sparkline_svg, render_trend_svg, ChartRenderer
+from src.section_blocks import wrap_section, split_sections
+
+
+def _weekly_rows(weeks=14):
+    """生成按渠道分组的周数据"""
+    rows = []
+    for i in range(weeks):
+        date = f"2025{i // 4 + 1:02d}{i % 4 * 7 + 1:02d}"
+        rows.append({'日期': date, '渠道': 'organic', '新访客数': 100 + i})
+        rows.append({'日期': date, '渠道': 'ads', '新访客数': 50 + i})
+    return rows
+
+
+class TestSeries:
+    """序列提取测试类"""
+
+    def test_sum_by_date(self):
+        """测试无分组时按日期求和，只保留最近12周"""
+        series = build_series(_weekly_rows(), '日期', '新访客数')
+
+        assert list(series) == ['全部']
+        assert len(series['全部']) == 12
+        assert series['全部'][-1][1] == 100 + 13 + 50 + 13
+
+    def test_group_and_skip_invalid(self):
+        """测试分组序列，非数值行被跳过"""
+        rows = _weekly_rows(3) + [{'日期': '20250301', '渠道': 'ads', '新访客数': None}]
+        series = build_series(rows, '日期', '新访客数', group_key='渠道')
+
+        assert set(series) == {'organic', 'ads'}
+        assert [v for _, v in series['ads']] == [50, 51, 52]
+
+
+class TestSvg:
+    """SVG生成测试类"""
+
+    def test_sparkline(self):
+        """测试迷你走势图，数据不足时返回空"""
+        svg = render_sparkline_svg([1, 3, 2], width=100, height=20)
+
+        assert svg.startswith('<svg') and 'polyline' in svg
+        assert render_sparkline_svg([1]) == ''
+
+    def test_trend_with_legend_and_percent(self):
+        """测试多序列趋势图包含图例，比率序列按百分比标注"""
+        series = {'新注册': [('20250101', 0.1), ('20250108', 0.12)], '老用户': [('20250101', 0.3), ('20250108', 0.28)]}
+        svg = render_trend_svg(series, title='留存<次周>')
+
+        assert svg.count('<polyline') == 2
+        assert '新注册' in svg and '%' in svg
+        assert '留存&lt;次周&gt;' in svg
+
+
+class TestChartRenderer:
+    """图表渲染器测试类"""
+
+    def test_jobs_per_section(self):
+        """测试每个有历史数据的部分生成迷你走势图和趋势图"""
+        jobs = build_chart_jobs({'traffic': _weekly_rows(), 'revenue': [], 'unknown': [{'x': 1}]}, report_date='d')
+
+        assert [job['filename'] for job in jobs] == ['traffic_sparkline_d.svg', 'traffic_trend_d.svg']
+
+    def test_jobs_for_sql_columns(self):
+        """测试按 03 活跃、05 收入查询的实际返回列生成图表"""
+        weeks = [f"2025{i // 4 + 1:02d}{i % 4 * 7 + 1:02d}" for i in range(4)]
+        engagement = [{'周': week, '新用户WAU': 100 + i, '老用户WAU': 500 - i} for i, week in enumerate(weeks)]
+        revenue = [{'日期': week, '总收入': 1000.0 * (i + 1), '新签收入': 400.0, '续约收入': 600.0}
+                   for i, week in enumerate(weeks)]
+
+        jobs = build_chart_jobs({'engagement': engagement, 'revenue': revenue})
+        by_name = {job['filename']: job for job in jobs}
+
+        assert set(by_name) == {'engagement_sparkline.svg', 'engagement_trend.svg',
+                                'revenue_sparkline.svg', 'revenue_trend.svg'}
+        assert set(by_name['engagement_trend.svg']['series']) == {'新用户WAU', '老用户WAU'}
+        assert by_name['engagement_sparkline.svg']['series']['全部'][0] == (weeks[0], 600.0)
+        assert by_name['revenue_trend.svg']['series']['全部'][-1] == (weeks[-1], 4000.0)
+
+    def test_render_in_pool(self, logger):
+        """测试进程池渲染并可嵌入报告"""
+        renderer = ChartRenderer({'max_workers': 1}, logger=logger)
+        assert renderer.submit({'traffic': _weekly_rows()}) == 2
+        charts = renderer.collect()
+
+        assert all(info['content'].startswith(b'<svg') for info in charts.values())
+        blocks = add_chart_images({'traffic': wrap_section('traffic', '<h2>1.流量</h2><p>数据</p>')}, charts)
+        content = split_sections(blocks['traffic'])['traffic']
+        assert content.index('traffic_sparkline.svg') < content.index('<p>数据</p>') < content.index('traffic_trend.svg')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
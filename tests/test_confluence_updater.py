@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Confluence更新器测试
+
+测试差量发布：无变化跳过、按部分合并、发布状态记录
+"""
+
+import json
+import pytest
+from src.api.confluence import ConfluenceAPIClient
+from src.confluence_updater import ConfluenceUpdater
+from src.section_blocks import wrap_section, split_sections, replace_sections
+
+
+class FakeResponse:
+    """模拟HTTP响应"""
+
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.text = json.dumps(self._payload)
+        self.content = self.text.encode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """模拟Confluence页面（记录GET/PUT请求，支持ETag条件请求）"""
+
+    def __init__(self, body='', version=1):
+        self.body = body
+        self.version = version
+        self.gets = []
+        self.puts = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        expand = (params or {}).get('expand', '')
+        self.gets.append(expand)
+        etag = f'"v{self.version}-{expand}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakeResponse(304)
+        payload = {'title': '周报', 'version': {'number': self.version}}
+        if 'body.storage' in expand:
+            payload['body'] = {'storage': {'value': self.body}}
+        return FakeResponse(200, payload, {'ETag': etag})
+
+    def put(self, url, json=None, **kwargs):
+        if json['version']['number'] != self.version + 1:
+            return FakeResponse(409, {'message': 'version conflict'})
+        self.puts.append(json)
+        self.body = json['body']['storage']['value']
+        self.version = json['version']['number']
+        return FakeResponse(200, {'title': json['title'], 'version': {'number': self.version}})
+
+
+def _report(traffic='流量A', revenue='收入A', footer=''):
+    """生成带分段标记的报告"""
+    return f"<h1>周报</h1>{wrap_section('traffic', traffic)}{wrap_section('revenue', revenue)}{footer}"
+
+
+@pytest.fixture
+def updater(tmp_path, logger):
+    """使用临时发布状态目录和模拟会话的更新器"""
+    config = {'confluence': {'page_id': 123, 'publish_state_dir': str(tmp_path)}}
+    updater = ConfluenceUpdater(config, logger)
+    updater.client = ConfluenceAPIClient('https://cf.example.com', logger=logger)
+    updater.client.session = FakeSession()
+    return updater
+
+
+class TestSectionBlocks:
+    """分段标记测试类"""
+
+    def test_split_and_replace(self):
+        """测试提取与替换部分"""
+        body = _report() + '<p>人工备注</p>'
+
+        assert split_sections(body) == {'traffic': '\n流量A\n', 'revenue': '\n收入A\n'}
+
+        new_body, replaced = replace_sections(body, {'revenue': '\n收入B\n'})
+        assert replaced == ['revenue']
+        assert '收入B' in new_body and '流量A' in new_body and '人工备注' in new_body
+
+
+class TestDifferentialPublish:
+    """差量发布测试类"""
+
+    def test_first_publish_saves_state(self, updater, tmp_path):
+        """测试首次发布写入发布状态"""
+        assert updater.update_page(_report())
+
+        state = json.loads((tmp_path / '123.json').read_text(encoding='utf-8'))
+        assert state['version'] == 2
+        assert set(state['sections']) == {'traffic', 'revenue'}
+
+    def test_skip_unchanged(self, updater):
+        """测试内容无变化时跳过更新（页脚时间变化不影响）"""
+        updater.update_page(_report(footer='<p>10:00</p>'))
+        session = updater.client.session
+        gets_before = len(session.gets)
+
+        assert updater.update_page(_report(footer='<p>10:05</p>'))
+
+        assert len(session.puts) == 1
+        assert session.version == 2
+        # 版本一致时只比较本地哈希，不下载正文
+        assert 'body.storage,version' not in session.gets[gets_before:]
+
+    def test_changed_section_in_version_message(self, updater):
+        """测试部分变化时发布并在版本消息中注明"""
+        updater.update_page(_report())
+
+        assert updater.update_page(_report(revenue='收入B'), version_message='周报')
+
+        assert updater.client.session.puts[-1]['version']['message'] == '周报 (revenue)'
+
+    def test_merge_preserves_manual_edits(self, updater):
+        """测试页面被人工编辑后只替换变化的部分"""
+        updater.update_page(_report())
+        session = updater.client.session
+        session.body += '<p>人工备注</p>'
+        session.version += 1
+
+        assert updater.update_page(_report(revenue='收入B'))
+
+        assert '人工备注' in session.body
+        assert '收入B' in session.body
+
+    def test_force_publish(self, updater):
+        """测试强制完整发布"""
+        updater.update_page(_report())
+
+        assert updater.update_page(_report(), force=True)
+
+        assert len(updater.client.session.puts) == 2
+
+
+class TestConfluenceAPIClient:
+    """Confluence API客户端测试类"""
+
+    @pytest.fixture
+    def client(self, logger):
+        """使用模拟会话的客户端"""
+        client = ConfluenceAPIClient('https://cf.example.com', cache_ttl=0, logger=logger)
+        client.session = FakeSession(body='<p>正文</p>', version=5)
+        return client
+
+    def test_conditional_get_uses_cache(self, client):
+        """测试ETag条件请求返回304时沿用缓存"""
+        first = client.get_page('123')
+        second = client.get_page('123')
+
+        assert first == second
+        assert second['version']['number'] == 5
+        assert len(client.session.gets) == 2
+
+    def test_put_refreshes_cache(self, client):
+        """测试PUT成功后缓存新版本，后续读取无需请求"""
+        client.cache_ttl = 300
+        client.get_page('123')
+
+        status, _ = client.put_page('123', '周报', '<p>新正文</p>', 6, 'update')
+
+        assert status == 200
+        assert client.get_page('123')['version']['number'] == 6
+        assert client.get_page('123', expand='body.storage,version')['body']['storage']['value'] == '<p>新正文</p>'
+        assert len(client.session.gets) == 1
+
+    def test_conflict_retry(self, updater):
+        """测试版本冲突后重新获取页面并重试"""
+        updater.client.cache_ttl = 300
+        updater.update_page(_report())
+        # 页面在缓存有效期内被他人更新
+        updater.client.session.version += 1
+
+        assert updater.update_page(_report(revenue='收入B'))
+        assert updater.client.session.version == 4
+
+    def test_shared_client(self):
+        """测试同一站点、同一账号复用客户端"""
+        from src.api.confluence import get_confluence_client
+
+        first = get_confluence_client('https://cf.example.com/', 'bot', 'token')
+        second = get_confluence_client('https://cf.example.com', 'bot', 'token')
+
+        assert first is second
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+核心报告生成器测试
+
+测试流式HTML输出、列顺序预计算和完整表格输出
+"""
+
+import io
+import pytest
+from src.core.generator import ReportGenerator
+
+
+@pytest.fixture
+def channel_rows():
+    """25行渠道数据（超过默认显示的10行）"""
+    return [{'渠道': f'c{i}', '新访客数': 1000 + i, '转化率': 0.5, 'b': 1, 'a': 2, 'z': 3, 'y': 4} for i in range(25)]
+
+
+class TestStreamingHtml:
+    """流式HTML输出测试类"""
+
+    def test_write_matches_string_output(self, logger, channel_rows):
+        """测试写入文本流与返回字符串的结果一致（生成时间除外）"""
+        generator = ReportGenerator(logger=logger)
+        params = {'report_date': '2026-02-10'}
+        buffer = io.StringIO()
+
+        generator.write_html_report(buffer, params, {'traffic': channel_rows})
+        html = generator.generate_html_report(params, {'traffic': channel_rows})
+
+        assert buffer.getvalue().split('生成时间')[0] == html.split('生成时间')[0]
+        assert html.count('<td>c') == 10
+        assert '... 共 25 条记录' in html
+
+    def test_save_full_table(self, logger, channel_rows, tmp_path):
+        """测试写入文件时默认输出完整表格"""
+        path = ReportGenerator(logger=logger).save_html_report(tmp_path / 'r.html', {}, {'traffic': channel_rows})
+        html = (tmp_path / 'r.html').read_text(encoding='utf-8')
+
+        assert path.endswith('r.html')
+        assert html.count('<td>c') == 25
+        assert '共 25 条记录' not in html
+        assert '<td>1,024</td>' in html
+
+
+class TestColumnOrder:
+    """列顺序测试类"""
+
+    def test_default_sorted_and_cached(self, logger, channel_rows):
+        """测试默认按列名排序取前6列，同一份数据只扫描一次"""
+        generator = ReportGenerator(logger=logger)
+        columns = generator._column_order('traffic', channel_rows)
+
+        assert columns == sorted(channel_rows[0])[:6]
+        assert generator._column_order('traffic', channel_rows) is columns
+
+    def test_configured_order(self, logger, channel_rows):
+        """测试按配置的列顺序输出Markdown和HTML表格"""
+        generator = ReportGenerator(logger=logger, column_orders={'traffic': ['渠道', '新访客数']})
+
+        md = generator._format_data_table(channel_rows, 'traffic', max_rows=None)
+        html = generator._format_html_table(channel_rows[:1], 'traffic')
+
+        assert md.splitlines()[0] == '| 渠道 | 新访客数 |'
+        assert len(md.splitlines()) == 27
+        assert html.index('<th>渠道</th>') < html.index('<th>新访客数</th>')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -147,6 +147,37 @@ class TestDataValidator:
         # 严重 (ratio > 2.0)
         assert validator._get_severity(110, 50) == 'critical'
 
+    def test_completeness_aggregated_per_column(self, logger):
+        """测试完整性问题按列汇总：每列一条，附少量示例行"""
+        validator = DataValidator(logger)
+        rows = [{'new_visitors': 1000, 'registrations': 50, 'conversion_rate': 0.05, 'change_rate': -0.1}
+                for _ in range(10000)]
+        for row in rows[100:]:
+            row['conversion_rate'] = None
+        rows[7]['new_visitors'] = -5
+
+        is_valid, issues = validator.validate_data_completeness('traffic', rows)
+
+        assert is_valid is False
+        assert len(issues) == 2
+        assert '缺少字段: conversion_rate（9900/10000 行，如第 101, 102, 103 行）' in issues[0]
+        assert '发现负值: new_visitors（1/10000 行，如 第 8 行=-5）' in issues[1]
+
+    def test_profile_columns_in_quality_report(self, logger):
+        """测试按列汇总结果写入数据质量报告"""
+        from src.data_quality import DataQualityAnalyzer
+
+        rows = [{'new_visitors': 1000}, {'new_visitors': 1200, 'registrations': 60, 'conversion_rate': 0.05}]
+
+        report = DataQualityAnalyzer(logger).generate_quality_report({'traffic': rows})
+        completeness = report['sections']['traffic']['completeness']
+
+        assert report['sections']['traffic']['status'] == 'error'
+        assert completeness['missing'] == {'registrations': {'count': 1, 'examples': [1]},
+                                           'conversion_rate': {'count': 1, 'examples': [1]}}
+        assert completeness['negative'] == {}
+        assert len(completeness['issues']) == 2
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+导入耗时分析测试
+
+测试import_profile模块的记录与报告输出，以及核心层的按需导入
+"""
+
+import io
+import sys
+import pytest
+from src.utils.import_profile import (
+    enable_import_profile, disable_import_profile, get_import_records, report_import_profile
+)
+
+
+class TestImportProfile:
+    """导入耗时分析测试类"""
+
+    def test_records_first_import(self):
+        """测试记录首次导入的模块"""
+        sys.modules.pop('colorsys', None)
+
+        enable_import_profile()
+        try:
+            import colorsys  # noqa: F401
+        finally:
+            disable_import_profile()
+
+        names = [record[0] for record in get_import_records()]
+        assert 'colorsys' in names
+
+    def test_records_import_module(self):
+        """测试 importlib.import_module（按需导出）同样被记录，依赖挂在其下"""
+        import importlib
+
+        for name in ('colorsys', 'xml.dom.minidom', 'xml.dom'):
+            sys.modules.pop(name, None)
+
+        enable_import_profile()
+        try:
+            importlib.import_module('xml.dom.minidom')
+        finally:
+            disable_import_profile()
+
+        records = {record[0]: record for record in get_import_records()}
+        assert 'xml.dom.minidom' in records
+        assert records['xml.dom'][3] > records['xml.dom.minidom'][3]
+
+    def test_report_format(self):
+        """测试报告输出与 -X importtime 格式一致"""
+        stream = io.StringIO()
+
+        report_import_profile(stream, top=3)
+
+        assert stream.getvalue().startswith("import time: self [us] | cumulative | imported package")
+        assert '导入总耗时' in stream.getvalue()
+
+
+class TestLazyCore:
+    """核心层按需导入测试类"""
+
+    def test_lazy_attribute(self):
+        """测试通过包属性访问导出类"""
+        import src.core as core
+        from src.core.config import ConfigManager
+
+        assert core.ConfigManager is ConfigManager
+        with pytest.raises(AttributeError):
+            core.NotExists
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+本地SQL引擎测试
+
+测试方言翻译、日期函数、GROUPING SETS 展开，以及 sql/ 下的部分SQL在样例表上端到端执行
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+from src.data_fetcher import DataFetcher
+from src.date_utils import calculate_week_params
+from src.local_engine import LocalEngine, translate_sql
+from src.revenue_cube import split_revenue_cube
+from src.sql_preprocessor import preprocess_sql_file
+
+BASE_PATH = str(Path(__file__).parent.parent)
+TODAY = '20260218'  # 周三：本周一 20260216，最近完整周 20260209 ~ 20260215
+
+
+def _tool_rows():
+    """工具活跃样例：用户1、2 在 0202 周活跃，用户1 在 0209 周留存，用户3 为 0209 周新注册"""
+    rows = []
+    for user_id, week, created_week, last_week in [
+        (1, '20260202', '20260105', '20260126'),
+        (2, '20260202', '20260202', '20260126'),
+        (1, '20260209', '20260105', '20260202'),
+        (3, '20260209', '20260209', '20260202'),
+    ]:
+        rows.append({'user_id': user_id, 'created_week': week, 'user_created_week': created_week,
+                     'last_created_week': last_week, 'coohom_user_type': '个人用户',
+                     'ds': str(int(week) + 1)})
+    rows.append({'user_id': 9, 'created_week': '20260209', 'user_created_week': '20260209',
+                 'last_created_week': '20260202', 'coohom_user_type': '企业用户', 'ds': '20260210'})
+    return rows
+
+
+def _revenue_tables():
+    """收入样例：三个用户、两周发票"""
+    ds = '20260217'
+    users = [{'kujiale_user_id': uid, 'ds': ds, 'created_day': '20250101', 'created_week': '20241230',
+              'qhdi': f'q{uid}', 'locale_site': 'US', 'locale': 'en_US'} for uid in (1, 2, 3)]
+    invoices = []
+    for uid, week, day, amount, order_type, mode, country in [
+        (1, '20260202', '20260203', 100.0, 'NewSubscribe', 'normal_subscription_mode', ('United States', '美国')),
+        (2, '20260202', '20260204', 50.0, 'Renewal', 'normal_subscription_mode', ('Japan', '日本')),
+        (1, '20260209', '20260210', 30.0, 'Renewal', 'normal_subscription_mode', ('United States', '美国')),
+        (3, '20260209', '20260211', 20.0, 'NewSubscribe', 'pay_per_use', ('Japan', '日本')),
+        (3, '20260209', '20260212', 10.0, 'NewSubscribe', 'pay_per_use', ('Japan', '日本')),
+    ]:
+        invoices.append({
+            'ds': ds, 'pay_success_week': week, 'pay_success_day': day, 'amt_usd': amount,
+            'order_type_user': order_type, 'sub_mode_type': mode, 'user_id': uid, 'kjl_user_id': uid,
+            'sku_mode': 'subscription', 'sku_type': 'pro', 'sku_interval': 'year',
+            'country_en': country[0], 'country_chs': country[1],
+            'is_upgrade': False, 'is_downgrade': False, 'consecutive_renewal_count': 1,
+        })
+    return {
+        'exabrain.dwb_usr_coohom_user_s_d': users,
+        'kdw_dw.dwb_usr_coohom_user_s_d': [{k: u[k] for k in ('kujiale_user_id', 'ds', 'locale_site', 'locale')}
+                                           for u in users],
+        'exabrain.dwb_usr_coohom_qhdi_extended_s_d': [{'qhdi': 'q1', 'ads_channel_classify': 'paid ads',
+                                                       'ds': ds}],
+        'kdw_dw.dws_coohom_trd_daily_toc_invoice_s_d': invoices,
+    }
+
+
+class TestTranslate:
+    """方言翻译测试类"""
+
+    def test_tables_identifiers_and_strings(self):
+        """测试表名、反引号标识符、双引号字符串、数组和 IF"""
+        sql = ("SELECT `渠道`, IF(a > 0, 1, 0) FROM hive_prod.`exabrain`.`t1` "
+               "WHERE ARRAY_CONTAINS(['x', 'y'], c) AND d = \"it's\" -- 注释")
+
+        result = translate_sql(sql)
+
+        assert '"exabrain__t1"' in result
+        assert '"渠道"' in result
+        assert 'IIF(a > 0, 1, 0)' in result
+        assert "JSON_ARRAY('x', 'y')" in result
+        assert "d = 'it''s'" in result
+        assert '注释' not in result
+
+    def test_interval_arithmetic(self):
+        """测试 x - INTERVAL 和 DATE_SUB(x, INTERVAL) 的改写"""
+        sql = ("SELECT DATE_FORMAT(DATE_SUB(DATE_TRUNC('week', CURRENT_DATE()) - INTERVAL '1' DAY, "
+               "INTERVAL '12' WEEK), '%Y%m%d')")
+
+        assert translate_sql(sql) == ("SELECT DATE_FORMAT(DATE_SUB(DATE_SUB(DATE_TRUNC('week', LOCAL_TODAY()), "
+                                      "'1 DAY'), '12 WEEK'), '%Y%m%d')")
+
+    def test_date_functions(self, logger):
+        """测试日期函数语义（周一为一周起点、跨月、月末对齐）"""
+        engine = LocalEngine(today=TODAY, logger=logger)
+
+        row = engine.execute(
+            "SELECT DATE_FORMAT(DATE_TRUNC('week', CURRENT_DATE()), '%Y%m%d') AS monday, "
+            "DATE_FORMAT(DATE_ADD('20260227', INTERVAL 6 DAY), '%Y%m%d') AS next_days, "
+            "DATE_FORMAT(DATE_ADD('2026-01-31', INTERVAL 1 MONTH), '%Y%m%d') AS month_end, "
+            "CONCAT(SUBSTR('20260218', 1, 6), '01') AS month_key"
+        )[0]
+
+        assert row == {'monday': '20260216', 'next_days': '20260305', 'month_end': '20260228',
+                       'month_key': '20260201'}
+
+    def test_grouping_sets(self, logger):
+        """测试 GROUPING SETS 展开为 UNION ALL，GROUPING() 与未分组列正确"""
+        engine = LocalEngine(logger=logger)
+        engine.load_table('demo.sales', [{'week': 'w1', 'country': 'US', 'amt': 5},
+                                         {'week': 'w1', 'country': 'JP', 'amt': 3}])
+
+        rows = engine.execute(
+            "SELECT week, IF(GROUPING(country) = 0, 'country', 'total') AS level, country, SUM(amt) AS amt "
+            "FROM hive_prod.demo.sales GROUP BY GROUPING SETS ((week), (week, country)) ORDER BY level, amt"
+        )
+
+        assert rows == [
+            {'week': 'w1', 'level': 'country', 'country': 'JP', 'amt': 3},
+            {'week': 'w1', 'level': 'country', 'country': 'US', 'amt': 5},
+            {'week': 'w1', 'level': 'total', 'country': None, 'amt': 8},
+        ]
+
+
+class TestSectionSql:
+    """部分SQL端到端测试类"""
+
+    @pytest.fixture
+    def params(self):
+        """与 TODAY 对应的周参数"""
+        return calculate_week_params(target_date='20260215')
+
+    def test_engagement_and_retention(self, params, logger):
+        """测试活跃和留存SQL在样例表上的结果"""
+        engine = LocalEngine(today=TODAY, logger=logger)
+        engine.load_table('exabrain.dw_flw_wt_coohomtool_i_d', _tool_rows())
+
+        engagement = engine.execute(preprocess_sql_file('03_engagement_new_old_users.sql', params, BASE_PATH))
+        retention = engine.execute(preprocess_sql_file('04_retention.sql', params, BASE_PATH))
+
+        assert engagement == [{'周': '20260202', '新用户WAU': 1, '老用户WAU': 1},
+                              {'周': '20260209', '新用户WAU': 1, '老用户WAU': 1}]
+        old_0202 = [row for row in retention if row['上周'] == '20260202' and row['上周用户类型'] == '老用户'][0]
+        assert old_0202['上周工具WAU'] == 1
+        assert old_0202['本周工具WAU'] == 1
+        assert old_0202['工具次周留存'] == 1.0
+
+    def test_revenue_cube_matches_revenue(self, params, logger):
+        """测试收入立方体拆分后的总计与 05_revenue.sql 一致"""
+        engine = LocalEngine(today=TODAY, logger=logger)
+        for name, rows in _revenue_tables().items():
+            engine.load_table(name, rows)
+
+        revenue = engine.execute(preprocess_sql_file('05_revenue.sql', params, BASE_PATH))
+        cube = split_revenue_cube(engine.execute(preprocess_sql_file('11_revenue_cube.sql', params, BASE_PATH)))
+
+        assert [row['总收入'] for row in revenue] == [150.0, 60.0]
+        for expected, actual in zip(revenue, cube['revenue']):
+            for column in ('日期', '总收入', '新签收入', '续约收入', '付费用户数', '整体客单价'):
+                assert actual[column] == expected[column], column
+        japan = [row for row in cube['revenue_country'] if row['日期'] == '20260209' and row['国家_中文'] == '日本']
+        assert japan[0]['收入_美元'] == 30.0
+
+    def test_fetcher_uses_local_engine(self, tmp_path, params, logger):
+        """测试 DataFetcher 启用本地引擎后从样例目录取数，且不写快照"""
+        sample_dir = tmp_path / 'warehouse'
+        sample_dir.mkdir()
+        (sample_dir / 'exabrain.dw_flw_wt_coohomtool_i_d.json').write_text(
+            json.dumps(_tool_rows(), ensure_ascii=False), encoding='utf-8'
+        )
+        config = {
+            'local_engine': {'enabled': True, 'sample_dir': str(sample_dir), 'today': TODAY},
+            'snapshot': {'enabled': True, 'output_dir': str(tmp_path / 'archive')},
+            'sections': {'engagement': {}},
+        }
+        fetcher = DataFetcher(config, logger=logger)
+
+        results = fetcher.fetch_all_sections(params, base_path=BASE_PATH)
+
+        assert len(results['engagement']) == 2
+        assert not (tmp_path / 'archive').exists()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+日志模块测试
+
+测试队列模式日志和日志负载截断
+"""
+
+import logging
+import logging.handlers
+import pytest
+from src.logger import LoggerContext, get_logger, setup_logging, stop_logging, truncate_payload
+
+
+class TestQueueLogging:
+    """队列模式日志测试类"""
+
+    def test_queue_mode_writes_file(self, tmp_path):
+        """测试队列模式下日志由后台线程写入文件"""
+        log_file = tmp_path / 'queue.log'
+        logger = setup_logging(
+            name='test_queue_logging',
+            level='DEBUG',
+            log_file=str(log_file),
+            use_queue=True
+        )
+
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+
+        logger.info("处理 %s 部分，共 %d 行", 'traffic', 143)
+        stop_logging('test_queue_logging')
+
+        content = log_file.read_text(encoding='utf-8')
+        assert '处理 traffic 部分，共 143 行' in content
+
+    def test_queue_mode_snapshots_args(self, tmp_path):
+        """测试入队时固定参数状态，之后修改列表/字典不影响输出"""
+        log_file = tmp_path / 'args.log'
+        logger = setup_logging(name='test_queue_args', level='DEBUG', log_file=str(log_file), use_queue=True)
+
+        class Counter:
+            """自定义可变对象：在调用线程格式化"""
+            value = 1
+
+            def __str__(self):
+                return f"counter={self.value}"
+
+        rows = ['traffic']
+        payload = {'status': 'running'}
+        counter = Counter()
+        logger.info("部分: %s，响应: %s，%s", rows, truncate_payload(payload), counter)
+        rows.append('revenue')
+        payload['status'] = 'done'
+        counter.value = 2
+        stop_logging('test_queue_args')
+
+        content = log_file.read_text(encoding='utf-8')
+        assert "部分: ['traffic']，响应: {'status': 'running'}，counter=1" in content
+
+    def test_context_on_record(self, tmp_path):
+        """测试上下文前缀只加在上下文内的记录上，不修改formatter"""
+        log_file = tmp_path / 'context.log'
+        logger = setup_logging(name='test_queue_context', level='DEBUG', log_file=str(log_file), use_queue=True)
+
+        logger.info("之前")
+        with LoggerContext(logger, "数据获取"):
+            logger.info("之中")
+        logger.info("之后")
+        stop_logging('test_queue_context')
+
+        lines = log_file.read_text(encoding='utf-8').splitlines()
+        assert lines[0].endswith(' - 之前')
+        assert lines[1].endswith(' - [数据获取] 之中')
+        assert lines[2].endswith(' - 之后')
+
+    def test_module_loggers_share_queue(self, tmp_path):
+        """测试 get_logger 的模块记录器经主记录器的队列输出"""
+        log_file = tmp_path / 'main.log'
+        setup_logging(name='weekly_report', level='DEBUG', log_file=str(log_file), use_queue=True)
+        try:
+            module_logger = get_logger('anomaly')
+            module_logger.info("异常扫描完成")
+
+            assert module_logger.name == 'weekly_report.anomaly'
+            assert not module_logger.handlers
+        finally:
+            stop_logging('weekly_report')
+            setup_logging(name='weekly_report')
+
+        assert 'weekly_report.anomaly - INFO' in log_file.read_text(encoding='utf-8')
+
+    def test_direct_mode_unchanged(self):
+        """测试默认模式仍直接挂载输出handler"""
+        logger = setup_logging(name='test_direct_logging', log_file=None)
+
+        assert not any(isinstance(h, logging.handlers.QueueHandler) for h in logger.handlers)
+
+
+class TestTruncatePayload:
+    """日志负载截断测试类"""
+
+    def test_truncate_long_string(self):
+        """测试长字符串被截断并标注总长度"""
+        text = str(truncate_payload('x' * 1000, 10))
+
+        assert text.startswith('x' * 10)
+        assert '共1000字符' in text
+
+    def test_short_string_unchanged(self):
+        """测试短字符串原样输出"""
+        assert str(truncate_payload('ok', 10)) == 'ok'
+
+    def test_large_dict_bounded(self):
+        """测试大字典输出受长度上限约束"""
+        payload = {'data': {'rows': [[i, i * 2] for i in range(10000)]}}
+
+        text = str(truncate_payload(payload, 200))
+
+        assert len(text) < 250
+
+    def test_lazy_formatting(self):
+        """测试日志级别未启用时不会格式化负载"""
+        class Exploding:
+            def __repr__(self):
+                raise AssertionError("不应被格式化")
+
+        logger = setup_logging(name='test_lazy_payload', level='INFO', log_file=None)
+        logger.debug("响应: %s", truncate_payload(Exploding()))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Metabase 流式导出测试
+
+测试截断判断、兜底 LIMIT 去除、分块CSV解析，以及 DataFetcher 在结果被截断时改用导出接口
+"""
+
+import json
+
+import pytest
+from src import data_fetcher
+from src.data_fetcher import DataFetcher
+from src.metabase_export import is_truncated, iter_csv_rows, iter_text_lines, lift_limit, query_row_limit
+
+COLS = [{'name': '日期', 'base_type': 'type/Text'},
+        {'name': '渠道', 'base_type': 'type/Text'},
+        {'name': '新访客数', 'base_type': 'type/BigInteger'},
+        {'name': '转化率', 'base_type': 'type/Float'}]
+
+
+class FakeResponse:
+    """模拟HTTP响应（iter_content 按块返回）"""
+
+    def __init__(self, status_code=200, payload=None, body=b'', content_type='application/json'):
+        self.status_code = status_code
+        self._payload = payload
+        self.body = body
+        self.text = json.dumps(payload) if payload is not None else body.decode('utf-8', 'replace')
+        self.content = self.text.encode('utf-8')
+        self.headers = {'Content-Type': content_type}
+        self.closed = False
+
+    def json(self):
+        return self._payload
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def _csv_body(rows):
+    """生成导出CSV响应体（UTF-8 BOM）"""
+    lines = ['日期,渠道,新访客数,转化率'] + [f"{day},\"{channel}\",{count},{rate}" for day, channel, count, rate in rows]
+    return ('\ufeff' + '\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+
+class TestExportHelpers:
+    """截断判断与CSV解析测试类"""
+
+    def test_truncation_and_limits(self):
+        """测试兜底 LIMIT 去除，取前N行的 LIMIT 不算截断"""
+        sql = "SELECT * FROM t ORDER BY 日期 LIMIT 10000\n"
+
+        assert query_row_limit(sql) == 10000
+        assert is_truncated(sql, 2000)
+        assert not is_truncated(sql, 1999)
+        assert is_truncated(sql, 10, rows_truncated=10)
+        assert lift_limit(sql) == "SELECT * FROM t ORDER BY 日期"
+        assert not is_truncated("SELECT * FROM t LIMIT 25", 25)
+        assert lift_limit("SELECT * FROM t LIMIT 25") == "SELECT * FROM t LIMIT 25"
+
+    def test_chunked_csv(self):
+        """测试跨块的多字节字符、引号内逗号和换行、空值和类型还原"""
+        body = _csv_body([('20260209', '付费, 广告', 120, 0.25), ('20260209', '自然\n流量', '', '')])
+
+        rows = list(iter_csv_rows(iter_text_lines(body[i:i + 3] for i in range(0, len(body), 3)), COLS))
+
+        assert rows == [
+            {'日期': '20260209', '渠道': '付费, 广告', '新访客数': 120, '转化率': 0.25},
+            {'日期': '20260209', '渠道': '自然\n流量', '新访客数': None, '转化率': None},
+        ]
+
+
+class TestFetcherStreaming:
+    """DataFetcher 截断后流式导出测试类"""
+
+    @pytest.fixture
+    def fetcher(self, logger):
+        """API 上限设为3行的获取器"""
+        return DataFetcher({'metabase': {'base_url': 'https://mb/', 'api_row_cap': 3, 'export_chunk_size': 7}},
+                           logger=logger)
+
+    def _dataset(self, count):
+        """/api/dataset 响应"""
+        rows = [['20260209', f'c{i}', i, 0.5] for i in range(count)]
+        return FakeResponse(200, {'status': 'completed', 'data': {'rows': rows, 'cols': COLS}})
+
+    def test_truncated_result_streams(self, fetcher, monkeypatch):
+        """测试行数达到上限时改用CSV导出，去掉兜底 LIMIT 并还原类型"""
+        calls = []
+        export = FakeResponse(200, body=_csv_body([('20260209', f'c{i}', i, 0.5) for i in range(5)]),
+                              content_type='text/csv')
+
+        def fake_post(url, headers=None, data=None, timeout=None, stream=False):
+            calls.append((url, data, stream))
+            return export if url.endswith('api/dataset/csv') else self._dataset(3)
+
+        monkeypatch.setattr(data_fetcher.requests, 'post', fake_post)
+
+        rows = fetcher._execute_api_query("SELECT * FROM t LIMIT 10000", section='traffic')
+
+        assert len(rows) == 5
+        assert rows[4] == {'日期': '20260209', '渠道': 'c4', '新访客数': 4, '转化率': 0.5}
+        assert [url for url, _, _ in calls] == ['https://mb/api/dataset', 'https://mb/api/dataset/csv']
+        assert calls[1][2] is True
+        assert json.loads(calls[1][1]['query'])['native']['query'] == "SELECT * FROM t"
+        assert export.closed
+
+    def test_complete_result_no_export(self, fetcher, monkeypatch):
+        """测试未达上限时不调用导出接口"""
+        urls = []
+
+        def fake_post(url, **kwargs):
+            urls.append(url)
+            return self._dataset(2)
+
+        monkeypatch.setattr(data_fetcher.requests, 'post', fake_post)
+
+        rows = fetcher._execute_api_query("SELECT * FROM t LIMIT 10000")
+
+        assert len(rows) == 2
+        assert urls == ['https://mb/api/dataset']
+
+    def test_export_failure_keeps_rows(self, fetcher, monkeypatch):
+        """测试导出返回错误时保留截断前的结果"""
+        def fake_post(url, **kwargs):
+            if url.endswith('api/dataset/csv'):
+                return FakeResponse(202, {'status': 'failed', 'error': 'boom'})
+            return self._dataset(3)
+
+        monkeypatch.setattr(data_fetcher.requests, 'post', fake_post)
+
+        rows = fetcher._execute_api_query("SELECT * FROM t LIMIT 10000")
+
+        assert len(rows) == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
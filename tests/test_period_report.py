@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+月报/季报测试
+
+测试周期参数、快照历史合并、按月汇总（求和、重算比率、周均值）和只为缺失日期查询数仓
+"""
+
+import pytest
+from src.core.analyzer import Analyzer
+from src.core.sections import load_sections
+from src.date_utils import calculate_period_params
+from src.period_report import load_period_data, missing_dates, rollup_period
+from src.run_metrics import reset_run_metrics
+from src.snapshot import load_section_history, save_binary_snapshot
+
+
+def _traffic_days(start_day: int, end_day: int, month: str = '202601'):
+    """生成某月若干天的流量日粒度数据"""
+    return [{'日期': f"{month}{day:02d}", '渠道': 'paid ads', '新访客数': 100, '新访客注册数': 10}
+            for day in range(start_day, end_day + 1)]
+
+
+class TestPeriodParams:
+    """周期参数测试类"""
+
+    def test_month(self):
+        """测试指定日期所在月份及上月"""
+        params = calculate_period_params('month', '20260315')
+
+        assert params['period_start'] == '20260301'
+        assert params['period_end'] == '20260331'
+        assert params['previous_period_start'] == '20260201'
+        assert params['previous_period_end'] == '20260228'
+        assert params['report_date'] == '2026-03'
+
+    def test_quarter_across_year(self):
+        """测试季度跨年的上期"""
+        params = calculate_period_params('quarter', '20260105')
+
+        assert params['period_start'] == '20260101'
+        assert params['period_end'] == '20260331'
+        assert params['previous_period_start'] == '20251001'
+        assert params['period_label'] == '2026年Q1'
+
+    def test_invalid_period(self):
+        """测试未知周期"""
+        with pytest.raises(ValueError):
+            calculate_period_params('year')
+
+
+class TestPeriodRollup:
+    """按周期汇总测试类"""
+
+    def test_history_later_snapshot_wins(self, tmp_path, logger):
+        """测试合并多份快照，同一日期以较新的快照为准"""
+        save_binary_snapshot('traffic', _traffic_days(1, 3), {'snapshot_date': '20260104'}, output_dir=str(tmp_path), fmt='json.gz', logger=logger)
+        corrected = _traffic_days(3, 5)
+        corrected[0]['新访客数'] = 999
+        save_binary_snapshot('traffic', corrected, {'snapshot_date': '20260111'}, output_dir=str(tmp_path), fmt='json.gz', logger=logger)
+
+        rows = load_section_history(str(tmp_path), 'traffic', logger=logger)
+
+        assert [row['日期'] for row in rows] == ['20260101', '20260102', '20260103', '20260104', '20260105']
+        assert rows[2]['新访客数'] == 999
+
+    def test_weekly_sections(self):
+        """测试周粒度部分按周四归属月份：留存重算比率，WAU取周均值"""
+        specs = {spec['name']: spec for spec in load_sections({})}
+        retention = [
+            {'上周': '20251229', '上周用户类型': '新注册', '上周工具WAU': 100, '本周工具WAU': 10},
+            {'上周': '20260105', '上周用户类型': '新注册', '上周工具WAU': 300, '本周工具WAU': 50},
+            {'上周': '20260126', '上周用户类型': '新注册', '上周工具WAU': 100, '本周工具WAU': 40},
+        ]
+        engagement = [{'周': '20260105', '新用户WAU': 100, '老用户WAU': 500},
+                      {'周': '20260112', '新用户WAU': 200, '老用户WAU': 700}]
+
+        retention_month = rollup_period(specs['retention'], retention, 'month')
+        engagement_month = rollup_period(specs['engagement'], engagement, 'month')
+
+        # 20251229 这周的周四是 20260101，归属1月
+        assert len(retention_month) == 1
+        assert retention_month[0]['上周'] == '20260101'
+        assert retention_month[0]['上周工具WAU'] == 500
+        assert retention_month[0]['工具次周留存'] == 0.2
+        assert engagement_month == [{'周': '20260101', '新用户WAU': 150.0, '老用户WAU': 600.0}]
+
+    def test_fetch_only_missing(self, tmp_path, logger):
+        """测试缓存完整的部分不查询，只查询有缺口的部分并复用缓存"""
+        specs = load_sections({'sections': {'traffic': {}, 'engagement': {}}})
+        params = calculate_period_params('month', '20260201')
+        save_binary_snapshot('traffic', _traffic_days(1, 31) + _traffic_days(1, 28, '202602'),
+                             {'snapshot_date': '20260301'}, output_dir=str(tmp_path), fmt='json.gz', logger=logger)
+
+        class FakeFetcher:
+            """记录被查询的部分"""
+            requested = []
+
+            def fetch_all_sections(self, params, week_offset=0, base_path=None, sections=None):
+                self.requested.append(sections)
+                return {'engagement': [{'周': day, '新用户WAU': 10, '老用户WAU': 20}
+                                       for day in ('20251229', '20260105', '20260112', '20260119', '20260126',
+                                                   '20260202', '20260209', '20260216', '20260223')]}
+
+        fetcher = FakeFetcher()
+        metrics = reset_run_metrics()
+        data = load_period_data(specs, params, str(tmp_path), fetcher=fetcher, today='20260310', logger=logger)
+
+        assert fetcher.requested == [['engagement']]
+        counters = metrics.to_dict()['counters']
+        assert [item['labels'] for item in counters['cache_hits_total']] == [{'section': 'traffic'}]
+        assert [item['labels'] for item in counters['cache_misses_total']] == [{'section': 'engagement'}]
+        assert missing_dates(_traffic_days(1, 31), specs[0], '20260101', '20260131') == []
+        assert [row['日期'] for row in data['traffic']] == ['20260101', '20260201']
+        assert data['traffic'][1]['新访客数'] == 2800
+        assert data['traffic'][1]['新访客注册转化率'] == 0.1
+
+        analyzer = Analyzer(logger=logger)
+        analyzer.sections = specs
+        analysis = analyzer.analyze_all_sections(data, data, params)
+        assert analysis['traffic']['new_visitors_current'] == 2800
+        assert analysis['traffic']['new_visitors_previous'] == 3100
+
+    def test_no_fetch_outside_window(self, tmp_path, logger):
+        """测试缺口超出数仓12周窗口时不查询"""
+        specs = load_sections({'sections': {'traffic': {}}})
+        params = calculate_period_params('month', '20260101')
+
+        class FailingFetcher:
+            """不应被调用"""
+            def fetch_all_sections(self, *args, **kwargs):
+                raise AssertionError('不应查询数仓')
+
+        metrics = reset_run_metrics()
+        data = load_period_data(specs, params, str(tmp_path), fetcher=FailingFetcher(), today='20261018',
+                                logger=logger)
+
+        assert data == {'traffic': []}
+        # 缓存有缺口即为未命中，即使超出窗口无法补查
+        assert 'cache_hits_total' not in metrics.to_dict()['counters']
+        assert metrics.to_dict()['counters']['cache_misses_total'][0]['labels'] == {'section': 'traffic'}
+
+    def test_window_per_section(self, tmp_path, logger):
+        """测试按部分的 history_weeks 判断窗口：激活SQL只返回8周，更早的缺口不触发查询"""
+        specs = load_sections({'sections': {'traffic': {}, 'activation': {}}})
+        params = calculate_period_params('month', '20260201')
+        # 缓存缺 1月1日~11日，已超出激活的8周窗口（20260112 起）
+        activation_days = ([{'日期': f"202601{day:02d}"} for day in range(12, 32)]
+                           + [{'日期': f"202602{day:02d}"} for day in range(1, 29)])
+        save_binary_snapshot('activation', activation_days, {'snapshot_date': '20260301'},
+                             output_dir=str(tmp_path), fmt='json.gz', logger=logger)
+
+        class FakeFetcher:
+            """记录被查询的部分"""
+            requested = []
+
+            def fetch_all_sections(self, params, week_offset=0, base_path=None, sections=None):
+                self.requested.append(sections)
+                return {}
+
+        fetcher = FakeFetcher()
+        load_period_data(specs, params, str(tmp_path), fetcher=fetcher, today='20260310', logger=logger)
+
+        assert specs[1]['history_weeks'] == 8
+        assert fetcher.requested == [['traffic']]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+多页面发布测试
+
+测试发布目标配置、按目标组装报告和并发发布
+"""
+
+import pytest
+from src.publisher import build_target_reports, publish_targets
+from src.report_generator import ReportGenerator
+
+
+@pytest.fixture
+def targets():
+    """两个发布目标：完整报告和仅收入"""
+    return [
+        {'name': 'main', 'page_id': 1, 'sections': None, 'template': 'base.html'},
+        {'name': 'revenue', 'page_id': 2, 'sections': ['revenue'], 'template': 'base.html'},
+    ]
+
+
+class TestPublishTargets:
+    """发布目标测试类"""
+
+    def test_default_target_from_page_id(self, tmp_path):
+        """测试未配置targets时使用page_id作为唯一目标"""
+        from src.core.config import ConfigManager
+
+        config_file = tmp_path / 'config.yaml'
+        config_file.write_text("confluence:\n  page_id: 42\n", encoding='utf-8')
+
+        targets = ConfigManager(str(config_file)).get_publish_targets()
+
+        assert targets == [{'name': 'main', 'page_id': 42, 'sections': None, 'template': 'base.html'}]
+
+    def test_reports_use_section_subset(self, logger, targets):
+        """测试每个目标只包含自己的部分"""
+        generator = ReportGenerator(logger)
+        blocks = {
+            'traffic': '<!-- section:traffic:start -->流量<!-- section:traffic:end -->',
+            'revenue': '<!-- section:revenue:start -->收入<!-- section:revenue:end -->',
+        }
+
+        reports = build_target_reports(generator, {'report_date': '2026-02-07'}, blocks, targets)
+
+        assert '流量' in reports['main'] and '收入' in reports['main']
+        assert '流量' not in reports['revenue'] and '收入' in reports['revenue']
+
+    def test_publish_save_file_per_target(self, logger, targets, tmp_path, monkeypatch):
+        """测试保存模式下每个目标生成独立文件"""
+        monkeypatch.chdir(tmp_path)
+
+        results = publish_targets(
+            targets,
+            {'main': '<p>全部</p>', 'revenue': '<p>收入</p>'},
+            {'confluence': {}},
+            save_file=True,
+            report_date='2026-02-07',
+            logger=logger
+        )
+
+        assert all(result['success'] for result in results.values())
+        assert (tmp_path / 'output' / 'confluence_report_2026-02-07.html').exists()
+        assert (tmp_path / 'output' / 'confluence_report_2026-02-07_revenue.html').read_text(encoding='utf-8') == '<p>收入</p>'
+
+    def test_publish_failure_reported(self, logger, targets, monkeypatch):
+        """测试单个目标失败不影响其他目标"""
+        from src.confluence_updater import ConfluenceUpdater
+
+        def fake_update(self, new_content, version_message=None, force=False):
+            return self.page_id != 2
+
+        monkeypatch.setattr(ConfluenceUpdater, 'update_page', fake_update)
+
+        results = publish_targets(targets, {'main': 'a', 'revenue': 'b'}, {'confluence': {}}, logger=logger)
+
+        assert results['main']['success']
+        assert not results['revenue']['success']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -6,7 +6,7 @@
 """
 
 import pytest
-from src.report_generator import ReportGenerator
+from src.report_generator import ReportGenerator, html_to_storage
 
 
 class TestReportGenerator:
@@ -251,5 +251,43 @@ class TestReportGenerator:
         assert 'Coohom平台整体数据' in full_html
 
 
+class TestMultiFormatRendering:
+    """单次构建模型、多格式输出测试类"""
+
+    @pytest.fixture
+    def params(self):
+        return {'report_date': '2026-02-10', 'data_week': '20260210', 'data_end_date': '2026-02-09'}
+
+    def test_render_all_formats(self, logger, params):
+        """测试同一模型输出HTML、Markdown和storage格式"""
+        generator = ReportGenerator(logger=logger)
+        analysis = {'traffic': {'new_visitors_current': 12345, 'visitors_wow': {'change_rate': 5.0}}}
+
+        result = generator.render_all_formats(params, {'traffic': [{'x': 1}]}, analysis)
+
+        assert list(result['blocks']) == ['traffic']
+        assert '12,345' in result['html'] and '12,345' in result['markdown']
+        assert '**↑ 5.00%**' in result['markdown']
+        assert result['html'].startswith('<!DOCTYPE html>')
+        assert '<head>' not in result['storage'] and '<!-- section:traffic:start -->' in result['storage']
+
+    def test_markdown_keeps_all_sections(self, logger, params):
+        """测试Markdown保留无数据部分的标题，建议并入洞察一节"""
+        generator = ReportGenerator(logger=logger)
+        model = generator.build_report_model(params, {}, {'suggestions': {'short_term_suggestions': ['优化注册']}})
+
+        md = generator.render_model_markdown(model, appendix={'traffic': '![traffic](attachments/t.svg)'})
+
+        assert list(generator.render_model_blocks(model)) == ['suggestions']
+        assert '## 2.激活' in md and '![traffic](attachments/t.svg)' in md
+        assert md.count('\n---\n') == 7
+        assert '| 注册→进工具' in md and '|\n\n|' not in md
+
+    def test_html_to_storage(self):
+        """测试提取body内容，正文片段原样返回"""
+        assert html_to_storage('<html><head><style>x</style></head><body>\n<p>a</p>\n</body></html>') == '<p>a</p>'
+        assert html_to_storage('<p>b</p>') == '<p>b</p>'
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+查询结果集测试
+
+测试表头级列名映射：中英文别名访问、写回原始行、不复制数据行，以及数据校验按别名访问中文列
+"""
+
+import pytest
+from src.data_quality import DataValidator
+from src.result_set import ResultSet, RowView, column_aliases
+from src.sql_preprocessor import apply_column_mapping, get_column_aliases_for_section
+
+MAPPING = {'日期': 'date', '新访客数': 'new_visitors', '新访客注册数': 'new_visitor_registrations'}
+
+
+@pytest.fixture
+def raw_rows():
+    """SQL返回的中文列数据"""
+    return [{'日期': '20260209', '新访客数': 1200, '新访客注册数': 60},
+            {'日期': '20260216', '新访客数': 1500, '新访客注册数': 90}]
+
+
+class TestResultSet:
+    """结果集测试类"""
+
+    def test_aliases_without_copy(self, raw_rows):
+        """测试中英文键都能访问，行对象就是原始行"""
+        result = apply_column_mapping(raw_rows, MAPPING)
+
+        assert isinstance(result, ResultSet)
+        assert result.rows is raw_rows
+        assert result[0]['new_visitors'] == result[0]['新访客数'] == 1200
+        assert result[1].row is raw_rows[1]
+        assert 'date' in result[0] and 'missing' not in result[0]
+        assert list(result[0].keys()) == ['日期', '新访客数', '新访客注册数']
+        assert result.column('new_visitor_registrations') == [60, 90]
+
+    def test_write_through_and_rename(self, raw_rows):
+        """测试通过别名写回原始行，重命名只合并别名表"""
+        result = ResultSet.from_mapping(raw_rows, MAPPING)
+        result[0]['new_visitors'] = 1300
+        renamed = apply_column_mapping(result, {'新访客数': 'visitors'})
+
+        assert raw_rows[0]['新访客数'] == 1300
+        assert renamed.rows is raw_rows
+        assert renamed[0]['visitors'] == renamed[0]['new_visitors'] == 1300
+        assert renamed[:1] == raw_rows[:1]
+        assert apply_column_mapping(raw_rows, {}) is raw_rows
+
+    def test_chained_rename(self, raw_rows):
+        """测试对已有别名再次重命名时解析到原始列名"""
+        result = apply_column_mapping(apply_column_mapping(raw_rows, {'新访客数': 'new_visitors'}),
+                                      {'new_visitors': 'nv'})
+        extra = ResultSet(result, {'visitors': 'nv'})
+
+        assert result.resolve('nv') == '新访客数'
+        assert result[0]['nv'] == result[0]['new_visitors'] == 1200
+        assert result.column('nv') == [1200, 1500]
+        assert extra[1]['visitors'] == 1500
+
+    def test_original_key_wins(self):
+        """测试原始行中已有的键优先于别名"""
+        view = RowView({'a': 1, 'b': 2}, column_aliases({'b': 'a'}))
+
+        assert view['a'] == 1
+        assert view['b'] == 2
+
+    def test_config_aliases(self):
+        """测试从配置生成别名表（英文键名 + aliases）"""
+        config = {'column_mappings': {'traffic': {'columns': MAPPING,
+                                                  'aliases': {'registrations': '新访客注册数'}}}}
+
+        aliases = get_column_aliases_for_section(config, 'traffic')
+
+        assert aliases['new_visitors'] == '新访客数'
+        assert aliases['registrations'] == '新访客注册数'
+
+
+class TestValidatorAliases:
+    """数据校验别名测试类"""
+
+    def test_required_fields_on_chinese_rows(self, logger):
+        """测试英文必需字段通过别名在中文列上校验，数据行不被改写"""
+        mappings = {'traffic': {'columns': {'新访客数': 'new_visitors'},
+                                'aliases': {'registrations': '新访客注册数', 'conversion_rate': '新访客注册转化率'}}}
+        rows = [{'新访客数': 1000, '新访客注册数': 50, '新访客注册转化率': 0.05}]
+        validator = DataValidator(logger, column_mappings=mappings)
+
+        is_valid, issues = validator.validate_data_completeness('traffic', rows)
+        anomalies = validator.check_anomalies('traffic', rows, [{'新访客数': 400, '新访客注册数': 50}])
+
+        assert is_valid, issues
+        assert rows == [{'新访客数': 1000, '新访客注册数': 50, '新访客注册转化率': 0.05}]
+        assert anomalies[0]['field'] == 'new_visitors'
+        assert anomalies[0]['current_value'] == 1000
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+收入数据立方体测试
+
+测试立方体拆分为各收入部分，以及一次共享查询替代四次单独查询
+"""
+
+import pytest
+from src.core.analyzer import Analyzer
+from src.data_fetcher import DataFetcher
+from src.revenue_cube import split_revenue_cube
+
+
+@pytest.fixture
+def cube_rows():
+    """立方体查询结果（两周，含四个粒度）"""
+    return [
+        {'日期': '20260202', '粒度': 'total', '收入_美元': 800.0, '新签收入_美元': 200.0, '续约收入_美元': 600.0,
+         '付费用户数': 30, '订阅收入_美元': 700.0, '订阅付费用户数': 20, '订阅新签用户数': 8, '订阅续约用户数': 12,
+         '订阅新签收入_美元': 160.0, '订阅续约收入_美元': 540.0},
+        {'日期': '20260209', '粒度': 'total', '收入_美元': 1000.0, '新签收入_美元': 300.0, '续约收入_美元': 700.0,
+         '付费用户数': 40, '订阅收入_美元': 900.0, '订阅付费用户数': 30, '订阅新签用户数': 10, '订阅续约用户数': 0,
+         '订阅新签收入_美元': 250.0, '订阅续约收入_美元': 0},
+        {'日期': '20260209', '粒度': 'sku', 'SKU模式': 'subscription', 'SKU类型': 'pro', 'SKU周期': 'year',
+         '收入_美元': 600.0, '付费用户数': 12, '新签收入_美元': 100.0, '新签用户数': 2},
+        {'日期': '20260209', '粒度': 'country', '国家_英文': 'Japan', '国家_中文': '日本', '收入_美元': 100.0, '付费用户数': 4},
+        {'日期': '20260209', '粒度': 'country', '国家_英文': 'United States', '国家_中文': '美国', '收入_美元': 900.0,
+         '付费用户数': 36},
+        {'日期': '20260209', '粒度': 'tier', '账单分层': '新签', '收入_美元': 300.0, '付费用户数': 10},
+    ]
+
+
+class TestSplitRevenueCube:
+    """立方体拆分测试类"""
+
+    def test_sections_and_shapes(self, cube_rows):
+        """测试按粒度拆分，行结构与 05~08 单独查询一致"""
+        result = split_revenue_cube(cube_rows)
+
+        assert set(result) == {'revenue', 'revenue_sku', 'revenue_country', 'revenue_tier'}
+        assert [row['日期'] for row in result['revenue']] == ['20260202', '20260209']
+        total = result['revenue'][1]
+        assert total['总收入'] == 1000.0
+        assert total['付费用户数'] == 30
+        assert total['整体客单价'] == 30.0
+        assert total['续约客单价'] == 0
+
+        assert [row['国家_中文'] for row in result['revenue_country']] == ['美国', '日本']
+        assert result['revenue_country'][0]['客单价_美元'] == 25.0
+        assert result['revenue_sku'][0]['SKU类型'] == 'pro'
+        assert result['revenue_tier'][0] == {'日期': '20260209', '账单分层': '新签', '收入_美元': 300.0,
+                                             '付费用户数': 10, '客单价_美元': 30.0, '用户数': 10}
+
+    def test_empty(self):
+        """测试无数据时各部分为空列表"""
+        assert split_revenue_cube([]) == {'revenue': [], 'revenue_sku': [], 'revenue_country': [], 'revenue_tier': []}
+
+
+class TestSharedQuery:
+    """共享查询测试类"""
+
+    @pytest.fixture
+    def fetcher(self, tmp_path, logger):
+        """收入部分声明 source: revenue_cube 的取数器"""
+        config = {
+            'snapshot': {'enabled': False},
+            'shared_queries': {
+                'revenue_cube': {'sql': '11_revenue_cube.sql', 'splitter': 'src.revenue_cube:split_revenue_cube'}
+            },
+            'sections': {
+                'revenue': {'source': 'revenue_cube'},
+                'revenue_country': {'sql': '07_revenue_by_country.sql', 'parent': 'revenue',
+                                    'source': 'revenue_cube', 'analyzer': 'analyze_revenue_by_country'},
+            },
+        }
+        fetcher = DataFetcher(config, logger=logger)
+        fetcher.sql_output_dir = tmp_path
+        return fetcher
+
+    def test_single_scan(self, fetcher, cube_rows):
+        """测试多个收入部分只执行一次查询"""
+        executed = []
+
+        def fake_query(sql, max_retries=5, section='adhoc'):
+            executed.append(section)
+            return cube_rows
+
+        fetcher.execute_metabase_query = fake_query
+        data = fetcher.fetch_all_sections({'report_date': '2026-02-15'})
+
+        assert executed == ['revenue_cube']
+        assert list(data) == ['revenue', 'revenue_country']
+        assert len(data['revenue_country']) == 2
+
+    def test_analysis_from_cube(self, fetcher, cube_rows, logger):
+        """测试拆分后的数据可直接用于收入分析"""
+        fetcher.execute_metabase_query = lambda sql, max_retries=5, section='adhoc': cube_rows
+        data = fetcher.fetch_all_sections({})
+        analyzer = Analyzer(logger=logger)
+        analyzer.sections = fetcher.sections
+
+        analysis = analyzer.analyze_all_sections(data, {}, {})
+
+        assert analysis['revenue']['total_current'] == 1000.0
+        assert analysis['revenue']['total_previous'] == 800.0
+        assert analysis['revenue_country']['top_gainers'][0]['name'] == '美国'
+
+    def test_query_failure(self, fetcher):
+        """测试共享查询失败时各部分返回空列表"""
+        def failing_query(sql, max_retries=5, section='adhoc'):
+            raise RuntimeError('timeout')
+
+        fetcher.execute_metabase_query = failing_query
+
+        assert fetcher.fetch_all_sections({}) == {'revenue': [], 'revenue_country': []}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+粒度汇总测试
+
+测试日粒度数据汇总为周/月视图，周起点与 calculate_week_params 一致
+"""
+
+import pytest
+from src.core.sections import load_sections
+from src.date_utils import calculate_week_params
+from src.rollup import bucket_key, build_views, rollup, rollup_sections
+
+
+@pytest.fixture
+def traffic_daily():
+    """流量日粒度数据（跨两周、两个月）"""
+    return [
+        {'日期': '20260126', '渠道': 'paid ads', '新访客数': 10, '新访客注册数': 1, '新访客注册转化率': 0.1},
+        {'日期': '20260201', '渠道': 'paid ads', '新访客数': 30, '新访客注册数': 9, '新访客注册转化率': 0.3},
+        {'日期': '20260202', '渠道': 'paid ads', '新访客数': 100, '新访客注册数': 20, '新访客注册转化率': 0.2},
+        {'日期': '20260202', '渠道': 'referral', '新访客数': 0, '新访客注册数': 0, '新访客注册转化率': None},
+        {'日期': '20260205', '渠道': 'paid ads', '新访客数': 50, '新访客注册数': 10, '新访客注册转化率': 0.2},
+    ]
+
+
+class TestBucketKey:
+    """汇总桶测试类"""
+
+    def test_week_matches_week_params(self):
+        """测试周桶为周一，与 calculate_week_params 的 week_monday 一致"""
+        for day in ('20260202', '20260205', '20260208'):
+            assert bucket_key(day, 'week') == calculate_week_params(target_date=day)['week_monday']
+
+    def test_month_and_quarter(self):
+        """测试月桶和季度桶"""
+        assert bucket_key(20260228, 'month') == '20260201'
+        assert bucket_key('20260515', 'quarter') == '20260401'
+        with pytest.raises(ValueError):
+            bucket_key('20260101', 'year')
+
+
+class TestRollup:
+    """汇总测试类"""
+
+    def test_week_rollup(self, traffic_daily):
+        """测试按周和渠道求和，比率由分子/分母重新计算"""
+        weekly = build_views('traffic', traffic_daily, grains=('week',))['week']
+
+        assert [(r['日期'], r['渠道']) for r in weekly] == [
+            ('20260126', 'paid ads'), ('20260202', 'paid ads'), ('20260202', 'referral')
+        ]
+        assert weekly[0]['新访客数'] == 40
+        assert weekly[0]['新访客注册转化率'] == 0.25
+        assert weekly[1]['新访客数'] == 150
+        assert weekly[2]['新访客注册转化率'] is None
+
+    def test_month_rollup(self, traffic_daily):
+        """测试按月汇总（周跨月时按日拆分到各自月份）"""
+        monthly = rollup(traffic_daily, 'month', ['新访客数'])
+
+        assert [(r['日期'], r['新访客数']) for r in monthly] == [('20260101', 10), ('20260201', 180)]
+
+    def test_rollup_sections(self, traffic_daily):
+        """测试只汇总注册表中声明 grain: day 的部分"""
+        specs = load_sections({})
+        revenue = [{'日期': '20260202', '总收入': 1}]
+
+        result = rollup_sections({'traffic': traffic_daily, 'revenue': revenue}, specs, 'week')
+
+        assert len(result['traffic']) == 3
+        assert result['revenue'] is revenue
+        assert len(rollup_sections(result, specs, 'week')['traffic']) == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
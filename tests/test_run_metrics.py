@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+运行指标测试
+
+测试run_metrics模块的指标记录与Prometheus/JSON导出
+"""
+
+import json
+import pytest
+from src.run_metrics import RunMetrics, get_run_metrics, reset_run_metrics
+
+
+class TestRunMetrics:
+    """运行指标测试类"""
+
+    def test_counter_accumulates_per_label(self, logger):
+        """测试计数器按标签累加"""
+        metrics = RunMetrics(logger=logger)
+
+        metrics.inc('section_rows_total', 100, section='traffic')
+        metrics.inc('section_rows_total', 20, section='traffic')
+        metrics.inc('section_rows_total', 5, section='revenue')
+
+        counters = {
+            item['labels']['section']: item['value']
+            for item in metrics.to_dict()['counters']['section_rows_total']
+        }
+        assert counters == {'traffic': 120, 'revenue': 5}
+
+    def test_histogram_buckets(self, logger):
+        """测试直方图桶计数为累计值"""
+        metrics = RunMetrics(buckets=(1.0, 5.0), logger=logger)
+
+        metrics.observe('query_duration_seconds', 0.5, section='traffic')
+        metrics.observe('query_duration_seconds', 3.0, section='traffic')
+        metrics.observe('query_duration_seconds', 10.0, section='traffic')
+
+        text = metrics.to_prometheus()
+
+        assert 'weekly_report_query_duration_seconds_bucket{section="traffic",le="1"} 1' in text
+        assert 'weekly_report_query_duration_seconds_bucket{section="traffic",le="5"} 2' in text
+        assert 'weekly_report_query_duration_seconds_bucket{section="traffic",le="+Inf"} 3' in text
+        assert 'weekly_report_query_duration_seconds_count{section="traffic"} 3' in text
+        assert '# TYPE weekly_report_query_duration_seconds histogram' in text
+
+    def test_cache_hit_ratio(self, logger):
+        """测试缓存命中率派生指标"""
+        metrics = RunMetrics(logger=logger)
+
+        metrics.record_cache(True, section='traffic')
+        metrics.record_cache(False, section='revenue')
+        metrics.record_cache(True, section='retention')
+        metrics.record_cache(True, section='engagement')
+
+        metrics._finalize(success=True)
+        gauges = metrics.to_dict()['gauges']
+
+        assert gauges['cache_hit_ratio'][0]['value'] == 0.75
+        assert gauges['run_success'][0]['value'] == 1
+
+    def test_timer_records_duration(self, logger):
+        """测试计时上下文管理器"""
+        metrics = RunMetrics(logger=logger)
+
+        with metrics.timer('llm_duration_seconds', section='traffic'):
+            pass
+
+        hist = metrics.to_dict()['histograms']['llm_duration_seconds'][0]
+        assert hist['count'] == 1
+        assert hist['sum'] >= 0
+
+    def test_export_writes_files(self, logger, tmp_path):
+        """测试导出Prometheus文件、JSON文件和历史文件"""
+        metrics = RunMetrics(logger=logger)
+        metrics.inc('section_rows_total', 10, section='traffic')
+
+        config = {
+            'enabled': True,
+            'prometheus_file': str(tmp_path / 'report.prom'),
+            'json_file': str(tmp_path / 'report.json'),
+            'history_file': str(tmp_path / 'history.jsonl')
+        }
+        written = metrics.export(config, success=True)
+        metrics.export(config, success=True)
+
+        assert set(written) == {'prometheus', 'json', 'history'}
+        assert 'weekly_report_section_rows_total{section="traffic"} 10' in (tmp_path / 'report.prom').read_text()
+        data = json.loads((tmp_path / 'report.json').read_text())
+        assert data['counters']['section_rows_total'][0]['value'] == 10
+        assert len((tmp_path / 'history.jsonl').read_text().splitlines()) == 2
+
+    def test_export_disabled(self, logger, tmp_path):
+        """测试禁用导出"""
+        metrics = RunMetrics(logger=logger)
+
+        written = metrics.export({'enabled': False, 'json_file': str(tmp_path / 'x.json')})
+
+        assert written == {}
+        assert not (tmp_path / 'x.json').exists()
+
+    def test_singleton_reset(self):
+        """测试单例获取与重置"""
+        first = reset_run_metrics()
+        assert get_run_metrics() is first
+
+        second = reset_run_metrics()
+        assert second is not first
+        assert get_run_metrics() is second
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+列类型测试
+
+测试由 column_mappings 推断列类型、解码时一次性转换，以及分析器直接使用已转换的日期
+"""
+
+from pathlib import Path
+
+import pytest
+import yaml
+from src.core.analyzer import Analyzer
+from src.core.sections import load_sections
+from src.data_fetcher import DataFetcher
+from src.schema import apply_schema, build_schema, infer_column_type, normalize_date
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+
+@pytest.fixture
+def schema():
+    """config.yaml 生成的列类型"""
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        return build_schema(yaml.safe_load(f))
+
+
+class TestBuildSchema:
+    """列类型推断测试类"""
+
+    def test_infer(self):
+        """测试按中文列名和英文键名推断"""
+        assert infer_column_type('上周', 'last_week') == 'date'
+        assert infer_column_type('工具次周留存', 'retention_rate') == 'rate'
+        assert infer_column_type('客单价_美元') == 'money'
+        assert infer_column_type('Total_Amt', 'total_amount') == 'money'
+        assert infer_column_type('新用户WAU', 'new_user_wau') == 'int'
+        assert infer_column_type('渠道', 'channel') == 'str'
+
+    def test_config_schema(self, schema):
+        """测试 config.yaml 中各部分的列类型，维度列不转换"""
+        assert schema['traffic'] == {'日期': 'date', '新访客数': 'int', '新访客注册数': 'int',
+                                     '新访客注册转化率': 'rate'}
+        assert schema['revenue']['总收入'] == 'money'
+        assert schema['revenue_country']['付费用户数'] == 'int'
+        assert '国家_中文' not in schema['revenue_country']
+
+    def test_type_override(self):
+        """测试 types 覆盖推断结果，未知类型报错"""
+        config = {'column_mappings': {'demo': {'columns': {'编号': 'id'}, 'types': {'编号': 'int'}}}}
+        assert build_schema(config) == {'demo': {'编号': 'int'}}
+
+        config['column_mappings']['demo']['types'] = {'编号': 'uuid'}
+        with pytest.raises(ValueError):
+            build_schema(config)
+
+
+class TestApplySchema:
+    """解码时类型转换测试类"""
+
+    def test_coerce_once(self, schema, logger):
+        """测试日期统一为 YYYYMMDD 字符串，人数/比率转为数值，坏值置空"""
+        rows = [
+            {'日期': 20260209, '渠道': 'paid ads', '新访客数': '1,200', '新访客注册数': 30.0,
+             '新访客注册转化率': '2.5%'},
+            {'日期': '2026-02-10T00:00:00', '渠道': 'seo', '新访客数': 'n/a', '新访客注册数': None,
+             '新访客注册转化率': 0.1},
+        ]
+
+        apply_schema(rows, schema['traffic'], logger=logger)
+
+        assert rows[0] == {'日期': '20260209', '渠道': 'paid ads', '新访客数': 1200, '新访客注册数': 30,
+                           '新访客注册转化率': 0.025}
+        assert type(rows[0]['新访客注册数']) is int
+        assert rows[1]['日期'] == '20260210'
+        assert rows[1]['新访客数'] is None
+        assert rows[1]['新访客注册数'] is None
+
+    def test_normalize_date(self):
+        """测试日期规范化"""
+        assert normalize_date(20260209.0) == '20260209'
+        assert normalize_date('') is None
+        assert normalize_date('总计') == '总计'
+
+    def test_fetcher_applies_schema(self, tmp_path, schema, logger, monkeypatch):
+        """测试 DataFetcher 取数后按部分列类型转换"""
+        fetcher = DataFetcher({'column_mappings': {'engagement': {'columns': {'周': 'week',
+                                                                             '新用户WAU': 'new_user_wau'}}},
+                               'snapshot': {'enabled': False}}, logger=logger)
+        monkeypatch.setattr(fetcher, 'execute_metabase_query',
+                            lambda sql, section='adhoc': [{'周': 20260209, '新用户WAU': '15'}])
+        monkeypatch.setattr(fetcher, '_save_sql_to_md', lambda *args: None)
+
+        rows = fetcher.fetch_section_data('engagement', {'report_date': '2026-02-15'},
+                                          base_path=str(Path(__file__).parent.parent))
+
+        assert rows == [{'周': '20260209', '新用户WAU': 15}]
+
+    def test_analyzer_uses_typed_dates(self, logger):
+        """测试分析器按 YYYYMMDD 字符串提取目标周和上周，整数日期同样可用"""
+        analyzer = Analyzer(logger=logger)
+        analyzer.sections = load_sections({})
+        typed = [{'日期': '20260209', '新访客数': 5}, {'日期': '20260215', '新访客数': 7},
+                 {'日期': '20260202', '新访客数': 3}, {'日期': '总计', '新访客数': 15}]
+        untyped = [dict(row, 日期=int(row['日期'])) for row in typed[:3]]
+
+        for rows in (typed, untyped):
+            week = analyzer._extract_target_week_data(rows, {}, 'traffic')
+            assert [row['新访客数'] for row in week['current_week_data']] == [5, 7]
+            assert [row['新访客数'] for row in week['previous_week_data']] == [3]
+            assert week['target_week_start'] == '20260209'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
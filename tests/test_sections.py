@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+报告部分注册表测试
+
+测试注册表读取、插件分析器、并发取数、通用模板渲染和收入拆分子部分
+"""
+
+import threading
+import time
+import pytest
+from src.core.analyzer import Analyzer
+from src.core.sections import DEFAULT_SECTIONS, get_section, load_sections, resolve_analyzer
+from src.data_fetcher import DataFetcher
+from src.report_generator import ReportGenerator
+from src.sql_preprocessor import replace_sql_params
+
+
+def analyze_signups(current_rows, previous_rows):
+    """插件分析器：汇总注册数"""
+    current = sum(row['注册数'] for row in current_rows)
+    previous = sum(row['注册数'] for row in previous_rows)
+    return {'signups_current': current, 'signups_previous': previous, 'summary': f"注册 {current}"}
+
+
+SIGNUPS_SPEC = {
+    'title': '6. 注册明细',
+    'sql': '99_signups.sql',
+    'analyzer': f'{__name__}:analyze_signups',
+    'date_column': '日期',
+}
+
+
+class TestLoadSections:
+    """注册表读取测试类"""
+
+    def test_defaults(self):
+        """测试未配置时使用内置五个部分"""
+        specs = load_sections({})
+
+        assert [spec['name'] for spec in specs] == list(DEFAULT_SECTIONS)
+        assert get_section(specs, 'retention')['week_lag'] == 1
+
+    def test_sections_order_and_disabled(self):
+        """测试按配置顺序读取，enabled: false 的部分被跳过"""
+        config = {'sections': {
+            'revenue': {'sql': '05_revenue.sql'},
+            'signups': SIGNUPS_SPEC,
+            'traffic': {'enabled': False},
+        }}
+        specs = load_sections(config)
+
+        assert [spec['name'] for spec in specs] == ['revenue', 'signups']
+        assert get_section(specs, 'revenue')['analyzer'] == 'analyze_revenue_data'
+        assert get_section(specs, 'signups')['template'] == 'signups'
+        assert len(load_sections(config, include_disabled=True)) == 3
+
+    def test_legacy_sql_files(self):
+        """测试兼容旧的 sql_files 配置"""
+        specs = load_sections({'sql_files': {'traffic': {'name': '流量/投放', 'file': 'custom.sql'}}})
+
+        assert specs[0]['name'] == 'traffic'
+        assert specs[0]['sql'] == 'custom.sql'
+        assert specs[0]['title'] == '1. 流量/投放'
+
+
+class TestRegistryStages:
+    """各阶段遍历注册表测试类"""
+
+    @pytest.fixture
+    def config(self):
+        """包含插件部分的配置"""
+        return {
+            'metabase': {'max_concurrent_queries': 3},
+            'sections': {'traffic': {}, 'signups': SIGNUPS_SPEC},
+        }
+
+    def test_resolve_plugin(self, logger):
+        """测试解析插件分析器和内置方法"""
+        analyzer = Analyzer(logger=logger)
+
+        assert resolve_analyzer(SIGNUPS_SPEC) is analyze_signups
+        assert resolve_analyzer({'name': 'x', 'analyzer': 'analyze_traffic_data'}, analyzer) == \
+            analyzer.analyze_traffic_data
+        assert resolve_analyzer({'name': 'x', 'analyzer': 'no_such_module:fn'}) is None
+
+    def test_analyze_plugin_section(self, config, logger):
+        """测试新部分自动参与分析并补充AI总结"""
+        analyzer = Analyzer(logger=logger)
+        analyzer.sections = load_sections(config)
+        rows = [{'日期': '20260202', '注册数': 5}, {'日期': '20260208', '注册数': 7}, {'日期': '20260126', '注册数': 3}]
+
+        results = analyzer.analyze_all_sections({'signups': rows}, {}, {})
+
+        assert results['signups']['signups_current'] == 12
+        assert results['signups']['signups_previous'] == 3
+        assert 'ai_summary' in results['signups']
+
+    def test_fetch_all_concurrent(self, config, logger):
+        """测试注册表中的部分并发获取，结果按注册表顺序返回"""
+        fetcher = DataFetcher(config, logger=logger)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake_fetch(section, params, base_path=None):
+            with lock:
+                active.append(section)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(section)
+            return [{'section': section}]
+
+        fetcher.fetch_section_data = fake_fetch
+        results = fetcher.fetch_all_sections({})
+
+        assert list(results) == ['traffic', 'signups']
+        assert results['signups'] == [{'section': 'signups'}]
+        assert max(peak) == 2
+
+    def test_render_generic_section(self, config, logger):
+        """测试没有专用模板的部分使用通用模板渲染"""
+        generator = ReportGenerator(logger, sections=load_sections(config))
+        analysis = {'signups': {'signups_current': 1200, 'ai_summary': '注册稳定'}}
+
+        model = generator.build_report_model({'report_date': '2026-02-09'}, {'signups': [{}]}, analysis)
+        blocks = generator.render_model_blocks(model)
+        markdown = generator.render_model_markdown(model)
+
+        assert list(model['sections']) == ['traffic', 'signups', 'insights', 'suggestions']
+        assert model['sections']['signups']['template'] == 'generic'
+        assert '<h2>6. 注册明细</h2>' in blocks['signups']
+        assert '1,200' in blocks['signups']
+        assert '## 6. 注册明细' in markdown
+        assert 'traffic' not in blocks
+
+    def test_section_named_like_helper(self, logger):
+        """测试与内部上下文方法同名的部分（breakdown、generic）使用通用上下文"""
+        config = {'sections': {'breakdown': {'title': '拆分'}, 'generic': {'title': '通用'}}}
+        generator = ReportGenerator(logger, sections=load_sections(config))
+        analysis = {'breakdown': {'items_current': 3}, 'generic': {'rows_current': 5}}
+
+        model = generator.build_report_model({'report_date': '2026-02-09'}, {'breakdown': [{}], 'generic': [{}]},
+                                             analysis)
+
+        assert model['sections']['breakdown']['template'] == 'generic'
+        assert model['sections']['generic']['has_data'] is True
+
+
+class TestRevenueBreakdown:
+    """收入拆分子部分测试类"""
+
+    @pytest.fixture
+    def country_rows(self):
+        """国家拆分数据（本周 20260209，上周 20260202）"""
+        return [
+            {'日期': '20260209', '国家_中文': '美国', '收入_美元': 500.0, '付费用户数': 10},
+            {'日期': '20260209', '国家_中文': '日本', '收入_美元': 100.0, '付费用户数': 3},
+            {'日期': '20260209', '国家_中文': '德国', '收入_美元': 400.0, '付费用户数': 8},
+            {'日期': '20260202', '国家_中文': '美国', '收入_美元': 300.0, '付费用户数': 7},
+            {'日期': '20260202', '国家_中文': '日本', '收入_美元': 250.0, '付费用户数': 5},
+        ]
+
+    def test_top_movers(self, country_rows, logger):
+        """测试按维度汇总、排序并找出增长/下降最多的项"""
+        analyzer = Analyzer(logger=logger)
+        current = [row for row in country_rows if row['日期'] == '20260209']
+        previous = [row for row in country_rows if row['日期'] == '20260202']
+
+        result = analyzer.analyze_revenue_by_country(current, previous)
+
+        assert [item['name'] for item in result['items']] == ['美国', '德国', '日本']
+        assert [item['name'] for item in result['top_gainers']] == ['德国', '美国']
+        assert result['top_decliners'][0]['name'] == '日本'
+        assert result['top_decliners'][0]['change_abs'] == -150.0
+        assert result['items'][0]['share'] == 50.0
+
+    def test_rendered_into_revenue(self, country_rows, logger):
+        """测试子部分并入收入部分渲染，不单独成节"""
+        specs = load_sections({'sections': {
+            'revenue': {},
+            'revenue_country': {'title': '国家/地区', 'parent': 'revenue', 'sql': '07_revenue_by_country.sql',
+                                'analyzer': 'analyze_revenue_by_country', 'summary': False},
+        }})
+        analyzer = Analyzer(logger=logger)
+        analyzer.sections = specs
+        data = {'revenue': [{'日期': '20260209', 'Total_Amt': 1000}], 'revenue_country': country_rows}
+        analysis = analyzer.analyze_all_sections(data, {}, {})
+        generator = ReportGenerator(logger, sections=specs)
+
+        model = generator.build_report_model({'report_date': '2026-02-15'}, data, analysis)
+        blocks = generator.render_model_blocks(model)
+        markdown = generator.render_model_markdown(model)
+
+        assert 'ai_summary' not in analysis['revenue_country']
+        assert 'revenue_country' not in model['sections']
+        assert '<h4>国家/地区</h4>' in blocks['revenue']
+        assert '下降：日本' in blocks['revenue']
+        assert '| 美国 | 500 | 50.0% |' in markdown
+
+    def test_breakdown_sql_params(self):
+        """测试拆分SQL的 {{ds}} 占位符和中英混合列名的反引号处理"""
+        sql = "WHERE ds = '{{ds}}' AND d BETWEEN '{{date_start}}' AND '{{date_end}}' -- `收入_美元`"
+        params = {'snapshot_date': '20260215', 'last_week_monday': '20260202', 'week_sunday': '20260215'}
+
+        assert replace_sql_params(sql, params) == \
+            "WHERE ds = '20260215' AND d BETWEEN '20260202' AND '20260215' -- 收入_美元"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
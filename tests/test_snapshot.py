@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+数据快照测试
+
+测试快照的保存、加载、版本升级与选择逻辑
+"""
+
+import json
+import pytest
+from src import snapshot as snapshot_module
+from src.snapshot import (
+    SNAPSHOT_SCHEMA_VERSION, load_snapshot_file, load_snapshot_dir, find_snapshot_files,
+    save_binary_snapshot, load_manifest
+)
+
+
+@pytest.fixture
+def traffic_rows():
+    """流量快照数据fixture"""
+    return [
+        {'日期': '20260126', '渠道': 'paid ads', '新访客数': 100, '新访客注册数': 20},
+        {'日期': '20260202', '渠道': 'paid ads', '新访客数': 120, '新访客注册数': 30},
+    ]
+
+
+class TestSnapshot:
+    """数据快照测试类"""
+
+    def test_save_and_load_roundtrip(self, tmp_path, traffic_rows, logger):
+        """测试保存后可原样加载（参数从清单补全）"""
+        params = {'snapshot_date': '20260208', 'report_date': '2026-02-07'}
+
+        path = save_binary_snapshot('traffic', traffic_rows, params, output_dir=str(tmp_path), fmt='json.gz',
+                                    logger=logger)
+        snapshot = load_snapshot_file(path, logger)
+
+        assert path.endswith('2026-02/data/traffic_weekly_20260208.json.gz')
+        assert snapshot['schema_version'] == SNAPSHOT_SCHEMA_VERSION
+        assert snapshot['query']['latest_week'] == '20260202'
+        assert snapshot['params']['report_date'] == '2026-02-07'
+        assert snapshot['data'] == traffic_rows
+
+    def test_legacy_snapshot_upgraded(self, tmp_path, traffic_rows, logger):
+        """测试旧归档格式（无版本号）被升级"""
+        path = tmp_path / 'traffic_weekly_20260202.json'
+        path.write_text(json.dumps({'description': '旧格式', 'data': traffic_rows}), encoding='utf-8')
+
+        snapshot = load_snapshot_file(path, logger)
+
+        assert snapshot['schema_version'] == SNAPSHOT_SCHEMA_VERSION
+        assert snapshot['section'] == 'traffic'
+        assert snapshot['data'] == traffic_rows
+
+    def test_future_version_rejected(self, tmp_path, logger):
+        """测试拒绝加载更高版本的快照"""
+        path = tmp_path / 'traffic_weekly_20260202.json'
+        path.write_text(json.dumps({'schema_version': SNAPSHOT_SCHEMA_VERSION + 1, 'data': []}), encoding='utf-8')
+
+        assert load_snapshot_file(path, logger) is None
+
+    def test_select_latest_before_max_date(self, tmp_path, traffic_rows, logger):
+        """测试按最晚日期选择快照"""
+        for date in ('20260125', '20260201', '20260208'):
+            save_binary_snapshot('traffic', traffic_rows, {'snapshot_date': date}, output_dir=str(tmp_path),
+                                 fmt='json.gz', logger=logger)
+
+        assert find_snapshot_files(str(tmp_path))['traffic'].name == 'traffic_weekly_20260208.json.gz'
+        assert find_snapshot_files(str(tmp_path), '20260205')['traffic'].name == 'traffic_weekly_20260201.json.gz'
+        # 没有更早的快照时退回到最新一份
+        assert find_snapshot_files(str(tmp_path), '20250101')['traffic'].name == 'traffic_weekly_20260208.json.gz'
+
+    def test_load_dir_missing_section(self, tmp_path, traffic_rows, logger):
+        """测试缺失部分返回空列表"""
+        save_binary_snapshot('traffic', traffic_rows, {'snapshot_date': '20260208'}, output_dir=str(tmp_path),
+                             fmt='json.gz', logger=logger)
+
+        data = load_snapshot_dir(str(tmp_path), sections=['traffic', 'revenue'], logger=logger)
+
+        assert data == {'traffic': traffic_rows, 'revenue': []}
+
+    def test_process_json_data(self, tmp_path, traffic_rows, logger):
+        """测试从快照提取流量指标"""
+        from generate_report import process_json_data
+
+        path = save_binary_snapshot('traffic', traffic_rows, {'snapshot_date': '20260208'}, output_dir=str(tmp_path),
+                                    fmt='json.gz', logger=logger)
+        result = process_json_data({'traffic': path})
+
+        assert result['traffic']['total_guests'] == 120
+        assert result['traffic']['guests_wow'] == '+20.0%'
+        assert result['traffic']['guests_trend'] == '↑'
+
+
+class TestBinarySnapshot:
+    """二进制快照测试类"""
+
+    def test_json_gz_roundtrip_and_manifest(self, tmp_path, traffic_rows, logger):
+        """测试列式gzip快照往返及清单记录"""
+        params = {'snapshot_date': '20260208'}
+
+        path = save_binary_snapshot(
+            'traffic', traffic_rows, params,
+            sql='SELECT 1', output_dir=str(tmp_path), fmt='json.gz', logger=logger
+        )
+        snapshot = load_snapshot_file(path, logger)
+        manifest = load_manifest(tmp_path / '2026-02')
+
+        assert path.endswith('2026-02/data/traffic_weekly_20260208.json.gz')
+        assert snapshot['data'] == traffic_rows
+        entry = manifest['snapshots']['traffic_20260208']
+        assert entry['rows'] == 2
+        assert entry['format'] == 'json.gz'
+        assert entry['sql_sha256'] == snapshot['query']['sql_sha256']
+        assert len(entry['sql_sha256']) == 64
+
+    def test_binary_preferred_over_json(self, tmp_path, traffic_rows, logger):
+        """测试同一日期优先加载二进制快照（早期 JSON 快照仍可被选中和加载）"""
+        params = {'snapshot_date': '20260208'}
+        json_path = tmp_path / '2026-02' / 'json' / 'traffic_weekly_20260208.json'
+        json_path.parent.mkdir(parents=True)
+        json_path.write_text(json.dumps({'schema_version': 1, 'section': 'traffic', 'data': traffic_rows}),
+                             encoding='utf-8')
+        assert find_snapshot_files(str(tmp_path))['traffic'] == json_path
+
+        save_binary_snapshot('traffic', traffic_rows, params, output_dir=str(tmp_path), fmt='json.gz', logger=logger)
+
+        assert find_snapshot_files(str(tmp_path))['traffic'].name == 'traffic_weekly_20260208.json.gz'
+
+    def test_future_binary_version_rejected(self, tmp_path, traffic_rows, logger, monkeypatch):
+        """测试拒绝加载更高版本的二进制快照"""
+        monkeypatch.setattr(snapshot_module, 'SNAPSHOT_SCHEMA_VERSION', SNAPSHOT_SCHEMA_VERSION + 1)
+        path = save_binary_snapshot('traffic', traffic_rows, {'snapshot_date': '20260208'}, output_dir=str(tmp_path),
+                                    fmt='json.gz', logger=logger)
+        monkeypatch.undo()
+
+        assert load_snapshot_file(path, logger) is None
+
+    def test_arrow_version_and_mixed_type_fallback(self, tmp_path, traffic_rows, logger):
+        """测试 Arrow 快照记录 schema_version，混合类型列改存 json.gz（未安装 pyarrow 时跳过）"""
+        if not snapshot_module.HAS_PYARROW:
+            pytest.skip('pyarrow 未安装')
+
+        path = save_binary_snapshot('traffic', traffic_rows, {'snapshot_date': '20260208'}, output_dir=str(tmp_path),
+                                    fmt='arrow', logger=logger)
+        assert snapshot_module._read_arrow(snapshot_module.Path(path))[1] == SNAPSHOT_SCHEMA_VERSION
+
+        mixed = traffic_rows + [{'日期': '20260209', '渠道': 7, '新访客数': 90, '新访客注册数': 10}]
+        fallback = save_binary_snapshot('traffic', mixed, {'snapshot_date': '20260208'}, output_dir=str(tmp_path),
+                                        fmt='arrow', logger=logger)
+
+        assert fallback.endswith('traffic_weekly_20260208.json.gz')
+        assert not snapshot_module.Path(path).exists()
+        assert load_snapshot_file(fallback, logger)['data'] == mixed
+
+    def test_fetcher_writes_snapshot(self, tmp_path, traffic_rows, logger, monkeypatch):
+        """测试DataFetcher获取数据后自动写入快照"""
+        from src.data_fetcher import DataFetcher
+
+        sql_dir = tmp_path / 'sql'
+        sql_dir.mkdir()
+        (sql_dir / '01_traffic_weekly.sql').write_text('SELECT 1', encoding='utf-8')
+        config = {
+            'metabase': {},
+            'sql_files': {'traffic': {'file': '01_traffic_weekly.sql'}},
+            'snapshot': {'enabled': True, 'output_dir': 'archive', 'format': 'json.gz'}
+        }
+        fetcher = DataFetcher(config, logger=logger)
+        fetcher.sql_output_dir = tmp_path / 'sql_queries'
+        monkeypatch.setattr(fetcher, 'execute_metabase_query', lambda sql, section='adhoc': traffic_rows)
+
+        fetcher.fetch_section_data('traffic', {'snapshot_date': '20260208'}, str(tmp_path))
+
+        manifest = load_manifest(tmp_path / 'archive' / '2026-02')
+        assert manifest['snapshots']['traffic_20260208']['rows'] == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+SQL差分测试
+
+测试激活SQL滚动PV步骤的窗口函数写法与原自连接写法在合成数据上结果一致，
+以及差分工具能发现口径差异
+"""
+
+from pathlib import Path
+
+import pytest
+from src.sql_diff import (
+    check_activation_rolling_pv, compare_results, extract_cte, run_sqlite, synthetic_daily_pv, to_sqlite
+)
+
+SQL_DIR = Path(__file__).parent.parent / 'sql'
+
+
+class TestActivationRollingPv:
+    """激活SQL滚动PV改写测试类"""
+
+    def test_window_matches_selfjoin(self, logger):
+        """测试多组随机数据上两种写法结果完全一致"""
+        outcome = check_activation_rolling_pv(seeds=range(5), logger=logger)
+
+        assert outcome['equal']
+        assert all(run['reference_rows'] > 0 for run in outcome['runs'])
+
+    def test_window_edges(self):
+        """测试窗口边界：间隔6天计入，间隔7天不计入，跨月日期运算正确"""
+        body = extract_cte((SQL_DIR / '02_activation_ready.sql').read_text(encoding='utf-8'), 'user_rolling_pv')
+        sql = to_sqlite(f"WITH user_rolling_pv AS ({body}) SELECT userid, ds, total_pv FROM user_rolling_pv")
+        rows = [
+            {'userid': 1, 'ds': '20260126', 'pv': 4},
+            {'userid': 1, 'ds': '20260201', 'pv': 3},  # 与 0126 相隔6天
+            {'userid': 2, 'ds': '20260126', 'pv': 4},
+            {'userid': 2, 'ds': '20260202', 'pv': 3},  # 与 0126 相隔7天
+        ]
+
+        result = run_sqlite(sql, {'user_daily_pv': rows})
+
+        assert result == [{'userid': 1, 'ds': '20260201', 'total_pv': 7}]
+
+    def test_production_sql_has_no_selfjoin(self):
+        """测试线上SQL不再对 user_daily_pv 做自连接"""
+        body = extract_cte((SQL_DIR / '02_activation_ready.sql').read_text(encoding='utf-8'), 'user_rolling_pv')
+
+        assert ' JOIN ' not in body.upper()
+        assert 'LAG(' in body
+
+
+class TestDiffHarness:
+    """差分工具测试类"""
+
+    def test_detects_difference(self):
+        """测试窗口写错（只看5天）时差分能发现"""
+        tables = {'user_daily_pv': synthetic_daily_pv(seed=3)}
+        reference = run_sqlite(
+            to_sqlite((SQL_DIR / 'reference' / '02_rolling_pv_selfjoin.sql').read_text(encoding='utf-8')), tables
+        )
+        broken = run_sqlite(to_sqlite(
+            "SELECT a.userid, a.ds, SUM(b.pv) AS total_pv FROM user_daily_pv a "
+            "LEFT JOIN user_daily_pv b ON a.userid = b.userid "
+            "AND b.ds BETWEEN DATE_FORMAT(DATE_ADD(a.ds, INTERVAL -4 DAY), '%Y%m%d') AND a.ds "
+            "GROUP BY a.userid, a.ds HAVING SUM(b.pv) > 6"
+        ), tables)
+
+        result = compare_results(reference, broken)
+
+        assert not result['equal']
+        assert result['only_reference']
+
+    def test_extract_cte_missing(self):
+        """测试找不到 CTE 时报错"""
+        with pytest.raises(ValueError):
+            extract_cte("WITH a AS (SELECT 1) SELECT * FROM a", 'b')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
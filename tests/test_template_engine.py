@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+共享模板引擎测试
+
+测试环境复用、字节码缓存开关和配置读取
+"""
+
+import pytest
+from src.template_engine import clear_template_envs, get_template_env, load_rendering_config, warm_template_cache
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    """包含两个模板的临时目录"""
+    directory = tmp_path / 'templates'
+    directory.mkdir()
+    (directory / 'a.html').write_text('<p>{{ name }}</p>', encoding='utf-8')
+    (directory / 'b.md').write_text('# {{ title }}', encoding='utf-8')
+    yield directory
+    clear_template_envs()
+
+
+class TestTemplateEngine:
+    """模板引擎测试类"""
+
+    def test_env_shared_per_dir_and_options(self, template_dir, tmp_path):
+        """测试同一目录、同一参数复用环境，参数不同时创建新环境"""
+        rendering = {'cache_enabled': True, 'bytecode_cache_dir': str(tmp_path / 'cache')}
+        env = get_template_env(template_dir, rendering)
+
+        assert get_template_env(str(template_dir), rendering) is env
+        assert get_template_env(template_dir, rendering, trim_blocks=True) is not env
+
+    def test_bytecode_cache_written(self, template_dir, tmp_path):
+        """测试启用缓存时预编译结果写入磁盘"""
+        cache_dir = tmp_path / 'cache'
+        env = get_template_env(template_dir, {'cache_enabled': True, 'bytecode_cache_dir': str(cache_dir)})
+
+        assert warm_template_cache(env) == 2
+        assert len(list(cache_dir.glob('__jinja2_*.cache'))) == 2
+        assert env.get_template('a.html').render(name='周报') == '<p>周报</p>'
+
+    def test_cache_disabled(self, template_dir):
+        """测试关闭缓存时不使用字节码缓存"""
+        env = get_template_env(template_dir, {'cache_enabled': False})
+
+        assert env.bytecode_cache is None
+
+    def test_filters_registered_on_creation(self, template_dir):
+        """测试过滤器在创建共享环境时注册，不同过滤器使用不同环境"""
+        def shout(value):
+            return f"{value}!"
+
+        env = get_template_env(template_dir, {'cache_enabled': False}, filters={'shout': shout})
+
+        assert get_template_env(template_dir, {'cache_enabled': False}, filters={'shout': shout}) is env
+        assert 'shout' not in get_template_env(template_dir, {'cache_enabled': False}).filters
+        assert env.from_string('{{ name | shout }}').render(name='周报') == '周报!'
+
+    def test_load_rendering_config(self, tmp_path):
+        """测试从 templates.yaml 读取 rendering 配置"""
+        config_file = tmp_path / 'templates.yaml'
+        config_file.write_text('rendering:\n  cache_enabled: false\n  autoescape: true\n', encoding='utf-8')
+
+        assert load_rendering_config(str(config_file)) == {'cache_enabled': False, 'autoescape': True}
+        assert load_rendering_config(str(tmp_path / 'missing.yaml')) == {}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])